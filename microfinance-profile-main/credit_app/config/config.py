@@ -18,8 +18,10 @@ class Config:
     
     # Configuration de l'API
     API_RATE_LIMIT = int(os.getenv('API_RATE_LIMIT', '100'))
+    PREDICT_BATCH_MAX_SIZE = int(os.getenv('PREDICT_BATCH_MAX_SIZE', '10000'))
     
-    # Configuration du logging
+    # Configuration du logging : niveau global puis surcharges par sous-systeme
+    # (api, scoring, realtime, db) ou par logger, ex. "INFO,realtime=WARNING,db=DEBUG"
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     
     # Configuration de l'ingénierie des caractéristiques
@@ -33,6 +35,7 @@ class Config:
     
     # Configuration Redis (pour la mise en cache si nécessaire)
     REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    SCORE_CACHE_BACKEND = os.getenv('SCORE_CACHE_BACKEND', 'memory')  # memory | redis
     
     # Configuration du modèle ML
     MODEL_RETRAIN_INTERVAL = int(os.getenv('MODEL_RETRAIN_INTERVAL', '24'))  # heures
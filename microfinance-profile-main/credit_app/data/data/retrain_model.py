@@ -3,15 +3,33 @@ import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score
+from sklearn.metrics import classification_report, confusion_matrix
 import joblib
 import logging
+import sys
+import time
 from datetime import datetime
 import os
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'models'))
+from hyperparameter_search import append_model_history, history_row, successive_halving_search
+from model_registry import ModelRegistry
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'historique_modeles.csv')
+
+# Paramètres historiques, servent de base à la recherche
+RF_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 10,
+    'min_samples_split': 5,
+    'min_samples_leaf': 2,
+    'random_state': 42,
+    'class_weight': 'balanced'
+}
+
 class CreditScoringRetrainer:
     def __init__(self):
         self.model = None
@@ -19,6 +37,8 @@ class CreditScoringRetrainer:
         self.label_encoders = {}
         self.feature_columns = []
         self.target_column = 'decision_credit'
+        self.search_summary = None
+        self.fit_seconds = None
         
         # Types de crédit à automatiser
         self.automated_credit_types = ['consommation_generale', 'avance_salaire', 'depannage']
@@ -224,28 +244,40 @@ class CreditScoringRetrainer:
             logger.error(f"Erreur préprocessing: {str(e)}")
             raise
     
-    def train_model(self, X_train, y_train):
-        """Entraîne le modèle"""
+    def train_model(self, X_train, y_train, search=None):
+        """
+        Entraîne le modèle. search : options de successive_halving_search
+        (budget_seconds, n_candidates, cv...) pour choisir les hyperparamètres
+        par validation croisée stratifiée sur X_train avant l'entraînement final.
+        """
         try:
             logger.info("Entraînement du modèle...")
+            params = dict(RF_PARAMS)
+            self.search_summary = None
+            
+            if search is not None:
+                options = {'scoring': 'f1_weighted', **search}
+                result = successive_halving_search(
+                    np.asarray(X_train, dtype=float), np.asarray(y_train),
+                    base_params=params, **options
+                )
+                params.update(result.best_params)
+                self.search_summary = result.summary()
+                logger.info(f"Recherche terminée ({result.stop_reason}): "
+                            f"{options['scoring']} CV {result.best_score:.4f} en {result.elapsed_seconds:.1f}s")
             
             # Normalisation
             X_train_scaled = self.scaler.fit_transform(X_train)
             
             # Configuration du modèle
-            self.model = RandomForestClassifier(
-                n_estimators=100,
-                max_depth=10,
-                min_samples_split=5,
-                min_samples_leaf=2,
-                random_state=42,
-                class_weight='balanced'
-            )
+            self.model = RandomForestClassifier(**params)
             
             # Entraînement
+            started = time.perf_counter()
             self.model.fit(X_train_scaled, y_train)
+            self.fit_seconds = time.perf_counter() - started
             
-            logger.info("Modèle entraîné avec succès")
+            logger.info(f"Modèle entraîné avec succès ({self.fit_seconds:.1f}s)")
             
         except Exception as e:
             logger.error(f"Erreur entraînement: {str(e)}")
@@ -312,8 +344,27 @@ class CreditScoringRetrainer:
             logger.error(f"Erreur sauvegarde: {str(e)}")
             raise
     
-    def retrain_with_synthetic_data(self, n_samples=10000):
-        """Pipeline complet avec données synthétiques"""
+    def publish_model(self, registry_dir, metrics):
+        """
+        Publie le modèle entraîné dans le registre, sans l'activer : un
+        service l'active avec activate_version, après validation.
+        """
+        registry = ModelRegistry(registry_dir)
+        version = registry.publish(
+            self.model, self.scaler, self.feature_columns,
+            metrics=metrics, params=self.model.get_params(),
+            artifacts={'label_encoders': self.label_encoders},
+            search=self.search_summary, automated_credit_types=self.automated_credit_types
+        )
+        logger.info(f"Version {version} publiée dans {registry_dir} (non active)")
+        return version
+    
+    def retrain_with_synthetic_data(self, n_samples=10000, search=None, registry_dir=None):
+        """
+        Pipeline complet avec données synthétiques.
+        search : options de recherche d'hyperparamètres (None = paramètres fixes)
+        registry_dir : registre propre à ce modèle où il est publié (None = pas de publication)
+        """
         try:
             logger.info("=== Début du réentraînement ===")
             
@@ -332,7 +383,7 @@ class CreditScoringRetrainer:
             X_val, y_val = self.preprocess_data(val_data)
             
             # 4. Entraînement
-            self.train_model(X_train, y_train)
+            self.train_model(X_train, y_train, search=search)
             
             # 5. Évaluation
             logger.info("=== Métriques sur Test ===")
@@ -341,13 +392,27 @@ class CreditScoringRetrainer:
             logger.info("=== Métriques sur Validation ===")
             val_metrics = self.evaluate_model(X_val, y_val)
             
-            # 6. Sauvegarde
+            # 6. Sauvegarde et publication
             self.save_model()
             
+            history_metrics = {}
+            for split, split_metrics in (('test', test_metrics), ('validation', val_metrics)):
+                for name in ('accuracy', 'f1_score', 'precision', 'recall'):
+                    history_metrics[f'{name}_{split}'] = split_metrics[name]
+            
+            model_version = f"v{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            if registry_dir:
+                model_version = self.publish_model(registry_dir, history_metrics)
+            
+            append_model_history(HISTORY_PATH, history_row(
+                model_version, history_metrics, search=self.search_summary, fit_seconds=self.fit_seconds
+            ))
+            
             # 7. Résultats
             results = {
                 'status': 'success',
                 'timestamp': datetime.now().isoformat(),
+                'model_version': model_version,
                 'samples': {
                     'total': n_samples,
                     'train': len(train_data),
@@ -357,7 +422,9 @@ class CreditScoringRetrainer:
                 'credit_types': self.automated_credit_types,
                 'features_used': len(self.feature_columns),
                 'test_metrics': test_metrics,
-                'validation_metrics': val_metrics
+                'validation_metrics': val_metrics,
+                'fit_seconds': self.fit_seconds,
+                'search': self.search_summary
             }
             
             logger.info("=== Réentraînement terminé avec succès ===")
@@ -373,7 +440,16 @@ if __name__ == "__main__":
     
     try:
         # Réentraînement avec données synthétiques
-        results = retrainer.retrain_with_synthetic_data(n_samples=10000)
+        # --tune [budget en secondes] : recherche d'hyperparamètres avant l'entraînement
+        # --registry <dossier> : publie la version (non active) dans ce registre
+        search = None
+        if '--tune' in sys.argv:
+            args = sys.argv[sys.argv.index('--tune') + 1:]
+            search = {'budget_seconds': float(args[0]) if args and not args[0].startswith('--') else 600}
+        registry_dir = None
+        if '--registry' in sys.argv:
+            registry_dir = sys.argv[sys.argv.index('--registry') + 1]
+        results = retrainer.retrain_with_synthetic_data(n_samples=10000, search=search, registry_dir=registry_dir)
         
         print("\n" + "="*50)
         print("RÉSULTATS DU RÉENTRAÎNEMENT")
@@ -383,6 +459,10 @@ if __name__ == "__main__":
         print(f"Types de crédit: {', '.join(results['credit_types'])}")
         print(f"Échantillons total: {results['samples']['total']}")
         print(f"Features utilisées: {results['features_used']}")
+        print(f"Version: {results['model_version']} (entraînement {results['fit_seconds']:.1f}s)")
+        if results['search']:
+            print(f"Recherche: {results['search']['rungs_completed']} paliers en "
+                  f"{results['search']['search_seconds']}s, CV {results['search']['cv_score']}")
         
         print("\nPerformance sur Test:")
         print(f"  Accuracy: {results['test_metrics']['accuracy']:.4f}")
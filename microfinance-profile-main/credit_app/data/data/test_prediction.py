@@ -284,50 +284,39 @@ def test_batch_predictions_from_csv():
         print(f"🔮 Test de prédictions en lot ({len(sample_df)} échantillons)...")
         print("=" * 60)
         
-        url = "http://localhost:5000/predict"
+        url = "http://localhost:5000/predict/batch"
         
-        for idx, row in sample_df.iterrows():
+        # Retirer les colonnes qui ne sont pas des features
+        features_to_remove = ['client_id', 'date_demande', 'niveau_risque', 'decision_credit', 'remboursement_ok']
+        features_df = sample_df.drop(columns=features_to_remove, errors='ignore')
+        
+        # Convertir les valeurs NaN en None
+        applications = features_df.astype(object).where(features_df.notna(), None).to_dict(orient='records')
+        
+        # Un seul appel pour tout le lot
+        response = requests.post(url, json={'applications': applications})
+        if response.status_code != 200:
+            print(f"  ❌ Erreur: {response.status_code}")
+            return
+        
+        predictions = response.json()['predictions']
+        for (idx, row), result in zip(sample_df.iterrows(), predictions):
             print(f"\n📋 Échantillon {idx + 1}:")
+            actual_decision = row.get('decision_credit', 'N/A')
             
-            # Convertir la ligne en dictionnaire et retirer les colonnes non nécessaires
-            data = row.to_dict()
+            print(f"  📊 Score prédit: {result['score']:.2f}")
+            print(f"  📊 Probabilité: {result['probability']:.4f}")
+            print(f"  📋 Décision réelle: {actual_decision}")
             
-            # Retirer les colonnes qui ne sont pas des features
-            features_to_remove = ['client_id', 'date_demande', 'niveau_risque', 'decision_credit', 'remboursement_ok']
-            for feature in features_to_remove:
-                data.pop(feature, None)
-            
-            # Convertir les valeurs NaN en None
-            for key, value in data.items():
-                if pd.isna(value):
-                    data[key] = None
+            # Comparaison simple
+            if result['score'] >= 500:
+                predicted_decision = "approuve"
+            else:
+                predicted_decision = "rejete"
             
-            try:
-                response = requests.post(url, json=data)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    actual_decision = row.get('decision_credit', 'N/A')
-                    
-                    print(f"  📊 Score prédit: {result['score']:.2f}")
-                    print(f"  📊 Probabilité: {result['probability']:.4f}")
-                    print(f"  📋 Décision réelle: {actual_decision}")
-                    
-                    # Comparaison simple
-                    if result['score'] >= 500:
-                        predicted_decision = "approuve"
-                    else:
-                        predicted_decision = "rejete"
-                    
-                    if actual_decision != 'N/A':
-                        match = "✅" if predicted_decision == actual_decision else "❌"
-                        print(f"  🎯 Prédiction: {predicted_decision} {match}")
-                    
-                else:
-                    print(f"  ❌ Erreur: {response.status_code}")
-                    
-            except Exception as e:
-                print(f"  ❌ Erreur: {str(e)}")
+            if actual_decision != 'N/A':
+                match = "✅" if predicted_decision == actual_decision else "❌"
+                print(f"  🎯 Prédiction: {predicted_decision} {match}")
                 
     except Exception as e:
         print(f"❌ Erreur lors du test en lot: {str(e)}")
@@ -1,5 +1 @@
-# app/models/__init__.py
-from .user import User
-from .credit_cash import CreditCash, CashTransaction
-from .credit_long import CreditLong, CreditLongDocument, CreditLongHistory
-from .scoring import CreditScoring
\ No newline at end of file
+# Modeles de scoring et services associes (modules importes depuis ce dossier)
@@ -1,9 +1,13 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 import logging
+import atexit
 from datetime import datetime
 import os
-from scoring_model import CreditScoringModel
+from scoring_model import CreditScoringModel, ModelValidationError
+from model_registry import RegistryError
+from payment_stats import PaymentEventListener
+from scoring_logging import configure_logging
 
 app = Flask(__name__)
 
@@ -15,10 +19,8 @@ CORS(app,
      max_age=86400
 )
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Niveaux par sous-systeme (LOG_LEVEL), ecriture des logs hors des threads de requete
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Configuration PostgreSQL
@@ -30,14 +32,84 @@ DB_CONFIG = {
     'port': int(os.getenv('DB_PORT', 5432))
 }
 
-# Initialiser le modele
+# Configuration du pool de connexions
+POOL_CONFIG = {
+    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+    'max_overflow': int(os.getenv('DB_POOL_MAX_OVERFLOW', 5)),
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+    'health_check_interval': float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30))
+}
+
+# Configuration du cache des scores
+CACHE_CONFIG = {
+    'backend': os.getenv('SCORE_CACHE_BACKEND', 'memory'),  # memory | redis
+    'redis_url': os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+    'max_size': int(os.getenv('SCORE_CACHE_MAX_SIZE', 10000)),
+    'single_flight_timeout': float(os.getenv('SCORE_CACHE_LOCK_TIMEOUT', 10.0))
+}
+
+# Configuration de la file d'envoi des notifications
+OUTBOX_CONFIG = {
+    'max_queue_size': int(os.getenv('NOTIFICATION_QUEUE_SIZE', 10000)),
+    'batch_size': int(os.getenv('NOTIFICATION_BATCH_SIZE', 200)),
+    'flush_interval': float(os.getenv('NOTIFICATION_FLUSH_INTERVAL', 0.5)),
+    'max_retries': int(os.getenv('NOTIFICATION_MAX_RETRIES', 5))
+}
+
+# Configuration du modele (registre des versions, chargement au demarrage)
+MODEL_CONFIG = {
+    'registry_dir': os.getenv('MODEL_REGISTRY_DIR', 'models/registry'),
+    'load_in_background': os.getenv('MODEL_LOAD_IN_BACKGROUND', 'true').lower() == 'true',
+    'mmap_mode': os.getenv('MODEL_MMAP_MODE', 'r') or None,
+    # Relecture de la version active (activations faites par un autre worker)
+    'refresh_interval': float(os.getenv('MODEL_REFRESH_INTERVAL', 5)),
+    'training_cache_dir': os.getenv('TRAINING_CACHE_DIR', 'models/training_cache') or None,
+    'training_itersize': int(os.getenv('TRAINING_ITERSIZE', 10000)),
+    # Au-dela, le processus d'entrainement est tue et le job passe en echec
+    'training_timeout': float(os.getenv('MODEL_TRAINING_TIMEOUT', 3600)) or None,
+    # Successive halving + CV stratifiee a chaque reentrainement
+    'tuning': {
+        'budget_seconds': float(os.getenv('MODEL_TUNING_BUDGET', 900)),
+        'n_candidates': int(os.getenv('MODEL_TUNING_CANDIDATES', 27)),
+        'cv': int(os.getenv('MODEL_TUNING_FOLDS', 5))
+    } if os.getenv('MODEL_TUNING', 'false').lower() == 'true' else None
+}
+
+STARTED_AT = datetime.now()
+
+# Initialiser le modele (rend la main avant la fin du chargement)
 try:
-    scoring_model = CreditScoringModel(DB_CONFIG)
+    scoring_model = CreditScoringModel(DB_CONFIG, POOL_CONFIG, CACHE_CONFIG, OUTBOX_CONFIG, MODEL_CONFIG)
     logger.info("Modele de scoring initialise avec succes")
 except Exception as e:
     logger.error(f"Erreur initialisation modele: {str(e)}")
     scoring_model = None
 
+# Invalidation du cache a chaque paiement enregistre (trigger statistiques_paiements)
+if scoring_model:
+    payment_listener = PaymentEventListener(DB_CONFIG, scoring_model.on_payment_event)
+    payment_listener.start()
+
+    # Ecrire les notifications en attente avant l'arret du processus
+    atexit.register(scoring_model.shutdown)
+
+
+@app.before_request
+def bind_db_connection():
+    """Une seule connexion du pool par requete HTTP, version active a jour"""
+    if scoring_model:
+        scoring_model.refresh_active_version()
+        g.db_scope = scoring_model.request_scope()
+        g.db_scope.__enter__()
+
+
+@app.teardown_request
+def release_db_connection(exc):
+    scope = g.pop('db_scope', None)
+    if scope is not None:
+        scope.__exit__(None, None, None)
+
 
 @app.route('/')
 def home():
@@ -46,7 +118,7 @@ def home():
         'version': '8.0 - Auto-recalcul avec notifications',
         'status': 'running',
         'database': 'PostgreSQL',
-        'model_type': 'Random Forest' if (scoring_model and scoring_model.model) else 'Regles metier',
+        'model_type': 'Random Forest' if (scoring_model and scoring_model.has_model) else 'Regles metier',
         'features': {
             'auto_recalculation': True,
             'notifications': True,
@@ -65,35 +137,50 @@ def test():
     })
 
 
+def _model_status():
+    if not scoring_model:
+        return 'inactive'
+    if scoring_model.has_model:
+        return 'random_forest'
+    if scoring_model.model_state in ('loading', 'training'):
+        return scoring_model.model_state
+    return 'rule_based'
+
+
+def _readiness():
+    """Modele pret (ou regles metier faute de modele) et base joignable"""
+    if not scoring_model:
+        return {'ready': False, 'model_state': 'inactive', 'database': 'disconnected'}
+    
+    state = scoring_model.readiness()
+    try:
+        with scoring_model.get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+        state['database'] = 'ok'
+    except Exception as e:
+        state['database'] = f'error: {str(e)}'
+        state['ready'] = False
+    return state
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
+    """Vue d'ensemble : vivacite, disponibilite et etat des composants"""
     try:
-        db_status = 'ok'
-        model_status = 'inactive'
-        
-        if scoring_model:
-            try:
-                with scoring_model.get_db_connection() as conn:
-                    with conn.cursor() as cur:
-                        cur.execute("SELECT 1")
-                db_status = 'ok'
-                
-                if scoring_model.model is not None:
-                    model_status = 'random_forest'
-                else:
-                    model_status = 'rule_based'
-                    
-            except Exception as e:
-                db_status = f'error: {str(e)}'
+        readiness = _readiness()
         
         return jsonify({
-            'status': 'healthy',
+            'status': 'healthy' if readiness['ready'] else 'starting',
             'timestamp': datetime.now().isoformat(),
+            'liveness': 'ok',
+            'readiness': readiness,
             'components': {
-                'model': model_status,
-                'database': db_status,
+                'model': _model_status(),
+                'database': readiness['database'],
                 'api': 'ok'
-            }
+            },
+            'db_pool': scoring_model.db_pool.get_metrics() if scoring_model else None
         })
     except Exception as e:
         return jsonify({
@@ -102,6 +189,22 @@ def health_check():
         }), 500
 
 
+@app.route('/health/live', methods=['GET'])
+def liveness_check():
+    """Le processus repond : ni base ni modele consultes"""
+    return jsonify({
+        'status': 'alive',
+        'uptime_seconds': round((datetime.now() - STARTED_AT).total_seconds(), 1)
+    })
+
+
+@app.route('/health/ready', methods=['GET'])
+def readiness_check():
+    """200 quand le service peut recevoir du trafic, 503 sinon"""
+    readiness = _readiness()
+    return jsonify(readiness), 200 if readiness['ready'] else 503
+
+
 # ==========================================
 # ENDPOINT PRINCIPAL - SCORE AVEC AUTO-RECALCUL
 # ==========================================
@@ -161,6 +264,7 @@ def recalculate_score(user_id):
         if not scoring_model:
             return jsonify({'error': 'Modele non disponible'}), 500
         
+        scoring_model.invalidate_score(user_id)
         score_data = scoring_model.get_or_calculate_score(user_id, force_recalculate=True)
         
         if not score_data:
@@ -187,6 +291,82 @@ def recalculate_score(user_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/payment-events/<int:user_id>', methods=['POST'])
+def payment_event(user_id):
+    """Signale un paiement enregistre hors base (invalide le score en cache)"""
+    if not scoring_model:
+        return jsonify({'error': 'Modele non disponible'}), 500
+    
+    scoring_model.on_payment_event(user_id)
+    
+    return jsonify({
+        'success': True,
+        'user_id': user_id
+    })
+
+
+def _parse_user_ids(values):
+    """Convertit les identifiants recus (entiers ou chaines de chiffres); retourne (ids, invalides)"""
+    user_ids, invalid = [], []
+    for value in values:
+        if isinstance(value, int) and not isinstance(value, bool):
+            user_ids.append(value)
+        elif isinstance(value, str) and value.strip().isdigit():
+            user_ids.append(int(value))
+        else:
+            invalid.append(value)
+    return user_ids, invalid
+
+
+@app.route('/batch-scoring', methods=['POST'])
+def batch_scoring():
+    """Score un lot d'utilisateurs en un seul passage du modele"""
+    try:
+        if not scoring_model:
+            return jsonify({'error': 'Modele non disponible'}), 500
+        
+        payload = request.get_json(silent=True) or {}
+        user_ids = payload.get('user_ids')
+        persist = bool(payload.get('persist', True))
+        
+        if user_ids is not None and not isinstance(user_ids, list):
+            return jsonify({'error': 'user_ids doit etre une liste'}), 400
+        
+        if user_ids is not None:
+            user_ids, invalid = _parse_user_ids(user_ids)
+            if invalid:
+                return jsonify({'error': 'Identifiants utilisateur invalides', 'invalid_ids': invalid[:100]}), 400
+        
+        started = datetime.now()
+        results = scoring_model.score_users(user_ids, persist=persist)
+        duration = (datetime.now() - started).total_seconds()
+        
+        logger.info(f"Scoring par lot: {len(results)} utilisateurs en {duration:.2f}s")
+        
+        return jsonify({
+            'success': True,
+            'count': len(results),
+            'persisted': persist,
+            'duration_seconds': round(duration, 3),
+            'not_found': [uid for uid in (user_ids or []) if uid not in results],
+            'results': [
+                {
+                    'user_id': user_id,
+                    'score': score_data['score'],
+                    'score_850': score_data['score_850'],
+                    'risk_level': score_data['niveau_risque'],
+                    'eligible_amount': score_data['montant_eligible'],
+                    'model_used': score_data['model_type']
+                }
+                for user_id, score_data in results.items()
+            ]
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur scoring par lot: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/check-eligibility/<int:user_id>', methods=['GET'])
 def check_eligibility(user_id):
     """Verifie eligibilite"""
@@ -486,9 +666,12 @@ def get_statistics():
             'eligible_users': stats[2] if stats else 0,
             'risk_distribution': risk_distribution,
             'model_info': {
-                'type': 'Random Forest' if (scoring_model.model is not None) else 'Regles metier',
-                'ml_available': scoring_model.model is not None
+                'type': 'Random Forest' if scoring_model.has_model else 'Regles metier',
+                'ml_available': scoring_model.has_model,
+                'version': scoring_model.model_version
             },
+            'score_cache': scoring_model.score_cache.get_stats(),
+            'notifications': scoring_model.notification_outbox.get_stats(),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -499,30 +682,96 @@ def get_statistics():
 
 @app.route('/retrain-model', methods=['POST'])
 def retrain_model():
-    """Reentraine le modele"""
+    """
+    Lance le reentrainement en arriere-plan; la version courante reste servie.
+    Corps optionnel : {"tune": true, "budget_seconds": 600, "n_candidates": 27, "cv": 5}
+    """
     try:
         if not scoring_model:
             return jsonify({'error': 'Modele non disponible'}), 500
         
-        success = scoring_model.train_model_from_database()
-        
-        if success:
+        data = request.get_json(silent=True) or {}
+        search = None
+        if 'tune' in data:
+            if data['tune']:
+                # {} : recherche avec les valeurs par defaut de successive_halving_search
+                search = dict(scoring_model.tuning or {})
+                for key, cast in (('budget_seconds', float), ('n_candidates', int), ('cv', int)):
+                    if key in data:
+                        search[key] = cast(data[key])
+            else:
+                search = False
+        
+        started, job = scoring_model.start_background_training(search=search)
+        
+        if started:
             return jsonify({
                 'success': True,
-                'message': 'Modele reentraine avec succes',
+                'message': 'Reentrainement lance en arriere-plan',
+                'job': job,
                 'timestamp': datetime.now().isoformat()
-            })
+            }), 202
         else:
             return jsonify({
                 'success': False,
-                'message': 'Echec du reentrainement'
-            }), 500
+                'message': 'Un reentrainement est deja en cours',
+                'job': job
+            }), 409
         
     except Exception as e:
         logger.error(f"Erreur reentrainement: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/retrain-model/status', methods=['GET'])
+def retrain_model_status():
+    if not scoring_model:
+        return jsonify({'error': 'Modele non disponible'}), 500
+    return jsonify({
+        'job': scoring_model.get_training_status(),
+        'active_version': scoring_model.model_version
+    })
+
+
+# ==========================================
+# REGISTRE DES VERSIONS DU MODELE
+# ==========================================
+
+@app.route('/model-versions', methods=['GET'])
+def list_model_versions():
+    if not scoring_model:
+        return jsonify({'error': 'Modele non disponible'}), 500
+    return jsonify({
+        'active_version': scoring_model.model_version,
+        'versions': scoring_model.list_model_versions()
+    })
+
+
+@app.route('/model-versions/rollback', methods=['POST'])
+def rollback_model_version():
+    """Reactive la version precedente, ou celle passee dans {"version": ...}"""
+    try:
+        if not scoring_model:
+            return jsonify({'error': 'Modele non disponible'}), 500
+        
+        data = request.get_json(silent=True) or {}
+        previous = scoring_model.model_version
+        bundle = scoring_model.rollback_model(data.get('version'))
+        
+        return jsonify({
+            'success': True,
+            'previous_version': previous,
+            'active_version': bundle.version,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except (RegistryError, ModelValidationError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Erreur retour arriere du modele: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
 @app.errorhandler(Exception)
 def handle_error(e):
     logger.error(f"Erreur non geree: {str(e)}")
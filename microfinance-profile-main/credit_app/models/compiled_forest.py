@@ -0,0 +1,208 @@
+"""
+Predicteur compile pour le Random Forest de scoring
+
+La foret est aplatie en tableaux numpy contigus (feature, seuil, gauche,
+droite, probabilites des feuilles) et le StandardScaler est replie dans les
+seuils : l'inference se fait sur les features brutes, sans appel sklearn.
+
+Equivalence exacte avec scaler.transform + model.predict_proba :
+- sklearn compare float32((x - mean) / scale) <= seuil. Cette fonction est
+  monotone en x, donc l'ensemble des x qui vont a gauche est ]-inf, x*].
+  x* est cherche par dichotomie sur la representation binaire des float64.
+- les probabilites des arbres sont additionnees dans l'ordre des estimateurs
+  puis divisees par leur nombre, comme ForestClassifier.predict_proba.
+"""
+import os
+from typing import Dict, Optional
+
+import numpy as np
+import sklearn
+from sklearn.utils.fixes import parse_version
+
+_SIGN = np.uint64(1 << 63)
+
+# Depuis sklearn 1.4, tree_.value contient deja des fractions par classe
+_NORMALIZED_TREE_VALUES = parse_version(sklearn.__version__) >= parse_version('1.4')
+
+
+def _to_key(x: np.ndarray) -> np.ndarray:
+    """float64 -> uint64 dont l'ordre suit celui des flottants"""
+    bits = np.ascontiguousarray(x, dtype=np.float64).view(np.uint64)
+    return np.where(bits & _SIGN, ~bits, bits | _SIGN)
+
+
+def _from_key(key: np.ndarray) -> np.ndarray:
+    bits = np.where(key & _SIGN, key ^ _SIGN, ~key)
+    return np.ascontiguousarray(bits, dtype=np.uint64).view(np.float64)
+
+
+def fold_scaler_thresholds(threshold: np.ndarray, mean: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    """
+    Pour chaque noeud, plus grand x float64 tel que
+    float32((x - mean) / scale) <= threshold.
+    """
+    threshold = np.asarray(threshold, dtype=np.float64)
+    mean = np.asarray(mean, dtype=np.float64)
+    scale = np.asarray(scale, dtype=np.float64)
+
+    def goes_left(x):
+        with np.errstate(over='ignore', invalid='ignore'):
+            return ((x - mean) / scale).astype(np.float32) <= threshold
+
+    inf = np.full_like(threshold, np.inf)
+    result = inf.copy()
+    bounded = ~goes_left(inf)
+
+    # Invariant : goes_left(lo) vrai, goes_left(hi) faux
+    lo = _to_key(-inf)
+    hi = _to_key(inf)
+    for _ in range(64):
+        mid = lo + (hi - lo) // np.uint64(2)
+        left = goes_left(_from_key(mid))
+        lo = np.where(left, mid, lo)
+        hi = np.where(left, hi, mid)
+
+    result[bounded] = _from_key(lo)[bounded]
+    return result
+
+
+class CompiledForest:
+    """
+    Foret aplatie : tous les arbres partagent les memes tableaux, les
+    feuilles bouclent sur elles-memes pour un parcours a profondeur fixe.
+    """
+
+    def __init__(self, feature, threshold, left, right, leaf_proba, roots,
+                 max_depth: int, classes, n_features: int, children=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+        self.n_features = int(n_features)
+        # Enfants entrelaces [droite, gauche] : un seul gather par niveau
+        self._children = np.stack([right, left], axis=1).ravel() if children is None else children
+
+    @classmethod
+    def from_model(cls, model, scaler=None) -> 'CompiledForest':
+        """Compile un RandomForestClassifier (mono-sortie) et son StandardScaler"""
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Seules les forets mono-sortie sont supportees")
+
+        n_features = model.n_features_in_
+        n_classes = int(model.n_classes_)
+        if scaler is not None:
+            mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features)
+            scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+        else:
+            mean, scale = np.zeros(n_features), np.ones(n_features)
+
+        features, thresholds, lefts, rights, probas, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(offset, offset + n_nodes, dtype=np.intp)
+            is_leaf = tree.children_left == -1
+
+            feature = np.where(is_leaf, 0, tree.feature).astype(np.intp)
+            raw = fold_scaler_thresholds(tree.threshold, mean[feature], scale[feature])
+            raw[is_leaf] = np.inf
+
+            proba = tree.value[:, 0, :n_classes].astype(np.float64)
+            if not _NORMALIZED_TREE_VALUES:
+                normalizer = proba.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                proba /= normalizer
+
+            features.append(feature)
+            thresholds.append(raw)
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+            probas.append(proba)
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n_nodes
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            leaf_proba=np.concatenate(probas),
+            roots=np.array(roots, dtype=np.intp),
+            max_depth=max_depth,
+            classes=np.asarray(model.classes_),
+            n_features=n_features
+        )
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Probabilites par classe a partir des features NON normalisees"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"{X.shape[1]} features recues, {self.n_features} attendues")
+
+        n_samples, n_features = X.shape
+        flat = np.ascontiguousarray(X).ravel()
+        row_offsets = (np.arange(n_samples) * n_features)[:, np.newaxis]
+        nodes = np.tile(self.roots, (n_samples, 1))
+        for _ in range(self.max_depth):
+            go_left = flat.take(row_offsets + self.feature.take(nodes)) <= self.threshold.take(nodes)
+            nodes = self._children.take(nodes * 2 + go_left)
+
+        # cumsum additionne sequentiellement, dans l'ordre des estimateurs
+        proba = np.cumsum(self.leaf_proba[nodes], axis=1)[:, -1, :]
+        proba /= len(self.roots)
+        return proba
+
+    # ==========================================
+    # PERSISTANCE
+    # ==========================================
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'left': self.left,
+            'right': self.right,
+            'leaf_proba': self.leaf_proba,
+            'roots': self.roots,
+            'max_depth': np.array(self.max_depth),
+            'classes': self.classes_,
+            'n_features': np.array(self.n_features)
+        }
+
+    def save_arrays(self, directory: str):
+        """Un .npy par tableau, relisibles en memoire partagee (load_arrays)"""
+        os.makedirs(directory, exist_ok=True)
+        for name, array in {**self.to_arrays(), 'children': self._children}.items():
+            np.save(os.path.join(directory, f'{name}.npy'), array, allow_pickle=False)
+
+    @classmethod
+    def load_arrays(cls, directory: str, mmap_mode: Optional[str] = 'r') -> 'CompiledForest':
+        """
+        Avec mmap_mode='r', les tableaux de la foret sont projetes en memoire
+        en lecture seule : les workers d'un meme hote partagent les pages du
+        cache disque au lieu d'en garder chacun une copie.
+        """
+        def load(name):
+            return np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+
+        return cls(
+            feature=load('feature'),
+            threshold=load('threshold'),
+            left=load('left'),
+            right=load('right'),
+            leaf_proba=load('leaf_proba'),
+            roots=load('roots'),
+            max_depth=int(load('max_depth')),
+            classes=np.array(load('classes')),
+            n_features=int(load('n_features')),
+            children=load('children')
+        )
@@ -0,0 +1,328 @@
+"""
+Pool de connexions PostgreSQL thread-safe pour le service de scoring
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+import psycopg2
+from psycopg2.pool import PoolError
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(PoolError):
+    """Aucune connexion disponible dans le delai imparti"""
+
+
+class PooledConnectionPool:
+    """
+    Pool de connexions psycopg2 avec taille min/max, debordement,
+    verification de sante au checkout et metriques.
+
+    Une portee de requete (request_scope) lie une connexion au thread courant :
+    tous les appels a connection() dans cette portee reutilisent la meme
+    connexion, qui n'est rendue au pool qu'a la sortie de la portee.
+    """
+
+    def __init__(self, db_config: Dict, min_size: int = 1, max_size: int = 10,
+                 max_overflow: int = 5, timeout: float = 10.0,
+                 health_check_interval: float = 30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Tailles de pool invalides: min={min_size}, max={max_size}")
+        if max_overflow < 0:
+            raise ValueError(f"max_overflow invalide: {max_overflow}")
+
+        self.db_config = db_config
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = []          # [(conn, last_used)]
+        self._in_use = set()     # id(conn)
+        self._overflow = set()   # id(conn) des connexions hors max_size
+        self._opened = 0
+        self._closed = False
+        self._local = threading.local()
+
+        self._stats = {
+            'checkouts': 0,
+            'created': 0,
+            'discarded': 0,
+            'timeouts': 0,
+            'health_check_failures': 0,
+            'overflow_created': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'scope_reuses': 0
+        }
+
+    # ==========================================
+    # CYCLE DE VIE
+    # ==========================================
+
+    def _connect(self):
+        return psycopg2.connect(**self.db_config)
+
+    def prefill(self) -> int:
+        """Ouvre les connexions minimales; retourne le nombre ouvert"""
+        opened = 0
+        while True:
+            with self._cond:
+                if self._closed or self._opened >= self.min_size:
+                    return opened
+                self._opened += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._opened -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats['created'] += 1
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+            opened += 1
+
+    def close(self):
+        """Ferme toutes les connexions inactives et refuse les checkouts suivants"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._opened -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    # ==========================================
+    # CHECKOUT / CHECKIN
+    # ==========================================
+
+    def _is_healthy(self, conn, last_used: float) -> bool:
+        """Verifie la connexion avant de la rendre a l'appelant"""
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self):
+        """Emprunte une connexion; bloque jusqu'a `timeout` secondes si le pool est plein"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+
+        while True:
+            create_overflow = False
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolError("Pool de connexions ferme")
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        self._in_use.add(id(conn))
+                        break
+                    if self._opened < self.max_size + self.max_overflow:
+                        create_overflow = self._opened >= self.max_size
+                        self._opened += 1
+                        conn, last_used = None, None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            f"Aucune connexion disponible apres {self.timeout:.1f}s "
+                            f"({len(self._in_use)} en cours d'utilisation)"
+                        )
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._opened -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats['created'] += 1
+                    self._in_use.add(id(conn))
+                    if create_overflow:
+                        self._overflow.add(id(conn))
+                        self._stats['overflow_created'] += 1
+            elif not self._is_healthy(conn, last_used):
+                logger.warning("Connexion PostgreSQL invalide, remplacement")
+                self._discard(conn, health_failure=True)
+                continue
+
+            waited = time.monotonic() - start
+            with self._cond:
+                self._stats['checkouts'] += 1
+                self._stats['wait_time_total'] += waited
+                self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+            return conn
+
+    def putconn(self, conn, discard: bool = False):
+        """Rend une connexion au pool (les connexions de debordement sont fermees)"""
+        if not discard and not conn.closed:
+            try:
+                # Ne jamais rendre une transaction ouverte au pool
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            key = id(conn)
+            self._in_use.discard(key)
+            is_overflow = key in self._overflow
+            self._overflow.discard(key)
+            if discard or conn.closed or is_overflow or self._closed:
+                self._opened -= 1
+                close_it = True
+            else:
+                self._idle.append((conn, time.monotonic()))
+                close_it = False
+            self._cond.notify()
+
+        if close_it:
+            if discard or conn.closed:
+                with self._cond:
+                    self._stats['discarded'] += 1
+            self._close_quietly(conn)
+
+    def _discard(self, conn, health_failure: bool = False):
+        with self._cond:
+            self._in_use.discard(id(conn))
+            self._overflow.discard(id(conn))
+            self._opened -= 1
+            self._stats['discarded'] += 1
+            if health_failure:
+                self._stats['health_check_failures'] += 1
+            self._cond.notify()
+        self._close_quietly(conn)
+
+    # ==========================================
+    # API CONTEXTUELLE
+    # ==========================================
+
+    @contextmanager
+    def request_scope(self):
+        """
+        Lie paresseusement une connexion au thread courant pour la duree du bloc.
+        Les portees imbriquees reutilisent la portee la plus externe.
+        """
+        if getattr(self._local, 'depth', 0) > 0:
+            self._local.depth += 1
+            try:
+                yield
+            finally:
+                self._local.depth -= 1
+            return
+
+        self._local.depth = 1
+        self._local.conn = None
+        self._local.broken = False
+        try:
+            yield
+        finally:
+            conn = self._local.conn
+            broken = self._local.broken
+            self._local.depth = 0
+            self._local.conn = None
+            if conn is not None:
+                self.putconn(conn, discard=broken)
+
+    def in_request_scope(self) -> bool:
+        return getattr(self._local, 'depth', 0) > 0
+
+    @contextmanager
+    def connection(self):
+        """
+        Fournit une connexion avec la semantique de `with conn:` de psycopg2 :
+        commit en sortie normale, rollback sur exception.
+        """
+        scoped = self.in_request_scope()
+        if scoped and self._local.conn is not None:
+            conn = self._local.conn
+            with self._cond:
+                self._stats['scope_reuses'] += 1
+        else:
+            conn = self.getconn()
+            if scoped:
+                self._local.conn = conn
+
+        failed = False
+        try:
+            yield conn
+            if not conn.closed:
+                conn.commit()
+        except Exception:
+            failed = True
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+            raise
+        finally:
+            broken = conn.closed != 0 or (failed and self._connection_lost(conn))
+            if scoped:
+                if broken:
+                    self._local.broken = True
+            else:
+                self.putconn(conn, discard=broken)
+
+    @staticmethod
+    def _connection_lost(conn) -> bool:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return False
+        except Exception:
+            return True
+
+    # ==========================================
+    # METRIQUES
+    # ==========================================
+
+    def get_metrics(self) -> Dict:
+        """Metriques du pool pour /health"""
+        with self._cond:
+            checkouts = self._stats['checkouts']
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'max_overflow': self.max_overflow,
+                'opened': self._opened,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'overflow': len(self._overflow),
+                'overflow_created': self._stats['overflow_created'],
+                'checkouts': checkouts,
+                'scope_reuses': self._stats['scope_reuses'],
+                'created': self._stats['created'],
+                'discarded': self._stats['discarded'],
+                'timeouts': self._stats['timeouts'],
+                'health_check_failures': self._stats['health_check_failures'],
+                'wait_time_avg_ms': round(self._stats['wait_time_total'] / checkouts * 1000, 3) if checkouts else 0.0,
+                'wait_time_max_ms': round(self._stats['wait_time_max'] * 1000, 3)
+            }
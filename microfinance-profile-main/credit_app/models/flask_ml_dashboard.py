@@ -1,15 +1,21 @@
 # flask_ml_integration.py - Utilise votre modèle scoring_model.py existant
-from flask import Flask, jsonify, Response
+from flask import Flask, jsonify, Response, request
 from flask_cors import CORS
 import numpy as np
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from sklearn.metrics import confusion_matrix, roc_curve, auc
+from sklearn.model_selection import StratifiedKFold
+from concurrent.futures import ThreadPoolExecutor
 import io
 import logging
 import sys
 import os
+import time
+
+from model_registry import ModelRegistry
+from plot_cache import PlotCache, snapshot_key
 
 # Importer votre modèle existant
 try:
@@ -26,19 +32,50 @@ CORS(app)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Graphiques rendus une fois par version du modele / snapshot des metriques
+PLOT_CACHE_DIR = os.getenv('PLOT_CACHE_DIR', 'models/plot_cache')
+MODEL_REGISTRY_DIR = os.getenv('MODEL_REGISTRY_DIR', 'models/registry')
+# Intervalle minimal entre deux lectures de la version active du registre (s)
+REFRESH_INTERVAL = float(os.getenv('DASHBOARD_REFRESH_INTERVAL', 30))
+
+PLOTS = {
+    'confusion_matrix': 'generate_confusion_matrix',
+    'roc_curve': 'generate_roc_curve',
+    'feature_importance': 'generate_feature_importance',
+    'score_distribution': 'generate_score_distribution',
+    'cross_validation': 'generate_cross_validation',
+    'learning_curve': 'generate_learning_curve'
+}
+
+# Metriques derivees des donnees persistees, hors empreinte du snapshot
+EVALUATION_KEYS = ('cv_scores', 'cv_mean', 'cv_std')
+
 class IntegratedDashboard:
     def __init__(self):
         self.external_model = None
+        # Version active lue directement dans le registre, avec ou sans modèle externe
+        self.registry = ModelRegistry(MODEL_REGISTRY_DIR)
+        self.model_version = self.registry.active_version()
         self.test_data = []
         self.test_labels = []
         self.predictions = []
         self.probabilities = []
         self.metrics = {}
+        self.evaluation = {}
+        
+        # Un seul thread evalue et rend les graphiques (pyplot n'est pas thread-safe)
+        self.plot_cache = PlotCache(PLOT_CACHE_DIR)
+        self.cache_key = None
+        self._renderer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='plot-render')
+        self._last_check = time.time()
         
         if EXTERNAL_MODEL_AVAILABLE:
             self._load_external_model()
         else:
             self._create_fallback_model()
+        
+        self._finalize_evaluation()
+        self._renderer.submit(self._render_all)
     
     def _load_external_model(self):
         """Charge et utilise votre modèle existant"""
@@ -139,13 +176,6 @@ class IntegratedDashboard:
                 'rejected': len(self.predictions) - sum(self.predictions)
             }
             
-            # Validation croisée simulée (votre modèle n'a pas de CV direct)
-            self.metrics['cv_scores'] = [
-                self.metrics['accuracy'] + np.random.normal(0, 0.02) for _ in range(5)
-            ]
-            self.metrics['cv_mean'] = float(np.mean(self.metrics['cv_scores']))
-            self.metrics['cv_std'] = float(np.std(self.metrics['cv_scores']))
-            
         except Exception as e:
             logger.error(f"Erreur calcul métriques: {e}")
             self._fallback_metrics()
@@ -167,6 +197,127 @@ class IntegratedDashboard:
             'total_clients': 200, 'approved': 120, 'rejected': 80
         }
     
+    def _model_version(self):
+        return self.model_version or 'secours'
+    
+    def _finalize_evaluation(self):
+        """
+        Calcule la cle du snapshot (version + metriques + predictions), puis
+        lit la validation croisée et la courbe d'apprentissage persistées pour
+        cette cle, ou les calcule une seule fois. Les graphiques des anciennes
+        cles sont supprimés.
+        """
+        base = {k: v for k, v in self.metrics.items() if k not in EVALUATION_KEYS}
+        key = snapshot_key(self._model_version(), base,
+                           self.test_labels, self.predictions, self.probabilities)
+        
+        evaluation = self.plot_cache.load_data(key, 'evaluation')
+        if evaluation is None:
+            evaluation = self._compute_evaluation_data()
+            self.plot_cache.save_data(key, 'evaluation', evaluation)
+        
+        cv_scores = evaluation['cv_scores']
+        self.evaluation = evaluation
+        self.metrics = {
+            **base,
+            'cv_scores': cv_scores,
+            'cv_mean': float(np.mean(cv_scores)),
+            'cv_std': float(np.std(cv_scores))
+        }
+        self.cache_key = key
+        self.plot_cache.invalidate(keep=key)
+    
+    def _compute_evaluation_data(self):
+        """Stabilité par plis stratifiés et performance selon la taille de l'échantillon"""
+        labels = np.asarray(self.test_labels).astype(int)
+        correct = (labels == np.asarray(self.predictions)).astype(float)
+        
+        n_splits = min(5, int(np.bincount(labels).min()))
+        if n_splits >= 2:
+            folds = StratifiedKFold(n_splits, shuffle=True, random_state=42).split(correct, labels)
+            cv_scores = [float(correct[test].mean()) for _, test in folds]
+        else:
+            cv_scores = [float(correct.mean())]
+        
+        # Échantillons emboîtés de taille croissante
+        order = np.random.RandomState(42).permutation(len(labels))
+        sizes = [size for size in (20, 50, 100, 150) if size < len(labels)] + [len(labels)]
+        return {
+            'cv_scores': cv_scores,
+            'learning_curve': {
+                'sizes': sizes,
+                'scores': [float(correct[order[:size]].mean()) for size in sizes]
+            }
+        }
+    
+    # ==========================================
+    # RENDU ET CACHE
+    # ==========================================
+    
+    def _render(self, name):
+        """Rend un graphique pour la clé courante (thread de rendu uniquement) et le met en cache"""
+        key = self.cache_key
+        item = self.plot_cache.get(key, name)
+        if item is None:
+            item = self.plot_cache.put(key, name, getattr(self, PLOTS[name])())
+        return item
+    
+    def _render_all(self):
+        started = time.perf_counter()
+        for name in PLOTS:
+            self._render(name)
+        logger.info(f"Graphiques rendus pour {self.cache_key} en {time.perf_counter() - started:.2f}s")
+    
+    def _reevaluate(self, version=None):
+        """Active la nouvelle version, réévalue puis rend les graphiques de la nouvelle clé"""
+        try:
+            version = version or self.registry.active_version()
+            if version and version != self.model_version and self.external_model is not None:
+                self.external_model.activate_version(version)
+            self.model_version = version
+            if self.external_model is not None:
+                self._evaluate_with_external_model()
+            self._finalize_evaluation()
+            self._render_all()
+        except Exception as e:
+            logger.error(f"Erreur réévaluation du tableau de bord: {e}")
+        return self.cache_key
+    
+    def refresh(self, force=False):
+        """
+        Réévalue en arrière-plan si une nouvelle version est active dans le
+        registre (vérifié au plus toutes les REFRESH_INTERVAL secondes) ou si
+        force. Retourne le Future de la réévaluation, None sinon.
+        """
+        if force:
+            return self._renderer.submit(self._reevaluate)
+        if time.time() - self._last_check < REFRESH_INTERVAL:
+            return None
+        self._last_check = time.time()
+        active = self.registry.active_version()
+        if active is None or active == self.model_version:
+            return None
+        logger.info(f"Nouvelle version active {active}, graphiques invalidés")
+        return self._renderer.submit(self._reevaluate, active)
+    
+    def plot_response(self, name):
+        """PNG en cache avec ETag; rendu à la demande si absent"""
+        self.refresh()
+        key = self.cache_key
+        item = self.plot_cache.get(key, name)
+        if item is None:
+            item = self._renderer.submit(self._render, name).result()
+        png, etag = item
+        
+        response = Response(png, mimetype='image/png')
+        response.set_etag(etag.strip('"'))
+        if request.args.get('v') == key:
+            # URL versionnée (page d'accueil) : le contenu ne change jamais
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+    
     def generate_confusion_matrix(self):
         """Matrice de confusion de votre modèle"""
         try:
@@ -274,7 +425,7 @@ class IntegratedDashboard:
             return self._error_plot(f"Erreur distribution: {e}")
     
     def generate_cross_validation(self):
-        """Validation croisée simulée"""
+        """Précision par pli stratifié (données persistées)"""
         try:
             cv_scores = self.metrics['cv_scores']
             mean_score = self.metrics['cv_mean']
@@ -299,35 +450,36 @@ class IntegratedDashboard:
     def generate_learning_curve(self):
         """Performance selon la taille des données"""
         try:
-            # Simule comment votre modèle s'améliorerait avec plus de données
-            data_sizes = [20, 50, 100, 150, 200]
-            performance = [0.65, 0.72, 0.76, 0.78, self.metrics['accuracy']]
+            # Précision sur des échantillons emboîtés (données persistées)
+            data_sizes = self.evaluation['learning_curve']['sizes']
+            performance = self.evaluation['learning_curve']['scores']
             
             plt.figure(figsize=(8, 6))
             plt.plot(data_sizes, performance, 'o-', color='blue', linewidth=2,
                     label='Performance de votre modèle')
             
-            plt.xlabel('Nombre de clients d\'entraînement')
+            plt.xlabel('Nombre de clients évalués')
             plt.ylabel('Performance (Accuracy)')
             plt.title('Évolution avec Plus de Données - Votre Modèle')
             plt.legend()
             plt.grid(True, alpha=0.3)
-            plt.ylim(0.6, 0.85)
+            plt.ylim(max(0.0, min(performance) - 0.05), min(1.05, max(performance) + 0.05))
             
             return self._save_plot()
         except Exception as e:
             return self._error_plot(f"Erreur learning curve: {e}")
     
     def _save_plot(self):
+        """PNG de la figure courante"""
         try:
             img = io.BytesIO()
             plt.savefig(img, format='png', bbox_inches='tight', dpi=100, facecolor='white')
             img.seek(0)
             plt.close()
-            return Response(img.getvalue(), mimetype='image/png')
+            return img.getvalue()
         except:
             plt.close()
-            return Response(b'', mimetype='image/png')
+            return b''
     
     def _error_plot(self, message):
         plt.figure(figsize=(6, 4))
@@ -401,27 +553,27 @@ def home():
             <div class="charts">
                 <div class="chart">
                     <h3>Matrice de Confusion</h3>
-                    <img src="/plot/confusion_matrix" alt="Matrice">
+                    <img src="/plot/confusion_matrix?v={dashboard.cache_key}" alt="Matrice">
                 </div>
                 <div class="chart">
                     <h3>Courbe ROC</h3>
-                    <img src="/plot/roc_curve" alt="ROC">
+                    <img src="/plot/roc_curve?v={dashboard.cache_key}" alt="ROC">
                 </div>
                 <div class="chart">
                     <h3>Importance des Facteurs</h3>
-                    <img src="/plot/feature_importance" alt="Importance">
+                    <img src="/plot/feature_importance?v={dashboard.cache_key}" alt="Importance">
                 </div>
                 <div class="chart">
                     <h3>Distribution des Scores</h3>
-                    <img src="/plot/score_distribution" alt="Distribution">
+                    <img src="/plot/score_distribution?v={dashboard.cache_key}" alt="Distribution">
                 </div>
                 <div class="chart">
                     <h3>Stabilité du Modèle</h3>
-                    <img src="/plot/cross_validation" alt="Validation">
+                    <img src="/plot/cross_validation?v={dashboard.cache_key}" alt="Validation">
                 </div>
                 <div class="chart">
                     <h3>Performance vs Données</h3>
-                    <img src="/plot/learning_curve" alt="Learning">
+                    <img src="/plot/learning_curve?v={dashboard.cache_key}" alt="Learning">
                 </div>
             </div>
         </div>
@@ -445,29 +597,35 @@ def home():
 def get_metrics():
     return jsonify(dashboard.metrics)
 
+@app.route('/api/refresh', methods=['POST'])
+def refresh_plots():
+    """Réévalue le modèle et régénère les graphiques (à appeler après un réentraînement)"""
+    key = dashboard.refresh(force=True).result()
+    return jsonify({'cache_key': key}), 200
+
 @app.route('/plot/confusion_matrix')
 def plot_confusion():
-    return dashboard.generate_confusion_matrix()
+    return dashboard.plot_response('confusion_matrix')
 
 @app.route('/plot/roc_curve')
 def plot_roc():
-    return dashboard.generate_roc_curve()
+    return dashboard.plot_response('roc_curve')
 
 @app.route('/plot/feature_importance')
 def plot_features():
-    return dashboard.generate_feature_importance()
+    return dashboard.plot_response('feature_importance')
 
 @app.route('/plot/score_distribution')
 def plot_distribution():
-    return dashboard.generate_score_distribution()
+    return dashboard.plot_response('score_distribution')
 
 @app.route('/plot/cross_validation')
 def plot_cv():
-    return dashboard.generate_cross_validation()
+    return dashboard.plot_response('cross_validation')
 
 @app.route('/plot/learning_curve')
 def plot_learning():
-    return dashboard.generate_learning_curve()
+    return dashboard.plot_response('learning_curve')
 
 if __name__ == '__main__':
     print("=" * 60)
@@ -0,0 +1,290 @@
+"""
+Recherche d'hyperparametres du Random Forest par divisions successives
+
+Recherche aleatoire + successive halving : tous les candidats sont evalues
+(validation croisee stratifiee) sur un petit sous-echantillon, le meilleur
+tiers passe au palier suivant avec trois fois plus de lignes, et ainsi de
+suite jusqu'a l'ensemble complet.
+
+Les evaluations (candidat x pli) tournent dans un pool de processus. La
+matrice d'entrainement est ecrite une fois en .npy et projetee en memoire
+par chaque worker : seuls les indices des plis transitent entre processus.
+
+Arret anticipe : budget de temps (aucun palier n'est lance s'il ne peut pas
+se terminer) et patience (paliers successifs sans amelioration du score).
+"""
+import csv
+import json
+import logging
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import ParameterSampler, StratifiedKFold, train_test_split
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARAM_DISTRIBUTIONS = {
+    'n_estimators': [100, 200, 300],
+    'max_depth': [6, 8, 10, 12, 16, None],
+    'min_samples_split': [2, 5, 10],
+    'min_samples_leaf': [1, 2, 4],
+    'max_features': ['sqrt', 'log2', 0.5],
+    'class_weight': ['balanced', None]
+}
+
+
+class Trial(NamedTuple):
+    candidate: int
+    rung: int
+    n_samples: int
+    params: Dict
+    mean_score: float
+    std_score: float
+    fit_seconds: float
+
+
+class SearchResult(NamedTuple):
+    best_params: Dict
+    best_score: float
+    trials: List[Trial]
+    n_candidates: int
+    rungs_completed: int
+    elapsed_seconds: float
+    stop_reason: str
+
+    def summary(self) -> Dict:
+        return {
+            'best_params': self.best_params,
+            'cv_score': round(self.best_score, 6),
+            'n_candidates': self.n_candidates,
+            'rungs_completed': self.rungs_completed,
+            'search_seconds': round(self.elapsed_seconds, 2),
+            'stop_reason': self.stop_reason
+        }
+
+
+# ==========================================
+# WORKERS
+# ==========================================
+
+_SHARED: Dict[str, np.ndarray] = {}
+
+
+def _init_worker(x_path: str, y_path: str):
+    _SHARED['X'] = np.load(x_path, mmap_mode='r')
+    _SHARED['y'] = np.load(y_path, mmap_mode='r')
+
+
+def _evaluate_fold(params: Dict, train_idx: np.ndarray, test_idx: np.ndarray, scoring: str,
+                   deadline: Optional[float] = None):
+    """
+    Score d'un candidat sur un pli (scaler + foret, comme en production).
+    Rien n'est calcule si le budget est deja depasse : les taches deja
+    transmises au worker se terminent sans attendre un entrainement.
+    """
+    if deadline is not None and time.time() > deadline:
+        return None
+    X, y = _SHARED['X'], _SHARED['y']
+    started = time.perf_counter()
+    pipeline = make_pipeline(StandardScaler(), RandomForestClassifier(**params))
+    pipeline.fit(X[train_idx], y[train_idx])
+    fit_seconds = time.perf_counter() - started
+    return float(get_scorer(scoring)(pipeline, X[test_idx], y[test_idx])), fit_seconds
+
+
+# ==========================================
+# RECHERCHE
+# ==========================================
+
+def _public(params: Dict) -> Dict:
+    """Parametres d'un candidat sans le n_jobs=1 impose dans les workers"""
+    return {k: v for k, v in params.items() if k != 'n_jobs'}
+
+
+def _rung_schedule(n_rows: int, n_candidates: int, factor: int, min_resources: int) -> List[int]:
+    """Nombre de lignes par palier, le dernier sur toutes les lignes"""
+    n_rungs = 1 + int(math.ceil(math.log(max(n_candidates, 1), factor)))
+    n_rungs = min(n_rungs, 1 + int(math.floor(math.log(max(n_rows / min_resources, 1), factor))))
+    return [min(n_rows, min_resources * factor ** r) for r in range(n_rungs - 1)] + [n_rows]
+
+
+def successive_halving_search(X: np.ndarray, y: np.ndarray,
+                              param_distributions: Optional[Dict] = None,
+                              base_params: Optional[Dict] = None,
+                              n_candidates: int = 27, factor: int = 3, cv: int = 5,
+                              scoring: str = 'roc_auc', min_resources: Optional[int] = None,
+                              budget_seconds: Optional[float] = None,
+                              patience: int = 2, tol: float = 1e-3,
+                              n_workers: Optional[int] = None,
+                              random_state: int = 42) -> SearchResult:
+    """
+    Retourne les meilleurs parametres (fusionnes avec base_params, sans
+    n_jobs) et l'historique des essais. Le meilleur candidat est celui du
+    dernier palier evalue entierement. TimeoutError si le budget ne suffit
+    pas a evaluer un seul candidat.
+    """
+    started = time.time()
+    deadline = started + budget_seconds if budget_seconds else None
+    # Labels encodes en entiers : un tableau d'objets (chaines) ne se projette pas en memoire
+    _, y, class_counts = np.unique(np.asarray(y), return_inverse=True, return_counts=True)
+    n_rows = len(y)
+    # Chaque pli doit contenir toutes les classes, y compris la plus rare
+    min_resources = min_resources or max(cv * len(class_counts) * 10, n_rows // factor ** 3,
+                                         int(math.ceil(cv * 2 * n_rows / class_counts.min())))
+    schedule = _rung_schedule(n_rows, n_candidates, factor, min(min_resources, n_rows))
+
+    base_params = {**(base_params or {}), 'n_jobs': 1}
+    candidates = [
+        {**base_params, **params}
+        for params in ParameterSampler(param_distributions or DEFAULT_PARAM_DISTRIBUTIONS,
+                                       n_iter=n_candidates, random_state=random_state)
+    ]
+    survivors = list(range(len(candidates)))
+    rng = np.random.RandomState(random_state)
+
+    trials: List[Trial] = []
+    best_candidate, best_score = 0, -np.inf
+    rungs_completed, rounds_without_gain = 0, 0
+    stop_reason = 'complete'
+    last_rung_seconds = None
+
+    shared_dir = tempfile.mkdtemp(prefix='hp-search-')
+    x_path, y_path = os.path.join(shared_dir, 'X.npy'), os.path.join(shared_dir, 'y.npy')
+    np.save(x_path, np.ascontiguousarray(X))
+    np.save(y_path, y)
+
+    executor = ProcessPoolExecutor(max_workers=n_workers or os.cpu_count(),
+                                   initializer=_init_worker, initargs=(x_path, y_path))
+    try:
+        for rung, n_samples in enumerate(schedule):
+            # Un palier coute environ autant que le precedent (x factor lignes, / factor candidats)
+            if deadline and last_rung_seconds and time.time() + last_rung_seconds > deadline:
+                stop_reason = 'budget'
+                break
+
+            rung_started = time.time()
+            if n_samples < n_rows:
+                sample, _ = train_test_split(np.arange(n_rows), train_size=n_samples,
+                                             stratify=y, random_state=rng.randint(2 ** 31 - 1))
+            else:
+                sample = np.arange(n_rows)
+            folds = [
+                (sample[train], sample[test])
+                for train, test in StratifiedKFold(cv, shuffle=True, random_state=rng.randint(2 ** 31 - 1))
+                .split(sample, y[sample])
+            ]
+
+            futures = {
+                executor.submit(_evaluate_fold, candidates[c], train, test, scoring, deadline): c
+                for c in survivors for train, test in folds
+            }
+            remaining = deadline - time.time() if deadline else None
+            done, pending = wait(futures, timeout=remaining, return_when=FIRST_EXCEPTION)
+            for future in pending:
+                future.cancel()
+            for future in done:
+                future.result()  # une erreur d'evaluation interrompt la recherche
+
+            scores: Dict[int, List[float]] = {c: [] for c in survivors}
+            seconds: Dict[int, float] = {c: 0.0 for c in survivors}
+            for future in done:
+                if future.result() is None:
+                    pending.add(future)  # ignoree faute de budget
+                    continue
+                score, fit_seconds = future.result()
+                scores[futures[future]].append(score)
+                seconds[futures[future]] += fit_seconds
+            evaluated = [c for c in survivors if len(scores[c]) == len(folds)]
+            for c in evaluated:
+                trials.append(Trial(c, rung, int(n_samples), _public(candidates[c]),
+                                    float(np.mean(scores[c])), float(np.std(scores[c])), seconds[c]))
+
+            if pending:
+                # Palier interrompu : on garde le classement du palier precedent,
+                # ou les candidats complets du premier palier
+                stop_reason = 'budget'
+                if rung == 0:
+                    if not evaluated:
+                        raise TimeoutError("Budget epuise avant la fin du premier palier")
+                    best_candidate = max(evaluated, key=lambda c: np.mean(scores[c]))
+                    best_score = float(np.mean(scores[best_candidate]))
+                break
+
+            ranking = sorted(evaluated, key=lambda c: np.mean(scores[c]), reverse=True)
+            rung_best = float(np.mean(scores[ranking[0]]))
+            rungs_completed += 1
+            last_rung_seconds = time.time() - rung_started
+            logger.info(f"Palier {rung}: {len(ranking)} candidats sur {n_samples} lignes, "
+                        f"meilleur {scoring} {rung_best:.4f} ({last_rung_seconds:.1f}s)")
+
+            rounds_without_gain = rounds_without_gain + 1 if rung_best < best_score + tol else 0
+            best_candidate, best_score = ranking[0], rung_best
+
+            if len(ranking) == 1 or n_samples == n_rows:
+                break
+            if rounds_without_gain >= patience:
+                stop_reason = 'early_stopping'
+                break
+            survivors = ranking[:max(1, len(ranking) // factor)]
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
+    return SearchResult(_public(candidates[best_candidate]), float(best_score), trials, len(candidates),
+                        rungs_completed, time.time() - started, stop_reason)
+
+
+# ==========================================
+# HISTORIQUE
+# ==========================================
+
+def append_model_history(path: str, row: Dict):
+    """
+    Ajoute une ligne a historique_modeles.csv. Les nouvelles colonnes sont
+    ajoutees a droite de l'en-tete existant (anciennes lignes laissees vides).
+    """
+    fieldnames: List[str] = []
+    rows: List[Dict] = []
+    if os.path.exists(path) and os.path.getsize(path):
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f)
+            fieldnames = list(reader.fieldnames or [])
+            rows = list(reader)
+    missing = [name for name in row if name not in fieldnames]
+
+    if missing or not fieldnames:
+        fieldnames += missing
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows + [row])
+    else:
+        with open(path, 'a', encoding='utf-8', newline='') as f:
+            csv.DictWriter(f, fieldnames=fieldnames).writerow(row)
+
+
+def history_row(version: str, metrics: Dict, search: Optional[Dict] = None,
+                fit_seconds: Optional[float] = None) -> Dict:
+    """
+    Ligne d'historique : metriques (colonnes existantes) + temps de
+    recherche (search = SearchResult.summary()) et d'entrainement
+    """
+    row = {'date': time.strftime('%Y-%m-%d %H:%M'), 'version_modele': version}
+    row.update(metrics)
+    if fit_seconds is not None:
+        row['fit_seconds'] = round(fit_seconds, 2)
+    if search is not None:
+        row.update({key: search[key] for key in
+                    ('cv_score', 'search_seconds', 'n_candidates', 'rungs_completed', 'stop_reason')})
+        row['best_params'] = json.dumps(search['best_params'], sort_keys=True)
+    return row
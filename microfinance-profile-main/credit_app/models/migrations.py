@@ -0,0 +1,207 @@
+"""
+Migrations versionnees du schema credit_scoring
+
+Chaque migration a un numero de version croissant et s'applique une seule
+fois, dans sa propre transaction. La table schema_migrations garde la
+version, le nom et une somme de controle du SQL applique : une migration
+deja appliquee puis modifiee dans le code est signalee au lieu d'etre
+ignoree en silence. Un verrou consultatif empeche deux instances de migrer
+en meme temps.
+
+Usage:
+    python migrations.py status              # versions appliquees / en attente
+    python migrations.py migrate [version]   # applique jusqu'a `version` (toutes par defaut)
+"""
+import hashlib
+import logging
+import os
+import sys
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    sql: str
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.sql.strip().encode('utf-8')).hexdigest()[:16]
+
+
+class MigrationError(RuntimeError):
+    """Historique des migrations incoherent avec le code"""
+
+
+MIGRATIONS_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version integer PRIMARY KEY,
+        nom varchar(200) NOT NULL,
+        somme_controle varchar(64) NOT NULL,
+        date_application timestamp without time zone DEFAULT now()
+    )
+"""
+
+# Cle du verrou consultatif (transactionnel) partage par tous les migrateurs
+LOCK_KEY = 74210025
+
+
+MIGRATIONS = [
+    Migration(1, 'table_notifications', """
+        -- Table lue et ecrite par app.py et notification_outbox.py,
+        -- absente du schema initial
+        CREATE TABLE IF NOT EXISTS notifications (
+            id serial PRIMARY KEY,
+            utilisateur_id integer NOT NULL REFERENCES utilisateurs(id) ON DELETE CASCADE,
+            type varchar(50) NOT NULL,
+            titre varchar(255) NOT NULL,
+            message text NOT NULL,
+            lu boolean NOT NULL DEFAULT FALSE,
+            date_creation timestamp without time zone DEFAULT now(),
+            date_lecture timestamp without time zone
+        );
+    """),
+    Migration(2, 'index_chemins_scoring', """
+        -- Agregats de paiements d'un utilisateur (payment_stats_cte, trigger) :
+        -- type_paiement et jours_retard inclus pour un parcours d'index seul
+        CREATE INDEX IF NOT EXISTS idx_paiements_utilisateur_date
+            ON historique_paiements (utilisateur_id, date_paiement DESC)
+            INCLUDE (type_paiement, jours_retard);
+        DROP INDEX IF EXISTS idx_paiements_utilisateur;
+
+        -- /score-trend : 20 derniers scores, lus dans l'ordre de l'index
+        CREATE INDEX IF NOT EXISTS idx_scores_utilisateur_date
+            ON historique_scores (utilisateur_id, date_calcul DESC);
+        DROP INDEX IF EXISTS idx_scores_utilisateur;
+
+        -- /notifications : toutes, ou non lues seulement (index partiel,
+        -- qui sert aussi mark-all-read)
+        CREATE INDEX IF NOT EXISTS idx_notifications_utilisateur_date
+            ON notifications (utilisateur_id, date_creation DESC);
+        CREATE INDEX IF NOT EXISTS idx_notifications_non_lues
+            ON notifications (utilisateur_id, date_creation DESC)
+            WHERE lu = FALSE;
+
+        -- /score-trend/<username> : email OR nom, un index par branche (BitmapOr)
+        CREATE INDEX IF NOT EXISTS idx_utilisateurs_email ON utilisateurs (email);
+        CREATE INDEX IF NOT EXISTS idx_utilisateurs_nom ON utilisateurs (nom);
+    """),
+]
+
+
+def check_sequence(migrations: Sequence[Migration]):
+    """Versions strictement croissantes et uniques"""
+    versions = [m.version for m in migrations]
+    if versions != sorted(set(versions)):
+        raise MigrationError(f"Versions de migration non ordonnees ou dupliquees: {versions}")
+
+
+class MigrationRunner:
+    """
+    Applique les migrations en attente sur la base.
+    """
+
+    def __init__(self, get_connection: Callable, migrations: Optional[Sequence[Migration]] = None):
+        # get_connection() doit renvoyer un context manager qui fournit une connexion
+        # (commit en sortie normale, rollback sur exception)
+        self.get_connection = get_connection
+        self.migrations = list(MIGRATIONS if migrations is None else migrations)
+        check_sequence(self.migrations)
+
+    def applied(self) -> Dict[int, Dict]:
+        """Migrations enregistrees en base, par version"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(MIGRATIONS_TABLE_DDL)
+                cur.execute("""
+                    SELECT version, nom, somme_controle, date_application
+                    FROM schema_migrations
+                    ORDER BY version
+                """)
+                return {
+                    row[0]: {'name': row[1], 'checksum': row[2], 'applied_at': row[3]}
+                    for row in cur.fetchall()
+                }
+
+    def pending(self, applied: Optional[Dict[int, Dict]] = None) -> List[Migration]:
+        """
+        Migrations a appliquer. Leve MigrationError si une migration appliquee
+        a change depuis ou n'existe plus dans le code.
+        """
+        applied = self.applied() if applied is None else applied
+        known = {m.version: m for m in self.migrations}
+
+        unknown = sorted(set(applied) - set(known))
+        if unknown:
+            raise MigrationError(f"Versions appliquees inconnues du code: {unknown}")
+        for version, record in applied.items():
+            if record['checksum'] != known[version].checksum:
+                raise MigrationError(
+                    f"Migration {version} ({record['name']}) modifiee apres application"
+                )
+
+        return [m for m in self.migrations if m.version not in applied]
+
+    def migrate(self, target: Optional[int] = None) -> List[int]:
+        """Applique les migrations en attente jusqu'a `target` incluse; retourne les versions appliquees"""
+        done = []
+        for migration in self.pending():
+            if target is not None and migration.version > target:
+                break
+            with self.get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_xact_lock(%s)", (LOCK_KEY,))
+                    # Une autre instance a pu l'appliquer pendant l'attente du verrou
+                    cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (migration.version,))
+                    if cur.fetchone():
+                        continue
+                    cur.execute(migration.sql)
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, nom, somme_controle) VALUES (%s, %s, %s)",
+                        (migration.version, migration.name, migration.checksum)
+                    )
+            logger.info(f"Migration {migration.version:03d} {migration.name} appliquee")
+            done.append(migration.version)
+        return done
+
+    def status(self) -> Dict:
+        applied = self.applied()
+        return {
+            'current_version': max(applied, default=0),
+            'applied': [f"{v:03d} {r['name']}" for v, r in sorted(applied.items())],
+            'pending': [f"{m.version:03d} {m.name}" for m in self.pending(applied)]
+        }
+
+
+def _cli_pool():
+    from db_pool import PooledConnectionPool
+
+    db_config = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'database': os.getenv('DB_NAME', 'credit_scoring'),
+        'user': os.getenv('DB_USER', 'postgres'),
+        'password': os.getenv('DB_PASSWORD', 'admin'),
+        'port': int(os.getenv('DB_PORT', 5432))
+    }
+    return PooledConnectionPool(db_config, min_size=0, max_size=1, max_overflow=0)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    command = sys.argv[1] if len(sys.argv) > 1 else '--help'
+    pool = _cli_pool()
+    runner = MigrationRunner(pool.connection)
+
+    if command == 'status':
+        print(runner.status())
+    elif command == 'migrate':
+        target = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        applied = runner.migrate(target)
+        print(f"{len(applied)} migration(s) appliquee(s), version {runner.status()['current_version']}")
+    else:
+        print(__doc__)
+
+    pool.close()
@@ -0,0 +1,355 @@
+"""
+Registre versionne des modeles de scoring
+
+Chaque version est un repertoire immuable :
+    <racine>/<version>/model.pkl, scaler.pkl, compiled/*.npy (optionnel),
+                       validation.npy (optionnel), metadata.json
+ecrit dans un repertoire temporaire puis renomme (os.rename est atomique
+sur un meme systeme de fichiers) : une version visible est toujours complete.
+
+La version active est un simple pointeur (<racine>/ACTIVE, JSON) remplace
+atomiquement par os.replace, avec l'historique des activations pour le
+retour arriere. Chaque worker compare l'empreinte du pointeur (inode et
+date de modification) a celle de sa derniere lecture pour suivre les
+activations faites par les autres.
+
+Le premier entrainement (registre vide) est reserve a un seul processus par
+un verrou flock sur <racine>/.training.lock, libere a la mort du processus.
+
+Au chargement, les tableaux du predicteur compile sont projetes en memoire
+(mmap_mode) et le Random Forest sklearn n'est lu qu'au premier acces.
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+
+from compiled_forest import CompiledForest
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_FILE = 'ACTIVE'
+METADATA_FILE = 'metadata.json'
+TRAINING_LOCK_FILE = '.training.lock'
+HISTORY_SIZE = 20
+
+
+class RegistryError(Exception):
+    """Version absente, incomplete ou refusee"""
+
+
+class ModelBundle:
+    """
+    Modele, scaler et predicteur compile d'une meme version.
+
+    Le service ne garde qu'une reference vers le bundle actif : une requete
+    lit cette reference une fois et termine sur la meme version, meme si
+    une autre est activee entre-temps.
+
+    Le modele sklearn n'est charge qu'au premier acces a .model : tant que
+    le predicteur compile suffit, un worker n'en garde pas de copie.
+    """
+
+    def __init__(self, version: str, scaler, compiled_model: Optional[CompiledForest],
+                 feature_columns: Sequence[str], metadata: Dict,
+                 validation_X: Optional[np.ndarray] = None, model=None,
+                 model_path: Optional[str] = None, mmap_mode: Optional[str] = None):
+        self.version = version
+        self.scaler = scaler
+        self.compiled_model = compiled_model
+        self.feature_columns = tuple(feature_columns)
+        self.metadata = metadata
+        self.validation_X = validation_X
+        self._model = model
+        self._model_path = model_path
+        self._mmap_mode = mmap_mode
+        self._model_lock = threading.Lock()
+
+    @property
+    def model_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = joblib.load(self._model_path, mmap_mode=self._mmap_mode)
+                    logger.info(f"Modele sklearn charge (version {self.version})")
+        return self._model
+
+
+class TrainingLock:
+    """
+    Verrou exclusif entre processus (flock). Deux ouvertures du fichier,
+    meme dans un seul processus, s'excluent; le noyau libere le verrou si
+    le processus qui le tient meurt.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self, blocking: bool = False) -> bool:
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+def _file_digest(paths: Sequence[str]) -> str:
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """Versions publiees sous root, pointeur de version active"""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, version: str, name: str = '') -> str:
+        if not version or os.sep in version or version.startswith('.') or version == ACTIVE_FILE:
+            raise RegistryError(f"Version invalide: {version!r}")
+        return os.path.join(self.root, version, name)
+
+    # ==========================================
+    # PUBLICATION
+    # ==========================================
+
+    def publish(self, model, scaler, feature_columns: Sequence[str], metrics: Optional[Dict] = None,
+                params: Optional[Dict] = None, validation_X: Optional[np.ndarray] = None,
+                compile_model: bool = True, artifacts: Optional[Dict] = None, **extra) -> str:
+        """
+        Ecrit une nouvelle version (non active) et retourne son identifiant.
+        artifacts : objets annexes ecrits en <nom>.pkl dans la version (encodeurs...)
+        """
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=self.root)
+        try:
+            model_path = os.path.join(staging, 'model.pkl')
+            scaler_path = os.path.join(staging, 'scaler.pkl')
+            joblib.dump(model, model_path)
+            joblib.dump(scaler, scaler_path)
+            digest = _file_digest([model_path, scaler_path])
+            version = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}-{digest[:8]}"
+
+            compiled = False
+            if compile_model:
+                try:
+                    compiled_model = CompiledForest.from_model(model, scaler)
+                    # Verifie ici, avec le modele sklearn deja en memoire :
+                    # l'activation ne valide plus que le predicteur compile
+                    if validation_X is not None and not np.array_equal(
+                            compiled_model.predict_proba(validation_X),
+                            model.predict_proba(scaler.transform(validation_X))):
+                        raise ValueError("probabilites differentes de celles du modele sklearn")
+                    compiled_model.save_arrays(os.path.join(staging, 'compiled'))
+                    compiled = True
+                except Exception as e:
+                    shutil.rmtree(os.path.join(staging, 'compiled'), ignore_errors=True)
+                    logger.warning(f"Compilation du modele impossible, sklearn utilise: {e}")
+
+            if validation_X is not None:
+                np.save(os.path.join(staging, 'validation.npy'), np.asarray(validation_X, dtype=float))
+            for name, obj in (artifacts or {}).items():
+                joblib.dump(obj, os.path.join(staging, f'{name}.pkl'))
+
+            metadata = {
+                'version': version,
+                'created_at': datetime.now().isoformat(),
+                'sha1': digest,
+                'feature_columns': list(feature_columns),
+                'metrics': metrics or {},
+                'params': params or {},
+                'compiled': compiled,
+                'artifacts': sorted(artifacts or {}),
+                **extra
+            }
+            with open(os.path.join(staging, METADATA_FILE), 'w', encoding='utf-8') as f:
+                json.dump(metadata, f, indent=2, default=str)
+
+            os.rename(staging, os.path.join(self.root, version))
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        logger.info(f"Version de modele publiee: {version}")
+        return version
+
+    # ==========================================
+    # LECTURE
+    # ==========================================
+
+    def exists(self, version: str) -> bool:
+        return os.path.isfile(self._path(version, METADATA_FILE))
+
+    def metadata(self, version: str) -> Dict:
+        try:
+            with open(self._path(version, METADATA_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise RegistryError(f"Version inconnue: {version}")
+
+    def versions(self) -> List[str]:
+        """Versions publiees, de la plus ancienne a la plus recente"""
+        return sorted(
+            name for name in os.listdir(self.root)
+            if not name.startswith('.') and name != ACTIVE_FILE
+            and os.path.isfile(os.path.join(self.root, name, METADATA_FILE))
+        )
+
+    def list_versions(self) -> List[Dict]:
+        active = self.active_version()
+        result = []
+        for version in reversed(self.versions()):
+            metadata = self.metadata(version)
+            result.append({
+                'version': version,
+                'created_at': metadata.get('created_at'),
+                'metrics': metadata.get('metrics', {}),
+                'params': metadata.get('params', {}),
+                'source': metadata.get('source'),
+                'active': version == active
+            })
+        return result
+
+    def load(self, version: str, use_compiled: bool = True, mmap_mode: Optional[str] = 'r') -> ModelBundle:
+        """
+        Bundle d'une version. Le modele sklearn est lu a la demande
+        (joblib.load avec mmap_mode), le predicteur compile est projete en
+        memoire des maintenant.
+        """
+        metadata = self.metadata(version)
+        scaler = joblib.load(self._path(version, 'scaler.pkl'))
+
+        compiled = None
+        compiled_dir = self._path(version, 'compiled')
+        if use_compiled and os.path.isdir(compiled_dir):
+            try:
+                compiled = CompiledForest.load_arrays(compiled_dir, mmap_mode=mmap_mode)
+            except Exception as e:
+                logger.warning(f"Lecture du predicteur compile impossible ({version}): {e}")
+
+        validation_path = self._path(version, 'validation.npy')
+        validation_X = np.load(validation_path) if os.path.exists(validation_path) else None
+
+        return ModelBundle(
+            version=version,
+            scaler=scaler,
+            compiled_model=compiled,
+            feature_columns=metadata['feature_columns'],
+            metadata=metadata,
+            validation_X=validation_X,
+            model_path=self._path(version, 'model.pkl'),
+            mmap_mode=mmap_mode
+        )
+
+    # ==========================================
+    # POINTEUR DE VERSION ACTIVE
+    # ==========================================
+
+    def _read_active(self) -> Dict:
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'version': None, 'history': []}
+
+    def active_version(self) -> Optional[str]:
+        return self._read_active().get('version')
+
+    def active_stamp(self) -> Optional[Tuple[int, int]]:
+        """
+        (inode, mtime en ns) du pointeur, None tant qu'aucune version n'est
+        active. Change a chaque activation (os.replace d'un nouveau fichier)
+        pour le prix d'un stat.
+        """
+        try:
+            stat = os.stat(os.path.join(self.root, ACTIVE_FILE))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def training_lock(self) -> TrainingLock:
+        """Verrou du premier entrainement, partage par les workers du registre"""
+        return TrainingLock(os.path.join(self.root, TRAINING_LOCK_FILE))
+
+    def previous_version(self) -> Optional[str]:
+        """Derniere version active avant la version courante, encore presente"""
+        for version in reversed(self._read_active().get('history', [])):
+            if self.exists(version):
+                return version
+        return None
+
+    def _write_active(self, version: str, history: List[str]):
+        state = {
+            'version': version,
+            'activated_at': datetime.now().isoformat(),
+            'history': history[-HISTORY_SIZE:]
+        }
+        fd, tmp_path = tempfile.mkstemp(prefix='.active-', dir=self.root)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.root, ACTIVE_FILE))
+        logger.info(f"Version de modele active: {version}")
+
+    def set_active(self, version: str):
+        """Active une version; la version courante rejoint l'historique"""
+        if not self.exists(version):
+            raise RegistryError(f"Version inconnue: {version}")
+        state = self._read_active()
+        current = state.get('version')
+        if version == current:
+            return
+        history = [v for v in state.get('history', []) if v not in (version, current)]
+        if current:
+            history.append(current)
+        self._write_active(version, history)
+
+    def rollback(self, version: Optional[str] = None) -> str:
+        """
+        Revient a la version precedente (ou a version si fournie); la version
+        quittee n'est pas remise dans l'historique.
+        """
+        target = version or self.previous_version()
+        if target is None:
+            raise RegistryError("Aucune version precedente")
+        if not self.exists(target):
+            raise RegistryError(f"Version inconnue: {target}")
+        history = self._read_active().get('history', [])
+        if target in history:
+            history = history[:history.index(target)]
+        self._write_active(target, history)
+        return target
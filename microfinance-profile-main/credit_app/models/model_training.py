@@ -0,0 +1,188 @@
+"""
+Entrainement du modele de scoring hors du processus de l'API
+
+run_training_process() lance train_and_register() dans un interpreteur
+separe (ce fichier, parametres JSON sur stdin, resultat JSON sur stdout) :
+extraction PostgreSQL par flux avec sa propre connexion (training_data.py,
+cache par snapshot des donnees), entrainement, evaluation,
+puis publication d'une nouvelle version (non active) dans le registre.
+Le service principal valide la version et l'active ensuite.
+
+Un interpreteur neuf plutot que multiprocessing : app.py cree le modele et
+ses threads a l'import, qu'un fork ou un spawn reproduirait dans le fils.
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import psycopg2
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from hyperparameter_search import append_model_history, history_row, successive_halving_search
+from model_registry import ModelRegistry
+from training_data import DEFAULT_ITERSIZE, TrainingDataCache, load_training_data
+
+logger = logging.getLogger(__name__)
+
+MIN_TRAINING_ROWS = 30
+
+HISTORY_FILE = 'historique_modeles.csv'
+
+# Lignes de test conservees avec la version pour la valider avant activation
+VALIDATION_SAMPLE_SIZE = 200
+
+RF_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 12,
+    'min_samples_split': 5,
+    'min_samples_leaf': 2,
+    'max_features': 'sqrt',
+    'random_state': 42,
+    'class_weight': 'balanced',
+    'n_jobs': -1
+}
+
+
+class TrainingError(Exception):
+    """Donnees insuffisantes ou entrainement impossible"""
+
+
+def fit_scoring_model(X: np.ndarray, y: np.ndarray, params: Optional[Dict] = None,
+                      search: Optional[Dict] = None) -> Tuple[RandomForestClassifier, StandardScaler, Dict, np.ndarray]:
+    """
+    Split train/test, normalisation et Random Forest.
+    Avec search (options de successive_halving_search), les hyperparametres
+    sont choisis par validation croisee sur la partie train uniquement.
+    Retourne (modele, scaler, metriques, echantillon de validation brut).
+    """
+    if len(X) < MIN_TRAINING_ROWS:
+        raise TrainingError(f"Pas assez de donnees ({len(X)} < {MIN_TRAINING_ROWS})")
+    if len(np.unique(y)) < 2:
+        raise TrainingError("Une seule classe presente")
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+
+    params = {**RF_PARAMS, **(params or {})}
+    search_result = None
+    if search is not None:
+        base_params = {k: v for k, v in params.items() if k != 'n_jobs'}
+        search_result = successive_halving_search(X_train, y_train, base_params=base_params, **search)
+        params.update(search_result.best_params)
+        logger.info(f"Recherche d'hyperparametres: {search_result.summary()}")
+
+    started = time.perf_counter()
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+
+    model = RandomForestClassifier(**params)
+    model.fit(X_train_scaled, y_train)
+    fit_seconds = time.perf_counter() - started
+
+    metrics = {
+        'train_score': float(model.score(X_train_scaled, y_train)),
+        'test_score': float(model.score(X_test_scaled, y_test)),
+        'test_roc_auc': float(roc_auc_score(y_test, model.predict_proba(X_test_scaled)[:, 1])),
+        'n_samples': int(len(X)),
+        'positive_rate': float(np.mean(y)),
+        'fit_seconds': round(fit_seconds, 2)
+    }
+    if search_result is not None:
+        metrics['search'] = search_result.summary()
+    # Validation en float64, comme les lignes scorees par le service
+    return model, scaler, metrics, X_test[:VALIDATION_SAMPLE_SIZE].astype(np.float64)
+
+
+def train_and_register(db_config: Dict, registry_root: str, feature_columns: Sequence[str],
+                       use_payment_stats_table: bool, params: Optional[Dict] = None,
+                       cache_dir: Optional[str] = None, itersize: int = DEFAULT_ITERSIZE,
+                       search: Optional[Dict] = None) -> Dict:
+    """
+    Entrainement complet : retourne la version publiee et ses metriques,
+    ajoutees a historique_modeles.csv du registre.
+    Leve TrainingError si les donnees sont insuffisantes.
+    """
+    logger.info("Extraction des donnees depuis PostgreSQL...")
+    cache = TrainingDataCache(cache_dir) if cache_dir else None
+    conn = psycopg2.connect(**db_config)
+    try:
+        data = load_training_data(conn, feature_columns, use_payment_stats_table, cache, itersize)
+    finally:
+        conn.close()
+    logger.info(f"{len(data.X)} utilisateurs recuperes")
+
+    logger.info("Entrainement du Random Forest...")
+    model, scaler, metrics, validation_X = fit_scoring_model(data.X, data.y, params, search)
+    logger.info(f"Precision train: {metrics['train_score']:.3f}")
+    logger.info(f"Precision test: {metrics['test_score']:.3f}")
+
+    version = ModelRegistry(registry_root).publish(
+        model, scaler, feature_columns,
+        metrics=metrics,
+        params=model.get_params(),
+        validation_X=validation_X,
+        extraction=data.report,
+        source='train_model_from_database'
+    )
+
+    append_model_history(os.path.join(registry_root, HISTORY_FILE), history_row(
+        version,
+        {'accuracy_test': metrics['test_score'], 'roc_auc_test': metrics['test_roc_auc'],
+         'extraction_seconds': data.report.get('seconds')},
+        search=metrics.get('search'),
+        fit_seconds=metrics['fit_seconds']
+    ))
+    return {'version': version, 'metrics': metrics, 'extraction': data.report}
+
+
+def run_training_process(db_config: Dict, registry_root: str, feature_columns: Sequence[str],
+                         use_payment_stats_table: bool, params: Optional[Dict] = None,
+                         cache_dir: Optional[str] = None, itersize: int = DEFAULT_ITERSIZE,
+                         search: Optional[Dict] = None, timeout: Optional[float] = None) -> Dict:
+    """train_and_register dans un processus separe; memes retours et exceptions"""
+    payload = json.dumps({
+        'db_config': db_config,
+        'registry_root': os.path.abspath(registry_root),
+        'feature_columns': list(feature_columns),
+        'use_payment_stats_table': use_payment_stats_table,
+        'params': params,
+        'cache_dir': os.path.abspath(cache_dir) if cache_dir else None,
+        'itersize': itersize,
+        'search': search
+    })
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__)],
+        input=payload, stdout=subprocess.PIPE, text=True, timeout=timeout,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    lines = completed.stdout.strip().splitlines()
+    try:
+        result = json.loads(lines[-1])
+    except (IndexError, ValueError):
+        raise RuntimeError(f"Processus d'entrainement interrompu (code {completed.returncode})")
+    if result.get('error_type') == 'TrainingError':
+        raise TrainingError(result['error'])
+    if 'error' in result:
+        raise RuntimeError(result['error'])
+    return result
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)  # stderr, herite du service
+    # Mots de passe sur stdin plutot qu'en arguments (visibles dans ps)
+    arguments = json.load(sys.stdin)
+    try:
+        output = train_and_register(**arguments)
+    except Exception as e:
+        output = {'error_type': type(e).__name__, 'error': str(e)}
+    print(json.dumps(output, default=str))
@@ -0,0 +1,217 @@
+"""
+File d'envoi asynchrone des notifications
+
+Les requetes de scoring deposent les notifications dans une file bornee;
+un thread d'ecriture les insere par lots (INSERT multi-lignes) dans la
+table notifications, avec reprise sur erreur et vidage a l'arret.
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict
+
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class NotificationOutbox:
+    """
+    File bornee + ecrivain en arriere-plan.
+
+    Contre-pression : enqueue() attend au plus `enqueue_timeout` secondes
+    qu'une place se libere, puis abandonne la notification (comptee dans
+    'dropped') plutot que de bloquer la requete de scoring.
+    """
+
+    INSERT_SQL = """
+        INSERT INTO notifications (
+            utilisateur_id,
+            type,
+            titre,
+            message,
+            lu,
+            date_creation
+        ) VALUES %s
+    """
+    # date_creation = heure serveur de l'insertion moins l'attente dans la file
+    INSERT_TEMPLATE = "(%s, %s, %s, %s, FALSE, NOW() - %s * INTERVAL '1 second')"
+
+    def __init__(self, get_connection: Callable, max_queue_size: int = 10000,
+                 batch_size: int = 200, flush_interval: float = 0.5,
+                 max_retries: int = 5, retry_backoff: float = 0.5,
+                 enqueue_timeout: float = 0.05):
+        if max_queue_size < 1 or batch_size < 1:
+            raise ValueError(f"Tailles invalides: queue={max_queue_size}, batch={batch_size}")
+        self.get_connection = get_connection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.enqueue_timeout = enqueue_timeout
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'retries': 0,
+            'dropped': 0,
+            'failed': 0
+        }
+
+    def _count(self, name: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[name] += n
+
+    # ==========================================
+    # CYCLE DE VIE
+    # ==========================================
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._closed = False
+                self._thread = threading.Thread(
+                    target=self._run, name='notification-outbox', daemon=True
+                )
+                self._thread.start()
+
+    def close(self, timeout: float = 10.0) -> bool:
+        """
+        Arrete l'ecrivain apres avoir ecrit tout ce qui est en file. Attend au
+        plus `timeout` secondes au total; False si des notifications restent
+        non ecrites (ecrivain bloque, base indisponible).
+        """
+        with self._start_lock:
+            self._closed = True
+            thread = self._thread
+        if thread is None:
+            return True
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            # L'ecrivain s'arrete aussi de lui-meme une fois la file videe
+            logger.warning(f"File de notifications pleine a l'arret ({self._queue.qsize()} en attente)")
+        thread.join(max(0.0, deadline - time.monotonic()))
+        if thread.is_alive():
+            logger.warning(f"Notifications non ecrites a l'arret: {self._queue.qsize()}")
+            return False
+        return True
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Attend que toutes les notifications deposees soient traitees"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks > 0:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    # ==========================================
+    # PRODUCTEUR
+    # ==========================================
+
+    def enqueue(self, user_id: int, notification_type: str, titre: str, message: str) -> bool:
+        """Depose une notification; False si la file est pleine ou fermee"""
+        if self._closed:
+            self._count('dropped')
+            return False
+        item = (int(user_id), notification_type, titre, message, time.monotonic())
+        try:
+            self._queue.put(item, timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._count('dropped')
+            logger.warning(f"File de notifications pleine, notification abandonnee pour user {user_id}")
+            return False
+        self._count('enqueued')
+        return True
+
+    # ==========================================
+    # ECRIVAIN
+    # ==========================================
+
+    def _run(self):
+        stopping = False
+        while True:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if stopping or self._closed:
+                    return
+                continue
+
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    self._queue.task_done()
+                else:
+                    batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                # A l'arret, vider la file sans attendre
+                remaining = 0 if stopping else deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write_with_retry(batch)
+                for _ in batch:
+                    self._queue.task_done()
+            if stopping and self._queue.empty():
+                return
+
+    def _write_with_retry(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._write(batch)
+                self._count('written', len(batch))
+                self._count('batches')
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self._count('failed', len(batch))
+                    logger.error(f"Ecriture de {len(batch)} notifications abandonnee: {e}")
+                    return
+                self._count('retries')
+                delay = self.retry_backoff * (2 ** attempt)
+                logger.warning(f"Ecriture des notifications en echec ({e}), nouvel essai dans {delay:.1f}s")
+                time.sleep(delay)
+
+    def _write(self, batch):
+        now = time.monotonic()
+        rows = [
+            (user_id, notification_type, titre, message, now - enqueued_at)
+            for user_id, notification_type, titre, message, enqueued_at in batch
+        ]
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                execute_values(cur, self.INSERT_SQL, rows,
+                               template=self.INSERT_TEMPLATE, page_size=self.batch_size)
+
+    # ==========================================
+    # METRIQUES
+    # ==========================================
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({
+            'queued': self._queue.qsize(),
+            'max_queue_size': self._queue.maxsize,
+            'running': self._thread is not None and self._thread.is_alive()
+        })
+        return stats
@@ -0,0 +1,339 @@
+"""
+Statistiques de paiement maintenues incrementalement par utilisateur
+
+La table statistiques_paiements est mise a jour par un trigger sur
+historique_paiements a chaque paiement insere, modifie ou supprime.
+Le scoring lit alors une seule ligne par cle primaire au lieu de
+re-agreger tout l'historique.
+
+Usage:
+    python payment_stats.py install          # cree table + trigger et remplit
+    python payment_stats.py rebuild [id...]  # reconstruit tout ou certains utilisateurs
+    python payment_stats.py check [--repair] # compare avec historique_paiements
+"""
+import logging
+import os
+import select
+import sys
+import threading
+from typing import Callable, Dict, List, Optional
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+logger = logging.getLogger(__name__)
+
+
+PAYMENT_STATS_DDL = """
+    CREATE TABLE IF NOT EXISTS statistiques_paiements (
+        utilisateur_id integer PRIMARY KEY REFERENCES utilisateurs(id) ON DELETE CASCADE,
+        total_paiements integer NOT NULL DEFAULT 0,
+        paiements_a_temps integer NOT NULL DEFAULT 0,
+        paiements_en_retard integer NOT NULL DEFAULT 0,
+        paiements_manques integer NOT NULL DEFAULT 0,
+        paiements_anticipes integer NOT NULL DEFAULT 0,
+        somme_jours_retard bigint NOT NULL DEFAULT 0,
+        nb_jours_retard integer NOT NULL DEFAULT 0,
+        date_dernier_paiement timestamp without time zone,
+        date_modification timestamp without time zone DEFAULT now()
+    );
+
+    COMMENT ON TABLE statistiques_paiements IS
+        'Agregats de historique_paiements par utilisateur, maintenus par trigger';
+
+    CREATE OR REPLACE FUNCTION maj_statistiques_paiements() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE statistiques_paiements SET
+                total_paiements = total_paiements - 1,
+                paiements_a_temps = paiements_a_temps - (OLD.type_paiement = 'a_temps')::int,
+                paiements_en_retard = paiements_en_retard - (OLD.type_paiement = 'en_retard')::int,
+                paiements_manques = paiements_manques - (OLD.type_paiement = 'manque')::int,
+                paiements_anticipes = paiements_anticipes - (OLD.type_paiement = 'anticipe')::int,
+                somme_jours_retard = somme_jours_retard - COALESCE(OLD.jours_retard, 0),
+                nb_jours_retard = nb_jours_retard - (OLD.jours_retard IS NOT NULL)::int,
+                date_dernier_paiement = (
+                    SELECT MAX(date_paiement) FROM historique_paiements
+                    WHERE utilisateur_id = OLD.utilisateur_id
+                ),
+                date_modification = NOW()
+            WHERE utilisateur_id = OLD.utilisateur_id;
+
+            PERFORM pg_notify('paiements_utilisateur', OLD.utilisateur_id::text);
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO statistiques_paiements AS s (
+                utilisateur_id, total_paiements, paiements_a_temps, paiements_en_retard,
+                paiements_manques, paiements_anticipes, somme_jours_retard,
+                nb_jours_retard, date_dernier_paiement
+            ) VALUES (
+                NEW.utilisateur_id,
+                1,
+                (NEW.type_paiement = 'a_temps')::int,
+                (NEW.type_paiement = 'en_retard')::int,
+                (NEW.type_paiement = 'manque')::int,
+                (NEW.type_paiement = 'anticipe')::int,
+                COALESCE(NEW.jours_retard, 0),
+                (NEW.jours_retard IS NOT NULL)::int,
+                NEW.date_paiement
+            )
+            ON CONFLICT (utilisateur_id) DO UPDATE SET
+                total_paiements = s.total_paiements + 1,
+                paiements_a_temps = s.paiements_a_temps + EXCLUDED.paiements_a_temps,
+                paiements_en_retard = s.paiements_en_retard + EXCLUDED.paiements_en_retard,
+                paiements_manques = s.paiements_manques + EXCLUDED.paiements_manques,
+                paiements_anticipes = s.paiements_anticipes + EXCLUDED.paiements_anticipes,
+                somme_jours_retard = s.somme_jours_retard + EXCLUDED.somme_jours_retard,
+                nb_jours_retard = s.nb_jours_retard + EXCLUDED.nb_jours_retard,
+                date_dernier_paiement = GREATEST(s.date_dernier_paiement, EXCLUDED.date_dernier_paiement),
+                date_modification = NOW();
+
+            PERFORM pg_notify('paiements_utilisateur', NEW.utilisateur_id::text);
+        END IF;
+
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS trigger_statistiques_paiements ON historique_paiements;
+    CREATE TRIGGER trigger_statistiques_paiements
+        AFTER INSERT OR UPDATE OR DELETE ON historique_paiements
+        FOR EACH ROW EXECUTE FUNCTION maj_statistiques_paiements();
+"""
+
+# Agregation de reference, utilisee pour le remplissage et la verification
+AGGREGATE_SELECT = """
+    SELECT
+        utilisateur_id,
+        COUNT(*) as total_paiements,
+        COUNT(CASE WHEN type_paiement = 'a_temps' THEN 1 END) as paiements_a_temps,
+        COUNT(CASE WHEN type_paiement = 'en_retard' THEN 1 END) as paiements_en_retard,
+        COUNT(CASE WHEN type_paiement = 'manque' THEN 1 END) as paiements_manques,
+        COUNT(CASE WHEN type_paiement = 'anticipe' THEN 1 END) as paiements_anticipes,
+        COALESCE(SUM(jours_retard), 0) as somme_jours_retard,
+        COUNT(jours_retard) as nb_jours_retard,
+        MAX(date_paiement) as date_dernier_paiement
+    FROM historique_paiements
+    {where}
+    GROUP BY utilisateur_id
+"""
+
+STATS_COLUMNS = [
+    'total_paiements', 'paiements_a_temps', 'paiements_en_retard',
+    'paiements_manques', 'paiements_anticipes', 'somme_jours_retard',
+    'nb_jours_retard', 'date_dernier_paiement'
+]
+
+
+def payment_stats_cte(use_table: bool, where: str = "") -> str:
+    """
+    Corps de la CTE payment_stats utilisee par les requetes de scoring.
+    Memes colonnes dans les deux cas; `where` filtre sur utilisateur_id.
+    """
+    if use_table:
+        return f"""
+            SELECT
+                utilisateur_id,
+                total_paiements,
+                paiements_a_temps,
+                paiements_en_retard,
+                paiements_manques,
+                somme_jours_retard::numeric / NULLIF(nb_jours_retard, 0) as moyenne_jours_retard
+            FROM statistiques_paiements
+            {where}
+        """
+    return f"""
+            SELECT
+                utilisateur_id,
+                COUNT(*) as total_paiements,
+                COUNT(CASE WHEN type_paiement = 'a_temps' THEN 1 END) as paiements_a_temps,
+                COUNT(CASE WHEN type_paiement = 'en_retard' THEN 1 END) as paiements_en_retard,
+                COUNT(CASE WHEN type_paiement = 'manque' THEN 1 END) as paiements_manques,
+                AVG(jours_retard) as moyenne_jours_retard
+            FROM historique_paiements
+            {where}
+            GROUP BY utilisateur_id
+        """
+
+
+class PaymentStatsStore:
+    """
+    Gestion de la table statistiques_paiements : installation,
+    reconstruction et verification de coherence.
+    """
+
+    def __init__(self, get_connection: Callable):
+        # get_connection() doit renvoyer un context manager qui fournit une connexion
+        self.get_connection = get_connection
+
+    def is_installed(self) -> bool:
+        """Vrai si la table et le trigger existent"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT to_regclass('statistiques_paiements') IS NOT NULL
+                       AND EXISTS (
+                           SELECT 1 FROM pg_trigger
+                           WHERE tgname = 'trigger_statistiques_paiements'
+                       )
+                """)
+                return bool(cur.fetchone()[0])
+
+    def install(self, backfill: bool = True) -> int:
+        """Cree la table et le trigger; remplit la table si demande"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(PAYMENT_STATS_DDL)
+        logger.info("Table statistiques_paiements et trigger installes")
+        return self.rebuild() if backfill else 0
+
+    def rebuild(self, user_ids: Optional[List[int]] = None) -> int:
+        """
+        Recalcule les agregats depuis historique_paiements.
+        Les ecritures sur historique_paiements sont bloquees pendant la
+        reconstruction pour ne perdre aucun delta du trigger.
+        """
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("LOCK TABLE historique_paiements IN SHARE MODE")
+
+                if user_ids is None:
+                    cur.execute("DELETE FROM statistiques_paiements")
+                    where = ""
+                else:
+                    user_ids = [int(uid) for uid in user_ids]
+                    cur.execute(
+                        "DELETE FROM statistiques_paiements WHERE utilisateur_id = ANY(%(ids)s)",
+                        {'ids': user_ids}
+                    )
+                    where = "WHERE utilisateur_id = ANY(%(ids)s)"
+
+                columns = ', '.join(['utilisateur_id'] + STATS_COLUMNS)
+                cur.execute(
+                    f"INSERT INTO statistiques_paiements ({columns}) "
+                    + AGGREGATE_SELECT.format(where=where),
+                    {'ids': user_ids}
+                )
+                count = cur.rowcount
+
+        logger.info(f"statistiques_paiements reconstruite: {count} utilisateurs")
+        return count
+
+    def check_consistency(self, repair: bool = False, limit: int = 100) -> Dict:
+        """Compare la table avec une agregation complete de historique_paiements"""
+        mismatch_condition = ' OR '.join(
+            f"s.{col} IS DISTINCT FROM a.{col}" for col in STATS_COLUMNS
+        )
+
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    WITH a AS ({AGGREGATE_SELECT.format(where='')})
+                    SELECT COALESCE(a.utilisateur_id, s.utilisateur_id)
+                    FROM a
+                    FULL OUTER JOIN statistiques_paiements s
+                        ON s.utilisateur_id = a.utilisateur_id
+                    WHERE a.utilisateur_id IS NULL AND s.total_paiements <> 0
+                       OR s.utilisateur_id IS NULL
+                       OR (a.utilisateur_id IS NOT NULL AND ({mismatch_condition}))
+                    ORDER BY 1
+                """)
+                mismatched = [row[0] for row in cur.fetchall()]
+
+        report = {
+            'consistent': not mismatched,
+            'mismatched_count': len(mismatched),
+            'mismatched_user_ids': mismatched[:limit],
+            'repaired': 0
+        }
+
+        if mismatched:
+            logger.warning(f"statistiques_paiements incoherente pour {len(mismatched)} utilisateurs")
+            if repair:
+                report['repaired'] = self.rebuild(mismatched)
+
+        return report
+
+
+class PaymentEventListener(threading.Thread):
+    """
+    Ecoute les notifications du trigger (canal paiements_utilisateur) et
+    appelle `callback(utilisateur_id)` pour chaque paiement enregistre.
+    Utilise une connexion dediee, hors pool; se reconnecte en cas d'erreur.
+    """
+
+    CHANNEL = 'paiements_utilisateur'
+
+    def __init__(self, db_config: Dict, callback: Callable[[int], None],
+                 poll_interval: float = 5.0):
+        super().__init__(name='payment-event-listener', daemon=True)
+        self.db_config = db_config
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.db_config)
+                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.CHANNEL}")
+                logger.info(f"Ecoute des paiements sur le canal {self.CHANNEL}")
+
+                while not self._stop_event.is_set():
+                    if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            self.callback(int(notify.payload))
+                        except Exception as e:
+                            logger.error(f"Erreur traitement evenement paiement: {e}")
+            except Exception as e:
+                logger.warning(f"Ecoute des paiements interrompue: {e}")
+                self._stop_event.wait(self.poll_interval)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+def _cli_pool():
+    from db_pool import PooledConnectionPool
+
+    db_config = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'database': os.getenv('DB_NAME', 'credit_scoring'),
+        'user': os.getenv('DB_USER', 'postgres'),
+        'password': os.getenv('DB_PASSWORD', 'admin'),
+        'port': int(os.getenv('DB_PORT', 5432))
+    }
+    return PooledConnectionPool(db_config, min_size=0, max_size=1, max_overflow=0)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    command = sys.argv[1] if len(sys.argv) > 1 else '--help'
+    pool = _cli_pool()
+    store = PaymentStatsStore(pool.connection)
+
+    if command == 'install':
+        print(f"{store.install()} utilisateurs initialises")
+    elif command == 'rebuild':
+        ids = [int(arg) for arg in sys.argv[2:]] or None
+        print(f"{store.rebuild(ids)} utilisateurs reconstruits")
+    elif command == 'check':
+        report = store.check_consistency(repair='--repair' in sys.argv)
+        print(report)
+        sys.exit(0 if report['consistent'] or report['repaired'] else 1)
+    else:
+        print(__doc__)
+
+    pool.close()
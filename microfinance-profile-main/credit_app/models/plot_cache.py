@@ -0,0 +1,103 @@
+"""
+Cache des graphiques du tableau de bord
+
+Les PNG sont rendus une fois par cle (version du modele + empreinte des
+metriques d'evaluation) et gardes en memoire et sur disque :
+
+    <directory>/<cle>/<graphique>.png
+    <directory>/<cle>/<nom>.json     donnees couteuses (validation croisee, courbe d'apprentissage)
+
+Une nouvelle cle (reentrainement, nouvelle evaluation) rend les anciennes
+obsoletes : invalidate(keep=cle) les supprime.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_key(model_version: Optional[str], metrics: Dict, *arrays) -> str:
+    """Cle de cache : version du modele + empreinte des metriques et des predictions"""
+    digest = hashlib.sha1(json.dumps(metrics, sort_keys=True, default=str).encode('utf-8'))
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array, dtype=float).tobytes())
+    version = ''.join(c if c.isalnum() or c in '-_' else '_' for c in str(model_version or 'aucun'))
+    return f"{version}-{digest.hexdigest()[:12]}"
+
+
+class PlotCache:
+    """PNG et donnees d'evaluation par cle; ETag = empreinte du PNG"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._plots: Dict[str, Dict[str, Tuple[bytes, str]]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key: str, filename: str) -> str:
+        return os.path.join(self.directory, key, filename)
+
+    def _write(self, path: str, payload: bytes):
+        # Ecriture atomique : un lecteur ne voit jamais un fichier partiel
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    # ---------- graphiques ----------
+
+    def get(self, key: str, name: str) -> Optional[Tuple[bytes, str]]:
+        """(png, etag) ou None si le graphique n'a pas encore ete rendu"""
+        with self._lock:
+            item = self._plots.get(key, {}).get(name)
+        if item is not None:
+            return item
+        try:
+            with open(self._path(key, f'{name}.png'), 'rb') as f:
+                png = f.read()
+        except FileNotFoundError:
+            return None
+        return self._remember(key, name, png)
+
+    def put(self, key: str, name: str, png: bytes) -> Tuple[bytes, str]:
+        self._write(self._path(key, f'{name}.png'), png)
+        return self._remember(key, name, png)
+
+    def _remember(self, key: str, name: str, png: bytes) -> Tuple[bytes, str]:
+        item = (png, f'"{hashlib.sha1(png).hexdigest()[:16]}"')
+        with self._lock:
+            self._plots.setdefault(key, {})[name] = item
+        return item
+
+    # ---------- donnees ----------
+
+    def load_data(self, key: str, name: str) -> Optional[Dict]:
+        try:
+            with open(self._path(key, f'{name}.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save_data(self, key: str, name: str, data: Dict):
+        self._write(self._path(key, f'{name}.json'), json.dumps(data, default=float).encode('utf-8'))
+
+    # ---------- invalidation ----------
+
+    def invalidate(self, keep: Optional[str] = None):
+        """Supprime toutes les cles sauf keep (memoire et disque)"""
+        with self._lock:
+            self._plots = {key: plots for key, plots in self._plots.items() if key == keep}
+        for entry in os.listdir(self.directory):
+            path = os.path.join(self.directory, entry)
+            if entry != keep and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+                logger.info(f"Graphiques obsoletes supprimes: {entry}")
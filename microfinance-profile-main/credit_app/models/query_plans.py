@@ -0,0 +1,294 @@
+"""
+Verification des plans d'execution des requetes chaudes du scoring
+
+Chaque requete chaude (meme SQL que app.py / scoring_model.py) passe par
+EXPLAIN avec un utilisateur reel. La verification echoue si un plan contient
+un parcours sequentiel (Seq Scan) : sur des volumes realistes, cela signifie
+qu'un index de migrations.py manque ou n'est pas utilisable.
+
+Sur une petite base, le planificateur prefere a raison un parcours
+sequentiel : --generate ajoute d'abord un volume realiste de donnees
+synthetiques (utilisateurs verif-*@volume.test). A reserver a une base de
+test.
+
+Usage:
+    python query_plans.py                          # EXPLAIN des requetes chaudes
+    python query_plans.py --generate 20000         # + donnees synthetiques, ANALYZE
+    python query_plans.py --migrate                # applique d'abord les migrations
+"""
+import argparse
+import json
+import logging
+import sys
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from payment_stats import payment_stats_cte
+
+logger = logging.getLogger(__name__)
+
+
+class HotQuery(NamedTuple):
+    name: str
+    sql: str
+    # Cles de l'utilisateur echantillon passees en parametres
+    params: Tuple[str, ...]
+
+
+HOT_QUERIES = [
+    HotQuery('paiements_utilisateur', f"""
+        WITH payment_stats AS ({payment_stats_cte(False, "WHERE utilisateur_id = %s")})
+        SELECT * FROM payment_stats
+    """, ('id',)),
+    HotQuery('score_trend_utilisateur', """
+        SELECT id FROM utilisateurs
+        WHERE email = %s OR nom = %s
+        LIMIT 1
+    """, ('email', 'nom')),
+    HotQuery('score_trend_historique', """
+        SELECT score_credit, score_850, niveau_risque, evenement_declencheur, date_calcul
+        FROM historique_scores
+        WHERE utilisateur_id = %s
+        ORDER BY date_calcul DESC
+        LIMIT 20
+    """, ('id',)),
+    HotQuery('notifications', """
+        SELECT id, type, titre, message, lu, date_creation, date_lecture
+        FROM notifications
+        WHERE utilisateur_id = %s
+        ORDER BY date_creation DESC LIMIT 20
+    """, ('id',)),
+    HotQuery('notifications_non_lues', """
+        SELECT id, type, titre, message, lu, date_creation, date_lecture
+        FROM notifications
+        WHERE utilisateur_id = %s AND lu = FALSE
+        ORDER BY date_creation DESC LIMIT 20
+    """, ('id',)),
+]
+
+HOT_TABLES = ('utilisateurs', 'historique_paiements', 'historique_scores', 'notifications')
+
+# En dessous, un parcours sequentiel peut etre le bon choix : resultat non probant
+MIN_TABLE_ROWS = 10000
+
+
+def iter_plan_nodes(plan: Dict) -> Iterator[Dict]:
+    """Noeuds d'un plan EXPLAIN (FORMAT JSON), en profondeur"""
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from iter_plan_nodes(child)
+
+
+def seq_scans(plan: Dict) -> List[str]:
+    """Tables parcourues sequentiellement dans le plan"""
+    return [
+        node.get('Relation Name', '?')
+        for node in iter_plan_nodes(plan)
+        if node.get('Node Type') == 'Seq Scan'
+    ]
+
+
+def plan_summary(plan: Dict) -> List[str]:
+    """'Type de noeud (index ou table)' pour chaque noeud d'acces"""
+    return [
+        f"{node['Node Type']} ({node.get('Index Name') or node.get('Relation Name')})"
+        for node in iter_plan_nodes(plan)
+        if 'Relation Name' in node or 'Index Name' in node
+    ]
+
+
+class QueryPlanVerifier:
+    """
+    EXPLAIN des requetes chaudes et detection des parcours sequentiels.
+    """
+
+    def __init__(self, get_connection: Callable, queries: Optional[List[HotQuery]] = None):
+        # get_connection() doit renvoyer un context manager qui fournit une connexion
+        self.get_connection = get_connection
+        self.queries = HOT_QUERIES if queries is None else queries
+
+    def table_rows(self) -> Dict[str, int]:
+        """Nombre de lignes estime (pg_class.reltuples) des tables chaudes"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT relname, GREATEST(reltuples, 0)::bigint
+                    FROM pg_class
+                    WHERE relname = ANY(%s) AND relkind = 'r'
+                """, (list(HOT_TABLES),))
+                return dict(cur.fetchall())
+
+    def sample_user(self) -> Dict:
+        """Auteur du dernier paiement : parametres des EXPLAIN"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT u.id, u.email, u.nom
+                    FROM utilisateurs u
+                    WHERE u.id = (
+                        SELECT utilisateur_id FROM historique_paiements
+                        ORDER BY id DESC LIMIT 1
+                    )
+                """)
+                row = cur.fetchone()
+                if row is None:
+                    cur.execute("SELECT id, email, nom FROM utilisateurs ORDER BY id LIMIT 1")
+                    row = cur.fetchone()
+        if row is None:
+            raise RuntimeError("Aucun utilisateur en base")
+        return {'id': row[0], 'email': row[1], 'nom': row[2]}
+
+    def explain(self, query: HotQuery, user: Dict) -> Dict:
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("EXPLAIN (FORMAT JSON) " + query.sql,
+                            tuple(user[key] for key in query.params))
+                result = cur.fetchone()[0]
+        if isinstance(result, str):
+            result = json.loads(result)
+        return result[0]['Plan']
+
+    def verify(self) -> Dict:
+        """
+        Rapport par requete (noeuds d'acces, tables en Seq Scan). `ok` est faux
+        des qu'une requete fait un parcours sequentiel.
+        """
+        rows = self.table_rows()
+        user = self.sample_user()
+        queries = {}
+        for query in self.queries:
+            plan = self.explain(query, user)
+            queries[query.name] = {
+                'seq_scans': seq_scans(plan),
+                'plan': plan_summary(plan),
+                'total_cost': plan.get('Total Cost')
+            }
+
+        small = sorted(t for t in HOT_TABLES if rows.get(t, 0) < MIN_TABLE_ROWS)
+        if small:
+            logger.warning(f"Volume insuffisant pour conclure ({', '.join(small)} < {MIN_TABLE_ROWS} lignes): "
+                           "relancer avec --generate")
+        return {
+            'ok': not any(q['seq_scans'] for q in queries.values()),
+            'sample_user_id': user['id'],
+            'table_rows': rows,
+            'small_tables': small,
+            'queries': queries
+        }
+
+
+# Volumes par utilisateur synthetique, proches de la production
+VOLUME_PER_USER = {'paiements': 24, 'scores': 30, 'notifications': 15}
+
+
+def generate_volume(get_connection: Callable, n_users: int, seed: float = 0.42) -> int:
+    """
+    Ajoute `n_users` utilisateurs synthetiques avec un credit, leurs
+    paiements, leur historique de scores et leurs notifications (un tiers
+    non lues), puis met a jour les statistiques du planificateur.
+    Retourne le nombre d'utilisateurs crees.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT setseed(%s)", (seed,))
+            cur.execute("SELECT COUNT(*) FROM utilisateurs WHERE email LIKE 'verif-%@volume.test'")
+            start = cur.fetchone()[0]
+            cur.execute("""
+                CREATE TEMP TABLE verif_utilisateurs ON COMMIT DROP AS
+                WITH inseres AS (
+                    INSERT INTO utilisateurs (nom, prenom, email, telephone, mot_de_passe_hash,
+                                              revenu_mensuel, anciennete_mois, charges_mensuelles)
+                    SELECT 'Verif' || n, 'Volume', 'verif-' || n || '@volume.test',
+                           '+241' || lpad(n::text, 8, '0'), '-',
+                           round((150000 + random() * 1850000)::numeric, 2),
+                           (random() * 240)::int,
+                           round((random() * 200000)::numeric, 2)
+                    FROM generate_series(%(start)s + 1, %(start)s + %(n)s) AS n
+                    RETURNING id
+                )
+                SELECT id FROM inseres
+            """, {'start': start, 'n': n_users})
+            cur.execute("""
+                CREATE TEMP TABLE verif_credits ON COMMIT DROP AS
+                WITH inseres AS (
+                    INSERT INTO credits_enregistres (utilisateur_id, type_credit, montant_principal,
+                                                     montant_total, montant_restant, taux_interet,
+                                                     duree_mois, date_echeance)
+                    SELECT id, 'consommation_generale', 500000, 550000, 250000, 10, 24,
+                           NOW() + INTERVAL '1 year'
+                    FROM verif_utilisateurs
+                    RETURNING id, utilisateur_id
+                )
+                SELECT * FROM inseres
+            """)
+            cur.execute("""
+                INSERT INTO historique_paiements (credit_id, utilisateur_id, montant, date_paiement,
+                                                  date_prevue, jours_retard, type_paiement)
+                SELECT c.id, c.utilisateur_id, 25000,
+                       NOW() - (k * 30 - retard) * INTERVAL '1 day',
+                       NOW() - k * 30 * INTERVAL '1 day',
+                       retard,
+                       CASE WHEN retard = 0 THEN 'a_temps' ELSE 'en_retard' END::type_paiement
+                FROM verif_credits c
+                CROSS JOIN generate_series(1, %(paiements)s) AS k
+                -- k * 0 : tirage reevalue pour chaque ligne
+                CROSS JOIN LATERAL (
+                    SELECT CASE WHEN random() < 0.8 THEN 0 ELSE (random() * 30)::int + 1 END + k * 0 AS retard
+                ) r
+            """, VOLUME_PER_USER)
+            cur.execute("""
+                INSERT INTO historique_scores (utilisateur_id, score_credit, score_850, niveau_risque,
+                                               evenement_declencheur, date_calcul)
+                SELECT u.id, s.score, 300 + (s.score * 55)::int, 'moyen', 'verif_volume',
+                       NOW() - k * INTERVAL '1 day'
+                FROM verif_utilisateurs u
+                CROSS JOIN generate_series(1, %(scores)s) AS k
+                CROSS JOIN LATERAL (SELECT round((3 + random() * 7)::numeric, 1) + k * 0 AS score) s
+            """, VOLUME_PER_USER)
+            cur.execute("""
+                INSERT INTO notifications (utilisateur_id, type, titre, message, lu, date_creation)
+                SELECT u.id, 'score_update', 'Score mis a jour', 'Notification synthetique',
+                       k %% 3 <> 0, NOW() - k * INTERVAL '1 hour'
+                FROM verif_utilisateurs u
+                CROSS JOIN generate_series(1, %(notifications)s) AS k
+            """, VOLUME_PER_USER)
+
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            for table in HOT_TABLES:
+                cur.execute(f"ANALYZE {table}")
+
+    logger.info(f"{n_users} utilisateurs synthetiques ajoutes ({VOLUME_PER_USER})")
+    return n_users
+
+
+def _print_report(report: Dict):
+    print(f"Utilisateur echantillon: {report['sample_user_id']}  lignes: {report['table_rows']}")
+    for name, result in report['queries'].items():
+        status = 'SEQ SCAN ' + ', '.join(result['seq_scans']) if result['seq_scans'] else 'ok'
+        print(f"  {name:28s} {status:30s} {' > '.join(result['plan'])}")
+    print('OK' if report['ok'] else 'ECHEC: parcours sequentiel sur une requete chaude')
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--generate', type=int, default=0, metavar='N',
+                        help='ajouter N utilisateurs synthetiques (base de test)')
+    parser.add_argument('--migrate', action='store_true', help='appliquer les migrations en attente')
+    args = parser.parse_args()
+
+    from migrations import MigrationRunner, _cli_pool
+
+    pool = _cli_pool()
+    try:
+        if args.migrate:
+            MigrationRunner(pool.connection).migrate()
+        if args.generate:
+            generate_volume(pool.connection, args.generate)
+        report = QueryPlanVerifier(pool.connection).verify()
+        _print_report(report)
+    finally:
+        pool.close()
+
+    sys.exit(0 if report['ok'] else 1)
@@ -0,0 +1,118 @@
+"""
+Analytics du portefeuille maintenues au fil des mises a jour de score
+
+Les scores temps reel sont arrondis au dixieme : un histogramme de 101
+cases (0.0 a 10.0) suffit a representer exactement la distribution.
+Moyenne, repartitions, percentiles et decoupages arbitraires se calculent
+sur l'histogramme en O(cases), independamment du nombre d'utilisateurs.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+N_BINS = 101  # scores 0.0, 0.1, ..., 10.0
+
+# Meme decoupage que l'ancien get_scoring_analytics (bornes basses incluses)
+SCORE_DISTRIBUTION = [
+    ('excellent', 9.0, None),
+    ('tres_bon', 7.0, 9.0),
+    ('bon', 6.0, 7.0),
+    ('moyen', 5.0, 6.0),
+    ('a_ameliorer', None, 5.0)
+]
+
+
+def _bin(score: float) -> int:
+    return min(N_BINS - 1, max(0, int(round(float(score) * 10))))
+
+
+class PortfolioAnalytics:
+    """Histogramme des scores, repartition des risques et nombre d'utilisateurs"""
+
+    def __init__(self):
+        self.histogram = np.zeros(N_BINS, dtype=np.int64)
+        self.risk_counts: Dict[str, int] = {}
+        self.total_users = 0
+        self._score_tenths = 0  # somme exacte des scores, en dixiemes
+
+    def _add(self, score_data: Dict, sign: int):
+        b = _bin(score_data['score'])
+        self.histogram[b] += sign
+        self._score_tenths += sign * b
+        risk = score_data.get('risk_level', 'moyen')
+        self.risk_counts[risk] = self.risk_counts.get(risk, 0) + sign
+        if not self.risk_counts[risk]:
+            del self.risk_counts[risk]
+        self.total_users += sign
+
+    def update(self, old_data: Optional[Dict], new_data: Dict):
+        """A appeler a chaque remplacement du score d'un utilisateur"""
+        if old_data is not None:
+            self._add(old_data, -1)
+        self._add(new_data, +1)
+
+    def rebuild(self, scores: Iterable[Tuple[object, Dict]]):
+        """Reconstruit depuis l'etat complet (demarrage a chaud)"""
+        self.__init__()
+        for _, data in scores:
+            self._add(data, +1)
+
+    # ==========================================
+    # LECTURES
+    # ==========================================
+
+    @property
+    def average_score(self) -> float:
+        return self._score_tenths / 10 / self.total_users if self.total_users else 0.0
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        """Vue colonnaire : valeurs de score et effectifs correspondants"""
+        return {
+            'score': np.arange(N_BINS) / 10,
+            'count': self.histogram.copy()
+        }
+
+    def bucket_counts(self, edges: Sequence[float]) -> List[int]:
+        """Effectifs des intervalles [edges[i], edges[i+1]["""
+        cumulative = np.concatenate(([0], np.cumsum(self.histogram)))
+        # Premier dixieme >= borne (les scores sont des multiples de 0.1)
+        positions = [min(N_BINS, max(0, int(np.ceil(round(e * 10, 9))))) for e in edges]
+        return [int(cumulative[hi] - cumulative[lo]) for lo, hi in zip(positions, positions[1:])]
+
+    def score_distribution(self) -> Dict[str, int]:
+        distribution = {}
+        for name, low, high in SCORE_DISTRIBUTION:
+            low = 0.0 if low is None else low
+            high = 10.1 if high is None else high
+            distribution[name] = self.bucket_counts([low, high])[0]
+        return distribution
+
+    def percentiles(self, qs: Sequence[float] = (10, 25, 50, 75, 90)) -> Dict[str, float]:
+        """Percentiles (interpolation lineaire, comme np.percentile sur tous les scores)"""
+        n = self.total_users
+        if not n:
+            return {}
+        cumulative = np.cumsum(self.histogram)
+        result = {}
+        for q in qs:
+            position = q / 100 * (n - 1)
+            lower, upper = int(np.floor(position)), int(np.ceil(position))
+            # Valeur de rang k : premiere case dont l'effectif cumule depasse k
+            low_value = np.searchsorted(cumulative, lower, side='right') / 10
+            high_value = np.searchsorted(cumulative, upper, side='right') / 10
+            result[f'p{q:g}'] = float(low_value + (high_value - low_value) * (position - lower))
+        return result
+
+    def summary(self, total_transactions: int) -> Dict:
+        if not self.total_users:
+            return {'message': 'Aucune donnée disponible'}
+        return {
+            'total_users': self.total_users,
+            'average_score': round(self.average_score, 1),
+            'score_distribution': self.score_distribution(),
+            'score_percentiles': self.percentiles(),
+            'risk_distribution': dict(self.risk_counts),
+            'total_transactions': total_transactions,
+            'last_updated': datetime.now().isoformat()
+        }
@@ -1,12 +1,16 @@
 # realtime_scoring_service.py
 import logging
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-import json
-import asyncio
 from dataclasses import dataclass
 from enum import Enum
 
+from realtime_analytics import PortfolioAnalytics
+from realtime_state import InMemoryStateStore
+from rolling_features import RollingFeatures
+from scoring_logging import log_event
+
 logger = logging.getLogger(__name__)
 
 class TransactionType(Enum):
@@ -29,13 +33,48 @@ class Transaction:
     loan_id: Optional[str] = None
     metadata: Optional[Dict] = None
 
+    def to_dict(self) -> Dict:
+        return {
+            'user_id': self.user_id,
+            'transaction_type': self.transaction_type.value,
+            'amount': self.amount,
+            'scheduled_date': self.scheduled_date,
+            'actual_date': self.actual_date,
+            'loan_id': self.loan_id,
+            'metadata': self.metadata
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Transaction':
+        return cls(
+            user_id=data['user_id'],
+            transaction_type=TransactionType(data['transaction_type']),
+            amount=data['amount'],
+            scheduled_date=data['scheduled_date'],
+            actual_date=data['actual_date'],
+            loan_id=data.get('loan_id'),
+            metadata=data.get('metadata')
+        )
+
 class RealtimeScoringService:
-    def __init__(self, scoring_model):
+    def __init__(self, scoring_model, state_store=None, log_sample_every: int = 100,
+                 max_rolling_users: int = 50000, rolling_window_days: int = 90):
+        if max_rolling_users < 1:
+            raise ValueError(f"max_rolling_users invalide: {max_rolling_users}")
         self.scoring_model = scoring_model
-        self.transaction_history = {}  # user_id -> list of transactions
-        self.current_scores = {}  # user_id -> current score data
+        # Un evenement 'transaction_processed' journalise sur N
+        self.log_sample_every = log_sample_every
+        # Transactions recentes, scores courants et historique (borne par utilisateur)
+        self.state = state_store or InMemoryStateStore()
         self.score_cache = {}  # Pour éviter les recalculs inutiles
-        self.score_history = {}  # Historique des scores
+        # Accumulateurs glissants par utilisateur (ponctualite, montants, prets),
+        # du moins au plus recemment utilise : (accumulateurs, dernier acces).
+        # Bornes en nombre (LRU) et evinces apres une inactivite plus longue que
+        # la fenetre; reconstruits depuis self.state au besoin.
+        self.rolling_features = OrderedDict()
+        self.max_rolling_users = max_rolling_users
+        self.rolling_window_days = rolling_window_days
+        self.rolling_idle_after = timedelta(days=rolling_window_days + 1)
         
         # Configuration des impacts par type de transaction
         self.transaction_impacts = {
@@ -49,33 +88,34 @@ class RealtimeScoringService:
             TransactionType.EMPLOYMENT_CHANGE: self._handle_employment_change
         }
         
-        logger.info("🚀 Service de scoring en temps réel initialisé")
+        # Demarrage a chaud depuis le stockage persistant
+        restored = self.state.load()
+        
+        # Histogramme des scores et repartition des risques, tenus a jour a chaque score
+        self.analytics = PortfolioAnalytics()
+        self.analytics.rebuild(self.state.iter_scores())
+        
+        logger.info(f"🚀 Service de scoring en temps réel initialisé ({restored} scores restaurés)")
 
     async def process_transaction(self, transaction: Transaction) -> Dict:
         """Traite une transaction et met à jour le score en temps réel"""
         try:
             user_id = transaction.user_id
             
-            logger.info(f"=== TRAITEMENT TRANSACTION TEMPS RÉEL ===")
-            logger.info(f"👤 Utilisateur: {user_id}")
-            logger.info(f"💳 Type: {transaction.transaction_type.value}")
-            logger.info(f"💰 Montant: {transaction.amount:,} FCFA")
-            logger.info(f"📅 Date: {transaction.actual_date}")
-            
             # Enregistrer la transaction
-            if user_id not in self.transaction_history:
-                self.transaction_history[user_id] = []
-            self.transaction_history[user_id].append(transaction)
+            self.state.append_transaction(transaction)
+            self._update_rolling_features(transaction)
             
             # Récupérer le score actuel
-            current_score_data = self.current_scores.get(user_id, {
+            stored_score_data = self.state.get_score(user_id)
+            current_score_data = stored_score_data or {
                 'score': 6.0,
                 'score_850': 650,
                 'risk_level': 'moyen',
                 'last_update': datetime.now(),
                 'payment_history': [],
                 'behavioral_factors': {}
-            })
+            }
             
             # Traiter l'impact de la transaction
             impact_result = await self._calculate_transaction_impact(
@@ -88,13 +128,11 @@ class RealtimeScoringService:
             )
             
             # Sauvegarder le nouveau score
-            self.current_scores[user_id] = new_score_data
+            self.state.set_score(user_id, new_score_data)
+            self.analytics.update(stored_score_data, new_score_data)
             
             # Historique des scores
-            if user_id not in self.score_history:
-                self.score_history[user_id] = []
-            
-            self.score_history[user_id].append({
+            self.state.append_score_history(user_id, {
                 'score': new_score_data['score'],
                 'score_850': new_score_data['score_850'],
                 'date': datetime.now(),
@@ -107,8 +145,17 @@ class RealtimeScoringService:
             if abs(score_change) >= 0.5:
                 await self._notify_significant_score_change(user_id, score_change, transaction)
             
-            logger.info(f"✅ Score mis à jour: {current_score_data.get('score', 6.0):.1f} → {new_score_data['score']:.1f}")
-            logger.info(f"📊 Changement: {score_change:+.1f} points")
+            log_event(
+                logger, logging.INFO, 'transaction_processed',
+                sample_every=self.log_sample_every,
+                user_id=user_id,
+                type=transaction.transaction_type.value,
+                amount=transaction.amount,
+                actual_date=transaction.actual_date,
+                score_before=current_score_data.get('score', 6.0),
+                score_after=new_score_data['score'],
+                change=score_change
+            )
             
             return {
                 'success': True,
@@ -124,7 +171,7 @@ class RealtimeScoringService:
             }
             
         except Exception as e:
-            logger.error(f"❌ Erreur traitement transaction: {str(e)}")
+            logger.error("Erreur traitement transaction pour %s: %s", transaction.user_id, e)
             return {
                 'success': False,
                 'error': str(e),
@@ -187,9 +234,7 @@ class RealtimeScoringService:
         score_delta = -1.0
         
         # Aggravation si paiements manqués récurrents
-        missed_count = len([t for t in self.transaction_history.get(transaction.user_id, [])
-                           if t.transaction_type == TransactionType.MISSED_PAYMENT and
-                           (datetime.now() - t.actual_date).days <= 90])
+        missed_count = self._get_rolling_features(transaction.user_id).missed_count()
         
         if missed_count > 1:
             score_delta -= 0.5 * (missed_count - 1)  # Pénalité cumulative
@@ -303,30 +348,9 @@ class RealtimeScoringService:
         # Mise à jour des facteurs comportementaux
         behavioral_factors = current_score_data.get('behavioral_factors', {})
         
-        # Analyser l'historique récent
-        recent_transactions = [t for t in self.transaction_history.get(user_id, [])
-                              if (datetime.now() - t.actual_date).days <= 90]
-        
-        # Calculer la ponctualité
-        payment_transactions = [t for t in recent_transactions 
-                               if t.transaction_type in [TransactionType.PAYMENT, 
-                                                        TransactionType.LATE_PAYMENT, 
-                                                        TransactionType.MISSED_PAYMENT]]
-        
-        if payment_transactions:
-            on_time_payments = len([t for t in payment_transactions 
-                                   if t.transaction_type == TransactionType.PAYMENT])
-            punctuality_score = (on_time_payments / len(payment_transactions)) * 100
-        else:
-            punctuality_score = 75  # Score par défaut
-        
-        behavioral_factors.update({
-            'punctuality_score': punctuality_score,
-            'recent_transactions_count': len(recent_transactions),
-            'last_transaction_type': impact_result.get('factors', [''])[0],
-            'payment_consistency': self._calculate_payment_consistency(user_id),
-            'debt_trend': self._calculate_debt_trend(user_id)
-        })
+        # Ponctualite et activite sur 90 jours, coherence et tendance d'endettement
+        behavioral_factors.update(self._get_rolling_features(user_id).snapshot())
+        behavioral_factors['last_transaction_type'] = impact_result.get('factors', [''])[0]
         
         # Déterminer le niveau de risque
         risk_level = self._get_risk_level_from_score(new_score_850)
@@ -347,38 +371,44 @@ class RealtimeScoringService:
             'monthly_income': current_score_data.get('monthly_income', 500000)
         }
 
+    def _update_rolling_features(self, transaction: Transaction):
+        """Met à jour les accumulateurs de l'utilisateur avec la transaction enregistrée"""
+        if transaction.user_id in self.rolling_features:
+            self._get_rolling_features(transaction.user_id).add(transaction)
+        else:
+            # Premier événement depuis le démarrage ou l'éviction : reconstruire depuis l'état (transaction incluse)
+            self._get_rolling_features(transaction.user_id)
+
+    def _get_rolling_features(self, user_id: str) -> RollingFeatures:
+        now = datetime.now()
+        entry = self.rolling_features.get(user_id)
+        if entry is None:
+            features = RollingFeatures.from_transactions(
+                self.state.get_transactions(user_id), now, window_days=self.rolling_window_days
+            )
+        else:
+            features = entry[0]
+            self.rolling_features.move_to_end(user_id)
+        self.rolling_features[user_id] = (features, now)
+        self._evict_rolling_features(now)
+        return features
+
+    def _evict_rolling_features(self, now: datetime):
+        """Évince les moins récemment utilisés au-delà de la borne ou inactifs depuis la fenêtre"""
+        idle_cutoff = now - self.rolling_idle_after
+        while self.rolling_features:
+            user_id, (_, last_access) = next(iter(self.rolling_features.items()))
+            if len(self.rolling_features) <= self.max_rolling_users and last_access > idle_cutoff:
+                break
+            del self.rolling_features[user_id]
+
     def _calculate_payment_consistency(self, user_id: str) -> float:
-        """Calcule la cohérence des paiements"""
-        transactions = self.transaction_history.get(user_id, [])
-        payment_transactions = [t for t in transactions[-12:]  # 12 dernières transactions
-                               if t.transaction_type in [TransactionType.PAYMENT, 
-                                                        TransactionType.LATE_PAYMENT]]
-        
-        if len(payment_transactions) < 2:
-            return 75.0
-        
-        # Analyser la régularité des montants et dates
-        amounts = [t.amount for t in payment_transactions]
-        avg_amount = sum(amounts) / len(amounts)
-        amount_variance = sum((a - avg_amount) ** 2 for a in amounts) / len(amounts)
-        amount_consistency = max(0, 100 - (amount_variance / avg_amount * 100))
-        
-        return min(100, amount_consistency)
+        """Calcule la cohérence des paiements (12 dernières transactions)"""
+        return self._get_rolling_features(user_id).payment_consistency()
 
     def _calculate_debt_trend(self, user_id: str) -> str:
-        """Calcule la tendance d'endettement"""
-        transactions = self.transaction_history.get(user_id, [])
-        recent_loans = [t for t in transactions[-6:]  # 6 derniers mois
-                       if t.transaction_type == TransactionType.NEW_LOAN]
-        recent_closures = [t for t in transactions[-6:]
-                          if t.transaction_type == TransactionType.LOAN_CLOSURE]
-        
-        if len(recent_loans) > len(recent_closures):
-            return 'increasing'
-        elif len(recent_closures) > len(recent_loans):
-            return 'decreasing'
-        else:
-            return 'stable'
+        """Calcule la tendance d'endettement (6 dernières transactions)"""
+        return self._get_rolling_features(user_id).debt_trend()
 
     def _get_risk_level_from_score(self, score_850: int) -> str:
         """Détermine le niveau de risque"""
@@ -409,74 +439,61 @@ class RealtimeScoringService:
 
     async def _notify_significant_score_change(self, user_id: str, score_change: float, transaction: Transaction):
         """Notifie les changements significatifs de score"""
-        logger.info(f"🔔 CHANGEMENT SIGNIFICATIF DE SCORE")
-        logger.info(f"👤 Utilisateur: {user_id}")
-        logger.info(f"📊 Changement: {score_change:+.1f} points")
-        logger.info(f"🎯 Déclencheur: {transaction.transaction_type.value}")
+        log_event(
+            logger, logging.INFO, 'significant_score_change',
+            user_id=user_id,
+            change=score_change,
+            trigger=transaction.transaction_type.value
+        )
         
         # Ici vous pouvez ajouter des notifications push, emails, etc.
 
     def get_user_score_history(self, user_id: str, days: int = 30) -> List[Dict]:
         """Récupère l'historique des scores d'un utilisateur"""
-        history = self.score_history.get(user_id, [])
         cutoff_date = datetime.now() - timedelta(days=days)
         
-        return [entry for entry in history if entry['date'] >= cutoff_date]
+        return self.state.get_score_history(user_id, cutoff_date)
+
+    def purge_expired_state(self) -> int:
+        """Applique la retention de l'historique des scores"""
+        return self.state.purge_expired()
+    
+    def get_state_memory_stats(self) -> Dict:
+        """Occupation memoire de l'etat temps reel"""
+        stats = self.state.memory_stats()
+        stats['rolling_features_users'] = len(self.rolling_features)
+        stats['max_rolling_users'] = self.max_rolling_users
+        return stats
 
     def get_current_score(self, user_id: str) -> Optional[Dict]:
         """Récupère le score actuel d'un utilisateur"""
-        return self.current_scores.get(user_id)
+        return self.state.get_score(user_id)
 
-    async def bulk_recalculate_scores(self, user_ids: List[str] = None):
-        """Recalcule les scores pour plusieurs utilisateurs"""
+    async def bulk_recalculate_scores(self, user_ids: List[str] = None, num_workers: int = 4) -> Dict:
+        """Recalcule les scores pour plusieurs utilisateurs, en parallèle par shard d'utilisateurs"""
+        from transaction_ingestion import TransactionIngestionEngine
+        
         if user_ids is None:
-            user_ids = list(self.current_scores.keys())
+            user_ids = self.state.user_ids()
         
         logger.info(f"🔄 Recalcul en masse pour {len(user_ids)} utilisateurs")
         
-        for user_id in user_ids:
-            try:
+        async with TransactionIngestionEngine(self, num_workers=num_workers) as engine:
+            for user_id in user_ids:
                 # Simuler une transaction de mise à jour
                 update_transaction = Transaction(
                     user_id=user_id,
                     transaction_type=TransactionType.INCOME_UPDATE,
-                    amount=self.current_scores.get(user_id, {}).get('monthly_income', 500000),
+                    amount=(self.state.get_score(user_id) or {}).get('monthly_income', 500000),
                     scheduled_date=datetime.now(),
                     actual_date=datetime.now(),
                     metadata={'bulk_update': True}
                 )
-                
-                await self.process_transaction(update_transaction)
-                
-            except Exception as e:
-                logger.error(f"❌ Erreur recalcul pour {user_id}: {str(e)}")
+                await engine.submit(update_transaction)
+            await engine.drain()
+        
+        return engine.get_metrics()
 
     def get_scoring_analytics(self) -> Dict:
-        """Retourne des analytics sur le scoring"""
-        total_users = len(self.current_scores)
-        
-        if total_users == 0:
-            return {'message': 'Aucune donnée disponible'}
-        
-        scores = [data['score'] for data in self.current_scores.values()]
-        avg_score = sum(scores) / len(scores)
-        
-        risk_distribution = {}
-        for data in self.current_scores.values():
-            risk_level = data.get('risk_level', 'moyen')
-            risk_distribution[risk_level] = risk_distribution.get(risk_level, 0) + 1
-        
-        return {
-            'total_users': total_users,
-            'average_score': round(avg_score, 1),
-            'score_distribution': {
-                'excellent': len([s for s in scores if s >= 9]),
-                'tres_bon': len([s for s in scores if 7 <= s < 9]),
-                'bon': len([s for s in scores if 6 <= s < 7]),
-                'moyen': len([s for s in scores if 5 <= s < 6]),
-                'a_ameliorer': len([s for s in scores if s < 5])
-            },
-            'risk_distribution': risk_distribution,
-            'total_transactions': sum(len(hist) for hist in self.transaction_history.values()),
-            'last_updated': datetime.now().isoformat()
-        }
\ No newline at end of file
+        """Retourne des analytics sur le scoring (compteurs incrémentaux, O(cases))"""
+        return self.analytics.summary(self.state.total_transactions())
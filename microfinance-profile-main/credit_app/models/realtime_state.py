@@ -0,0 +1,528 @@
+"""
+Stockage de l'etat du scoring temps reel
+
+- InMemoryStateStore : tampons circulaires par utilisateur et historique
+  des scores partitionne par jour, purge par retention
+- SQLStateStore : meme structure en memoire, ecrite en base (SQLite ou
+  PostgreSQL) par un thread d'ecriture et rechargee au demarrage
+"""
+import logging
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from score_cache import dumps_score, loads_score
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def _deep_sizeof(obj, seen=None) -> int:
+    """Taille approximative d'un objet et de son contenu"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, deque)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += _deep_sizeof(vars(obj), seen)
+    return size
+
+
+class InMemoryStateStore:
+    """
+    Etat borne par utilisateur :
+    - les `max_transactions_per_user` dernieres transactions (deque)
+    - le score courant
+    - l'historique des scores par partition journaliere, au plus
+      `max_history_per_day` entrees par utilisateur et par jour,
+      partitions supprimees au-dela de `retention_days`
+    """
+
+    def __init__(self, max_transactions_per_user: int = 100, retention_days: int = 90,
+                 max_history_per_day: int = 50):
+        if max_transactions_per_user < 1 or retention_days < 1:
+            raise ValueError("max_transactions_per_user et retention_days doivent etre >= 1")
+        self.max_transactions_per_user = max_transactions_per_user
+        self.retention_days = retention_days
+        self.max_history_per_day = max_history_per_day
+
+        self._transactions = {}                 # user_id -> deque(Transaction)
+        self._scores = {}                       # user_id -> score_data
+        self._history = OrderedDict()           # date -> {user_id: [entries]}
+        self._total_transactions = 0
+        self._lock = threading.RLock()
+
+    # ==========================================
+    # TRANSACTIONS
+    # ==========================================
+
+    def append_transaction(self, transaction):
+        with self._lock:
+            buffer = self._transactions.get(transaction.user_id)
+            if buffer is None:
+                buffer = deque(maxlen=self.max_transactions_per_user)
+                self._transactions[transaction.user_id] = buffer
+            buffer.append(transaction)
+            self._total_transactions += 1
+
+    def get_transactions(self, user_id) -> List:
+        """Transactions recentes, de la plus ancienne a la plus recente"""
+        with self._lock:
+            return list(self._transactions.get(user_id, ()))
+
+    def total_transactions(self) -> int:
+        """Nombre de transactions recues (y compris celles sorties des tampons)"""
+        return self._total_transactions
+
+    # ==========================================
+    # SCORES
+    # ==========================================
+
+    def get_score(self, user_id) -> Optional[Dict]:
+        return self._scores.get(user_id)
+
+    def set_score(self, user_id, score_data: Dict):
+        with self._lock:
+            self._scores[user_id] = score_data
+
+    def iter_scores(self) -> Iterator[Tuple[str, Dict]]:
+        with self._lock:
+            return iter(list(self._scores.items()))
+
+    def user_ids(self) -> List:
+        with self._lock:
+            return list(self._scores.keys())
+
+    def user_count(self) -> int:
+        return len(self._scores)
+
+    # ==========================================
+    # HISTORIQUE DES SCORES
+    # ==========================================
+
+    def append_score_history(self, user_id, entry: Dict):
+        day = entry['date'].date()
+        with self._lock:
+            partition = self._history.get(day)
+            if partition is None:
+                partition = {}
+                self._history[day] = partition
+                if len(self._history) > 1 and day < next(reversed(self._history)):
+                    # Partition hors ordre (rechargement) : retrier
+                    self._history = OrderedDict(sorted(self._history.items()))
+            entries = partition.setdefault(user_id, [])
+            entries.append(entry)
+            if len(entries) > self.max_history_per_day:
+                del entries[0]
+
+    def get_score_history(self, user_id, since: datetime) -> List[Dict]:
+        since_day = since.date()
+        result = []
+        with self._lock:
+            for day, partition in self._history.items():
+                if day < since_day:
+                    continue
+                result.extend(e for e in partition.get(user_id, ()) if e['date'] >= since)
+        return result
+
+    def purge_expired(self, now: Optional[datetime] = None) -> int:
+        """
+        Supprime les partitions d'historique et les transactions (date
+        effective) hors retention; retourne le nombre d'entrees supprimees
+        """
+        cutoff = (now or datetime.now()) - timedelta(days=self.retention_days)
+        cutoff_day = cutoff.date()
+        removed = 0
+        with self._lock:
+            while self._history:
+                day = next(iter(self._history))
+                if day >= cutoff_day:
+                    break
+                partition = self._history.pop(day)
+                removed += sum(len(entries) for entries in partition.values())
+            for user_id, buffer in list(self._transactions.items()):
+                kept = [t for t in buffer if t.actual_date >= cutoff]
+                if len(kept) == len(buffer):
+                    continue
+                removed += len(buffer) - len(kept)
+                if kept:
+                    self._transactions[user_id] = deque(kept, maxlen=self.max_transactions_per_user)
+                else:
+                    del self._transactions[user_id]
+        return removed
+
+    # ==========================================
+    # CYCLE DE VIE / MESURES
+    # ==========================================
+
+    def load(self) -> int:
+        """Demarrage a chaud (rien a recharger en memoire)"""
+        return 0
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def memory_stats(self) -> Dict:
+        """Occupation memoire mesuree (parcours complet, a appeler hors chemin critique)"""
+        with self._lock:
+            transactions_bytes = _deep_sizeof(self._transactions)
+            scores_bytes = _deep_sizeof(self._scores)
+            history_bytes = _deep_sizeof(self._history)
+            buffered = sum(len(buffer) for buffer in self._transactions.values())
+            history_entries = sum(len(entries) for partition in self._history.values()
+                                  for entries in partition.values())
+            users = len(set(self._transactions) | set(self._scores))
+        total = transactions_bytes + scores_bytes + history_bytes
+        return {
+            'users': users,
+            'buffered_transactions': buffered,
+            'history_entries': history_entries,
+            'history_partitions': len(self._history),
+            'transactions_bytes': transactions_bytes,
+            'scores_bytes': scores_bytes,
+            'history_bytes': history_bytes,
+            'total_bytes': total,
+            'bytes_per_user': round(total / users) if users else 0,
+            'max_transactions_per_user': self.max_transactions_per_user,
+            'retention_days': self.retention_days
+        }
+
+
+class SQLStateStore(InMemoryStateStore):
+    """
+    Etat en memoire ecrit en base a chaque modification et recharge par load().
+    `connect` retourne une connexion DB-API (sqlite3 ou psycopg2).
+
+    Ecriture differee : les modifications sont deposees dans une file bornee
+    et ecrites par un thread dedie, par lots d'au plus `commit_every`
+    ecritures (une transaction par lot). Les appelants, dont la boucle
+    asyncio du service temps reel, ne font jamais d'E/S base. Si la file
+    reste pleine `enqueue_timeout` secondes, l'ecriture est abandonnee
+    (comptee dans 'dropped'); l'etat en memoire reste a jour.
+
+    Les tampons de transactions sont bornes en base comme en memoire : apres
+    chaque lot, seules les `max_transactions_per_user` dernieres lignes des
+    utilisateurs concernes sont conservees dans rt_transactions.
+    """
+
+    DIALECTS = {
+        'sqlite': {'param': '?', 'id': 'INTEGER PRIMARY KEY AUTOINCREMENT',
+                   'ts': 'TIMESTAMP', 'day': 'DATE', 'json': 'TEXT'},
+        'postgresql': {'param': '%s', 'id': 'BIGSERIAL PRIMARY KEY',
+                       'ts': 'TIMESTAMP', 'day': 'DATE', 'json': 'TEXT'}
+    }
+
+    DDL = [
+        """
+        CREATE TABLE IF NOT EXISTS rt_transactions (
+            id {id},
+            user_id TEXT NOT NULL,
+            actual_date {ts} NOT NULL,
+            payload {json} NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_rt_transactions_user ON rt_transactions (user_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_rt_transactions_date ON rt_transactions (actual_date)",
+        """
+        CREATE TABLE IF NOT EXISTS rt_scores (
+            user_id TEXT PRIMARY KEY,
+            updated_at {ts} NOT NULL,
+            payload {json} NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS rt_score_history (
+            id {id},
+            user_id TEXT NOT NULL,
+            partition_day {day} NOT NULL,
+            date {ts} NOT NULL,
+            payload {json} NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_rt_score_history_day ON rt_score_history (partition_day)",
+        "CREATE INDEX IF NOT EXISTS idx_rt_score_history_user ON rt_score_history (user_id, date)",
+        # Compteurs cumules (les transactions sorties des tampons ne sont plus en base)
+        """
+        CREATE TABLE IF NOT EXISTS rt_counters (
+            name TEXT PRIMARY KEY,
+            value BIGINT NOT NULL
+        )
+        """
+    ]
+
+    TRIM_TRANSACTIONS_SQL = """
+        DELETE FROM rt_transactions
+        WHERE user_id = %s AND id <= (
+            SELECT id FROM rt_transactions WHERE user_id = %s
+            ORDER BY id DESC LIMIT 1 OFFSET %s
+        )
+    """
+
+    COUNT_TRANSACTIONS_SQL = """
+        INSERT INTO rt_counters (name, value) VALUES ('transactions', %s)
+        ON CONFLICT (name) DO UPDATE SET value = rt_counters.value + EXCLUDED.value
+    """
+
+    def __init__(self, connect: Callable, dialect: str = 'sqlite', commit_every: int = 100,
+                 max_queue_size: int = 100000, flush_interval: float = 0.5,
+                 enqueue_timeout: float = 0.05, **kwargs):
+        if dialect not in self.DIALECTS:
+            raise ValueError(f"Dialecte inconnu: {dialect}")
+        if commit_every < 1 or max_queue_size < 1:
+            raise ValueError(f"Tailles invalides: commit_every={commit_every}, queue={max_queue_size}")
+        super().__init__(**kwargs)
+        self.dialect = dialect
+        self.commit_every = commit_every
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._types = self.DIALECTS[dialect]
+        self._conn = connect()
+        # Acces a la connexion (ecrivain, load); self._lock protege la memoire
+        self._db_lock = threading.Lock()
+        self._create_schema()
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self._write_stats = {'written': 0, 'batches': 0, 'dropped': 0, 'failed': 0}
+        self._writer = threading.Thread(target=self._run, name='realtime-state-writer', daemon=True)
+        self._writer.start()
+
+    @classmethod
+    def sqlite(cls, path: str, **kwargs) -> 'SQLStateStore':
+        return cls(lambda: sqlite3.connect(path, check_same_thread=False), dialect='sqlite', **kwargs)
+
+    @classmethod
+    def postgresql(cls, db_config: Dict, **kwargs) -> 'SQLStateStore':
+        import psycopg2
+        return cls(lambda: psycopg2.connect(**db_config), dialect='postgresql', **kwargs)
+
+    def _sql(self, query: str) -> str:
+        return query.replace('%s', self._types['param'])
+
+    def _create_schema(self):
+        cur = self._conn.cursor()
+        for statement in self.DDL:
+            cur.execute(statement.format(**self._types))
+        cur.close()
+        self._conn.commit()
+
+    def _count(self, name: str, n: int = 1):
+        with self._stats_lock:
+            self._write_stats[name] += n
+
+    def _write(self, query: str, params: tuple, transaction_user: Optional[str] = None):
+        """Depose une ecriture pour le thread d'ecriture (sans E/S)"""
+        if self._closed:
+            self._count('dropped')
+            return
+        try:
+            self._queue.put((query, params, transaction_user), timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._count('dropped')
+            logger.warning("File d'ecriture de l'etat temps reel pleine, ecriture abandonnee")
+
+    # ==========================================
+    # ECRIVAIN
+    # ==========================================
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                # Arret demande sans _STOP (file pleine) : file videe, on sort
+                if self._closed:
+                    break
+                continue
+            batch = []
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    self._queue.task_done()
+                else:
+                    batch.append(item)
+                if len(batch) >= self.commit_every:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write_batch(batch)
+                for _ in batch:
+                    self._queue.task_done()
+        # L'ecrivain ferme la connexion : aucune ecriture apres fermeture,
+        # meme si close() a rendu la main avant la fin du vidage
+        with self._db_lock:
+            self._conn.close()
+
+    def _write_batch(self, batch):
+        """Un lot = une transaction : ecritures, retention par utilisateur, compteur"""
+        users = []
+        with self._db_lock:
+            cur = self._conn.cursor()
+            try:
+                for query, params, transaction_user in batch:
+                    cur.execute(self._sql(query), params)
+                    if transaction_user is not None:
+                        users.append(transaction_user)
+                for user_key in dict.fromkeys(users):
+                    cur.execute(self._sql(self.TRIM_TRANSACTIONS_SQL),
+                                (user_key, user_key, self.max_transactions_per_user))
+                if users:
+                    cur.execute(self._sql(self.COUNT_TRANSACTIONS_SQL), (len(users),))
+                self._conn.commit()
+                self._count('written', len(batch))
+                self._count('batches')
+            except Exception as e:
+                self._conn.rollback()
+                self._count('failed', len(batch))
+                logger.error(f"Ecriture de {len(batch)} modifications de l'etat temps reel abandonnee: {e}")
+            finally:
+                cur.close()
+
+    @staticmethod
+    def _key(user_id) -> str:
+        # JSON : un user_id entier reste entier au rechargement
+        return dumps_score(user_id)
+
+    # ==========================================
+    # ECRITURES
+    # ==========================================
+
+    def append_transaction(self, transaction):
+        super().append_transaction(transaction)
+        user_key = self._key(transaction.user_id)
+        self._write(
+            "INSERT INTO rt_transactions (user_id, actual_date, payload) VALUES (%s, %s, %s)",
+            (user_key, transaction.actual_date.isoformat(), dumps_score(transaction.to_dict())),
+            transaction_user=user_key
+        )
+
+    def set_score(self, user_id, score_data: Dict):
+        super().set_score(user_id, score_data)
+        self._write(
+            """
+            INSERT INTO rt_scores (user_id, updated_at, payload) VALUES (%s, %s, %s)
+            ON CONFLICT (user_id) DO UPDATE SET updated_at = EXCLUDED.updated_at, payload = EXCLUDED.payload
+            """,
+            (self._key(user_id), datetime.now().isoformat(), dumps_score(score_data))
+        )
+
+    def append_score_history(self, user_id, entry: Dict):
+        super().append_score_history(user_id, entry)
+        self._write(
+            "INSERT INTO rt_score_history (user_id, partition_day, date, payload) VALUES (%s, %s, %s, %s)",
+            (self._key(user_id), entry['date'].date().isoformat(), entry['date'].isoformat(),
+             dumps_score(entry))
+        )
+
+    def purge_expired(self, now: Optional[datetime] = None) -> int:
+        removed = super().purge_expired(now)
+        cutoff = (now or datetime.now()) - timedelta(days=self.retention_days)
+        self._write("DELETE FROM rt_score_history WHERE partition_day < %s", (cutoff.date().isoformat(),))
+        self._write("DELETE FROM rt_transactions WHERE actual_date < %s", (cutoff.isoformat(),))
+        return removed
+
+    # ==========================================
+    # CYCLE DE VIE
+    # ==========================================
+
+    def load(self) -> int:
+        """Demarrage a chaud : recharge scores, tampons et historique en retention"""
+        from realtime_scoring_service import Transaction
+
+        cutoff = datetime.now() - timedelta(days=self.retention_days)
+        loaded = 0
+        with self._lock, self._db_lock:
+            cur = self._conn.cursor()
+            try:
+                cur.execute("SELECT user_id, payload FROM rt_scores")
+                for user_id, payload in cur.fetchall():
+                    self._scores[loads_score(user_id)] = loads_score(payload)
+                    loaded += 1
+
+                cur.execute(self._sql("""
+                    SELECT user_id, payload FROM (
+                        SELECT user_id, payload, id,
+                               ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY id DESC) AS rang
+                        FROM rt_transactions
+                    ) t
+                    WHERE rang <= %s
+                    ORDER BY id
+                """), (self.max_transactions_per_user,))
+                for user_id, payload in cur.fetchall():
+                    InMemoryStateStore.append_transaction(self, Transaction.from_dict(loads_score(payload)))
+
+                cur.execute("SELECT value FROM rt_counters WHERE name = 'transactions'")
+                row = cur.fetchone()
+                if row is None:
+                    # Base anterieure au compteur
+                    cur.execute("SELECT COUNT(*) FROM rt_transactions")
+                    row = cur.fetchone()
+                self._total_transactions = row[0]
+
+                cur.execute(self._sql("""
+                    SELECT user_id, payload FROM rt_score_history
+                    WHERE partition_day >= %s
+                    ORDER BY date
+                """), (cutoff.date().isoformat(),))
+                for user_id, payload in cur.fetchall():
+                    InMemoryStateStore.append_score_history(self, loads_score(user_id), loads_score(payload))
+            finally:
+                cur.close()
+            self._conn.rollback()
+
+        logger.info(f"Etat temps reel recharge: {loaded} utilisateurs")
+        return loaded
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Attend que toutes les ecritures deposees soient commitees"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks > 0:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout: float = 10.0) -> bool:
+        """
+        Ecrit ce qui est en file puis ferme la connexion. Attend au plus
+        `timeout` secondes; False si l'ecrivain n'a pas fini (il ferme alors
+        la connexion lui-meme une fois la file videe).
+        """
+        self._closed = True
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            # L'ecrivain s'arrete aussi de lui-meme une fois la file videe
+            logger.warning(f"File d'ecriture de l'etat pleine a l'arret ({self._queue.qsize()} en attente)")
+        self._writer.join(max(0.0, deadline - time.monotonic()))
+        if self._writer.is_alive():
+            logger.warning(f"Ecritures de l'etat temps reel non ecrites a l'arret: {self._queue.qsize()}")
+            return False
+        return True
+
+    def memory_stats(self) -> Dict:
+        stats = super().memory_stats()
+        with self._stats_lock:
+            stats['writer'] = dict(self._write_stats, queued=self._queue.qsize())
+        return stats
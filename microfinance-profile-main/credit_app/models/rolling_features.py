@@ -0,0 +1,187 @@
+"""
+Caracteristiques comportementales glissantes, mises a jour en O(1) amorti
+a chaque transaction au lieu de reparcourir l'historique.
+
+Reproduit exactement les parcours de liste de RealtimeScoringService :
+- fenetre de 90 jours ((now - actual_date).days <= 90) : ponctualite,
+  nombre de transactions recentes, paiements manques
+- 12 dernieres transactions : moyenne/variance des montants payes (Welford)
+- 6 dernieres transactions : prets ouverts / clotures
+"""
+import heapq
+import itertools
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+PAYMENT = 'payment'
+LATE_PAYMENT = 'late_payment'
+MISSED_PAYMENT = 'missed_payment'
+NEW_LOAN = 'new_loan'
+LOAN_CLOSURE = 'loan_closure'
+
+PUNCTUALITY_TYPES = (PAYMENT, LATE_PAYMENT, MISSED_PAYMENT)
+CONSISTENCY_TYPES = (PAYMENT, LATE_PAYMENT)
+
+
+class TimeWindowCounter:
+    """
+    Compteurs par categorie sur une fenetre glissante de `days` jours.
+
+    Les evenements sont expires un par un depuis un tas ordonne par date :
+    chaque evenement entre et sort une seule fois, meme s'il arrive hors
+    ordre (paiement saisi apres coup). Le critere est celui de
+    (now - date).days <= days, a la microseconde pres.
+    """
+
+    def __init__(self, days: int = 90):
+        self.days = days
+        self._horizon = timedelta(days=days + 1)
+        self._heap = []            # (date, seq, categories)
+        self._seq = itertools.count()
+        self.counts = {}
+
+    def _expired(self, event_date: datetime, now: datetime) -> bool:
+        return now - event_date >= self._horizon
+
+    def add(self, event_date: datetime, categories, now: datetime):
+        self.expire(now)
+        if self._expired(event_date, now):
+            return
+        heapq.heappush(self._heap, (event_date, next(self._seq), categories))
+        for category in categories:
+            self.counts[category] = self.counts.get(category, 0) + 1
+
+    def expire(self, now: datetime):
+        heap = self._heap
+        while heap and self._expired(heap[0][0], now):
+            _, _, categories = heapq.heappop(heap)
+            for category in categories:
+                self.counts[category] -= 1
+
+    def count(self, category: str, now: datetime) -> int:
+        self.expire(now)
+        return self.counts.get(category, 0)
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class SlidingMoments:
+    """Moyenne et variance (population) d'une fenetre glissante, algorithme de Welford"""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x: float):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def remove(self, x: float):
+        if self.n <= 1:
+            self.n, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        self.n -= 1
+        delta = x - self.mean
+        self.mean -= delta / self.n
+        self.m2 = max(0.0, self.m2 - delta * (x - self.mean))
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.n if self.n else 0.0
+
+
+class RollingFeatures:
+    """Accumulateurs d'un utilisateur"""
+
+    def __init__(self, window_days: int = 90, consistency_size: int = 12, debt_trend_size: int = 6):
+        self.window = TimeWindowCounter(window_days)
+        self._consistency = deque(maxlen=consistency_size)   # (compte, montant)
+        self._moments = SlidingMoments()
+        self._debt = deque(maxlen=debt_trend_size)           # type de transaction
+        self._debt_counts = {NEW_LOAN: 0, LOAN_CLOSURE: 0}
+
+    @classmethod
+    def from_transactions(cls, transactions, now: Optional[datetime] = None, **kwargs) -> 'RollingFeatures':
+        features = cls(**kwargs)
+        now = now or datetime.now()
+        for transaction in transactions:
+            features.add(transaction, now)
+        return features
+
+    def add(self, transaction, now: Optional[datetime] = None):
+        now = now or datetime.now()
+        kind = transaction.transaction_type.value
+
+        # Fenetre temporelle
+        categories = ('all',)
+        if kind in PUNCTUALITY_TYPES:
+            categories += ('punctuality',)
+        if kind == PAYMENT:
+            categories += ('on_time',)
+        elif kind == MISSED_PAYMENT:
+            categories += ('missed',)
+        self.window.add(transaction.actual_date, categories, now)
+
+        # 12 dernieres transactions : moments des montants payes
+        if len(self._consistency) == self._consistency.maxlen:
+            counted, amount = self._consistency[0]
+            if counted:
+                self._moments.remove(amount)
+        counted = kind in CONSISTENCY_TYPES
+        self._consistency.append((counted, transaction.amount))
+        if counted:
+            self._moments.add(transaction.amount)
+
+        # 6 dernieres transactions : tendance d'endettement
+        if len(self._debt) == self._debt.maxlen:
+            oldest = self._debt[0]
+            if oldest in self._debt_counts:
+                self._debt_counts[oldest] -= 1
+        self._debt.append(kind)
+        if kind in self._debt_counts:
+            self._debt_counts[kind] += 1
+
+    # ==========================================
+    # LECTURES
+    # ==========================================
+
+    def recent_count(self, now: Optional[datetime] = None) -> int:
+        return self.window.count('all', now or datetime.now())
+
+    def missed_count(self, now: Optional[datetime] = None) -> int:
+        return self.window.count('missed', now or datetime.now())
+
+    def punctuality_score(self, now: Optional[datetime] = None) -> float:
+        now = now or datetime.now()
+        total = self.window.count('punctuality', now)
+        if not total:
+            return 75  # Score par defaut
+        return (self.window.count('on_time', now) / total) * 100
+
+    def payment_consistency(self) -> float:
+        if self._moments.n < 2:
+            return 75.0
+        amount_consistency = max(0, 100 - (self._moments.variance / self._moments.mean * 100))
+        return min(100, amount_consistency)
+
+    def debt_trend(self) -> str:
+        loans, closures = self._debt_counts[NEW_LOAN], self._debt_counts[LOAN_CLOSURE]
+        if loans > closures:
+            return 'increasing'
+        elif closures > loans:
+            return 'decreasing'
+        return 'stable'
+
+    def snapshot(self, now: Optional[datetime] = None) -> Dict:
+        now = now or datetime.now()
+        return {
+            'punctuality_score': self.punctuality_score(now),
+            'recent_transactions_count': self.recent_count(now),
+            'payment_consistency': self.payment_consistency(),
+            'debt_trend': self.debt_trend()
+        }
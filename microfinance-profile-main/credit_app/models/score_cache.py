@@ -0,0 +1,354 @@
+"""
+Cache des scores pour le service de scoring
+
+Deux implementations de la meme interface :
+- ScoreCache : LRU + TTL en memoire, propre a chaque processus
+- RedisScoreCache : partage entre workers gunicorn via Redis
+
+Les cles sont versionnees par le modele charge : un nouveau modele ne
+relit jamais un score calcule par l'ancien.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Hashable, Optional
+
+try:
+    import redis
+except ImportError:  # dependance optionnelle
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class ScoreCacheBackend(ABC):
+    """Interface commune des caches de scores"""
+
+    backend_name = None
+
+    def __init__(self, ttl: float = 3600.0, version: str = 'default'):
+        self.ttl = ttl
+        self.version = version
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+            'sets': 0,
+            'single_flight_waits': 0
+        }
+
+    def _count(self, name: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[name] += n
+
+    def set_version(self, version: str):
+        """Change la version du modele; les entrees precedentes deviennent invisibles"""
+        self.version = str(version)
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Valeur en cache pour la version courante, None si absente ou expiree"""
+
+    @abstractmethod
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Ajoute ou remplace une entree; `ttl` surcharge la duree par defaut"""
+
+    @abstractmethod
+    def invalidate(self, key: Hashable) -> bool:
+        """Supprime une entree; True si elle existait"""
+
+    @abstractmethod
+    def clear(self):
+        """Supprime les entrees de la version courante"""
+
+    @abstractmethod
+    def single_flight(self, key: Hashable, timeout: float = 10.0):
+        """
+        Context manager : un seul calcul a la fois par cle. Produit True si
+        l'appelant detient le verrou, False si l'attente a expire (l'appelant
+        calcule quand meme).
+        """
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'backend': self.backend_name,
+            'version': self.version,
+            'ttl_seconds': self.ttl,
+            'hit_ratio': round(stats['hits'] / lookups, 4) if lookups else 0.0
+        })
+        return stats
+
+
+class ScoreCache(ScoreCacheBackend):
+    """
+    Cache LRU borne avec expiration par entree, en memoire du processus.
+    """
+
+    backend_name = 'memory'
+    LOCK_STRIPES = 64
+
+    def __init__(self, max_size: int = 10000, ttl: float = 3600.0, version: str = 'default'):
+        if max_size < 1:
+            raise ValueError(f"max_size invalide: {max_size}")
+        super().__init__(ttl=ttl, version=version)
+        self.max_size = max_size
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._flight_locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+
+    def set_version(self, version: str):
+        if str(version) != self.version:
+            super().set_version(version)
+            self.clear()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._count('misses')
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self._count('expirations')
+                self._count('misses')
+                return None
+            self._data.move_to_end(key)
+        self._count('hits')
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Ajoute ou remplace une entree; `ttl` surcharge la duree par defaut"""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            self.invalidate(key)
+            return
+        evicted = 0
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                evicted += 1
+        self._count('sets')
+        if evicted:
+            self._count('evictions', evicted)
+
+    def invalidate(self, key: Hashable) -> bool:
+        with self._lock:
+            removed = self._data.pop(key, None) is not None
+        if removed:
+            self._count('invalidations')
+        return removed
+
+    def clear(self):
+        with self._lock:
+            count = len(self._data)
+            self._data.clear()
+        self._count('invalidations', count)
+
+    @contextmanager
+    def single_flight(self, key: Hashable, timeout: float = 10.0):
+        lock = self._flight_locks[hash(key) % self.LOCK_STRIPES]
+        if not lock.acquire(blocking=False):
+            self._count('single_flight_waits')
+            acquired = lock.acquire(timeout=timeout)
+        else:
+            acquired = True
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_stats(self) -> Dict:
+        stats = super().get_stats()
+        stats.update({'size': len(self._data), 'max_size': self.max_size})
+        return stats
+
+
+# ==========================================
+# SERIALISATION
+# ==========================================
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, 'item'):  # scalaires numpy
+        return value.item()
+    raise TypeError(f"Type non serialisable: {type(value).__name__}")
+
+
+def _decode(obj: Dict):
+    if '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    if '__date__' in obj:
+        return date.fromisoformat(obj['__date__'])
+    return obj
+
+
+def dumps_score(value: Any) -> str:
+    return json.dumps(value, default=_encode, separators=(',', ':'))
+
+
+def loads_score(payload) -> Any:
+    if isinstance(payload, bytes):
+        payload = payload.decode('utf-8')
+    return json.loads(payload, object_hook=_decode)
+
+
+class RedisScoreCache(ScoreCacheBackend):
+    """
+    Cache partage via Redis. `client` est un client compatible redis-py
+    (redis.Redis, fakeredis.FakeRedis, ...). Les valeurs sont serialisees
+    en JSON; les verrous single-flight utilisent SET NX PX.
+    """
+
+    backend_name = 'redis'
+
+    def __init__(self, client, ttl: float = 3600.0, version: str = 'default',
+                 prefix: str = 'scoring', lock_poll_interval: float = 0.05):
+        super().__init__(ttl=ttl, version=version)
+        self.client = client
+        self.prefix = prefix
+        self.lock_poll_interval = lock_poll_interval
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> 'RedisScoreCache':
+        if redis is None:
+            raise ImportError("Le paquet redis est requis pour SCORE_CACHE_BACKEND=redis")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _key(self, key: Hashable) -> str:
+        return f"{self.prefix}:score:{self.version}:{key}"
+
+    def _lock_key(self, key: Hashable) -> str:
+        return f"{self.prefix}:lock:{self.version}:{key}"
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        try:
+            payload = self.client.get(self._key(key))
+        except Exception as e:
+            logger.warning(f"Redis indisponible (get): {e}")
+            payload = None
+        if payload is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return loads_score(payload)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            self.invalidate(key)
+            return
+        try:
+            self.client.set(self._key(key), dumps_score(value), px=max(1, int(ttl * 1000)))
+            self._count('sets')
+        except Exception as e:
+            logger.warning(f"Redis indisponible (set): {e}")
+
+    def invalidate(self, key: Hashable) -> bool:
+        try:
+            removed = bool(self.client.delete(self._key(key)))
+        except Exception as e:
+            logger.warning(f"Redis indisponible (delete): {e}")
+            return False
+        if removed:
+            self._count('invalidations')
+        return removed
+
+    def clear(self):
+        """Supprime les scores de la version courante"""
+        count = 0
+        try:
+            for redis_key in self.client.scan_iter(match=f"{self.prefix}:score:{self.version}:*"):
+                count += self.client.delete(redis_key)
+        except Exception as e:
+            logger.warning(f"Redis indisponible (clear): {e}")
+        self._count('invalidations', count)
+
+    @contextmanager
+    def single_flight(self, key: Hashable, timeout: float = 10.0):
+        lock_key = self._lock_key(key)
+        token = uuid.uuid4().hex
+        ttl_ms = max(1, int(timeout * 1000))
+
+        try:
+            acquired = bool(self.client.set(lock_key, token, nx=True, px=ttl_ms))
+        except Exception as e:
+            logger.warning(f"Redis indisponible (verrou): {e}")
+            yield False
+            return
+
+        if not acquired:
+            # Un autre worker calcule : attendre la fin de son calcul
+            self._count('single_flight_waits')
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                try:
+                    if not self.client.exists(lock_key):
+                        break
+                except Exception:
+                    break
+                time.sleep(self.lock_poll_interval)
+
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self._release(lock_key, token)
+
+    def _release(self, lock_key: str, token: str):
+        """Libere le verrou seulement s'il nous appartient encore"""
+        try:
+            with self.client.pipeline() as pipe:
+                pipe.watch(lock_key)
+                current = pipe.get(lock_key)
+                if current is not None and (current.decode() if isinstance(current, bytes) else current) == token:
+                    pipe.multi()
+                    pipe.delete(lock_key)
+                    pipe.execute()
+                else:
+                    pipe.unwatch()
+        except Exception as e:
+            # WatchError : le verrou a expire et a ete repris entre-temps
+            logger.debug(f"Verrou {lock_key} non libere: {e}")
+
+
+def create_score_cache(backend: str = 'memory', ttl: float = 3600.0,
+                       max_size: int = 10000, redis_url: Optional[str] = None,
+                       version: str = 'default') -> ScoreCacheBackend:
+    """Construit le cache configure; repli sur la memoire si Redis est inutilisable"""
+    if backend == 'redis':
+        try:
+            cache = RedisScoreCache.from_url(redis_url, ttl=ttl, version=version)
+            cache.client.ping()
+            logger.info(f"Cache des scores Redis: {redis_url}")
+            return cache
+        except Exception as e:
+            logger.warning(f"Cache Redis indisponible, repli en memoire: {e}")
+    elif backend != 'memory':
+        raise ValueError(f"Backend de cache inconnu: {backend}")
+    return ScoreCache(max_size=max_size, ttl=ttl, version=version)
@@ -0,0 +1,173 @@
+"""
+Journalisation des services de scoring
+
+- configure_logging() : niveaux par sous-systeme depuis Config.LOG_LEVEL,
+  ecriture des logs (format + I/O) dans un thread dedie via une file
+- log_event() : evenement structure "evenement cle=valeur ...", formate
+  seulement s'il est emis, avec echantillonnage des evenements frequents
+
+Format de LOG_LEVEL : un niveau global, puis des surcharges par
+sous-systeme ou par logger, par exemple
+    LOG_LEVEL="INFO,realtime=WARNING,db=DEBUG,werkzeug=ERROR"
+"""
+import atexit
+import itertools
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from typing import Dict, Optional
+
+try:
+    from config.config import Config
+    DEFAULT_LOG_LEVEL = Config.LOG_LEVEL
+except ImportError:  # lance depuis credit_app/models
+    DEFAULT_LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Sous-systemes -> loggers des modules correspondants
+SUBSYSTEMS = {
+    'api': ['__main__', 'app'],
+    'scoring': ['scoring_model', 'compiled_forest', 'score_cache'],
+    'realtime': ['realtime_scoring_service', 'transaction_ingestion', 'rolling_features', 'realtime_state'],
+    'db': ['db_pool', 'payment_stats', 'notification_outbox']
+}
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def parse_log_levels(spec: str) -> Dict[str, int]:
+    """'INFO,realtime=WARNING' -> {'': INFO, 'realtime_scoring_service': WARNING, ...}"""
+    levels = {}
+    for part in (spec or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, level = part.rpartition('=')
+        value = logging.getLevelName(level.strip().upper())
+        if not isinstance(value, int):
+            raise ValueError(f"Niveau de log inconnu: {level}")
+        name = name.strip()
+        for logger_name in SUBSYSTEMS.get(name, [name]):
+            levels[logger_name] = value
+    return levels
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler qui ne formate pas dans le thread appelant : le message
+    est construit par le thread d'ecriture. Les exceptions sont rendues
+    ici, tant que la pile est disponible.
+    """
+
+    def prepare(self, record):
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def configure_logging(level_spec: Optional[str] = None, logfile: Optional[str] = None,
+                      queue_size: int = 10000):
+    """
+    Installe la file de logs sur le logger racine et applique les niveaux.
+    Idempotent : un second appel ne fait que mettre a jour les niveaux.
+    """
+    global _listener
+    levels = parse_log_levels(level_spec if level_spec is not None else DEFAULT_LOG_LEVEL)
+    root = logging.getLogger()
+    root.setLevel(levels.pop('', logging.INFO))
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+    with _listener_lock:
+        if _listener is not None:
+            return _listener
+
+        formatter = logging.Formatter(LOG_FORMAT)
+        handlers = [logging.StreamHandler()]
+        if logfile:
+            handlers.append(logging.FileHandler(logfile, encoding='utf-8'))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        # Une file pleine fait perdre des logs plutot que bloquer une requete
+        log_queue = queue.Queue(maxsize=queue_size)
+        queue_handler = _DeferredQueueHandler(log_queue)
+        queue_handler.enqueue = _enqueue_or_drop(log_queue)
+
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        return _listener
+
+
+def _enqueue_or_drop(log_queue: queue.Queue):
+    def enqueue(record):
+        try:
+            log_queue.put_nowait(record)
+        except queue.Full:
+            pass
+    return enqueue
+
+
+def shutdown_logging():
+    """Ecrit les logs en attente et arrete le thread d'ecriture"""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+# ==========================================
+# EVENEMENTS STRUCTURES
+# ==========================================
+
+class _EventMessage:
+    """Message construit au formatage (dans le thread d'ecriture)"""
+
+    __slots__ = ('event', 'fields')
+
+    def __init__(self, event: str, fields: Dict):
+        self.event = event
+        self.fields = fields
+
+    def __str__(self):
+        parts = [self.event]
+        for key, value in self.fields.items():
+            if isinstance(value, float):
+                value = f"{value:.2f}"
+            parts.append(f"{key}={value}")
+        return ' '.join(parts)
+
+
+_sample_counters: Dict[str, itertools.count] = {}
+
+
+def log_event(logger: logging.Logger, level: int, event: str,
+              sample_every: int = 1, **fields) -> bool:
+    """
+    Journalise `event` avec ses champs si le niveau est actif, en n'emettant
+    qu'un evenement sur `sample_every` pour un meme nom d'evenement.
+    """
+    if not logger.isEnabledFor(level):
+        return False
+    if sample_every > 1:
+        counter = _sample_counters.get(event)
+        if counter is None:
+            counter = _sample_counters.setdefault(event, itertools.count())
+        n = next(counter)
+        if n % sample_every:
+            return False
+        if n:
+            fields['sampled'] = f"1/{sample_every}"
+    logger.log(level, _EventMessage(event, fields))
+    return True
@@ -1,38 +1,124 @@
 """
 Modele de scoring Random Forest avec recalcul automatique et notifications
 """
-import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
 import joblib
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+from psycopg2.extras import RealDictCursor, execute_values
 from decimal import Decimal
 import os
 
+from db_pool import PooledConnectionPool
+from payment_stats import PaymentStatsStore, payment_stats_cte
+from score_cache import create_score_cache
+from model_registry import ModelBundle, ModelRegistry, RegistryError
+from model_training import TrainingError, run_training_process, train_and_register
+from training_data import DEFAULT_ITERSIZE
+from notification_outbox import NotificationOutbox
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+EMPLOYMENT_MAP = {
+    'cdi': 3,
+    'fonctionnaire': 3,
+    'cdd': 2,
+    'independant': 1,
+    'autre': 0
+}
+
+
+class ModelValidationError(Exception):
+    """Version du modele refusee a l'activation"""
+
 
 class CreditScoringModel:
     """
     Modele Random Forest avec recalcul automatique
     """
     
-    def __init__(self, db_config: Dict):
+    # Un score de moins d'une heure n'est pas recalcule
+    RECALCULATION_WINDOW_HOURS = 1
+    
+    # Precision test minimale pour activer une nouvelle version
+    MIN_VALIDATION_SCORE = 0.6
+    
+    def __init__(self, db_config: Dict, pool_config: Optional[Dict] = None,
+                 cache_config: Optional[Dict] = None, outbox_config: Optional[Dict] = None,
+                 model_config: Optional[Dict] = None):
         self.db_config = db_config
-        self.model = None
-        self.scaler = StandardScaler()
+        model_config = model_config or {}
+        self.db_pool = PooledConnectionPool(db_config, **(pool_config or {}))
+        try:
+            self.db_pool.prefill()
+        except Exception as e:
+            logger.warning(f"Pre-remplissage du pool impossible: {e}")
+        
+        # Agregats de paiements incrementaux si la table est installee
+        self.payment_stats = PaymentStatsStore(self.get_db_connection)
+        try:
+            self.use_payment_stats_table = self.payment_stats.is_installed()
+        except Exception as e:
+            logger.warning(f"statistiques_paiements indisponible, agregation a la volee: {e}")
+            self.use_payment_stats_table = False
+        
+        # Cache des scores, meme duree que la fenetre de recalcul
+        # (en memoire ou partage via Redis selon cache_config['backend'])
+        cache_config = dict(cache_config or {})
+        self.single_flight_timeout = cache_config.pop('single_flight_timeout', 10.0)
+        self.score_cache = create_score_cache(
+            ttl=self.RECALCULATION_WINDOW_HOURS * 3600,
+            **cache_config
+        )
+        
+        # Notifications ecrites par lots hors du chemin de la requete
+        self.notification_outbox = NotificationOutbox(self.get_db_connection, **(outbox_config or {}))
+        self.notification_outbox.start()
+        
+        # Version active : modele, scaler et predicteur compile (foret aplatie +
+        # scaler replie, sans sklearn a l'inference) remplaces d'un seul bloc
+        self._bundle: Optional[ModelBundle] = None
+        self.use_compiled_predictor = True
+        self.registry = ModelRegistry(model_config.get('registry_dir', 'models/registry'))
+        # Tableaux du modele projetes en memoire, partages entre workers
+        self.mmap_mode = model_config.get('mmap_mode', 'r')
+        # Activations faites par les autres workers : pointeur ACTIVE relu
+        # (un stat) au plus toutes les refresh_interval secondes
+        self.refresh_interval = model_config.get('refresh_interval', 5.0)
+        self._active_stamp = None
+        self._last_active_check = time.monotonic()
+        self._refresh_lock = threading.Lock()
+        # Verrou du registre tenu pendant le premier entrainement de ce worker
+        self._first_training_lock = None
+        
+        # Etat du demarrage : loading -> ready | training -> ready | rule_based
+        self.model_state = 'loading'
+        self.model_error = None
+        self._loader_thread = None
+        self._activation_lock = threading.Lock()
+        
+        # Entrainement en arriere-plan (un seul a la fois), extraction par
+        # paquets de training_itersize lignes, mise en cache par snapshot
+        self.training_cache_dir = model_config.get('training_cache_dir', 'models/training_cache')
+        self.training_itersize = model_config.get('training_itersize', DEFAULT_ITERSIZE)
+        # Recherche d'hyperparametres avant l'entrainement final (None : parametres fixes)
+        self.tuning = model_config.get('tuning')
+        # Duree maximale du processus d'entrainement (None : pas de limite)
+        self.training_timeout = model_config.get('training_timeout')
+        self._training_executor = None
+        self._training_lock = threading.Lock()
+        self.training_job: Dict = {'status': 'idle'}
+        
+        # Anciens artefacts, importes dans le registre au premier demarrage
         self.model_path = 'models/rf_model_postgres.pkl'
         self.scaler_path = 'models/scaler_postgres.pkl'
         
-        os.makedirs('models', exist_ok=True)
-        
         # Liste des features EXACTES utilisees pour l'entrainement
         self.feature_columns = [
             'revenu_mensuel', 'anciennete_mois', 'charges_mensuelles',
@@ -42,20 +128,34 @@ class CreditScoringModel:
             'debt_to_income', 'capacity_ratio', 'ratio_paiements_temps'
         ]
         
-        if not self.load_model():
-            logger.info("Entrainement du modele sur les donnees PostgreSQL...")
-            self.train_model_from_database()
-        
         self.risk_thresholds = {
             'tres_bas': 8.0,
             'bas': 7.0,
             'moyen': 5.0,
             'eleve': 3.0
         }
+        
+        # Le constructeur rend la main tout de suite : chargement (ou
+        # entrainement) en arriere-plan, regles metier en attendant
+        if model_config.get('load_in_background', True):
+            self.start_model_loading()
+        else:
+            self._load_or_train()
     
     def get_db_connection(self):
-        """Connexion a PostgreSQL"""
-        return psycopg2.connect(**self.db_config)
+        """Connexion a PostgreSQL empruntee au pool (commit/rollback en sortie de bloc)"""
+        return self.db_pool.connection()
+    
+    def request_scope(self):
+        """Reutilise une seule connexion pour tous les appels du bloc"""
+        return self.db_pool.request_scope()
+    
+    def shutdown(self, timeout: float = 10.0):
+        """Ecrit les notifications en attente puis ferme le pool"""
+        if self._training_executor is not None:
+            self._training_executor.shutdown(wait=False, cancel_futures=True)
+        self.notification_outbox.close(timeout)
+        self.db_pool.close()
     
     # ==========================================
     # CONVERSION DECIMAL -> FLOAT
@@ -77,41 +177,67 @@ class CreditScoringModel:
         """
         Recalcule automatiquement le score au login du client
         """
-        try:
-            logger.info(f"Recalcul automatique au login pour user {user_id}")
-            
-            # Verifier si besoin de recalculer
-            needs_recalc = self._check_if_needs_recalculation(user_id)
-            
-            if needs_recalc:
-                logger.info(f"Recalcul necessaire pour user {user_id}")
-                
-                # Recalculer le score
-                new_score = self.calculate_comprehensive_score(user_id)
-                
-                # Mettre a jour en base
-                self.update_user_score_in_db(user_id, new_score)
+        cached = self.score_cache.get(user_id)
+        if cached is not None:
+            logger.debug("Score en cache pour user %s", user_id)
+            return cached
+        
+        # Un seul worker recalcule un client donne; les autres attendent son resultat
+        with self.score_cache.single_flight(user_id, timeout=self.single_flight_timeout) as leader:
+            cached = self.score_cache.get(user_id)
+            if cached is not None:
+                logger.debug("Score calcule par un autre worker pour user %s", user_id)
+                return cached
+            if not leader:
+                logger.warning("Attente du verrou expiree pour user %s, recalcul local", user_id)
+            return self._recalculate_on_login_uncached(user_id)
+    
+    def _recalculate_on_login_uncached(self, user_id: int) -> Dict:
+        """Recalcul au login sans consulter le cache"""
+        with self.request_scope():
+            try:
+                logger.info("Recalcul automatique au login pour user %s", user_id)
                 
-                # Creer notification si changement significatif
-                self._create_score_change_notification(user_id, new_score)
+                # Verifier si besoin de recalculer
+                hours_since_update, previous_score = self._score_state(user_id)
+                needs_recalc = (hours_since_update is None
+                                or hours_since_update > self.RECALCULATION_WINDOW_HOURS)
                 
-                return new_score
-            else:
-                logger.info(f"Score recent, pas de recalcul pour user {user_id}")
+                if needs_recalc:
+                    logger.info("Recalcul necessaire pour user %s", user_id)
+                    
+                    # Recalculer le score
+                    new_score = self.calculate_comprehensive_score(user_id)
+                    
+                    # Mettre a jour en base
+                    self.update_user_score_in_db(user_id, new_score)
+                    
+                    # Creer notification si changement significatif (ecrite en arriere-plan)
+                    self._create_score_change_notification(user_id, new_score, previous_score)
+                    
+                    return new_score
+                else:
+                    logger.info("Score recent, pas de recalcul pour user %s", user_id)
+                    score_data = self.get_user_score_from_db(user_id)
+                    if score_data:
+                        # Expire quand le score en base sort de la fenetre de recalcul
+                        remaining = (self.RECALCULATION_WINDOW_HOURS - hours_since_update) * 3600
+                        self.score_cache.set(user_id, score_data, ttl=remaining)
+                    return score_data
+                    
+            except Exception as e:
+                logger.error("Erreur recalcul login: %s", e)
                 return self.get_user_score_from_db(user_id)
-                
-        except Exception as e:
-            logger.error(f"Erreur recalcul login: {e}")
-            return self.get_user_score_from_db(user_id)
     
-    def _check_if_needs_recalculation(self, user_id: int) -> bool:
-        """Verifie si le score doit etre recalcule"""
+    def _score_state(self, user_id: int) -> Tuple[Optional[float], Optional[float]]:
+        """(heures depuis la derniere mise a jour, score actuel) en une seule requete"""
         with self.get_db_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
                     SELECT 
                         date_modification,
-                        EXTRACT(EPOCH FROM (NOW() - date_modification))/3600 as hours_since_update
+                        EXTRACT(EPOCH FROM (NOW() - date_modification))/3600 as hours_since_update,
+                        score_credit
                     FROM utilisateurs
                     WHERE id = %s
                 """, (user_id,))
@@ -119,64 +245,40 @@ class CreditScoringModel:
                 result = cur.fetchone()
                 
                 if not result:
-                    return True
-                
-                hours_since_update = result[1]
+                    return None, None
                 
-                # Recalculer si derniere mise a jour > 1 heure
-                return hours_since_update > 1
+                hours = self._convert_to_float(result[1]) if result[1] is not None else None
+                score = self._convert_to_float(result[2]) if result[2] is not None else None
+                return hours, score
     
-    def _create_score_change_notification(self, user_id: int, new_score_data: Dict):
-        """Cree une notification en cas de changement significatif"""
+    def _create_score_change_notification(self, user_id: int, new_score_data: Dict,
+                                          old_score: Optional[float] = None):
+        """
+        Cree une notification en cas de changement significatif.
+        `old_score` est le score lu avant la mise a jour; l'insertion est
+        deleguee a la file d'envoi et ne bloque pas la requete.
+        """
         try:
-            with self.get_db_connection() as conn:
-                with conn.cursor() as cur:
-                    # Recuperer ancien score
-                    cur.execute("""
-                        SELECT score_credit 
-                        FROM historique_scores 
-                        WHERE utilisateur_id = %s 
-                        ORDER BY date_calcul DESC 
-                        LIMIT 1 OFFSET 1
-                    """, (user_id,))
-                    
-                    old_score_row = cur.fetchone()
-                    old_score = self._convert_to_float(old_score_row[0]) if old_score_row else 0
-                    new_score = self._convert_to_float(new_score_data['score'])
-                    
-                    score_diff = new_score - old_score
+            old_score = old_score if old_score is not None else 0
+            new_score = self._convert_to_float(new_score_data['score'])
+            
+            score_diff = new_score - old_score
+            
+            # Ne creer notification que si changement >= 0.5
+            if abs(score_diff) >= 0.5:
+                notification_type = 'score_improvement' if score_diff > 0 else 'score_decline'
+                
+                message = self._generate_notification_message(
+                    old_score, 
+                    new_score, 
+                    score_diff,
+                    new_score_data
+                )
+                
+                if self.notification_outbox.enqueue(user_id, notification_type,
+                                                    'Votre score a change', message):
+                    logger.info("Notification en file pour user %s: %+.1f", user_id, score_diff)
                     
-                    # Ne creer notification que si changement >= 0.5
-                    if abs(score_diff) >= 0.5:
-                        notification_type = 'score_improvement' if score_diff > 0 else 'score_decline'
-                        
-                        message = self._generate_notification_message(
-                            old_score, 
-                            new_score, 
-                            score_diff,
-                            new_score_data
-                        )
-                        
-                        # Inserer notification
-                        cur.execute("""
-                            INSERT INTO notifications (
-                                utilisateur_id,
-                                type,
-                                titre,
-                                message,
-                                lu,
-                                date_creation
-                            ) VALUES (%s, %s, %s, %s, FALSE, NOW())
-                        """, (
-                            user_id,
-                            notification_type,
-                            'Votre score a change',
-                            message
-                        ))
-                        
-                        conn.commit()
-                        logger.info(f"Notification creee pour user {user_id}: {score_diff:+.1f}")
-                        
         except Exception as e:
             logger.error(f"Erreur creation notification: {e}")
     
@@ -197,154 +299,342 @@ class CreditScoringModel:
         
         return message
     
+    # ==========================================
+    # DEMARRAGE : CHARGEMENT DU MODELE
+    # ==========================================
+    
+    def start_model_loading(self):
+        """Charge le modele actif dans un thread; l'API repond pendant ce temps"""
+        self._loader_thread = threading.Thread(target=self._load_or_train, name='model-loader', daemon=True)
+        self._loader_thread.start()
+    
+    def wait_until_loaded(self, timeout: Optional[float] = None) -> bool:
+        """Attend la fin du chargement initial (pas d'un entrainement lance ensuite)"""
+        if self._loader_thread is not None:
+            self._loader_thread.join(timeout)
+        return self.model_state != 'loading'
+    
+    def _load_or_train(self):
+        started = datetime.now()
+        if self.registry.active_version() is None or not self.load_model():
+            # Pas de version utilisable : un seul worker importe ou entraine
+            # la premiere version, les autres attendent qu'il l'active
+            lock = self.registry.training_lock()
+            if not lock.acquire():
+                self._wait_for_first_version(lock)
+                return
+            # Ancien modele importe, ou version activee entre-temps
+            if not self.load_model():
+                logger.info("Aucun modele enregistre, entrainement en arriere-plan sur les donnees PostgreSQL...")
+                self.model_state = 'training'
+                self._first_training_lock = lock
+                self.start_background_training()
+                return
+            lock.release()
+        self.model_state = 'ready'
+        logger.info(f"Modele pret en {(datetime.now() - started).total_seconds():.2f}s")
+    
+    def _wait_for_first_version(self, lock):
+        """
+        Premier entrainement mene par un autre worker : relit le pointeur a
+        chaque changement jusqu'a sa version, ou jusqu'a la liberation du
+        verrou (entrainement termine sans version : regles metier).
+        """
+        logger.info("Premier entrainement en cours dans un autre worker, attente de sa version...")
+        self.model_state = 'training'
+        interval = max(self.refresh_interval, 0.05)
+        stamp = self.registry.active_stamp()
+        while self._bundle is None:
+            if lock.acquire():
+                lock.release()
+                if not self.load_model():
+                    self.model_state = 'rule_based'
+                    self.model_error = self.model_error or "Premier entrainement sans version active"
+                    return
+                break
+            if self.registry.active_stamp() != stamp:
+                stamp = self.registry.active_stamp()
+                if self.load_model():
+                    break
+            time.sleep(interval)
+        self.model_state = 'ready'
+    
+    def readiness(self) -> Dict:
+        """
+        Pret a recevoir du trafic : modele charge, ou regles metier si aucun
+        modele n'a pu etre obtenu. Pas pret pendant le chargement initial ni
+        pendant le premier entrainement.
+        """
+        return {
+            'ready': self.model_state in ('ready', 'rule_based'),
+            'model_state': self.model_state,
+            'model_version': self.model_version,
+            'error': self.model_error
+        }
+    
     # ==========================================
     # ENTRAINEMENT DU MODELE
     # ==========================================
     
     def train_model_from_database(self) -> bool:
         """
-        Entraine le modele Random Forest sur les donnees PostgreSQL
+        Entraine le modele Random Forest sur les donnees PostgreSQL (dans ce
+        processus), publie la version dans le registre puis l'active
         """
         try:
-            logger.info("Extraction des donnees depuis PostgreSQL...")
-            
-            with self.get_db_connection() as conn:
-                query = """
-                    WITH payment_stats AS (
-                        SELECT 
-                            utilisateur_id,
-                            COUNT(*) as total_paiements,
-                            COUNT(CASE WHEN type_paiement = 'a_temps' THEN 1 END) as paiements_a_temps,
-                            COUNT(CASE WHEN type_paiement = 'en_retard' THEN 1 END) as paiements_en_retard,
-                            COUNT(CASE WHEN type_paiement = 'manque' THEN 1 END) as paiements_manques,
-                            AVG(jours_retard) as moyenne_jours_retard
-                        FROM historique_paiements
-                        GROUP BY utilisateur_id
-                    )
-                    SELECT 
-                        u.id as utilisateur_id,
-                        u.revenu_mensuel::float,
-                        u.anciennete_mois::float,
-                        u.charges_mensuelles::float,
-                        u.dettes_existantes::float,
-                        u.score_credit::float,
-                        
-                        CASE 
-                            WHEN u.statut_emploi IN ('cdi', 'fonctionnaire') THEN 3
-                            WHEN u.statut_emploi = 'cdd' THEN 2
-                            WHEN u.statut_emploi = 'independant' THEN 1
-                            ELSE 0
-                        END as statut_emploi_encoded,
-                        
-                        COALESCE(r.credits_actifs_count, 0)::float as credits_actifs_count,
-                        COALESCE(r.ratio_endettement, 0)::float as ratio_endettement,
-                        COALESCE(ps.total_paiements, 0)::float as total_paiements,
-                        COALESCE(ps.paiements_a_temps, 0)::float as paiements_a_temps,
-                        COALESCE(ps.paiements_en_retard, 0)::float as paiements_en_retard,
-                        COALESCE(ps.paiements_manques, 0)::float as paiements_manques,
-                        COALESCE(ps.moyenne_jours_retard, 0)::float as moyenne_jours_retard,
-                        
-                        CASE 
-                            WHEN u.score_credit >= 7 
-                                AND COALESCE(ps.paiements_a_temps::FLOAT / NULLIF(ps.total_paiements, 0), 0) >= 0.8
-                            THEN 1 
-                            ELSE 0 
-                        END as bon_client
-                        
-                    FROM utilisateurs u
-                    LEFT JOIN restrictions_credit r ON u.id = r.utilisateur_id
-                    LEFT JOIN payment_stats ps ON u.id = ps.utilisateur_id
-                    WHERE u.statut = 'actif'
-                    AND u.revenu_mensuel > 0
-                """
-                
-                df = pd.read_sql(query, conn)
-            
-            logger.info(f"{len(df)} utilisateurs recuperes")
-            
-            if len(df) < 30:
-                logger.warning(f"Pas assez de donnees ({len(df)} < 30)")
-                return False
-            
-            # Features calculees
-            df['debt_to_income'] = (df['charges_mensuelles'] + df['dettes_existantes']) / df['revenu_mensuel'].replace(0, 1)
-            df['capacity_ratio'] = np.maximum(0, (df['revenu_mensuel'] - df['charges_mensuelles'] - df['dettes_existantes']) / df['revenu_mensuel'].replace(0, 1))
-            df['ratio_paiements_temps'] = df['paiements_a_temps'] / df['total_paiements'].replace(0, 1)
-            
-            # Utiliser self.feature_columns
-            X = df[self.feature_columns].fillna(0).values
-            y = df['bon_client'].values
-            
-            if len(np.unique(y)) < 2:
-                logger.warning("Une seule classe presente")
-                return False
-            
-            # Split train/test
-            X_train, X_test, y_train, y_test = train_test_split(
-                X, y, test_size=0.2, random_state=42, stratify=y
+            result = train_and_register(
+                self.db_config, self.registry.root, self.feature_columns,
+                self.use_payment_stats_table,
+                cache_dir=self.training_cache_dir, itersize=self.training_itersize
             )
-            
-            # Normalisation
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
-            
-            # Entrainement
-            logger.info("Entrainement du Random Forest...")
-            self.model = RandomForestClassifier(
-                n_estimators=100,
-                max_depth=12,
-                min_samples_split=5,
-                min_samples_leaf=2,
-                max_features='sqrt',
-                random_state=42,
-                class_weight='balanced',
-                n_jobs=-1
-            )
-            
-            self.model.fit(X_train_scaled, y_train)
-            
-            # Evaluation
-            train_score = self.model.score(X_train_scaled, y_train)
-            test_score = self.model.score(X_test_scaled, y_test)
-            
-            logger.info(f"Precision train: {train_score:.3f}")
-            logger.info(f"Precision test: {test_score:.3f}")
-            logger.info(f"Nombre de features: {len(self.feature_columns)}")
-            
-            # Sauvegarder
-            self.save_model()
-            
+            self.activate_version(result['version'])
             logger.info("Modele Random Forest entraine avec succes")
             return True
-            
+        except TrainingError as e:
+            logger.warning(str(e))
+            return False
         except Exception as e:
             logger.error(f"Erreur entrainement: {e}")
             import traceback
             traceback.print_exc()
             return False
     
-    def save_model(self):
-        """Sauvegarde le modele et le scaler"""
+    def start_background_training(self, params: Optional[Dict] = None,
+                                  search: Union[Dict, bool, None] = None) -> Tuple[bool, Dict]:
+        """
+        Lance l'entrainement dans un processus separe. La nouvelle version
+        n'est activee qu'apres validation; les requetes continuent d'etre
+        servies par la version courante pendant ce temps.
+        search : options de successive_halving_search, {} pour ses valeurs par
+        defaut, False pour ne pas chercher (None : model_config['tuning']).
+        Retourne (lance, etat du job); False si un entrainement est deja en cours.
+        """
+        if search is None:
+            search = self.tuning
+        elif search is False:
+            search = None
+        with self._training_lock:
+            if self.training_job.get('status') == 'running':
+                return False, dict(self.training_job)
+            if self._training_executor is None:
+                # Un thread surveille le processus d'entrainement
+                self._training_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='model-training')
+            self.training_job = {
+                'status': 'running',
+                'tuning': search,
+                'started_at': datetime.now().isoformat(),
+                'finished_at': None,
+                'version': None,
+                'metrics': None,
+                'error': None,
+                'timeout': self.training_timeout
+            }
+            future = self._training_executor.submit(
+                run_training_process, self.db_config, self.registry.root,
+                self.feature_columns, self.use_payment_stats_table, params,
+                self.training_cache_dir, self.training_itersize, search,
+                self.training_timeout
+            )
+            job = dict(self.training_job)
+        # Hors du verrou : un job deja termine appelle _on_training_done ici
+        future.add_done_callback(self._on_training_done)
+        return True, job
+    
+    def _on_training_done(self, future):
+        """Validation et activation de la version entrainee (thread de surveillance)"""
+        job = {'finished_at': datetime.now().isoformat()}
         try:
-            joblib.dump(self.model, self.model_path)
-            joblib.dump(self.scaler, self.scaler_path)
-            logger.info(f"Modele sauvegarde: {self.model_path}")
+            result = future.result()
+            job.update(version=result['version'], metrics=result['metrics'])
+            self.activate_version(result['version'])
+            job['status'] = 'activated'
+        except (TrainingError, ModelValidationError) as e:
+            logger.warning(f"Entrainement en arriere-plan non active: {e}")
+            job.update(status='rejected', error=str(e))
+        except subprocess.TimeoutExpired as e:
+            # subprocess.run a deja tue le processus d'entrainement
+            logger.error(f"Entrainement en arriere-plan interrompu apres {e.timeout:.0f}s")
+            job.update(status='failed', error=f"Duree maximale d'entrainement depassee ({e.timeout:.0f}s)")
         except Exception as e:
-            logger.error(f"Erreur sauvegarde: {e}")
+            logger.error(f"Erreur entrainement en arriere-plan: {e}")
+            job.update(status='failed', error=str(e))
+        with self._training_lock:
+            self.training_job.update(job)
+        # Version activee (ou echec) : les workers en attente reprennent
+        lock, self._first_training_lock = self._first_training_lock, None
+        if lock is not None:
+            lock.release()
+        if self._bundle is None:
+            # Premier entrainement rate : service en regles metier
+            self.model_state = 'rule_based'
+            self.model_error = job.get('error')
+    
+    def get_training_status(self) -> Dict:
+        with self._training_lock:
+            return dict(self.training_job)
+    
+    # ==========================================
+    # REGISTRE DES VERSIONS
+    # ==========================================
+    
+    def validate_bundle(self, bundle: ModelBundle):
+        """Refuse une version incompatible avec le service ou peu fiable"""
+        if list(bundle.feature_columns) != list(self.feature_columns):
+            raise ModelValidationError(
+                f"Features de la version {bundle.version} differentes de celles du service"
+            )
+        test_score = bundle.metadata.get('metrics', {}).get('test_score')
+        if test_score is not None and test_score < self.MIN_VALIDATION_SCORE:
+            raise ModelValidationError(
+                f"Precision test insuffisante pour {bundle.version}: {test_score:.3f} < {self.MIN_VALIDATION_SCORE}"
+            )
+        X = bundle.validation_X
+        if X is None:
+            X = np.zeros((1, len(self.feature_columns)))
+        # Predicteur qui servira les requetes : le modele sklearn n'est lu
+        # que sans tableaux compiles (leur coherence est verifiee a la publication)
+        proba = self._predict_good_client_proba(X, bundle)
+        if not np.all(np.isfinite(proba)) or proba.min() < 0 or proba.max() > 1:
+            raise ModelValidationError(f"Probabilites invalides pour {bundle.version}")
+    
+    def activate_version(self, version: str, rollback: bool = False) -> ModelBundle:
+        """
+        Charge et valide la version, deplace le pointeur du registre puis
+        remplace le bundle actif (une seule affectation de reference)
+        """
+        bundle = self.registry.load(version, use_compiled=self.use_compiled_predictor, mmap_mode=self.mmap_mode)
+        self.validate_bundle(bundle)
+        with self._activation_lock:
+            if rollback:
+                self.registry.rollback(version)
+            else:
+                self.registry.set_active(version)
+            self._install_bundle(bundle)
+            self._active_stamp = self.registry.active_stamp()
+        return bundle
+    
+    def rollback_model(self, version: Optional[str] = None) -> ModelBundle:
+        """Retour a la version precedente, ou a une version donnee"""
+        target = version or self.registry.previous_version()
+        if target is None:
+            raise RegistryError("Aucune version precedente")
+        return self.activate_version(target, rollback=True)
+    
+    def list_model_versions(self) -> List[Dict]:
+        return self.registry.list_versions()
+    
+    def refresh_active_version(self, force: bool = False) -> bool:
+        """
+        Installe la version activee par un autre worker : le pointeur du
+        registre est compare (un stat) au plus toutes les refresh_interval
+        secondes, le bundle n'est charge que s'il a change. Deja validee a
+        son activation, la version n'est pas revalidee ici.
+        Retourne True si une autre version a ete installee.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_active_check < self.refresh_interval:
+            return False
+        # Une seule requete verifie, les autres continuent sur la version courante
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            self._last_active_check = now
+            stamp = self.registry.active_stamp()
+            if stamp is None or stamp == self._active_stamp:
+                return False
+            version = self.registry.active_version()
+            if version is None or version == self.model_version:
+                self._active_stamp = stamp
+                return False
+            bundle = self.registry.load(version, use_compiled=self.use_compiled_predictor, mmap_mode=self.mmap_mode)
+            with self._activation_lock:
+                # Activation locale plus recente pendant le chargement
+                if self.registry.active_version() != version:
+                    return False
+                self._install_bundle(bundle)
+                self._active_stamp = stamp
+            return True
+        except Exception as e:
+            logger.error(f"Erreur suivi de la version active: {e}")
+            return False
+        finally:
+            self._refresh_lock.release()
+    
+    def _install_bundle(self, bundle: ModelBundle):
+        self._bundle = bundle
+        self.model_state = 'ready'
+        self.model_error = None
+        self.score_cache.set_version(bundle.version)
+        logger.info(f"Modele Random Forest actif (version {bundle.version})")
     
     def load_model(self) -> bool:
-        """Charge le modele sauvegarde"""
+        """
+        Charge la version active du registre (ou importe l'ancien modele .pkl).
+        La version active a ete validee a son activation : pas de nouvelle
+        validation ici, le modele sklearn reste non charge tant que le
+        predicteur compile est disponible.
+        """
         try:
-            if os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
-                self.model = joblib.load(self.model_path)
-                self.scaler = joblib.load(self.scaler_path)
-                logger.info("Modele Random Forest charge")
+            stamp = self.registry.active_stamp()
+            version = self.registry.active_version()
+            if version is None:
+                version = self._import_legacy_model()
+                if version is None:
+                    return False
+                self.activate_version(version)
                 return True
-            return False
+            bundle = self.registry.load(version, use_compiled=self.use_compiled_predictor, mmap_mode=self.mmap_mode)
+            with self._activation_lock:
+                self._install_bundle(bundle)
+                self._active_stamp = stamp
+            return True
         except Exception as e:
             logger.error(f"Erreur chargement: {e}")
+            self.model_error = str(e)
             return False
     
+    def _import_legacy_model(self) -> Optional[str]:
+        """Publie rf_model_postgres.pkl / scaler_postgres.pkl comme premiere version"""
+        if not (os.path.exists(self.model_path) and os.path.exists(self.scaler_path)):
+            return None
+        logger.info(f"Import du modele {self.model_path} dans le registre")
+        return self.registry.publish(
+            joblib.load(self.model_path),
+            joblib.load(self.scaler_path),
+            self.feature_columns,
+            compile_model=self.use_compiled_predictor,
+            source=self.model_path
+        )
+    
+    # Lecture du bundle actif (compatibilite avec les appelants existants)
+    
+    @property
+    def has_model(self) -> bool:
+        """Un modele ML est actif (sans forcer le chargement du modele sklearn)"""
+        return self._bundle is not None
+    
+    @property
+    def model(self):
+        return self._bundle.model if self._bundle else None
+    
+    @property
+    def scaler(self):
+        return self._bundle.scaler if self._bundle else None
+    
+    @property
+    def compiled_model(self):
+        return self._bundle.compiled_model if self._bundle else None
+    
+    @property
+    def model_version(self) -> Optional[str]:
+        return self._bundle.version if self._bundle else None
+    
+    def _predict_good_client_proba(self, X: np.ndarray, bundle: ModelBundle) -> np.ndarray:
+        """Probabilite de bon client pour des features brutes (non normalisees)"""
+        if bundle.compiled_model is not None:
+            return bundle.compiled_model.predict_proba(X)[:, 1]
+        return bundle.model.predict_proba(bundle.scaler.transform(X))[:, 1]
+    
     # ==========================================
     # CALCUL DU SCORE
     # ==========================================
@@ -356,9 +646,10 @@ class CreditScoringModel:
         if not user_data:
             raise ValueError(f"Utilisateur {user_id} introuvable")
         
-        # Calculer score ML ou regles metier
-        if self.model is not None:
-            ml_score = self._calculate_ml_score(user_data)
+        # Calculer score ML ou regles metier (version lue une seule fois)
+        bundle = self._bundle
+        if bundle is not None:
+            ml_score = self._calculate_ml_score(user_data, bundle)
             model_type = 'random_forest'
             confidence = 0.85
         else:
@@ -383,6 +674,15 @@ class CreditScoringModel:
             ratio_dette
         )
         
+        return self._format_score_result(
+            user_data, final_score, score_850, risk_level,
+            eligible_amount, model_type, confidence
+        )
+    
+    def _format_score_result(self, user_data: Dict, final_score: float, score_850: int,
+                             risk_level: str, eligible_amount: int,
+                             model_type: str, confidence: float) -> Dict:
+        """Construit le dictionnaire de score renvoye par l'API"""
         # Recommandations
         recommendations = self._generate_recommendations(final_score, user_data)
         
@@ -408,19 +708,8 @@ class CreditScoringModel:
         """Recupere toutes les donnees utilisateur"""
         with self.get_db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    WITH payment_stats AS (
-                        SELECT 
-                            utilisateur_id,
-                            COUNT(*) as total_paiements,
-                            COUNT(CASE WHEN type_paiement = 'a_temps' THEN 1 END) as paiements_a_temps,
-                            COUNT(CASE WHEN type_paiement = 'en_retard' THEN 1 END) as paiements_en_retard,
-                            COUNT(CASE WHEN type_paiement = 'manque' THEN 1 END) as paiements_manques,
-                            AVG(jours_retard) as moyenne_jours_retard
-                        FROM historique_paiements
-                        WHERE utilisateur_id = %s
-                        GROUP BY utilisateur_id
-                    )
+                cur.execute(f"""
+                    WITH payment_stats AS ({payment_stats_cte(self.use_payment_stats_table, "WHERE utilisateur_id = %s")})
                     SELECT 
                         u.*,
                         COALESCE(r.credits_actifs_count, 0) as credits_actifs_count,
@@ -442,65 +731,60 @@ class CreditScoringModel:
                 if not result:
                     return None
                 
-                data = dict(result)
-                
-                # Convertir tous les Decimal en float
-                for key in data:
-                    if isinstance(data[key], Decimal):
-                        data[key] = float(data[key])
-                
-                # Features supplementaires
-                revenu = self._convert_to_float(data.get('revenu_mensuel', 0))
-                charges = self._convert_to_float(data.get('charges_mensuelles', 0))
-                dettes = self._convert_to_float(data.get('dettes_existantes', 0))
-                total_p = self._convert_to_float(data.get('total_paiements', 0))
-                
-                data['debt_to_income'] = (charges + dettes) / max(revenu, 1)
-                data['capacity_ratio'] = max(0, (revenu - charges - dettes) / max(revenu, 1))
-                data['ratio_paiements_temps'] = self._convert_to_float(data['paiements_a_temps']) / max(total_p, 1)
-                
-                # Fiabilite
-                if total_p == 0:
-                    data['reliability'] = 'nouveau_client'
-                elif data['ratio_paiements_temps'] >= 0.95:
-                    data['reliability'] = 'excellent'
-                elif data['ratio_paiements_temps'] >= 0.85:
-                    data['reliability'] = 'tres_bon'
-                elif data['ratio_paiements_temps'] >= 0.70:
-                    data['reliability'] = 'bon'
-                else:
-                    data['reliability'] = 'moyen'
-                
-                return data
+                return self._enrich_user_data(dict(result))
+    
+    def _enrich_user_data(self, data: Dict) -> Dict:
+        """Convertit les Decimal et ajoute les features derivees"""
+        # Convertir tous les Decimal en float
+        for key in data:
+            if isinstance(data[key], Decimal):
+                data[key] = float(data[key])
+        
+        # Features supplementaires
+        revenu = self._convert_to_float(data.get('revenu_mensuel', 0))
+        charges = self._convert_to_float(data.get('charges_mensuelles', 0))
+        dettes = self._convert_to_float(data.get('dettes_existantes', 0))
+        total_p = self._convert_to_float(data.get('total_paiements', 0))
+        
+        data['debt_to_income'] = (charges + dettes) / max(revenu, 1)
+        data['capacity_ratio'] = max(0, (revenu - charges - dettes) / max(revenu, 1))
+        data['ratio_paiements_temps'] = self._convert_to_float(data['paiements_a_temps']) / max(total_p, 1)
+        
+        # Fiabilite
+        if total_p == 0:
+            data['reliability'] = 'nouveau_client'
+        elif data['ratio_paiements_temps'] >= 0.95:
+            data['reliability'] = 'excellent'
+        elif data['ratio_paiements_temps'] >= 0.85:
+            data['reliability'] = 'tres_bon'
+        elif data['ratio_paiements_temps'] >= 0.70:
+            data['reliability'] = 'bon'
+        else:
+            data['reliability'] = 'moyen'
+        
+        return data
     
-    def _calculate_ml_score(self, user_data: Dict) -> float:
+    def _build_feature_row(self, user_data: Dict) -> List[float]:
+        """Features dans l'ORDRE EXACT de self.feature_columns"""
+        features = []
+        for feature_name in self.feature_columns:
+            if feature_name == 'statut_emploi_encoded':
+                value = EMPLOYMENT_MAP.get(user_data.get('statut_emploi', 'autre'), 0)
+            else:
+                value = self._convert_to_float(user_data.get(feature_name, 0))
+            features.append(value)
+        return features
+    
+    def _calculate_ml_score(self, user_data: Dict, bundle: ModelBundle) -> float:
         """Calcul score avec Random Forest"""
         try:
-            employment_map = {
-                'cdi': 3,
-                'fonctionnaire': 3,
-                'cdd': 2,
-                'independant': 1,
-                'autre': 0
-            }
-            
-            # Construire les features dans l'ORDRE EXACT de self.feature_columns
-            features = []
-            for feature_name in self.feature_columns:
-                if feature_name == 'statut_emploi_encoded':
-                    value = employment_map.get(user_data.get('statut_emploi', 'autre'), 0)
-                else:
-                    value = self._convert_to_float(user_data.get(feature_name, 0))
-                features.append(value)
-            
-            X = np.array([features])
-            X_scaled = self.scaler.transform(X)
+            X = np.array([self._build_feature_row(user_data)], dtype=float)
             
             # Prediction
-            proba = self.model.predict_proba(X_scaled)[0]
+            proba = self._predict_good_client_proba(X, bundle)[0]
             
             # Convertir en score 0-10
-            score = 3.0 + (proba[1] * 7.0)
+            score = 3.0 + (proba * 7.0)
             
             return score
             
@@ -634,6 +918,158 @@ class CreditScoringModel:
         
         return recommendations
     
+    # ==========================================
+    # SCORING PAR LOT
+    # ==========================================
+    
+    def score_users(self, user_ids: Optional[List[int]] = None, persist: bool = True) -> Dict[int, Dict]:
+        """
+        Score un lot d'utilisateurs avec une seule requete, un seul transform
+        et un seul predict_proba. Sans user_ids, score tous les utilisateurs actifs.
+        """
+        with self.request_scope():
+            users = self._get_users_complete_data(user_ids)
+            
+            if not users:
+                return {}
+            
+            raw_scores = None
+            bundle = self._bundle
+            if bundle is not None:
+                try:
+                    X = np.array([self._build_feature_row(u) for u in users], dtype=float)
+                    proba = self._predict_good_client_proba(X, bundle)
+                    raw_scores = 3.0 + proba * 7.0
+                    model_type, confidence = 'random_forest', 0.85
+                except Exception as e:
+                    logger.error(f"Erreur ML scoring par lot: {e}")
+            
+            if raw_scores is None:
+                raw_scores = np.array([self._calculate_rule_based_score(u) for u in users], dtype=float)
+                model_type, confidence = 'rule_based', 0.70
+            
+            final_scores = np.clip(raw_scores, 0, 10)
+            scores_850 = (300 + (final_scores / 10) * 550).astype(int)
+            risk_levels = self._determine_risk_levels(final_scores)
+            eligible_amounts = self._calculate_eligible_amounts(
+                final_scores,
+                np.array([self._convert_to_float(u['revenu_mensuel']) for u in users]),
+                np.array([self._convert_to_float(u['ratio_endettement']) for u in users])
+            )
+            
+            results = {}
+            for i, user_data in enumerate(users):
+                results[int(user_data['id'])] = self._format_score_result(
+                    user_data,
+                    float(final_scores[i]),
+                    int(scores_850[i]),
+                    str(risk_levels[i]),
+                    int(eligible_amounts[i]),
+                    model_type,
+                    confidence
+                )
+            
+            if persist:
+                self.bulk_update_scores_in_db(results)
+            
+            logger.info(f"Scoring par lot: {len(results)} utilisateurs ({model_type})")
+            return results
+    
+    def _get_users_complete_data(self, user_ids: Optional[List[int]] = None) -> List[Dict]:
+        """Recupere les donnees de plusieurs utilisateurs en une requete ensembliste"""
+        if user_ids is not None:
+            user_ids = [int(uid) for uid in user_ids]
+            if not user_ids:
+                return []
+            payment_filter = "WHERE utilisateur_id = ANY(%(ids)s)"
+            user_filter = "WHERE u.id = ANY(%(ids)s)"
+        else:
+            payment_filter = ""
+            user_filter = "WHERE u.statut = 'actif'"
+        
+        with self.get_db_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(f"""
+                    WITH payment_stats AS ({payment_stats_cte(self.use_payment_stats_table, payment_filter)})
+                    SELECT 
+                        u.*,
+                        COALESCE(r.credits_actifs_count, 0) as credits_actifs_count,
+                        COALESCE(r.ratio_endettement, 0) as ratio_endettement,
+                        COALESCE(r.dette_totale_active, 0) as dette_totale_active,
+                        COALESCE(ps.total_paiements, 0) as total_paiements,
+                        COALESCE(ps.paiements_a_temps, 0) as paiements_a_temps,
+                        COALESCE(ps.paiements_en_retard, 0) as paiements_en_retard,
+                        COALESCE(ps.paiements_manques, 0) as paiements_manques,
+                        COALESCE(ps.moyenne_jours_retard, 0) as moyenne_jours_retard
+                    FROM utilisateurs u
+                    LEFT JOIN restrictions_credit r ON u.id = r.utilisateur_id
+                    LEFT JOIN payment_stats ps ON u.id = ps.utilisateur_id
+                    {user_filter}
+                    ORDER BY u.id
+                """, {'ids': user_ids})
+                
+                return [self._enrich_user_data(dict(row)) for row in cur.fetchall()]
+    
+    def _determine_risk_levels(self, scores: np.ndarray) -> np.ndarray:
+        """Version vectorisee de _determine_risk_level"""
+        return np.select(
+            [scores >= 8.0, scores >= 7.0, scores >= 5.0, scores >= 3.0],
+            ['tres_bas', 'bas', 'moyen', 'eleve'],
+            default='tres_eleve'
+        )
+    
+    def _calculate_eligible_amounts(self, scores: np.ndarray, revenus: np.ndarray,
+                                    ratios_dette: np.ndarray) -> np.ndarray:
+        """Version vectorisee de _calculate_eligible_amount"""
+        multipliers = np.select(
+            [scores >= 8, scores >= 7, scores >= 6, scores >= 5],
+            [0.8, 0.6, 0.5, 0.4],
+            default=0.3
+        )
+        montants = np.trunc(revenus * multipliers)
+        
+        # Reduire si endettement eleve
+        montants = np.where(ratios_dette > 50, np.trunc(montants * 0.5), montants)
+        montants = np.minimum(montants, 2000000)
+        
+        return np.where(scores < 4, 0, montants).astype(np.int64)
+    
+    def bulk_update_scores_in_db(self, results: Dict[int, Dict], page_size: int = 1000) -> int:
+        """Met a jour les scores en masse via UPDATE ... FROM (VALUES ...)"""
+        rows = [
+            (
+                int(user_id),
+                float(score_data['score']),
+                int(score_data['score_850']),
+                str(score_data['niveau_risque']),
+                int(score_data['montant_eligible'])
+            )
+            for user_id, score_data in results.items()
+        ]
+        
+        updated = 0
+        with self.get_db_connection() as conn:
+            with conn.cursor() as cur:
+                for start in range(0, len(rows), page_size):
+                    page = rows[start:start + page_size]
+                    execute_values(cur, """
+                        UPDATE utilisateurs AS u
+                        SET 
+                            score_credit = v.score_credit,
+                            score_850 = v.score_850,
+                            niveau_risque = v.niveau_risque::niveau_risque,
+                            montant_eligible = v.montant_eligible,
+                            date_modification = NOW()
+                        FROM (VALUES %s) AS v(id, score_credit, score_850, niveau_risque, montant_eligible)
+                        WHERE u.id = v.id
+                    """, page, page_size=len(page))
+                    updated += cur.rowcount
+        
+        for user_id, score_data in results.items():
+            self.score_cache.set(int(user_id), score_data)
+        
+        return updated
+    
     # ==========================================
     # METHODES EXISTANTES
     # ==========================================
@@ -709,9 +1145,22 @@ class CreditScoringModel:
                     ))
         except Exception as e:
             logger.error(f"Erreur lors de la mise à jour du score en DB: {e}")
+            self.score_cache.invalidate(user_id)
             return False
+        
+        # Write-through : le cache reflete le score qui vient d'etre persiste
+        self.score_cache.set(user_id, score_data)
         return True
     
+    def invalidate_score(self, user_id: int):
+        """Retire le score d'un utilisateur du cache"""
+        self.score_cache.invalidate(user_id)
+    
+    def on_payment_event(self, user_id: int):
+        """Un paiement a ete enregistre : le score en cache n'est plus valide"""
+        logger.debug("Evenement de paiement pour user %s, invalidation du cache", user_id)
+        self.invalidate_score(user_id)
+    
     def check_eligibility(self, user_id: int) -> Dict:
         """Verifie eligibilite"""
         with self.get_db_connection() as conn:
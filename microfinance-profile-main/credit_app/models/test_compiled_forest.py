@@ -0,0 +1,139 @@
+"""
+Equivalence du predicteur compile avec scaler.transform + predict_proba,
+et micro-benchmark ligne unique / lot.
+
+    python -m pytest test_compiled_forest.py
+    python test_compiled_forest.py       # benchmark
+"""
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from compiled_forest import CompiledForest, fold_scaler_thresholds
+
+
+def _synthetic_clients(n: int, seed: int = 0) -> np.ndarray:
+    """Features a l'echelle des donnees reelles (montants FCFA, mois, ratios)"""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.lognormal(13, 0.6, n),          # revenu_mensuel
+        rng.integers(0, 240, n),            # anciennete_mois
+        rng.lognormal(11.5, 0.8, n),        # charges_mensuelles
+        rng.lognormal(12, 1.5, n),          # dettes_existantes
+        rng.integers(0, 6, n),              # statut_emploi_encoded
+        rng.integers(0, 5, n),              # credits_actifs_count
+        rng.uniform(0, 80, n),              # ratio_endettement
+        rng.integers(0, 60, n),             # total_paiements
+        rng.integers(0, 40, n),             # paiements_a_temps
+        rng.integers(0, 10, n),             # paiements_en_retard
+        rng.integers(0, 5, n),              # paiements_manques
+        rng.exponential(5, n),              # moyenne_jours_retard
+        rng.uniform(0, 3, n),               # debt_to_income
+        rng.uniform(-1, 1, n),              # capacity_ratio
+        rng.uniform(0, 1, n)                # ratio_paiements_temps
+    ]).astype(float)
+
+
+def _fit(n_samples: int = 2000):
+    """Meme configuration que CreditScoringModel.train_model_from_database"""
+    X = _synthetic_clients(n_samples, seed=1)
+    y = ((X[:, 14] > 0.6) & (X[:, 6] < 50) | (X[:, 0] > 8e5)).astype(int)
+    flip = np.random.default_rng(2).random(n_samples) < 0.1
+    y[flip] = 1 - y[flip]
+
+    scaler = StandardScaler()
+    model = RandomForestClassifier(
+        n_estimators=100, max_depth=12, min_samples_split=5, min_samples_leaf=2,
+        max_features='sqrt', random_state=42, class_weight='balanced', n_jobs=1
+    )
+    model.fit(scaler.fit_transform(X), y)
+    return model, scaler
+
+
+_MODEL, _SCALER = _fit()
+_COMPILED = CompiledForest.from_model(_MODEL, _SCALER)
+
+
+def _reference(X):
+    # n_jobs=1 : sklearn additionne les arbres dans l'ordre des estimateurs
+    return _MODEL.predict_proba(_SCALER.transform(X))
+
+
+def test_batch_bit_for_bit():
+    X = _synthetic_clients(5000, seed=3)
+    assert np.array_equal(_COMPILED.predict_proba(X), _reference(X))
+
+
+def test_single_row_bit_for_bit():
+    X = _synthetic_clients(200, seed=4)
+    for row in X:
+        assert np.array_equal(_COMPILED.predict_proba(row), _reference(row.reshape(1, -1)))
+
+
+def test_values_on_split_boundaries():
+    """Les x juste autour de chaque seuil replie tombent du meme cote que sklearn"""
+    internal = _COMPILED.left != np.arange(len(_COMPILED.left))
+    features = _COMPILED.feature[internal]
+    thresholds = _COMPILED.threshold[internal][:500]
+    features = features[:500]
+
+    base = _synthetic_clients(len(thresholds), seed=5)
+    rows = []
+    for i, (f, t) in enumerate(zip(features, thresholds)):
+        for x in (np.nextafter(t, -np.inf), t, np.nextafter(t, np.inf)):
+            row = base[i].copy()
+            row[f] = x
+            rows.append(row)
+    X = np.array(rows)
+    assert np.array_equal(_COMPILED.predict_proba(X), _reference(X))
+
+
+def test_fold_scaler_thresholds_is_tight():
+    rng = np.random.default_rng(6)
+    mean = rng.normal(0, 1e6, 1000)
+    scale = rng.lognormal(10, 2, 1000)
+    threshold = rng.normal(0, 2, 1000)
+    raw = fold_scaler_thresholds(threshold, mean, scale)
+
+    def goes_left(x):
+        return ((x - mean) / scale).astype(np.float32) <= threshold
+
+    assert goes_left(raw).all()
+    assert not goes_left(np.nextafter(raw, np.inf)).any()
+
+
+def test_memory_mapped_roundtrip(tmp_path):
+    directory = os.path.join(tmp_path, 'compiled')
+    _COMPILED.save_arrays(directory)
+    loaded = CompiledForest.load_arrays(directory, mmap_mode='r')
+    X = _synthetic_clients(500, seed=7)
+    assert isinstance(loaded.threshold, np.memmap) and not loaded.threshold.flags.writeable
+    assert np.array_equal(loaded.predict_proba(X), _reference(X))
+
+
+def benchmark(repeats: int = 200):
+    """Latence sklearn (transform + predict_proba) vs predicteur compile"""
+    row = _synthetic_clients(1, seed=8)
+    batch = _synthetic_clients(1000, seed=9)
+
+    def timed(fn, X, n):
+        fn(X)
+        start = time.perf_counter()
+        for _ in range(n):
+            fn(X)
+        return (time.perf_counter() - start) / n * 1000
+
+    print(f"{'':<22}{'sklearn (ms)':>14}{'compile (ms)':>14}{'gain':>8}")
+    for label, X, n in (('ligne unique', row, repeats), ('lot de 1000', batch, max(1, repeats // 10))):
+        ref = timed(_reference, X, n)
+        fast = timed(_COMPILED.predict_proba, X, n)
+        print(f"{label:<22}{ref:>14.3f}{fast:>14.3f}{ref / fast:>7.1f}x")
+
+
+if __name__ == '__main__':
+    benchmark()
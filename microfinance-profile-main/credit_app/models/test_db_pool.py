@@ -0,0 +1,149 @@
+"""
+Pool de connexions : reutilisation au checkout, debordement borne, delai
+d'attente, verification de sante et portee de requete, avec des connexions
+factices (sans PostgreSQL).
+
+    python -m pytest test_db_pool.py
+"""
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from db_pool import PooledConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if self.conn.broken:
+            raise RuntimeError("connexion perdue")
+        self.conn.executed.append(sql)
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = 0
+        self.broken = False
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        if self.broken:
+            raise RuntimeError("connexion perdue")
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+def _pool(**kwargs):
+    pool = PooledConnectionPool({}, **kwargs)
+    created = []
+
+    def connect():
+        created.append(FakeConnection(len(created)))
+        return created[-1]
+
+    pool._connect = connect
+    return pool, created
+
+
+def test_checkout_reuses_idle_connection():
+    pool, created = _pool(min_size=1, max_size=2)
+    assert pool.prefill() == 1
+
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+    metrics = pool.get_metrics()
+    assert len(created) == 1 and metrics['checkouts'] == 2 and metrics['in_use'] == 1
+    assert conn.rollbacks == 1  # transaction fermee avant retour au pool
+
+
+def test_overflow_is_bounded_and_closed_on_return():
+    pool, created = _pool(min_size=0, max_size=1, max_overflow=1, timeout=0.05)
+    first = pool.getconn()
+    overflow = pool.getconn()
+    assert pool.get_metrics()['overflow'] == 1
+
+    try:
+        pool.getconn()
+    except PoolTimeout:
+        pass
+    else:
+        raise AssertionError("checkout au-dela de max_size + max_overflow")
+
+    pool.putconn(overflow)
+    pool.putconn(first)
+    metrics = pool.get_metrics()
+    assert overflow.closed and not first.closed
+    assert metrics['opened'] == 1 and metrics['idle'] == 1 and metrics['timeouts'] == 1
+    assert metrics['overflow_created'] == 1
+
+
+def test_waiter_gets_returned_connection():
+    pool, _ = _pool(min_size=0, max_size=1, max_overflow=0, timeout=2.0)
+    conn = pool.getconn()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.getconn()))
+    waiter.start()
+    pool.putconn(conn)
+    waiter.join(1.0)
+    assert got == [conn]
+
+
+def test_health_check_replaces_dead_connection():
+    pool, created = _pool(min_size=1, max_size=2, health_check_interval=0)
+    pool.prefill()
+    created[0].broken = True
+
+    conn = pool.getconn()
+    assert conn is created[1] and created[0].closed
+    metrics = pool.get_metrics()
+    assert metrics['health_check_failures'] == 1 and metrics['discarded'] == 1
+
+
+def test_connection_commits_or_rolls_back():
+    pool, created = _pool(min_size=0, max_size=1)
+    with pool.connection() as conn:
+        pass
+    assert conn.commits == 1
+
+    try:
+        with pool.connection() as conn:
+            raise ValueError("erreur metier")
+    except ValueError:
+        pass
+    # rollback de l'exception, puis celui du retour au pool
+    assert conn.commits == 1 and conn.rollbacks >= 2
+    assert len(created) == 1 and not conn.closed
+
+
+def test_request_scope_shares_one_connection():
+    pool, created = _pool(min_size=0, max_size=2)
+    with pool.request_scope():
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+        assert pool.get_metrics()['in_use'] == 1
+    assert first is second and len(created) == 1
+    metrics = pool.get_metrics()
+    assert metrics['scope_reuses'] == 1 and metrics['in_use'] == 0 and metrics['idle'] == 1
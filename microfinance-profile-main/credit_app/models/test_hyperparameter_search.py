@@ -0,0 +1,74 @@
+"""
+Recherche par divisions successives : paliers, budget, labels non numeriques,
+et ajout de colonnes a historique_modeles.csv.
+
+    python -m pytest test_hyperparameter_search.py
+"""
+import csv
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from hyperparameter_search import (_rung_schedule, append_model_history, history_row,
+                                   successive_halving_search)
+
+SMALL_SPACE = {'n_estimators': [5, 10], 'max_depth': [2, 4, None], 'min_samples_leaf': [1, 5]}
+
+
+def _data(n: int = 900, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([rng.lognormal(13, 0.6, n), rng.uniform(0, 80, n), rng.uniform(0, 1, n)])
+    y = ((X[:, 2] > 0.6) & (X[:, 1] < 50)).astype(int)
+    return X, y
+
+
+def test_rung_schedule():
+    assert _rung_schedule(900, 9, 3, 100) == [100, 300, 900]
+    # Pas assez de lignes pour tous les paliers : le dernier porte sur tout le jeu
+    assert _rung_schedule(250, 27, 3, 100) == [250]
+    assert _rung_schedule(400, 27, 3, 100) == [100, 400]
+
+
+def test_search_halves_candidates():
+    X, y = _data()
+    result = successive_halving_search(X, y, SMALL_SPACE, base_params={'random_state': 0},
+                                       n_candidates=9, cv=3, min_resources=100, n_workers=1)
+    assert result.stop_reason in ('complete', 'early_stopping')
+    per_rung = [len([t for t in result.trials if t.rung == r]) for r in range(result.rungs_completed)]
+    assert per_rung[0] == 9 and all(b == max(1, a // 3) for a, b in zip(per_rung, per_rung[1:]))
+    assert 'n_jobs' not in result.best_params and result.best_params['random_state'] == 0
+    assert 0.5 < result.best_score <= 1.0
+
+
+def test_string_labels():
+    X, y = _data(seed=1)
+    labels = np.where(y == 1, 'approuve', 'refuse').astype(object)
+    result = successive_halving_search(X, labels, SMALL_SPACE, n_candidates=3, cv=3,
+                                       scoring='f1_weighted', n_workers=1)
+    assert result.rungs_completed >= 1
+
+
+def test_budget_exhausted():
+    X, y = _data()
+    with pytest.raises(TimeoutError):
+        successive_halving_search(X, y, SMALL_SPACE, n_candidates=3, cv=3, budget_seconds=1e-6, n_workers=1)
+
+
+def test_history_adds_columns(tmp_path):
+    path = str(tmp_path / 'historique_modeles.csv')
+    append_model_history(path, history_row('v1', {'accuracy_test': 0.9}))
+    search = {'best_params': {'max_depth': 8}, 'cv_score': 0.91, 'search_seconds': 12.5,
+              'n_candidates': 9, 'rungs_completed': 3, 'stop_reason': 'complete'}
+    append_model_history(path, history_row('v2', {'accuracy_test': 0.92}, search=search, fit_seconds=3.2))
+    append_model_history(path, history_row('v3', {'accuracy_test': 0.93}))
+
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['version_modele'] for row in rows] == ['v1', 'v2', 'v3']
+    assert list(rows[0])[:3] == ['date', 'version_modele', 'accuracy_test']
+    assert rows[0]['cv_score'] == '' and rows[1]['cv_score'] == '0.91'
+    assert rows[1]['best_params'] == '{"max_depth": 8}' and rows[1]['fit_seconds'] == '3.2'
+
@@ -0,0 +1,239 @@
+"""
+Registre des versions : publication atomique, pointeur actif, retour arriere,
+suivi de la version active par chaque worker (sans PostgreSQL).
+
+    python -m pytest test_model_registry.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from model_registry import ModelRegistry, RegistryError
+from model_training import TrainingError, fit_scoring_model
+import scoring_model
+from scoring_model import CreditScoringModel
+
+FEATURES = ['revenu_mensuel', 'ratio_endettement', 'ratio_paiements_temps']
+# Socket inexistant : echec immediat, le service passe sans base
+NO_DB = {'host': '/nonexistent', 'dbname': 'credit', 'user': 'postgres', 'password': '', 'port': 5432}
+
+
+def _data(n: int = 300, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.lognormal(13, 0.6, n),
+        rng.uniform(0, 80, n),
+        rng.uniform(0, 1, n)
+    ])
+    y = ((X[:, 2] > 0.6) & (X[:, 1] < 50)).astype(int)
+    return X, y
+
+
+def _publish(registry: ModelRegistry, seed: int = 0) -> str:
+    X, y = _data(seed=seed)
+    model, scaler, metrics, validation_X = fit_scoring_model(X, y, {'n_estimators': 10, 'n_jobs': 1})
+    return registry.publish(model, scaler, FEATURES, metrics=metrics, validation_X=validation_X)
+
+
+def _worker(registry: ModelRegistry, **model_config) -> CreditScoringModel:
+    """Un worker du service sur le registre, chargement synchrone"""
+    return CreditScoringModel(NO_DB, {'min_size': 0, 'max_size': 1}, model_config={
+        'registry_dir': registry.root, 'load_in_background': False, **model_config
+    })
+
+
+def test_publish_and_load(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    version = _publish(registry)
+
+    assert registry.versions() == [version]
+    assert registry.active_version() is None
+    assert not [name for name in os.listdir(registry.root) if name.startswith('.staging-')]
+
+    bundle = registry.load(version, mmap_mode='r')
+    assert bundle.version == version
+    assert isinstance(bundle.compiled_model.threshold, np.memmap)
+    assert not bundle.model_loaded  # sklearn lu au premier acces seulement
+    assert list(bundle.feature_columns) == FEATURES
+    assert bundle.metadata['metrics']['test_score'] > 0.5
+    assert bundle.compiled_model is not None
+    X = bundle.validation_X
+    expected = bundle.model.predict_proba(bundle.scaler.transform(X))
+    assert bundle.model_loaded
+    np.testing.assert_array_equal(bundle.compiled_model.predict_proba(X), expected)
+
+
+def test_activate_and_rollback(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    v1, v2, v3 = (_publish(registry, seed) for seed in range(3))
+    assert len({v1, v2, v3}) == 3
+
+    registry.set_active(v1)
+    registry.set_active(v2)
+    registry.set_active(v3)
+    assert registry.active_version() == v3
+    assert [item['version'] for item in registry.list_versions() if item['active']] == [v3]
+
+    # Retours arriere successifs : v3 -> v2 -> v1, sans revenir sur v3
+    assert registry.rollback() == v2
+    assert registry.rollback() == v1
+    assert registry.active_version() == v1
+    with pytest.raises(RegistryError):
+        registry.rollback()
+
+    # Retour vers une version explicite
+    registry.set_active(v3)
+    assert registry.rollback(v2) == v2
+
+
+def test_unknown_version(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    for version in ('absente', '../ailleurs', 'ACTIVE', ''):
+        with pytest.raises(RegistryError):
+            registry.set_active(version)
+
+
+def test_fit_rejects_single_class():
+    X, _ = _data()
+    with pytest.raises(TrainingError):
+        fit_scoring_model(X, np.ones(len(X), dtype=int))
+
+
+def test_workers_follow_active_version(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    v1, v2 = (_publish(registry, seed) for seed in range(2))
+    registry.set_active(v1)
+    eager = _worker(registry, refresh_interval=0.0)
+    lazy = _worker(registry, refresh_interval=3600.0)
+    try:
+        assert eager.model_version == lazy.model_version == v1
+        assert not eager.refresh_active_version()  # pointeur inchange
+
+        # Activation par un autre worker
+        registry.set_active(v2)
+        assert eager.refresh_active_version()
+        assert eager.model_version == v2 and eager.model_state == 'ready'
+        assert eager.score_cache.version == v2
+        assert not eager.refresh_active_version()
+
+        assert not lazy.refresh_active_version()  # relu au plus toutes les heures
+        assert lazy.model_version == v1
+        assert lazy.refresh_active_version(force=True) and lazy.model_version == v2
+
+        assert registry.rollback() == v1
+        assert eager.refresh_active_version() and eager.model_version == v1
+    finally:
+        eager.shutdown(timeout=1.0)
+        lazy.shutdown(timeout=1.0)
+
+
+def test_training_timeout_fails_job(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    version = _publish(registry)
+    registry.set_active(version)
+    worker = _worker(registry, training_timeout=0.01)
+    try:
+        started, job = worker.start_background_training()
+        assert started and job['timeout'] == 0.01
+        deadline = time.monotonic() + 10.0
+        while worker.get_training_status()['status'] == 'running' and time.monotonic() < deadline:
+            time.sleep(0.02)
+
+        job = worker.get_training_status()
+        assert job['status'] == 'failed' and 'maximale' in job['error']
+        # Un nouvel entrainement peut etre lance, la version courante reste active
+        assert worker.model_version == version
+        assert worker.start_background_training()[0]
+    finally:
+        worker.shutdown(timeout=1.0)
+
+
+def test_tune_with_defaults(tmp_path, monkeypatch):
+    """{"tune": true} sans model_config['tuning'] : recherche avec les valeurs par defaut"""
+    calls = []
+
+    def fake_training(*args):
+        calls.append(args[7])
+        raise TrainingError('non entraine')
+
+    monkeypatch.setattr(scoring_model, 'run_training_process', fake_training)
+    registry = ModelRegistry(str(tmp_path))
+    registry.set_active(_publish(registry))
+    worker = _worker(registry)
+    try:
+        for search, expected in (({}, {}), (False, None), (None, None), ({'cv': 3}, {'cv': 3})):
+            started, job = worker.start_background_training(search=search)
+            assert started and job['tuning'] == expected
+            worker._training_executor.submit(lambda: None).result(timeout=5.0)
+            assert worker.get_training_status()['status'] == 'rejected'
+        assert calls == [{}, None, None, {'cv': 3}]
+    finally:
+        worker.shutdown(timeout=1.0)
+
+
+def test_training_lock_is_exclusive(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    first, second = registry.training_lock(), registry.training_lock()
+    assert first.acquire()
+    assert not second.acquire() and not second.held
+    first.release()
+    assert second.acquire()
+    second.release()
+    assert registry.versions() == []
+
+
+def test_waiting_worker_installs_first_version(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # pas d'ancien modele a importer
+    registry = ModelRegistry(str(tmp_path / 'registry'))
+    trainer = registry.training_lock()
+    assert trainer.acquire()  # premier entrainement mene par un autre worker
+    worker = _worker(registry, load_in_background=True, refresh_interval=0.01)
+    try:
+        time.sleep(0.1)
+        assert worker.model_state == 'training' and not worker.has_model
+        assert worker.get_training_status()['status'] == 'idle'  # n'entraine pas lui-meme
+
+        version = _publish(registry)
+        registry.set_active(version)
+        worker._loader_thread.join(5.0)
+        assert worker.model_state == 'ready' and worker.model_version == version
+    finally:
+        trainer.release()
+        worker.shutdown(timeout=1.0)
+
+
+def test_waiting_worker_falls_back_to_rules(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    registry = ModelRegistry(str(tmp_path / 'registry'))
+    trainer = registry.training_lock()
+    assert trainer.acquire()
+    worker = _worker(registry, load_in_background=True, refresh_interval=0.01)
+    try:
+        time.sleep(0.1)
+        trainer.release()  # entrainement termine sans version active
+        worker._loader_thread.join(5.0)
+        assert worker.model_state == 'rule_based' and not worker.has_model
+    finally:
+        worker.shutdown(timeout=1.0)
+
+
+def test_validation_uses_compiled_predictor(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    v1, v2 = (_publish(registry, seed) for seed in range(2))
+    registry.set_active(v1)
+    worker = _worker(registry)
+    worker.feature_columns = list(FEATURES)
+    try:
+        bundle = worker.activate_version(v2)
+        assert bundle.compiled_model is not None and not bundle.model_loaded
+
+        # Sans tableaux compiles, validation par le modele sklearn
+        bundle = registry.load(v1, use_compiled=False)
+        worker.validate_bundle(bundle)
+        assert bundle.model_loaded
+    finally:
+        worker.shutdown(timeout=1.0)
@@ -0,0 +1,57 @@
+"""
+File d'envoi des notifications : vidage a l'arret et arret borne dans le
+temps quand la file est pleine et l'ecrivain bloque (sans PostgreSQL).
+
+    python -m pytest test_notification_outbox.py
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from notification_outbox import NotificationOutbox
+
+
+def _outbox(write, **kwargs):
+    outbox = NotificationOutbox(get_connection=None, **kwargs)
+    outbox._write = write
+    outbox.start()
+    return outbox
+
+
+def test_close_writes_pending_notifications():
+    written = []
+    outbox = _outbox(written.extend, batch_size=2, flush_interval=0.05)
+    for user_id in range(5):
+        assert outbox.enqueue(user_id, 'score_update', 'Score', 'message')
+
+    assert outbox.close(timeout=2.0)
+    assert [item[0] for item in written] == list(range(5))
+    assert not outbox.enqueue(9, 'score_update', 'Score', 'message')
+    stats = outbox.get_stats()
+    assert stats['written'] == 5 and stats['dropped'] == 1 and not stats['running']
+
+
+def test_close_is_bounded_when_queue_is_full():
+    release = threading.Event()
+    written = []
+
+    def blocked_write(batch):
+        release.wait(5.0)
+        written.extend(batch)
+
+    outbox = _outbox(blocked_write, max_queue_size=1, batch_size=1, flush_interval=0.01)
+    assert outbox.enqueue(1, 'score_update', 'Score', 'message')
+    time.sleep(0.05)  # l'ecrivain a pris la premiere notification et bloque
+    assert outbox.enqueue(2, 'score_update', 'Score', 'message')
+
+    start = time.monotonic()
+    assert not outbox.close(timeout=0.2)
+    assert time.monotonic() - start < 1.0
+
+    # Une fois debloque, l'ecrivain vide la file puis s'arrete sans _STOP
+    release.set()
+    outbox._thread.join(2.0)
+    assert not outbox._thread.is_alive()
+    assert [item[0] for item in written] == [1, 2]
@@ -0,0 +1,121 @@
+"""
+Statistiques de paiement incrementales : memes colonnes dans les deux
+formes de la CTE, et trigger coherent avec l'agregation complete apres
+insertions, modifications et suppressions.
+
+Le test du trigger utilise un schema jetable sur une base PostgreSQL de
+test, indiquee par PAYMENT_STATS_TEST_DSN (ignore sinon) :
+
+    PAYMENT_STATS_TEST_DSN="dbname=test host=localhost" python -m pytest test_payment_stats.py
+"""
+import os
+import re
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from payment_stats import PaymentStatsStore, payment_stats_cte
+
+TEST_DSN = os.getenv('PAYMENT_STATS_TEST_DSN')
+
+BASE_SCHEMA = """
+    CREATE TYPE type_paiement AS ENUM ('a_temps', 'en_retard', 'manque', 'anticipe');
+    CREATE TABLE utilisateurs (id serial PRIMARY KEY);
+    CREATE TABLE historique_paiements (
+        id serial PRIMARY KEY,
+        utilisateur_id integer NOT NULL REFERENCES utilisateurs(id) ON DELETE CASCADE,
+        date_paiement timestamp without time zone DEFAULT now() NOT NULL,
+        jours_retard integer DEFAULT 0,
+        type_paiement type_paiement NOT NULL
+    );
+"""
+
+
+def _select_columns(sql):
+    select = sql.split('FROM')[0]
+    return [re.split(r'\s+as\s+|\s+', line.strip().rstrip(','))[-1]
+            for line in select.splitlines()[2:] if line.strip()]
+
+
+def test_cte_forms_expose_same_columns():
+    table = _select_columns(payment_stats_cte(True))
+    aggregate = _select_columns(payment_stats_cte(False))
+    assert table == aggregate == [
+        'utilisateur_id', 'total_paiements', 'paiements_a_temps', 'paiements_en_retard',
+        'paiements_manques', 'moyenne_jours_retard'
+    ]
+    assert 'WHERE utilisateur_id = %s' in payment_stats_cte(True, 'WHERE utilisateur_id = %s')
+
+
+@pytest.fixture
+def store():
+    if not TEST_DSN:
+        pytest.skip("PAYMENT_STATS_TEST_DSN non defini")
+    psycopg2 = pytest.importorskip('psycopg2')
+    schema = f"test_payment_stats_{os.getpid()}"
+    conn = psycopg2.connect(TEST_DSN)
+
+    @contextmanager
+    def get_connection():
+        with conn:
+            yield conn
+
+    with get_connection() as c, c.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA {schema}")
+        cur.execute(f"SET search_path TO {schema}")
+        cur.execute(BASE_SCHEMA)
+        cur.execute("INSERT INTO utilisateurs SELECT FROM generate_series(1, 3)")
+    try:
+        yield PaymentStatsStore(get_connection), get_connection
+    finally:
+        conn.rollback()
+        with get_connection() as c, c.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {schema} CASCADE")
+        conn.close()
+
+
+def _stats(get_connection, user_id):
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT total_paiements, paiements_a_temps, paiements_en_retard,
+                   somme_jours_retard, nb_jours_retard
+            FROM statistiques_paiements WHERE utilisateur_id = %s
+        """, (user_id,))
+        return cur.fetchone()
+
+
+def test_trigger_tracks_inserts_updates_and_deletes(store):
+    store, get_connection = store
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO historique_paiements (utilisateur_id, jours_retard, type_paiement)
+            VALUES (1, 0, 'a_temps'), (1, 5, 'en_retard'), (2, 0, 'a_temps')
+        """)
+    assert store.install(backfill=True) == 2 and store.is_installed()
+
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("INSERT INTO historique_paiements (utilisateur_id, jours_retard, type_paiement) "
+                    "VALUES (1, 12, 'en_retard'), (3, NULL, 'manque')")
+        cur.execute("UPDATE historique_paiements SET type_paiement = 'a_temps', jours_retard = 0 "
+                    "WHERE utilisateur_id = 1 AND jours_retard = 5")
+        cur.execute("DELETE FROM historique_paiements WHERE utilisateur_id = 2")
+
+    assert _stats(get_connection, 1) == (3, 2, 1, 12, 3)
+    assert _stats(get_connection, 2)[0] == 0
+    assert _stats(get_connection, 3) == (1, 0, 0, 0, 0)
+    assert store.check_consistency()['consistent']
+
+
+def test_check_consistency_repairs_drift(store):
+    store, get_connection = store
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("INSERT INTO historique_paiements (utilisateur_id, type_paiement) VALUES (1, 'a_temps')")
+    store.install()
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("UPDATE statistiques_paiements SET total_paiements = 99 WHERE utilisateur_id = 1")
+
+    report = store.check_consistency(repair=True)
+    assert report['mismatched_user_ids'] == [1] and report['repaired'] == 1
+    assert store.check_consistency()['consistent']
@@ -0,0 +1,87 @@
+"""
+Cache des graphiques : cle par version et snapshot, relecture disque,
+invalidation des anciennes cles; le tableau de bord suit la version active
+du registre.
+
+    python -m pytest test_plot_cache.py
+"""
+import importlib
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from model_registry import ModelRegistry
+from model_training import fit_scoring_model
+from plot_cache import PlotCache, snapshot_key
+
+
+def test_snapshot_key():
+    metrics = {'accuracy': 0.8, 'f1_score': 0.7}
+    key = snapshot_key('20250101_120000-abcd1234', metrics, [0, 1, 1])
+    assert key.startswith('20250101_120000-abcd1234-')
+    assert key == snapshot_key('20250101_120000-abcd1234', dict(reversed(list(metrics.items()))), [0, 1, 1])
+    assert key != snapshot_key('20250101_120000-abcd1234', metrics, [0, 1, 0])
+    assert key != snapshot_key('autre', metrics, [0, 1, 1])
+    assert '/' not in snapshot_key('../x', metrics)
+
+
+def test_put_get_and_reload(tmp_path):
+    directory = str(tmp_path)
+    cache = PlotCache(directory)
+    assert cache.get('v1-a', 'roc_curve') is None
+    png, etag = cache.put('v1-a', 'roc_curve', b'\x89PNG-roc')
+    assert cache.get('v1-a', 'roc_curve') == (png, etag)
+    cache.save_data('v1-a', 'evaluation', {'cv_scores': [0.8, 0.9]})
+
+    # Nouveau processus : relu depuis le disque, meme ETag
+    reloaded = PlotCache(directory)
+    assert reloaded.get('v1-a', 'roc_curve') == (b'\x89PNG-roc', etag)
+    assert reloaded.load_data('v1-a', 'evaluation') == {'cv_scores': [0.8, 0.9]}
+    assert reloaded.put('v1-a', 'roc_curve', b'\x89PNG-autre')[1] != etag
+
+
+def test_invalidate_keeps_current(tmp_path):
+    cache = PlotCache(str(tmp_path))
+    cache.put('v1-a', 'roc_curve', b'old')
+    cache.put('v2-b', 'roc_curve', b'new')
+    cache.invalidate(keep='v2-b')
+    assert cache.get('v1-a', 'roc_curve') is None
+    assert cache.get('v2-b', 'roc_curve')[0] == b'new'
+    assert os.listdir(cache.directory) == ['v2-b']
+
+
+def _publish(registry, seed):
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 1, (200, 3))
+    y = (X[:, 0] > 0.5).astype(int)
+    model, scaler, metrics, validation_X = fit_scoring_model(X, y, {'n_estimators': 5, 'n_jobs': 1})
+    version = registry.publish(model, scaler, ['a', 'b', 'c'], metrics=metrics, validation_X=validation_X)
+    registry.set_active(version)
+    return version
+
+
+def test_dashboard_follows_active_version(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # instance globale du module : caches sous tmp_path
+    dashboard_module = importlib.import_module('flask_ml_dashboard')
+    registry = ModelRegistry(str(tmp_path / 'registry'))
+    plots = str(tmp_path / 'plots')
+    monkeypatch.setattr(dashboard_module, 'MODEL_REGISTRY_DIR', registry.root)
+    monkeypatch.setattr(dashboard_module, 'PLOT_CACHE_DIR', plots)
+    monkeypatch.setattr(dashboard_module, 'REFRESH_INTERVAL', 0)
+
+    first = _publish(registry, seed=0)
+    dashboard = dashboard_module.IntegratedDashboard()
+    old_key = dashboard.cache_key
+    assert old_key.startswith(first + '-')
+    dashboard._renderer.submit(lambda: None).result(timeout=60)
+    assert os.listdir(plots) == [old_key]
+    assert dashboard.refresh() is None
+
+    # Nouvelle version active : nouvelle cle, anciens graphiques supprimes
+    second = _publish(registry, seed=1)
+    new_key = dashboard.refresh().result(timeout=60)
+    assert new_key.startswith(second + '-') and dashboard.cache_key == new_key
+    assert os.listdir(plots) == [new_key]
+    assert dashboard.refresh() is None
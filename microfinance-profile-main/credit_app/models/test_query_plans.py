@@ -0,0 +1,96 @@
+"""
+Migrations versionnees et verificateur de plans : ordre des versions,
+detection d'une migration modifiee, parcours des plans EXPLAIN.
+
+    python -m pytest test_query_plans.py
+
+Verification complete sur une base de test (PostgreSQL) :
+    python migrations.py migrate && python query_plans.py --generate 20000
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from migrations import MIGRATIONS, Migration, MigrationError, MigrationRunner
+from query_plans import HOT_QUERIES, plan_summary, seq_scans
+
+PLAN_SEQ = {
+    'Node Type': 'Limit',
+    'Plans': [{
+        'Node Type': 'Sort',
+        'Plans': [{'Node Type': 'Seq Scan', 'Relation Name': 'notifications'}]
+    }]
+}
+
+PLAN_BITMAP_OR = {
+    'Node Type': 'Limit',
+    'Plans': [{
+        'Node Type': 'Bitmap Heap Scan', 'Relation Name': 'utilisateurs',
+        'Plans': [{
+            'Node Type': 'BitmapOr',
+            'Plans': [
+                {'Node Type': 'Bitmap Index Scan', 'Index Name': 'idx_utilisateurs_email'},
+                {'Node Type': 'Bitmap Index Scan', 'Index Name': 'idx_utilisateurs_nom'}
+            ]
+        }]
+    }]
+}
+
+
+def _applied(*migrations):
+    return {m.version: {'name': m.name, 'checksum': m.checksum} for m in migrations}
+
+
+def _runner(migrations=None):
+    # pending() recoit l'historique : aucune connexion necessaire
+    return MigrationRunner(get_connection=None, migrations=migrations)
+
+
+def test_seq_scan_detection():
+    assert seq_scans(PLAN_SEQ) == ['notifications']
+    assert seq_scans(PLAN_BITMAP_OR) == []
+    assert plan_summary(PLAN_BITMAP_OR) == [
+        'Bitmap Heap Scan (utilisateurs)',
+        'Bitmap Index Scan (idx_utilisateurs_email)',
+        'Bitmap Index Scan (idx_utilisateurs_nom)'
+    ]
+
+
+def test_hot_query_params():
+    for query in HOT_QUERIES:
+        assert query.sql.count('%s') == len(query.params), query.name
+        assert set(query.params) <= {'id', 'email', 'nom'}
+
+
+def test_pending_in_version_order():
+    runner = _runner()
+    assert [m.version for m in runner.pending({})] == [m.version for m in MIGRATIONS]
+    assert runner.pending(_applied(*MIGRATIONS)) == []
+    assert [m.version for m in runner.pending(_applied(MIGRATIONS[0]))] == [2]
+
+
+def test_modified_or_unknown_migration_is_rejected():
+    edited = MIGRATIONS[0]._replace(sql=MIGRATIONS[0].sql + "\n-- modifie")
+    for applied in (_applied(edited), _applied(Migration(99, 'disparue', 'SELECT 1'))):
+        with pytest.raises(MigrationError):
+            _runner().pending(applied)
+
+
+def test_versions_must_increase():
+    with pytest.raises(MigrationError):
+        _runner([Migration(2, 'b', 'SELECT 1'), Migration(1, 'a', 'SELECT 1')])
+
+
+def test_indexes_cover_hot_paths():
+    sql = ' '.join(m.sql for m in MIGRATIONS)
+    for fragment in (
+        'historique_paiements (utilisateur_id, date_paiement DESC)',
+        'historique_scores (utilisateur_id, date_calcul DESC)',
+        'notifications (utilisateur_id, date_creation DESC)',
+        'WHERE lu = FALSE',
+        'utilisateurs (nom)',
+    ):
+        assert fragment in sql, fragment
+
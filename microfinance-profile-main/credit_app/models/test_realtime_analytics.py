@@ -0,0 +1,89 @@
+"""
+Analytics du portefeuille : percentiles, decoupages et repartitions tenus
+sur l'histogramme identiques aux calculs directs sur la liste des scores,
+y compris apres remplacement de scores existants.
+
+    python -m pytest test_realtime_analytics.py
+"""
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from realtime_analytics import PortfolioAnalytics
+
+RISK_LEVELS = ('tres_bas', 'bas', 'moyen', 'eleve')
+QS = (0, 1, 10, 25, 33.3, 50, 75, 90, 99, 100)
+EDGES = [0.0, 2.5, 5.0, 5.05, 6.0, 7.0, 9.0, 10.1]
+
+
+def _score(rng):
+    return {'score': round(rng.uniform(0, 10), 1), 'risk_level': rng.choice(RISK_LEVELS)}
+
+
+def _check_against_direct(analytics, scores):
+    values = np.array([data['score'] for data in scores.values()])
+    assert analytics.total_users == len(values)
+    assert np.isclose(analytics.average_score, values.mean())
+
+    expected = np.percentile(values, QS)
+    percentiles = analytics.percentiles(QS)
+    assert np.allclose([percentiles[f'p{q:g}'] for q in QS], expected)
+
+    direct = [int(((values >= lo - 1e-9) & (values < hi - 1e-9)).sum()) for lo, hi in zip(EDGES, EDGES[1:])]
+    assert analytics.bucket_counts(EDGES) == direct
+
+    risks = {}
+    for data in scores.values():
+        risks[data['risk_level']] = risks.get(data['risk_level'], 0) + 1
+    assert analytics.risk_counts == risks
+
+
+def test_matches_numpy_on_random_portfolios():
+    for seed in range(30):
+        rng = random.Random(seed)
+        scores = {user_id: _score(rng) for user_id in range(rng.randint(1, 400))}
+        analytics = PortfolioAnalytics()
+        for data in scores.values():
+            analytics.update(None, data)
+        _check_against_direct(analytics, scores)
+
+        rebuilt = PortfolioAnalytics()
+        rebuilt.rebuild(scores.items())
+        assert np.array_equal(rebuilt.histogram, analytics.histogram)
+
+
+def test_update_replaces_previous_score_and_risk():
+    analytics = PortfolioAnalytics()
+    old = {'score': 6.0, 'risk_level': 'moyen'}
+    analytics.update(None, old)
+    analytics.update(None, {'score': 8.0, 'risk_level': 'bas'})
+
+    analytics.update(old, {'score': 4.2, 'risk_level': 'eleve'})
+    assert analytics.total_users == 2
+    assert analytics.histogram[60] == 0 and analytics.histogram[42] == 1
+    assert analytics.risk_counts == {'bas': 1, 'eleve': 1}  # 'moyen' retire, pas a zero
+    assert analytics.score_distribution()['bon'] == 0
+    assert analytics.score_distribution()['a_ameliorer'] == 1
+    assert np.isclose(analytics.average_score, 6.1)
+
+
+def test_random_replacements_match_direct_recount():
+    rng = random.Random(99)
+    scores = {}
+    analytics = PortfolioAnalytics()
+    for _ in range(5000):
+        user_id = rng.randrange(300)
+        new = _score(rng)
+        analytics.update(scores.get(user_id), new)
+        scores[user_id] = new
+    _check_against_direct(analytics, scores)
+
+
+def test_empty_portfolio():
+    analytics = PortfolioAnalytics()
+    assert analytics.percentiles() == {}
+    assert analytics.bucket_counts(EDGES) == [0] * (len(EDGES) - 1)
+    assert analytics.summary(0) == {'message': 'Aucune donnée disponible'}
@@ -0,0 +1,132 @@
+"""
+Etat temps reel en base (SQLite) : ecriture differee hors boucle asyncio,
+retention par utilisateur et purge par date dans rt_transactions identiques
+a celles des tampons en memoire, rechargement au demarrage et arret borne
+dans le temps quand la file est pleine.
+
+    python -m pytest test_realtime_state.py
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from realtime_scoring_service import RealtimeScoringService, Transaction, TransactionType
+from realtime_state import SQLStateStore
+
+START = datetime(2026, 1, 5, 9, 0)
+
+
+def _transaction(user_id, minutes):
+    date = START + timedelta(minutes=minutes)
+    return Transaction(user_id, TransactionType.PAYMENT, 25000.0, date, date)
+
+
+def _rows(path, sql):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(sql).fetchall()
+
+
+def test_transactions_are_trimmed_per_user_in_sql(tmp_path):
+    path = str(tmp_path / 'state.db')
+    store = SQLStateStore.sqlite(path, max_transactions_per_user=3, commit_every=4)
+    for minutes in range(10):
+        store.append_transaction(_transaction(1, minutes))
+        store.append_transaction(_transaction('u2', minutes))
+    store.append_transaction(_transaction(3, 0))
+    assert store.flush(timeout=5.0)
+
+    counts = dict(_rows(path, "SELECT user_id, COUNT(*) FROM rt_transactions GROUP BY user_id"))
+    assert counts == {'1': 3, '"u2"': 3, '3': 1}
+    assert store.memory_stats()['writer']['written'] == 21
+    store.close()
+
+    reloaded = SQLStateStore.sqlite(path, max_transactions_per_user=3)
+    reloaded.load()
+    assert [t.actual_date for t in reloaded.get_transactions(1)] == \
+        [t.actual_date for t in store.get_transactions(1)]
+    assert reloaded.total_transactions() == 21
+    reloaded.close()
+
+
+def test_process_transaction_does_not_write_on_event_loop(tmp_path):
+    path = str(tmp_path / 'state.db')
+    store = SQLStateStore.sqlite(path)
+    loop_thread = threading.get_ident()
+    writers = set()
+    execute = store._write_batch
+
+    def recording_write_batch(batch):
+        writers.add(threading.get_ident())
+        execute(batch)
+
+    store._write_batch = recording_write_batch
+    service = RealtimeScoringService(None, store)
+
+    async def run():
+        for minutes in range(5):
+            result = await service.process_transaction(_transaction(7, minutes))
+            assert result['success']
+
+    asyncio.run(run())
+    assert store.close(timeout=5.0)
+    assert writers and loop_thread not in writers
+
+    assert _rows(path, "SELECT COUNT(*) FROM rt_transactions") == [(5,)]
+    assert _rows(path, "SELECT COUNT(*) FROM rt_score_history") == [(5,)]
+    reloaded = SQLStateStore.sqlite(path)
+    assert reloaded.load() == 1 and reloaded.get_score(7)['score'] == service.get_current_score(7)['score']
+    reloaded.close()
+
+
+def test_close_is_bounded_when_queue_is_full(tmp_path):
+    path = str(tmp_path / 'state.db')
+    store = SQLStateStore.sqlite(path, max_queue_size=1, commit_every=1, flush_interval=0.01)
+    release = threading.Event()
+    execute = store._write_batch
+
+    def blocked_write_batch(batch):
+        release.wait(5.0)
+        execute(batch)
+
+    store._write_batch = blocked_write_batch
+    store.append_transaction(_transaction(1, 0))
+    time.sleep(0.05)  # l'ecrivain a pris la premiere ecriture et bloque
+    store.append_transaction(_transaction(1, 1))
+
+    start = time.monotonic()
+    assert not store.close(timeout=0.2)
+    assert time.monotonic() - start < 1.0
+    store.append_transaction(_transaction(1, 2))  # apres close : abandonnee
+
+    # Debloque, l'ecrivain vide la file, s'arrete sans _STOP et ferme la connexion
+    release.set()
+    store._writer.join(2.0)
+    assert not store._writer.is_alive()
+    with pytest.raises(sqlite3.ProgrammingError):
+        store._conn.cursor()
+    assert _rows(path, "SELECT COUNT(*) FROM rt_transactions") == [(2,)]
+    assert store.memory_stats()['writer']['dropped'] == 1
+
+
+def test_purge_trims_memory_like_sql(tmp_path):
+    path = str(tmp_path / 'state.db')
+    store = SQLStateStore.sqlite(path, retention_days=1)
+    for minutes in (0, 10, 3 * 24 * 60, 3 * 24 * 60 + 5):
+        store.append_transaction(_transaction(1, minutes))
+    store.append_transaction(_transaction(2, 0))
+    now = START + timedelta(days=3)
+    assert store.purge_expired(now) == 3
+    assert store.flush(timeout=5.0)
+
+    in_memory = {user_id: [t.actual_date for t in store.get_transactions(user_id)] for user_id in (1, 2)}
+    assert in_memory == {1: [START + timedelta(days=3), START + timedelta(days=3, minutes=5)], 2: []}
+    assert store.memory_stats()['users'] == 1
+    assert len(_rows(path, "SELECT id FROM rt_transactions")) == 2
+    store.close()
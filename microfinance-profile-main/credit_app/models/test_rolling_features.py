@@ -0,0 +1,182 @@
+"""
+Tests de propriete : les accumulateurs glissants donnent les memes resultats
+que les anciens parcours de l'historique complet de RealtimeScoringService.
+
+    python -m pytest test_rolling_features.py
+"""
+import math
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from realtime_scoring_service import RealtimeScoringService, Transaction, TransactionType
+from rolling_features import RollingFeatures, SlidingMoments
+
+TRIALS = 200
+
+
+# ==========================================
+# REFERENCES : parcours de liste d'origine
+# ==========================================
+
+def ref_recent(history, now):
+    return [t for t in history if (now - t.actual_date).days <= 90]
+
+
+def ref_punctuality(history, now):
+    payments = [t for t in ref_recent(history, now)
+                if t.transaction_type in [TransactionType.PAYMENT,
+                                          TransactionType.LATE_PAYMENT,
+                                          TransactionType.MISSED_PAYMENT]]
+    if payments:
+        on_time = len([t for t in payments if t.transaction_type == TransactionType.PAYMENT])
+        return (on_time / len(payments)) * 100
+    return 75
+
+
+def ref_missed(history, now):
+    return len([t for t in history
+                if t.transaction_type == TransactionType.MISSED_PAYMENT and
+                (now - t.actual_date).days <= 90])
+
+
+def ref_consistency(history):
+    payments = [t for t in history[-12:]
+                if t.transaction_type in [TransactionType.PAYMENT, TransactionType.LATE_PAYMENT]]
+    if len(payments) < 2:
+        return 75.0
+    amounts = [t.amount for t in payments]
+    avg_amount = sum(amounts) / len(amounts)
+    amount_variance = sum((a - avg_amount) ** 2 for a in amounts) / len(amounts)
+    return min(100, max(0, 100 - (amount_variance / avg_amount * 100)))
+
+
+def ref_debt_trend(history):
+    loans = [t for t in history[-6:] if t.transaction_type == TransactionType.NEW_LOAN]
+    closures = [t for t in history[-6:] if t.transaction_type == TransactionType.LOAN_CLOSURE]
+    if len(loans) > len(closures):
+        return 'increasing'
+    elif len(closures) > len(loans):
+        return 'decreasing'
+    return 'stable'
+
+
+# ==========================================
+# GENERATEUR
+# ==========================================
+
+def random_stream(rng: random.Random, length: int):
+    """Transactions hors ordre, anciennes, futures; horloge croissante"""
+    now = datetime(2024, 1, 1) + timedelta(seconds=rng.randrange(10 ** 7))
+    types = list(TransactionType)
+    regular_amount = rng.choice([25000.0, 50000.0, 100000.0])
+    for _ in range(length):
+        now += timedelta(seconds=rng.choice([0, 1, 60, 3600, 86400, 86400 * 7, 86400 * 30]))
+        offset = rng.choice([
+            timedelta(0),
+            -timedelta(days=rng.uniform(0, 120)),
+            -timedelta(days=91) + timedelta(microseconds=rng.randint(-2, 2)),  # bord de fenetre
+            timedelta(days=rng.uniform(0, 5))
+        ])
+        amount = regular_amount if rng.random() < 0.5 else round(rng.uniform(1000, 200000), 2)
+        yield now, Transaction(
+            user_id='u1',
+            transaction_type=rng.choice(types),
+            amount=amount,
+            scheduled_date=now,
+            actual_date=now + offset
+        )
+
+
+def _close(a, b):
+    return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
+
+
+# ==========================================
+# TESTS
+# ==========================================
+
+def test_equivalent_to_list_scans():
+    for seed in range(TRIALS):
+        rng = random.Random(seed)
+        history, features = [], RollingFeatures()
+        for now, transaction in random_stream(rng, rng.randint(1, 80)):
+            history.append(transaction)
+            features.add(transaction, now)
+
+            assert features.recent_count(now) == len(ref_recent(history, now)), seed
+            assert features.missed_count(now) == ref_missed(history, now), seed
+            assert _close(features.punctuality_score(now), ref_punctuality(history, now)), seed
+            assert _close(features.payment_consistency(), ref_consistency(history)), seed
+            assert features.debt_trend() == ref_debt_trend(history), seed
+
+
+def test_queries_after_clock_advance():
+    """Les evenements expirent sans nouvelle transaction"""
+    for seed in range(TRIALS):
+        rng = random.Random(10_000 + seed)
+        history, features = [], RollingFeatures()
+        now = None
+        for now, transaction in random_stream(rng, rng.randint(1, 40)):
+            history.append(transaction)
+            features.add(transaction, now)
+        for days in (1, 30, 89, 91, 200):
+            later = now + timedelta(days=days)
+            assert features.recent_count(later) == len(ref_recent(history, later)), seed
+            assert _close(features.punctuality_score(later), ref_punctuality(history, later)), seed
+
+
+def test_rebuild_from_transactions():
+    rng = random.Random(42)
+    stream = list(random_stream(rng, 60))
+    now = stream[-1][0]
+    history = [t for _, t in stream]
+    rebuilt = RollingFeatures.from_transactions(history, now)
+    assert rebuilt.recent_count(now) == len(ref_recent(history, now))
+    assert _close(rebuilt.payment_consistency(), ref_consistency(history))
+    assert rebuilt.debt_trend() == ref_debt_trend(history)
+
+
+def test_sliding_moments_long_stream():
+    """Pas de derive de Welford apres de nombreux ajouts/retraits"""
+    rng = random.Random(7)
+    window, moments = [], SlidingMoments()
+    for _ in range(100_000):
+        x = rng.uniform(1000, 200000)
+        window.append(x)
+        moments.add(x)
+        if len(window) > 12:
+            moments.remove(window.pop(0))
+    mean = sum(window) / len(window)
+    variance = sum((a - mean) ** 2 for a in window) / len(window)
+    assert math.isclose(moments.mean, mean, rel_tol=1e-9)
+    assert math.isclose(moments.variance, variance, rel_tol=1e-6)
+
+
+def test_service_bounds_rolling_features():
+    """LRU et eviction apres inactivite; un utilisateur evince est reconstruit a l'identique"""
+    service = RealtimeScoringService(None, max_rolling_users=3)
+    now = datetime.now()
+    stream = {}
+    for user_id in range(5):
+        stream[user_id] = [t for _, t in random_stream(random.Random(user_id), 20)]
+        for transaction in stream[user_id]:
+            transaction.user_id = user_id
+            service.state.append_transaction(transaction)
+            service._update_rolling_features(transaction)
+    assert list(service.rolling_features) == [2, 3, 4]
+
+    rebuilt = service._get_rolling_features(0)
+    reference = RollingFeatures.from_transactions(service.state.get_transactions(0), now)
+    assert rebuilt.recent_count(now) == reference.recent_count(now)
+    assert _close(rebuilt.payment_consistency(), reference.payment_consistency())
+    assert list(service.rolling_features) == [3, 4, 0]
+
+    # Inactif depuis plus que la fenetre : evince au prochain acces
+    features, _ = service.rolling_features[3]
+    service.rolling_features[3] = (features, now - timedelta(days=92))
+    service._get_rolling_features(4)
+    assert list(service.rolling_features) == [0, 4]
+    assert service.get_state_memory_stats()['rolling_features_users'] == 2
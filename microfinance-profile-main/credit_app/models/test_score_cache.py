@@ -0,0 +1,183 @@
+"""
+Cache des scores : lecture/ecriture, expiration, cles versionnees par le
+modele et single-flight, pour les deux implementations (memoire et Redis,
+ce dernier avec un client factice en memoire).
+
+    python -m pytest test_score_cache.py
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from score_cache import RedisScoreCache, ScoreCache, ScoreCacheBackend
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.queued = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def watch(self, key):
+        pass
+
+    def unwatch(self):
+        pass
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def multi(self):
+        pass
+
+    def delete(self, key):
+        self.queued.append(key)
+
+    def execute(self):
+        return [self.client.delete(key) for key in self.queued]
+
+
+class FakeRedis:
+    """Sous-ensemble de redis-py utilise par RedisScoreCache (PX en ms)"""
+
+    def __init__(self):
+        self._data = {}  # key -> (expires_at, bytes)
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key)
+        return None if entry is None else entry[1]
+
+    def set(self, key, value, px=None, nx=False):
+        with self._lock:
+            if nx and self._live(key) is not None:
+                return None
+            expires_at = time.monotonic() + px / 1000 if px else float('inf')
+            self._data[key] = (expires_at, value.encode() if isinstance(value, str) else value)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            return int(self._data.pop(key, None) is not None)
+
+    def exists(self, key):
+        with self._lock:
+            return int(self._live(key) is not None)
+
+    def scan_iter(self, match):
+        prefix = match.rstrip('*')
+        with self._lock:
+            return [key for key in list(self._data) if key.startswith(prefix) and self._live(key)]
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+@pytest.fixture(params=['memory', 'redis'])
+def cache(request):
+    if request.param == 'memory':
+        return ScoreCache(max_size=100, ttl=60, version='v1')
+    return RedisScoreCache(FakeRedis(), ttl=60, version='v1', lock_poll_interval=0.01)
+
+
+def test_interface_is_abstract():
+    with pytest.raises(TypeError):
+        ScoreCacheBackend()
+
+
+def test_get_set_and_invalidate(cache):
+    assert cache.get(1) is None
+    cache.set(1, {'score': 7.5, 'niveau_risque': 'bas'})
+    assert cache.get(1) == {'score': 7.5, 'niveau_risque': 'bas'}
+    cache.set(1, {'score': 6.0})
+    assert cache.get(1) == {'score': 6.0}
+
+    assert cache.invalidate(1) and not cache.invalidate(1)
+    assert cache.get(1) is None
+    stats = cache.get_stats()
+    assert stats['hits'] == 2 and stats['misses'] == 2 and stats['sets'] == 2
+
+
+def test_ttl_expiry(cache):
+    cache.set('court', 1, ttl=0.05)
+    cache.set('long', 2)
+    assert cache.get('court') == 1
+    time.sleep(0.08)
+    assert cache.get('court') is None
+    assert cache.get('long') == 2
+
+    cache.set('long', 3, ttl=0)  # ttl nul : supprime l'entree
+    assert cache.get('long') is None
+
+
+def test_keys_are_scoped_by_model_version(cache):
+    cache.set(1, 'ancien modele')
+    cache.set_version('v2')
+    assert cache.get(1) is None
+    cache.set(1, 'nouveau modele')
+    assert cache.get(1) == 'nouveau modele'
+
+    cache.clear()
+    assert cache.get(1) is None
+
+
+def test_redis_version_keys_do_not_collide():
+    client = FakeRedis()
+    v1 = RedisScoreCache(client, version='v1')
+    v2 = RedisScoreCache(client, version='v2')
+    v1.set(1, 'v1')
+    v2.set(1, 'v2')
+    v2.clear()
+    assert v1.get(1) == 'v1' and v2.get(1) is None
+
+
+def test_single_flight_serialises_computations(cache):
+    inside = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def holder():
+        with cache.single_flight('cle', timeout=2.0) as acquired:
+            results.append(('holder', acquired))
+            inside.set()
+            release.wait(1.0)
+            cache.set('cle', 'calcule')
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    assert inside.wait(1.0)
+
+    # Le verrou est pris : le second appelant attend sans l'obtenir
+    with cache.single_flight('cle', timeout=0.05) as acquired:
+        results.append(('timeout', acquired))
+
+    release.set()
+    with cache.single_flight('cle', timeout=2.0) as acquired:
+        results.append(('waiter', acquired))
+        assert cache.get('cle') == 'calcule'
+    thread.join(1.0)
+
+    assert results[0] == ('holder', True)
+    assert results[1] == ('timeout', False)
+    assert cache.get_stats()['single_flight_waits'] >= 1
+
+    # Verrou libere apres le calcul
+    with cache.single_flight('cle', timeout=0.05) as acquired:
+        assert acquired
@@ -0,0 +1,108 @@
+"""
+Journalisation : lecture de LOG_LEVEL (global, sous-systemes, loggers),
+file de logs qui abandonne les enregistrements au lieu de bloquer et
+messages du chemin de login formates seulement si le niveau est actif.
+
+    python -m pytest test_scoring_logging.py
+"""
+import logging
+import os
+import queue
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from score_cache import create_score_cache
+from scoring_logging import (SUBSYSTEMS, _DeferredQueueHandler, _enqueue_or_drop,
+                             log_event, parse_log_levels)
+from scoring_model import CreditScoringModel
+
+
+def test_parse_log_levels():
+    levels = parse_log_levels(" info , realtime=WARNING,db=debug,werkzeug=ERROR,")
+    assert levels[''] == logging.INFO
+    for name in SUBSYSTEMS['realtime']:
+        assert levels[name] == logging.WARNING
+    for name in SUBSYSTEMS['db']:
+        assert levels[name] == logging.DEBUG
+    assert levels['werkzeug'] == logging.ERROR
+    assert 'scoring_model' not in levels
+
+    assert parse_log_levels('') == {} and parse_log_levels(None) == {}
+    # La derniere surcharge l'emporte
+    assert parse_log_levels('db=INFO,db_pool=ERROR')['db_pool'] == logging.ERROR
+
+
+@pytest.mark.parametrize('spec', ['VERBOSE', 'realtime=BAVARD', 'db='])
+def test_parse_log_levels_rejects_unknown_level(spec):
+    with pytest.raises(ValueError):
+        parse_log_levels(spec)
+
+
+def test_full_queue_drops_records_without_blocking():
+    log_queue = queue.Queue(maxsize=2)
+    handler = _DeferredQueueHandler(log_queue)
+    handler.enqueue = _enqueue_or_drop(log_queue)
+    logger = logging.getLogger('test_scoring_logging.drop')
+    logger.propagate = False
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    try:
+        start = time.monotonic()
+        for i in range(100):
+            logger.info("message %d", i)
+        assert time.monotonic() - start < 1.0
+    finally:
+        logger.removeHandler(handler)
+
+    kept = [log_queue.get_nowait().getMessage() for _ in range(log_queue.qsize())]
+    assert kept == ['message 0', 'message 1']
+
+
+def test_log_event_sampling():
+    records = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            records.append(record.getMessage())
+
+    logger = logging.getLogger('test_scoring_logging.events')
+    logger.propagate = False
+    logger.addHandler(Collect())
+    logger.setLevel(logging.INFO)
+
+    emitted = [log_event(logger, logging.INFO, 'test_event_sampled', sample_every=3, n=i) for i in range(7)]
+    assert emitted == [True, False, False, True, False, False, True]
+    assert records[0] == 'test_event_sampled n=0'
+    assert records[1] == 'test_event_sampled n=3 sampled=1/3'
+    assert not log_event(logger, logging.DEBUG, 'test_event_debug')
+
+
+def test_login_cache_hit_logs_lazily():
+    records = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            records.append(record)
+
+    model = CreditScoringModel.__new__(CreditScoringModel)  # cache seul, sans base
+    model.score_cache = create_score_cache(ttl=60)
+    model.score_cache.set(42, {'score': 7.1})
+    handler = Collect()
+    scoring_logger = logging.getLogger('scoring_model')
+    previous_level = scoring_logger.level
+    scoring_logger.addHandler(handler)
+    try:
+        scoring_logger.setLevel(logging.INFO)
+        assert model.recalculate_on_login(42) == {'score': 7.1}
+        assert records == []
+
+        scoring_logger.setLevel(logging.DEBUG)
+        model.recalculate_on_login(42)
+    finally:
+        scoring_logger.removeHandler(handler)
+        scoring_logger.setLevel(previous_level)
+    # Message formate a l'emission seulement, par le handler
+    assert [(r.msg, r.args) for r in records] == [("Score en cache pour user %s", (42,))]
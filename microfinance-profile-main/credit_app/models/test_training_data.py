@@ -0,0 +1,189 @@
+"""
+Extraction par flux : memes valeurs que l'ancien calcul pandas, cache par
+snapshot, et mesure memoire sur un gros volume synthetique.
+
+    python -m pytest test_training_data.py
+    python test_training_data.py      # mesure pandas vs flux, 300k lignes
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from training_data import (SOURCE_COLUMNS, TrainingArrayBuilder, TrainingDataCache,
+                           load_training_data)
+
+FEATURES = [
+    'revenu_mensuel', 'anciennete_mois', 'charges_mensuelles',
+    'dettes_existantes', 'statut_emploi_encoded', 'credits_actifs_count',
+    'ratio_endettement', 'total_paiements', 'paiements_a_temps',
+    'paiements_en_retard', 'paiements_manques', 'moyenne_jours_retard',
+    'debt_to_income', 'capacity_ratio', 'ratio_paiements_temps'
+]
+
+
+def _rows(n: int, seed: int = 0):
+    """Lignes telles que renvoyees par le curseur (SOURCE_COLUMNS + bon_client)"""
+    rng = np.random.default_rng(seed)
+    values = np.column_stack([
+        rng.lognormal(13, 0.6, n),
+        rng.integers(0, 240, n),
+        rng.lognormal(11.5, 0.8, n),
+        rng.lognormal(12, 1.5, n),
+        rng.integers(0, 4, n),
+        rng.integers(0, 5, n),
+        rng.uniform(0, 80, n),
+        rng.integers(0, 60, n),
+        rng.integers(0, 40, n),
+        rng.integers(0, 10, n),
+        rng.integers(0, 5, n),
+        rng.exponential(5, n),
+        rng.integers(0, 2, n)
+    ]).tolist()
+    for row in values[::7]:
+        row[1] = None           # anciennete_mois inconnue
+    for row in values[::11]:
+        row[7] = 0.0            # aucun paiement
+    return [tuple(row) for row in values]
+
+
+def _pandas_reference(rows):
+    """Ancien chemin : pd.read_sql + ratios + fillna(0)"""
+    df = pd.DataFrame(rows, columns=SOURCE_COLUMNS + ['bon_client'])
+    df['debt_to_income'] = (df['charges_mensuelles'] + df['dettes_existantes']) / df['revenu_mensuel'].replace(0, 1)
+    df['capacity_ratio'] = np.maximum(0, (df['revenu_mensuel'] - df['charges_mensuelles'] - df['dettes_existantes']) / df['revenu_mensuel'].replace(0, 1))
+    df['ratio_paiements_temps'] = df['paiements_a_temps'] / df['total_paiements'].replace(0, 1)
+    return df[FEATURES].fillna(0).values, df['bon_client'].values
+
+
+class _Cursor:
+    def __init__(self, conn, name):
+        self.conn, self.name, self.itersize = conn, name, 2000
+        self._result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query):
+        self.conn.queries.append(query)
+        if 'pg_stat_user_tables' in query:
+            self._result = [self.conn.fingerprint]
+        elif 'COUNT(*)' in query and self.name is None:
+            self._result = [(self.conn.expected_rows,)]
+        else:
+            self._result = list(self.conn.rows)
+
+    def fetchone(self):
+        return self._result[0]
+
+    def fetchmany(self, size):
+        chunk, self._result = self._result[:size], self._result[size:]
+        return chunk
+
+
+class _Connection:
+    """Connexion psycopg2 minimale : requetes enregistrees, lignes fixes"""
+
+    def __init__(self, rows, fingerprint=(10, '2024-01-01', 3, None, 50, 50, 1000), expected_rows=None):
+        self.rows = rows
+        self.fingerprint = fingerprint
+        self.expected_rows = len(rows) if expected_rows is None else expected_rows
+        self.queries = []
+        self.named_cursors = 0
+
+    def set_session(self, **kwargs):
+        self.session = kwargs
+
+    def cursor(self, name=None):
+        self.named_cursors += name is not None
+        return _Cursor(self, name)
+
+    def rollback(self):
+        pass
+
+
+def test_builder_matches_pandas():
+    rows = _rows(5000)
+    expected_X, expected_y = _pandas_reference(rows)
+    for chunk_size, expected_rows in ((5000, 5000), (733, 5000), (1000, 10)):
+        builder = TrainingArrayBuilder(FEATURES, expected_rows)
+        for start in range(0, len(rows), chunk_size):
+            builder.add_rows(rows[start:start + chunk_size])
+        X, y = builder.result()
+        assert X.dtype == np.float32 and y.dtype == np.int8
+        np.testing.assert_array_equal(X, expected_X.astype(np.float32))
+        np.testing.assert_array_equal(y, expected_y)
+
+
+def test_unknown_feature():
+    with pytest.raises(ValueError):
+        TrainingArrayBuilder(FEATURES + ['age'])
+
+
+def test_streaming_and_snapshot_cache(tmp_path):
+    rows = _rows(4500, seed=1)
+    cache = TrainingDataCache(str(tmp_path))
+
+    conn = _Connection(rows)
+    first = load_training_data(conn, FEATURES, False, cache, itersize=1000)
+    assert conn.session == {'isolation_level': 'REPEATABLE READ', 'readonly': True}
+    assert conn.named_cursors == 1
+    assert first.report['chunks'] == 5 and not first.report['from_cache']
+    np.testing.assert_array_equal(first.X, _pandas_reference(rows)[0].astype(np.float32))
+
+    # Meme snapshot : pas de nouvelle extraction
+    conn = _Connection(rows)
+    second = load_training_data(conn, FEATURES, False, cache)
+    assert conn.named_cursors == 0 and second.report['from_cache']
+    assert second.report['snapshot_id'] == first.report['snapshot_id']
+    np.testing.assert_array_equal(second.X, first.X)
+    np.testing.assert_array_equal(second.y, first.y)
+
+    # Donnees modifiees : nouveau snapshot, nouvelle extraction
+    conn = _Connection(rows[:-1], fingerprint=(10, '2024-01-02', 3, None, 50, 50, 1001))
+    third = load_training_data(conn, FEATURES, False, cache)
+    assert conn.named_cursors == 1 and third.report['snapshot_id'] != first.report['snapshot_id']
+    assert len(third.X) == len(rows) - 1
+
+
+def test_cache_keeps_most_recent(tmp_path):
+    cache = TrainingDataCache(str(tmp_path), keep=2)
+    rows = _rows(100)
+    for i in range(4):
+        conn = _Connection(rows, fingerprint=(i, None, 0, None, 0, None, 0))
+        load_training_data(conn, FEATURES, False, cache)
+        time.sleep(0.01)
+    assert len([name for name in os.listdir(cache.directory) if name.endswith('.npz')]) == 2
+
+
+def benchmark(n: int = 300000):
+    """Temps sans tracemalloc, pic memoire Python avec (il ralentit les allocations)"""
+    import tracemalloc
+    rows = _rows(n, seed=2)
+
+    def streamed():
+        builder = TrainingArrayBuilder(FEATURES, n)
+        for i in range(0, n, 10000):
+            builder.add_rows(rows[i:i + 10000])
+        return builder.result()
+
+    for name, fn in (('pandas', lambda: _pandas_reference(rows)), ('flux', streamed)):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{n} lignes, {name:6s} : {elapsed:.2f}s, pic {peak / 2**20:.0f} Mo")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,88 @@
+"""
+Moteur d'ingestion : ordre d'arrivee conserve par utilisateur quand les
+shards tournent en parallele, et contre-pression de try_submit().
+
+    python -m pytest test_transaction_ingestion.py
+"""
+import asyncio
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from realtime_scoring_service import Transaction, TransactionType
+from transaction_ingestion import TransactionIngestionEngine
+
+START = datetime(2026, 1, 5, 9, 0)
+
+
+def _transaction(user_id, seq):
+    date = START + timedelta(minutes=seq)
+    return Transaction(user_id, TransactionType.PAYMENT, 25000.0, date, date, metadata={'seq': seq})
+
+
+class RecordingService:
+    """Traitement a duree variable : les shards s'entrelacent"""
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.processed = []
+        self.release = None
+
+    async def process_transaction(self, transaction):
+        if self.release is not None:
+            await self.release.wait()
+        for _ in range(self.rng.randrange(3)):
+            await asyncio.sleep(0)
+        self.processed.append((transaction.user_id, transaction.metadata['seq']))
+        return {'success': True}
+
+
+def test_per_user_order_is_kept_across_shards():
+    service = RecordingService()
+    rng = random.Random(1)
+    submitted = [_transaction(rng.randrange(20), seq) for seq in range(2000)]
+
+    async def run():
+        engine = TransactionIngestionEngine(service, num_workers=4, queue_size=50, batch_size=8)
+        async with engine:
+            for transaction in submitted:
+                await engine.submit(transaction)
+            await engine.drain()
+        return engine
+
+    engine = asyncio.run(run())
+    assert len({engine.shard_for(user_id) for user_id in range(20)}) > 1
+    assert sorted(service.processed) == sorted((t.user_id, t.metadata['seq']) for t in submitted)
+    for user_id in range(20):
+        seqs = [seq for uid, seq in service.processed if uid == user_id]
+        assert seqs == sorted(seqs), user_id
+    # Les shards ont bien ete entrelaces
+    assert service.processed != sorted(service.processed, key=lambda item: engine.shard_for(item[0]))
+    assert engine.get_metrics()['processed'] == 2000
+
+
+def test_try_submit_rejects_when_shard_queue_is_full():
+    service = RecordingService()
+
+    async def run():
+        service.release = asyncio.Event()
+        engine = TransactionIngestionEngine(service, num_workers=1, queue_size=2, batch_size=1)
+        await engine.start()
+        # Le worker prend la premiere transaction et reste bloque dessus
+        assert engine.try_submit(_transaction(1, 0))
+        await asyncio.sleep(0)
+        accepted = [engine.try_submit(_transaction(1, seq)) for seq in range(1, 5)]
+        metrics = engine.get_metrics()
+
+        service.release.set()
+        await engine.drain()
+        await engine.stop()
+        return accepted, metrics, engine.get_metrics()
+
+    accepted, blocked, final = asyncio.run(run())
+    assert accepted == [True, True, False, False]
+    assert blocked['rejected'] == 2 and blocked['queued'] == 2
+    assert final['processed'] == 3 and final['submitted'] == 3
+    assert service.processed == [(1, 0), (1, 1), (1, 2)]
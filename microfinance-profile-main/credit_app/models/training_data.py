@@ -0,0 +1,310 @@
+"""
+Extraction des donnees d'entrainement par flux
+
+Un curseur nomme (cote serveur) lit la jointure utilisateurs / restrictions /
+paiements par paquets de `itersize` lignes. Chaque paquet est converti
+directement dans des tableaux float32 prealloues (une ligne par utilisateur),
+les ratios derives etant calcules paquet par paquet : la memoire ne depend
+plus que de la taille du paquet et de la matrice finale, sans DataFrame
+intermediaire ni colonnes objet.
+
+Le resultat est mis en cache sur disque (npz) sous un identifiant de
+snapshot des donnees : un nouvel entrainement sur les memes donnees saute
+l'extraction.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from payment_stats import payment_stats_cte
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ITERSIZE = 10000
+
+# Colonnes lues en base, dans l'ordre du SELECT (bon_client en dernier)
+SOURCE_COLUMNS = [
+    'revenu_mensuel', 'anciennete_mois', 'charges_mensuelles', 'dettes_existantes',
+    'statut_emploi_encoded', 'credits_actifs_count', 'ratio_endettement',
+    'total_paiements', 'paiements_a_temps', 'paiements_en_retard',
+    'paiements_manques', 'moyenne_jours_retard'
+]
+DERIVED_COLUMNS = ['debt_to_income', 'capacity_ratio', 'ratio_paiements_temps']
+
+CACHE_FORMAT_VERSION = 1
+
+
+def training_query(use_payment_stats_table: bool) -> str:
+    return f"""
+        WITH payment_stats AS ({payment_stats_cte(use_payment_stats_table)})
+        SELECT
+            u.revenu_mensuel::float,
+            u.anciennete_mois::float,
+            u.charges_mensuelles::float,
+            u.dettes_existantes::float,
+
+            CASE
+                WHEN u.statut_emploi IN ('cdi', 'fonctionnaire') THEN 3
+                WHEN u.statut_emploi = 'cdd' THEN 2
+                WHEN u.statut_emploi = 'independant' THEN 1
+                ELSE 0
+            END as statut_emploi_encoded,
+
+            COALESCE(r.credits_actifs_count, 0)::float as credits_actifs_count,
+            COALESCE(r.ratio_endettement, 0)::float as ratio_endettement,
+            COALESCE(ps.total_paiements, 0)::float as total_paiements,
+            COALESCE(ps.paiements_a_temps, 0)::float as paiements_a_temps,
+            COALESCE(ps.paiements_en_retard, 0)::float as paiements_en_retard,
+            COALESCE(ps.paiements_manques, 0)::float as paiements_manques,
+            COALESCE(ps.moyenne_jours_retard, 0)::float as moyenne_jours_retard,
+
+            CASE
+                WHEN u.score_credit >= 7
+                    AND COALESCE(ps.paiements_a_temps::FLOAT / NULLIF(ps.total_paiements, 0), 0) >= 0.8
+                THEN 1
+                ELSE 0
+            END as bon_client
+
+        FROM utilisateurs u
+        LEFT JOIN restrictions_credit r ON u.id = r.utilisateur_id
+        LEFT JOIN payment_stats ps ON u.id = ps.utilisateur_id
+        WHERE u.statut = 'actif'
+        AND u.revenu_mensuel > 0
+        ORDER BY u.id
+    """
+
+
+COUNT_QUERY = """
+    SELECT COUNT(*) FROM utilisateurs u
+    WHERE u.statut = 'actif' AND u.revenu_mensuel > 0
+"""
+
+# Empreinte des tables lues : effectifs, dernieres modifications et compteurs
+# d'ecritures de PostgreSQL (pour les mises a jour sans date_modification)
+SNAPSHOT_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM utilisateurs),
+        (SELECT MAX(date_modification) FROM utilisateurs),
+        (SELECT COUNT(*) FROM restrictions_credit),
+        (SELECT MAX(date_modification) FROM restrictions_credit),
+        (SELECT COUNT(*) FROM historique_paiements),
+        (SELECT MAX(id) FROM historique_paiements),
+        (SELECT COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0)
+           FROM pg_stat_user_tables
+          WHERE relname IN ('utilisateurs', 'restrictions_credit', 'historique_paiements'))
+"""
+
+
+class TrainingData(NamedTuple):
+    X: np.ndarray
+    y: np.ndarray
+    feature_columns: Tuple[str, ...]
+    report: Dict
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # ko sous Linux
+
+
+class TrainingArrayBuilder:
+    """
+    Remplit X (float32) et y (int8) paquet par paquet.
+    Memes valeurs que l'ancien calcul pandas : ratios en float64 sur le
+    paquet, NaN remplaces par 0 (fillna) puis conversion en float32.
+    """
+
+    def __init__(self, feature_columns: Sequence[str], expected_rows: int = 0):
+        unknown = set(feature_columns) - set(SOURCE_COLUMNS) - set(DERIVED_COLUMNS)
+        if unknown:
+            raise ValueError(f"Colonnes inconnues: {sorted(unknown)}")
+        self.feature_columns = tuple(feature_columns)
+        self._source_index = {name: i for i, name in enumerate(SOURCE_COLUMNS)}
+        self.X = np.empty((max(expected_rows, 1), len(self.feature_columns)), dtype=np.float32)
+        self.y = np.empty(max(expected_rows, 1), dtype=np.int8)
+        self.n_rows = 0
+        self.n_chunks = 0
+
+    def _reserve(self, n: int):
+        needed = self.n_rows + n
+        if needed > len(self.X):
+            capacity = max(needed, 2 * len(self.X))
+            self.X = np.resize(self.X, (capacity, self.X.shape[1]))
+            self.y = np.resize(self.y, capacity)
+
+    def add_rows(self, rows: Sequence[Sequence]):
+        if not rows:
+            return
+        chunk = np.array(rows, dtype=np.float64)  # None -> NaN
+        self._reserve(len(chunk))
+
+        def column(name):
+            return chunk[:, self._source_index[name]]
+
+        start, stop = self.n_rows, self.n_rows + len(chunk)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for j, name in enumerate(self.feature_columns):
+                if name == 'debt_to_income':
+                    values = (column('charges_mensuelles') + column('dettes_existantes')) / _replace_zero(column('revenu_mensuel'))
+                elif name == 'capacity_ratio':
+                    values = np.maximum(0, (column('revenu_mensuel') - column('charges_mensuelles') - column('dettes_existantes')) / _replace_zero(column('revenu_mensuel')))
+                elif name == 'ratio_paiements_temps':
+                    values = column('paiements_a_temps') / _replace_zero(column('total_paiements'))
+                else:
+                    values = column(name)
+                self.X[start:stop, j] = np.nan_to_num(values, nan=0.0, posinf=np.inf, neginf=-np.inf)
+        self.y[start:stop] = chunk[:, len(SOURCE_COLUMNS)]
+        self.n_rows = stop
+        self.n_chunks += 1
+
+    def result(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self.X[:self.n_rows], self.y[:self.n_rows]
+
+
+def _replace_zero(values: np.ndarray) -> np.ndarray:
+    """Series.replace(0, 1)"""
+    return np.where(values == 0, 1.0, values)
+
+
+def data_snapshot_id(conn, feature_columns: Sequence[str], use_payment_stats_table: bool) -> str:
+    """Identifiant des donnees lues + de la requete : cle du cache"""
+    with conn.cursor() as cur:
+        cur.execute(SNAPSHOT_QUERY)
+        fingerprint = cur.fetchone()
+    payload = json.dumps({
+        'tables': [str(value) for value in fingerprint],
+        'query': training_query(use_payment_stats_table),
+        'features': list(feature_columns),
+        'format': CACHE_FORMAT_VERSION
+    }, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def stream_training_arrays(conn, feature_columns: Sequence[str], use_payment_stats_table: bool,
+                           itersize: int = DEFAULT_ITERSIZE) -> TrainingData:
+    """
+    Lecture par curseur nomme. A appeler dans une transaction (les curseurs
+    nommes n'existent que dans une transaction psycopg2).
+    """
+    started = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute(COUNT_QUERY)
+        expected_rows = cur.fetchone()[0]
+
+    builder = TrainingArrayBuilder(feature_columns, expected_rows)
+    with conn.cursor(name='training_extraction') as cur:
+        cur.itersize = itersize
+        cur.execute(training_query(use_payment_stats_table))
+        while True:
+            rows = cur.fetchmany(itersize)
+            if not rows:
+                break
+            builder.add_rows(rows)
+
+    X, y = builder.result()
+    report = {
+        'rows': int(len(X)),
+        'chunks': builder.n_chunks,
+        'itersize': itersize,
+        'array_mb': round((X.nbytes + y.nbytes) / 2 ** 20, 2),
+        'peak_rss_mb': _peak_rss_mb(),
+        'seconds': round(time.perf_counter() - started, 3),
+        'from_cache': False
+    }
+    logger.info(
+        f"Extraction: {report['rows']} lignes en {report['chunks']} paquets, "
+        f"{report['array_mb']} Mo de tableaux, pic RSS {report['peak_rss_mb']} Mo, {report['seconds']}s"
+    )
+    return TrainingData(X, y, builder.feature_columns, report)
+
+
+class TrainingDataCache:
+    """Tableaux d'entrainement par snapshot (<dir>/<snapshot>.npz), les plus recents conserves"""
+
+    def __init__(self, directory: str, keep: int = 3):
+        self.directory = directory
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, snapshot_id: str) -> str:
+        return os.path.join(self.directory, f'{snapshot_id}.npz')
+
+    def load(self, snapshot_id: str) -> Optional[TrainingData]:
+        path = self._path(snapshot_id)
+        if not os.path.exists(path):
+            return None
+        started = time.perf_counter()
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                X, y = data['X'], data['y']
+                feature_columns = tuple(str(name) for name in data['feature_columns'])
+        except Exception as e:
+            logger.warning(f"Cache d'entrainement illisible ({path}): {e}")
+            return None
+        os.utime(path)
+        report = {
+            'rows': int(len(X)),
+            'array_mb': round((X.nbytes + y.nbytes) / 2 ** 20, 2),
+            'peak_rss_mb': _peak_rss_mb(),
+            'seconds': round(time.perf_counter() - started, 3),
+            'from_cache': True
+        }
+        logger.info(f"Donnees d'entrainement lues depuis le cache {snapshot_id} ({report['rows']} lignes)")
+        return TrainingData(X, y, feature_columns, report)
+
+    def save(self, snapshot_id: str, data: TrainingData):
+        fd, tmp_path = tempfile.mkstemp(prefix='.cache-', suffix='.npz', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, X=data.X, y=data.y, feature_columns=np.array(data.feature_columns))
+            os.replace(tmp_path, self._path(snapshot_id))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._prune()
+
+    def _prune(self):
+        entries = sorted(
+            (os.path.join(self.directory, name) for name in os.listdir(self.directory)
+             if name.endswith('.npz') and not name.startswith('.')),
+            key=os.path.getmtime,
+            reverse=True
+        )
+        for path in entries[self.keep:]:
+            os.remove(path)
+
+
+def load_training_data(conn, feature_columns: Sequence[str], use_payment_stats_table: bool,
+                       cache: Optional[TrainingDataCache] = None,
+                       itersize: int = DEFAULT_ITERSIZE) -> TrainingData:
+    """
+    Snapshot REPEATABLE READ : l'identifiant et les lignes lues correspondent
+    au meme etat de la base. Cache consulte avant toute extraction.
+    """
+    conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+    try:
+        snapshot_id = data_snapshot_id(conn, feature_columns, use_payment_stats_table)
+        data = cache.load(snapshot_id) if cache is not None else None
+        if data is None:
+            data = stream_training_arrays(conn, feature_columns, use_payment_stats_table, itersize)
+            if cache is not None:
+                cache.save(snapshot_id, data)
+        conn.rollback()
+    except Exception:
+        conn.rollback()
+        raise
+    data.report['snapshot_id'] = snapshot_id
+    return data
@@ -0,0 +1,262 @@
+"""
+Moteur d'ingestion des transactions pour le scoring temps reel
+
+Les transactions sont reparties par user_id sur N files asyncio bornees,
+chacune videe par un seul worker : les evenements d'un meme utilisateur
+sont traites dans leur ordre d'arrivee, ceux d'utilisateurs differents
+en parallele.
+
+Rejouer un fichier de transactions (JSONL, ou JSON liste / dict par user) :
+    python transaction_ingestion.py replay transactions_history.json [--workers=4] [--batch-size=50] [--sqlite=etat.db]
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from realtime_scoring_service import RealtimeScoringService, Transaction, TransactionType
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class TransactionIngestionEngine:
+    """
+    Files par shard + workers asyncio.
+
+    Contre-pression : submit() attend qu'une place se libere dans la file du
+    shard; try_submit() refuse immediatement si elle est pleine.
+    """
+
+    def __init__(self, service: RealtimeScoringService, num_workers: int = 4,
+                 queue_size: int = 1000, batch_size: int = 50):
+        if num_workers < 1 or queue_size < 1 or batch_size < 1:
+            raise ValueError("num_workers, queue_size et batch_size doivent etre >= 1")
+        self.service = service
+        self.num_workers = num_workers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+
+        self._queues: List[asyncio.Queue] = []
+        self._workers: List[asyncio.Task] = []
+        self._started_at = None
+
+        self._metrics = {
+            'submitted': 0,
+            'rejected': 0,
+            'processed': 0,
+            'failed': 0,
+            'batches': 0,
+            'lag_total': 0.0,
+            'lag_max': 0.0
+        }
+
+    # ==========================================
+    # CYCLE DE VIE
+    # ==========================================
+
+    async def start(self):
+        if self._workers:
+            return
+        self._started_at = time.monotonic()
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(self.num_workers)]
+        self._workers = [
+            asyncio.create_task(self._worker(shard), name=f'ingestion-{shard}')
+            for shard in range(self.num_workers)
+        ]
+
+    async def drain(self):
+        """Attend que toutes les transactions soumises soient traitees"""
+        await asyncio.gather(*(q.join() for q in self._queues))
+
+    async def stop(self):
+        """Traite ce qui reste en file puis arrete les workers"""
+        for q in self._queues:
+            await q.put(_STOP)
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    # ==========================================
+    # PRODUCTEUR
+    # ==========================================
+
+    def shard_for(self, user_id) -> int:
+        # crc32 plutot que hash() : repartition stable d'un processus a l'autre
+        return zlib.crc32(str(user_id).encode('utf-8')) % self.num_workers
+
+    async def submit(self, transaction: Transaction):
+        await self._queues[self.shard_for(transaction.user_id)].put((transaction, time.monotonic()))
+        self._metrics['submitted'] += 1
+
+    def try_submit(self, transaction: Transaction) -> bool:
+        try:
+            self._queues[self.shard_for(transaction.user_id)].put_nowait((transaction, time.monotonic()))
+        except asyncio.QueueFull:
+            self._metrics['rejected'] += 1
+            return False
+        self._metrics['submitted'] += 1
+        return True
+
+    # ==========================================
+    # WORKERS
+    # ==========================================
+
+    async def _worker(self, shard: int):
+        q = self._queues[shard]
+        while True:
+            batch = [await q.get()]
+            # Vider la file par lots sans rendre la main entre deux elements
+            while len(batch) < self.batch_size and not q.empty():
+                batch.append(q.get_nowait())
+
+            stopping = False
+            for item in batch:
+                if item is _STOP:
+                    stopping = True
+                else:
+                    await self._process(*item)
+                q.task_done()
+            self._metrics['batches'] += 1
+
+            if stopping and q.empty():
+                return
+            # Laisser tourner les autres shards entre deux lots
+            await asyncio.sleep(0)
+
+    async def _process(self, transaction: Transaction, enqueued_at: float):
+        try:
+            result = await self.service.process_transaction(transaction)
+            ok = result.get('success', False)
+        except Exception as e:
+            logger.error("Erreur ingestion pour %s: %s", transaction.user_id, e)
+            ok = False
+
+        lag = time.monotonic() - enqueued_at
+        self._metrics['processed' if ok else 'failed'] += 1
+        self._metrics['lag_total'] += lag
+        self._metrics['lag_max'] = max(self._metrics['lag_max'], lag)
+
+    # ==========================================
+    # METRIQUES
+    # ==========================================
+
+    def get_metrics(self) -> Dict:
+        done = self._metrics['processed'] + self._metrics['failed']
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            'workers': self.num_workers,
+            'submitted': self._metrics['submitted'],
+            'rejected': self._metrics['rejected'],
+            'processed': self._metrics['processed'],
+            'failed': self._metrics['failed'],
+            'batches': self._metrics['batches'],
+            'queued': sum(q.qsize() for q in self._queues),
+            'queue_depths': [q.qsize() for q in self._queues],
+            'elapsed_seconds': round(elapsed, 3),
+            'throughput_per_second': round(done / elapsed, 1) if elapsed > 0 else 0.0,
+            'lag_avg_ms': round(self._metrics['lag_total'] / done * 1000, 3) if done else 0.0,
+            'lag_max_ms': round(self._metrics['lag_max'] * 1000, 3)
+        }
+
+
+# ==========================================
+# LECTURE DES FICHIERS DE TRANSACTIONS
+# ==========================================
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        return datetime.now()
+    return datetime.fromisoformat(str(value))
+
+
+def parse_transaction(record: Dict, user_id=None) -> Transaction:
+    """Construit une Transaction depuis un enregistrement JSON (dates ISO)"""
+    actual_date = _as_datetime(record.get('actual_date') or record.get('date'))
+    return Transaction(
+        user_id=record.get('user_id', user_id),
+        transaction_type=TransactionType(record.get('transaction_type') or record['type']),
+        amount=float(record.get('amount', 0)),
+        scheduled_date=_as_datetime(record.get('scheduled_date') or actual_date),
+        actual_date=actual_date,
+        loan_id=record.get('loan_id'),
+        metadata=record.get('metadata') or {}
+    )
+
+
+def read_transactions(path: str) -> Iterator[Transaction]:
+    """JSONL, liste JSON, ou dict JSON {user_id: [transactions]}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    try:
+        document = json.loads(content)
+    except json.JSONDecodeError:
+        document = None
+
+    if isinstance(document, list):
+        records = ((None, record) for record in document)
+    elif isinstance(document, dict) and 'transaction_type' not in document and 'type' not in document:
+        records = ((user_id, record) for user_id, items in document.items() for record in items)
+    else:
+        records = ((None, json.loads(line)) for line in content.splitlines() if line.strip())
+
+    for user_id, record in records:
+        yield parse_transaction(record, user_id)
+
+
+async def replay(transactions: Iterable[Transaction], service: RealtimeScoringService,
+                 num_workers: int = 4, batch_size: int = 50, queue_size: int = 1000) -> Dict:
+    engine = TransactionIngestionEngine(service, num_workers=num_workers,
+                                        queue_size=queue_size, batch_size=batch_size)
+    async with engine:
+        for transaction in transactions:
+            await engine.submit(transaction)
+        await engine.drain()
+    return engine.get_metrics()
+
+
+def _option(name: str, default: Optional[str] = None) -> Optional[str]:
+    for arg in sys.argv[2:]:
+        if arg.startswith(f'--{name}='):
+            return arg.split('=', 1)[1]
+    return default
+
+
+if __name__ == "__main__":
+    from scoring_logging import configure_logging
+    configure_logging(os.getenv('LOG_LEVEL', 'WARNING'))
+
+    command = sys.argv[1] if len(sys.argv) > 1 else '--help'
+    paths = [arg for arg in sys.argv[2:] if not arg.startswith('--')]
+
+    if command == 'replay' and paths:
+        state_store = None
+        if _option('sqlite'):
+            from realtime_state import SQLStateStore
+            state_store = SQLStateStore.sqlite(_option('sqlite'))
+
+        service = RealtimeScoringService(None, state_store)
+        metrics = asyncio.run(replay(
+            read_transactions(paths[0]),
+            service,
+            num_workers=int(_option('workers', '4')),
+            batch_size=int(_option('batch-size', '50'))
+        ))
+        service.state.close()
+        print(json.dumps(metrics, indent=2))
+    else:
+        print(__doc__)
@@ -1,3 +1,5 @@
+from collections import namedtuple
+
 import numpy as np
 import pandas as pd
 from datetime import datetime
@@ -5,81 +7,628 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+
+# ==========================================
+# MINI-LANGAGE DES RÈGLES
+# ==========================================
+# Une expression lit un champ de la demande (avec sa valeur par défaut, comme
+# data.get) ou combine d'autres expressions. Un prédicat compare une
+# expression à une constante ou à une autre expression. La table est compilée
+# une fois, à l'initialisation, en fonctions numpy sur colonnes (score_batch).
+# calculate_score garde ses if/elif écrits à la main, plus rapides sur une
+# seule demande; les tests vérifient que les deux donnent le même résultat.
+
+Expr = namedtuple('Expr', 'kind args')
+Rule = namedtuple('Rule', 'value steps otherwise when')
+
+
+def field(key, default=0):
+    """Valeur numérique : data.get(key, default)"""
+    return Expr('field', (key, default))
+
+
+def text(key, default='', case='lower'):
+    """Texte : data.get(key, default).lower() / .upper() / brut (case=None)"""
+    return Expr('text', (key, default, case))
+
+
+def flag(key):
+    """Booléen : bool(data.get(key))"""
+    return Expr('flag', (key,))
+
+
+def div(a, b):
+    return Expr('div', (a, b))
+
+
+def mul(a, b):
+    return Expr('mul', (a, b))
+
+
+def trunc(a):
+    return Expr('trunc', (a,))
+
+
+def minimum(a, b):
+    return Expr('min', (a, b))
+
+
+def all_of(*predicates):
+    return ('all', predicates)
+
+
+def any_of(*predicates):
+    return ('any', predicates)
+
+
+def rule(value, steps=(), otherwise=0, when=None):
+    """
+    Points d'un critère : première étape vérifiée, sinon `otherwise`.
+    Étapes (op, seuil, points) testées sur `value`, ou (prédicat, points)
+    quand value est None. Sans étapes, les points valent `value`.
+    Si `when` est faux, le critère ne rapporte rien.
+    """
+    return Rule(value, tuple(steps), otherwise, when)
+
+
+def bands(op, thresholds):
+    """[(seuil, points), ...] -> étapes (op, seuil, points)"""
+    return [(op, threshold, points) for threshold, points in thresholds]
+
+
+MONTHLY_PAYMENT = div(field('loan_amount'), field('loan_duration', 12))
+CONSOMMATION_DEBT_RATIO = div(MONTHLY_PAYMENT, field('monthly_income'))
+HAS_INCOME = (field('monthly_income'), '>', 0)
+IS_COMPANY = (text('entity_type', 'particulier'), '==', 'entreprise')
+MAX_AMOUNT_100M = (field('loan_amount'), '>', 100000000)
+
+
+# ==========================================
+# TABLE DES RÈGLES PAR TYPE DE CRÉDIT
+# ==========================================
+
+CREDIT_RULES = {
+    'consommation': {
+        'base_score': 600,
+        'weights': {
+            'age': 0.10,
+            'employment': 0.25,
+            'income': 0.30,
+            'debt_ratio': 0.20,
+            'loan_purpose': 0.15
+        },
+        'limits': {'max_amount': None, 'salary_ratio': 0.35},
+        'max_duration': 48,
+        'criteria': [
+            # Age (10%)
+            rule(field('age', 30), [('between', (25, 55), 50), ('between', (18, 65), 20)], otherwise=-30),
+            # Statut d'emploi (25%)
+            rule(text('employment_status'),
+                 [('in', ('cdi', 'fonctionnaire'), 100), ('==', 'cdd', 50), ('==', 'independant', 30)],
+                 otherwise=-50),
+            # Revenu mensuel (30%) : mensualité / revenu, limite de 35%
+            rule(CONSOMMATION_DEBT_RATIO, bands('<=', [(0.35, 120), (0.45, 60), (0.55, 20)]),
+                 otherwise=-100, when=HAS_INCOME),
+            # Objet du crédit (15%)
+            rule(text('loan_purpose'), [
+                ('contains', ('santé', 'éducation', 'urgence médicale'), 60),
+                ('contains', ('électroménager', 'rénovation', 'famille'), 40),
+                ('contains', ('voyage', 'loisir'), 20)
+            ], otherwise=10)
+        ],
+        'eligibility': [
+            (all_of(HAS_INCOME, (MONTHLY_PAYMENT, '>', mul(field('monthly_income'), 0.35))),
+             "La mensualité dépasse 35% du salaire"),
+            ((field('loan_duration', 12), '>', 48), "Durée maximale: 48 mois")
+        ],
+        'factors': [
+            {
+                'when': HAS_INCOME,
+                'name': 'debt_ratio',
+                'label': 'Ratio d\'endettement',
+                'value': CONSOMMATION_DEBT_RATIO,
+                'positive': ('<=', 0.35),
+                'display': mul(CONSOMMATION_DEBT_RATIO, 100),
+                'format': '{:.1f}%'
+            }
+        ],
+        'recommendations': [
+            (all_of(HAS_INCOME, (CONSOMMATION_DEBT_RATIO, '>', 0.35)),
+             "Réduire le montant demandé ou augmenter la durée pour respecter le ratio de 35%")
+        ]
+    },
+    'investissement': {
+        'base_score': 550,
+        'weights': {
+            'business_age': 0.15,
+            'turnover': 0.25,
+            'profit_margin': 0.20,
+            'collateral': 0.20,
+            'business_type': 0.10,
+            'documents': 0.10
+        },
+        'limits': {'max_amount': 100000000},
+        'max_duration': 36,
+        'criteria': [
+            # Entreprise : chiffre d'affaires (25%)
+            rule(field('company_turnover'),
+                 bands('>=', [(50000000, 100), (20000000, 70), (10000000, 40)]),
+                 otherwise=20, when=IS_COMPANY),
+            # Entreprise : marge bénéficiaire (20%)
+            rule(mul(div(field('net_profit'), field('company_turnover')), 100),
+                 bands('>=', [(20, 80), (10, 50), (5, 30)]), otherwise=-20,
+                 when=all_of(IS_COMPANY, (field('company_turnover'), '>', 0))),
+            # Entreprise : documents fournis (10%)
+            rule(None, [
+                (all_of((flag('has_statutes'), '==', True), (flag('has_patent'), '==', True),
+                        (flag('has_financial_statements'), '==', True)), 40),
+                ((flag('has_patent'), '==', True), 20)
+            ], when=IS_COMPANY),
+            # Particulier : revenu et capacité de remboursement
+            rule(field('monthly_income'),
+                 bands('>=', [(1000000, 80), (500000, 50), (300000, 30)]),
+                 when=(text('entity_type', 'particulier'), '!=', 'entreprise')),
+            # Garanties (20%)
+            rule(None, [
+                (all_of((field('loan_amount'), '>', 0),
+                        (field('collateral_value'), '>=', mul(field('loan_amount'), 1.5))), 80),
+                ((field('collateral_value'), '>=', field('loan_amount')), 50),
+                ((field('collateral_value'), '>=', mul(field('loan_amount'), 0.5)), 20)
+            ]),
+            # Type d'investissement (10%)
+            rule(text('investment_type'), [
+                ('contains', ('équipement', 'machines'), 40),
+                ('contains', ('immobilier',), 35),
+                ('contains', ('stock',), 20)
+            ])
+        ],
+        'eligibility': [
+            (MAX_AMOUNT_100M, "Montant maximum: 100 000 000 FCFA"),
+            (all_of((text('entity_type', None, None), '==', 'entreprise'), (flag('has_statutes'), '==', False)),
+             "Statuts de l'entreprise requis"),
+            (all_of((text('entity_type', None, None), '==', 'entreprise'), (flag('has_patent'), '==', False)),
+             "Patente requise")
+        ],
+        'recommendations': [
+            ((flag('has_financial_statements'), '==', False), "Fournir les états financiers de l'entreprise"),
+            ((field('collateral_value'), '<', field('loan_amount')), "Augmenter la valeur des garanties")
+        ]
+    },
+    'avance_facture': {
+        'base_score': 700,
+        'weights': {
+            'client_reputation': 0.30,
+            'invoice_amount': 0.20,
+            'payment_history': 0.25,
+            'invoice_validity': 0.15,
+            'business_relationship': 0.10
+        },
+        'limits': {'max_amount': 100000000, 'invoice_ratio': 0.70},
+        'max_duration': 12,
+        'criteria': [
+            # Montant de la facture vs montant demandé (limite de 70%)
+            rule(div(field('loan_amount'), field('invoice_amount')), [('<=', 0.7, 100)], otherwise=-100,
+                 when=(field('invoice_amount'), '>', 0)),
+            # Réputation du client (30%)
+            rule(text('client_payment_history', 'moyen'),
+                 [('==', 'excellent', 120), ('==', 'bon', 80), ('==', 'moyen', 40)], otherwise=-50),
+            # Délai de paiement (25%)
+            rule(field('payment_deadline_days', 90), bands('<=', [(30, 100), (60, 70), (90, 40)]), otherwise=-30),
+            # Validité de la facture (15%)
+            rule(flag('invoice_verified'), [('==', True, 60)]),
+            # Relation commerciale (10%)
+            rule(field('business_relationship_months'), bands('>=', [(24, 40), (12, 25), (6, 10)]))
+        ],
+        'eligibility': [
+            (all_of((field('invoice_amount'), '>', 0),
+                    (field('loan_amount'), '>', mul(field('invoice_amount'), 0.7))),
+             "Maximum 70% du montant de la facture"),
+            (MAX_AMOUNT_100M, "Montant maximum: 100 000 000 FCFA")
+        ]
+    },
+    'avance_commande': {
+        'base_score': 650,
+        'weights': {
+            'order_validity': 0.25,
+            'client_reputation': 0.25,
+            'production_capacity': 0.20,
+            'profit_margin': 0.15,
+            'raw_materials': 0.15
+        },
+        'limits': {'max_amount': 100000000},
+        'max_duration': 12,
+        'criteria': [
+            # Validité du bon de commande (25%)
+            rule(flag('order_verified'), [('==', True, 100)], otherwise=-50),
+            # Réputation du client (25%)
+            rule(text('order_client_reputation', 'moyen'),
+                 [('==', 'excellent', 100), ('==', 'bon', 60), ('==', 'moyen', 30)], otherwise=-40),
+            # Capacité de production (20%), note sur 10
+            rule(mul(field('production_capacity_score', 5), 8)),
+            # Marge bénéficiaire prévue (15%)
+            rule(field('profit_margin_percentage'), bands('>=', [(30, 60), (20, 40), (10, 20)]), otherwise=-20),
+            # Coût des matières premières (15%)
+            rule(field('raw_materials_cost_ratio', 0.5), bands('<=', [(0.4, 60), (0.6, 30)]), otherwise=-20)
+        ]
+    },
+    'tontine': {
+        'base_score': 750,
+        'weights': {
+            'contribution_history': 0.35,
+            'member_duration': 0.25,
+            'contribution_amount': 0.20,
+            'group_solidarity': 0.20
+        },
+        'limits': {'max_amount': 5000000},
+        'max_duration': 24,
+        'criteria': [
+            # Historique de cotisation (35%)
+            rule(None, [
+                (all_of((field('contribution_history_months'), '>=', 24),
+                        (field('missed_contributions'), '==', 0)), 140),
+                (all_of((field('contribution_history_months'), '>=', 12),
+                        (field('missed_contributions'), '<=', 1)), 100),
+                (all_of((field('contribution_history_months'), '>=', 6),
+                        (field('missed_contributions'), '<=', 2)), 60)
+            ], otherwise=-50),
+            # Durée d'adhésion (25%)
+            rule(field('tontine_membership_months'), bands('>=', [(24, 100), (12, 60), (6, 30)]), otherwise=-30),
+            # Montant de cotisation (20%) : prêt / cotisations annuelles
+            rule(div(field('loan_amount'), mul(field('contribution_amount'), 12)),
+                 bands('<=', [(2, 80), (3, 50), (4, 20)]), otherwise=-40,
+                 when=(field('contribution_amount'), '>', 0)),
+            # Solidarité du groupe (20%)
+            rule(field('group_default_rate'), [('==', 0, 80), ('<=', 0.05, 50), ('<=', 0.1, 20)], otherwise=-50)
+        ],
+        'eligibility': [
+            ((field('loan_amount'), '>', 5000000), "Montant maximum: 5 000 000 FCFA"),
+            ((field('contribution_history_months'), '<', 6), "Minimum 6 mois de cotisation requis")
+        ],
+        'factors': [
+            {
+                'name': 'contribution_regularity',
+                'label': 'Régularité des cotisations',
+                'value': field('missed_contributions'),
+                'positive': ('==', 0),
+                'format': '{} cotisation(s) manquée(s)'
+            }
+        ],
+        'recommendations': [
+            ((field('contribution_history_months'), '<', 12),
+             "Continuer à cotiser régulièrement pendant au moins 12 mois")
+        ]
+    },
+    'retraite': {
+        'base_score': 800,
+        'weights': {
+            'pension_amount': 0.30,
+            'pension_duration': 0.25,
+            'age': 0.15,
+            'health_status': 0.15,
+            'other_income': 0.15
+        },
+        'limits': {'max_amount': None},  # Basé sur la quotité
+        'max_duration': 12,
+        'criteria': [
+            # Montant de la pension (30%) : mensualité / pension
+            rule(div(MONTHLY_PAYMENT, field('pension_amount')),
+                 bands('<=', [(0.3, 120), (0.4, 80), (0.5, 40)]), otherwise=-60,
+                 when=(field('pension_amount'), '>', 0)),
+            # Durée de perception de la pension (25%)
+            rule(field('pension_duration_months'), bands('>=', [(24, 100), (12, 60), (6, 30)])),
+            # Age du retraité (15%)
+            rule(field('age', 65), bands('<=', [(65, 60), (70, 40), (75, 20)]), otherwise=-30),
+            # Affiliation (CNSS ou CPPF)
+            rule(text('retirement_organization', '', 'upper'), [('in', ('CNSS', 'CPPF'), 40)]),
+            # Autres revenus (15%)
+            rule(minimum(60, trunc(mul(div(field('other_income'), 50000), 10))),
+                 when=(field('other_income'), '>', 0))
+        ],
+        'eligibility': [
+            ((text('retirement_organization', '', 'upper'), 'not_in', ('CNSS', 'CPPF')),
+             "Affiliation CNSS ou CPPF requise"),
+            ((field('loan_duration', 0), '>', 12), "Durée maximale: 12 mois")
+        ]
+    },
+    'spot': {
+        'base_score': 500,
+        'weights': {
+            'urgency_validity': 0.25,
+            'repayment_capacity': 0.30,
+            'cash_flow': 0.25,
+            'business_stability': 0.20
+        },
+        'limits': {'max_amount': 100000000},
+        'max_duration': 3,
+        'criteria': [
+            # Validité de l'urgence (25%)
+            rule(text('urgency'),
+                 [('contains', ('medical', 'décès', 'accident', 'catastrophe', 'opportunité commerciale'), 100)],
+                 otherwise=20),
+            # Capacité de remboursement rapide (30%)
+            rule(text('repayment_source'), [
+                ('contains', ('contrat', 'facture'), 120),
+                ('contains', ('vente', 'stock'), 80),
+                ('contains', ('salaire',), 60)
+            ], otherwise=20),
+            # Cash flow (25%) : trois mois de trésorerie / montant
+            rule(div(mul(field('cash_flow'), 3), field('loan_amount')),
+                 bands('>=', [(2, 100), (1.5, 60), (1, 30)]), otherwise=-50,
+                 when=(field('cash_flow'), '>', 0)),
+            # Stabilité de l'activité (20%)
+            rule(field('business_age_years'), bands('>=', [(3, 80), (2, 50), (1, 20)]), otherwise=-30)
+        ],
+        'eligibility': [
+            ((field('loan_duration', 0), '>', 3), "Durée maximale: 3 mois"),
+            (MAX_AMOUNT_100M, "Montant maximum: 100 000 000 FCFA")
+        ]
+    }
+}
+
+DEFAULT_BASE_SCORE = 600
+
+# Ajustements communs à tous les types
+CREDIT_HISTORY_RULE = rule(text('credit_history', 'nouveau', None), [
+    ('==', 'excellent', 50), ('==', 'bon', 30), ('==', 'moyen', 10), ('==', 'mauvais', -100)
+])
+DURATION_PENALTY = -50   # dépassement de la durée max du type
+AMOUNT_PENALTY = -100    # dépassement du plafond du type
+
+COMMON_ELIGIBILITY = [
+    ((field('age', 0), '<', 18), "Âge minimum requis: 18 ans")
+]
+
+MIN_SCORE, MAX_SCORE = 300, 900
+PROBABILITY_BANDS = [(850, 0.95), (750, 0.85), (650, 0.70), (550, 0.50), (450, 0.30)]
+DEFAULT_PROBABILITY = 0.10
+RISK_LEVELS = [(750, 'bas'), (550, 'moyen')]
+DEFAULT_RISK_LEVEL = 'élevé'
+PROFILE_QUALITY_SCORE = 750
+LOW_SCORE_RECOMMENDATION = (550, "Améliorer votre historique de crédit")
+PROFILE_QUALITY_FACTOR = {
+    'name': 'profile_quality',
+    'label': 'Profil de qualité',
+    'impact': 'positive',
+    'value': 'Excellent profil de crédit'
+}
+
+
+# ==========================================
+# COMPILATION : FONCTIONS NUMPY SUR COLONNES
+# ==========================================
+# La table est évaluée sur toutes les demandes d'un lot à la fois. Chaque
+# fonction reçoit `active`, les lignes pour lesquelles calculate_score
+# évaluerait l'expression : une division par zéro (ou un texte qui n'en est
+# pas) n'y est une erreur que là, comme avec les if/elif.
+
+def _factorize(series, n, default):
+    """Codes par ligne et valeurs distinctes (NaN/absent -> défaut)"""
+    if series is None:
+        return np.zeros(n, dtype=np.intp), [default]
+    codes, uniques = pd.factorize(series.to_numpy(dtype=object))
+    codes[codes < 0] = len(uniques)  # NaN/None -> dernière valeur : le défaut
+    return codes, list(uniques) + [default]
+
+
+class _TextColumn:
+    """
+    Colonne texte factorisée : les opérations Python (lower, in, any(...))
+    portent sur les valeurs distinctes puis sont diffusées par les codes.
+    """
+
+    def __init__(self, codes, values, errors):
+        self.codes = codes
+        self.values = values
+        self.errors = errors      # par valeur : message si .lower()/.upper() lève
+
+    @classmethod
+    def from_series(cls, series, n, default, case):
+        codes, values = _factorize(series, n, default)
+        errors = [None] * len(values)
+        if case:
+            for i, value in enumerate(values):
+                try:
+                    values[i] = getattr(value, case)()
+                except AttributeError as e:
+                    errors[i] = str(e)
+        return cls(codes, values, errors)
+
+    def invalid(self):
+        if not any(self.errors):
+            return None
+        return np.array(self.errors, dtype=object)[self.codes]
+
+    def map(self, test):
+        results = [error is None and bool(test(v)) for v, error in zip(self.values, self.errors)]
+        return np.array(results, dtype=bool)[self.codes]
+
+
+class _BatchContext:
+    """
+    Colonnes d'un lot de demandes. Les valeurs manquantes (colonne absente
+    ou NaN) prennent la valeur par défaut de la règle, comme data.get.
+    `errors` marque les lignes où le calcul par dict lèverait une exception
+    (et renverrait donc le résultat de repli), avec le message de la première.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+        self.n = len(frame)
+        self.errors = np.zeros(self.n, dtype=bool)
+        self.error_messages = np.full(self.n, None, dtype=object)
+        self._columns = {}
+
+    def fail(self, rows, message):
+        first = rows & ~self.errors
+        self.error_messages[first] = message[first] if isinstance(message, np.ndarray) else message
+        self.errors |= rows
+
+    def column(self, expr):
+        cached = self._columns.get(expr)
+        if cached is not None:
+            return cached
+        kind, args = expr
+        key = args[0]
+        series = self.frame[key] if key in self.frame.columns else None
+        if kind == 'field':
+            default = args[1]
+            if series is None:
+                values = np.full(self.n, default, dtype=float)
+            else:
+                values = pd.to_numeric(series).to_numpy(dtype=float, copy=True)
+                values[np.isnan(values)] = default
+        elif kind == 'flag':
+            codes, values = _factorize(series, self.n, False)
+            values = np.array([bool(v) for v in values], dtype=bool)[codes]
+        else:
+            values = _TextColumn.from_series(series, self.n, args[1], args[2])
+        self._columns[expr] = values
+        return values
+
+
+def _text_or_array(test, array_test):
+    return lambda v, x: v.map(lambda value: test(value, x)) if isinstance(v, _TextColumn) else array_test(v, x)
+
+
+_VECTOR_COMPARATORS = {
+    '==': _text_or_array(lambda value, x: value == x, lambda v, x: v == x),
+    '!=': _text_or_array(lambda value, x: value != x, lambda v, x: v != x),
+    '<': lambda v, x: v < x,
+    '<=': lambda v, x: v <= x,
+    '>': lambda v, x: v > x,
+    '>=': lambda v, x: v >= x,
+    'between': lambda v, bounds: (v >= bounds[0]) & (v <= bounds[1]),
+    'in': lambda v, values: v.map(lambda value: value in values),
+    'not_in': lambda v, values: v.map(lambda value: value not in values),
+    'contains': lambda v, words: v.map(lambda value: any(word in value for word in words))
+}
+
+
+def _vectorize_expr(expr):
+    """Fonction (ctx, active) -> colonne"""
+    if not isinstance(expr, Expr):
+        return lambda ctx, active: expr
+    kind, args = expr
+    if kind == 'text':
+        def text_column(ctx, active):
+            column = ctx.column(expr)
+            messages = column.invalid()
+            if messages is not None:
+                ctx.fail(active & (messages != None), messages)  # noqa: E711
+            return column
+        return text_column
+    if kind in ('field', 'flag'):
+        return lambda ctx, active: ctx.column(expr)
+    if kind == 'trunc':
+        a = _vectorize_expr(args[0])
+        return lambda ctx, active: np.trunc(a(ctx, active))
+    a, b = (_vectorize_expr(arg) for arg in args)
+    if kind == 'div':
+        def divide(ctx, active):
+            numerator, denominator = a(ctx, active), b(ctx, active)
+            zero = denominator == 0
+            ctx.fail(active & zero, 'division by zero')
+            return np.divide(numerator, denominator, out=np.zeros(ctx.n), where=~zero)
+        return divide
+    if kind == 'mul':
+        return lambda ctx, active: np.multiply(a(ctx, active), b(ctx, active))
+    if kind == 'min':
+        return lambda ctx, active: np.minimum(a(ctx, active), b(ctx, active))
+    raise ValueError(f"Expression inconnue: {kind}")
+
+
+def _vectorize_predicate(predicate):
+    """Fonction (ctx, active) -> booléens; les parties de all/any sont court-circuitées"""
+    if predicate[0] in ('all', 'any'):
+        parts = [_vectorize_predicate(p) for p in predicate[1]]
+        if predicate[0] == 'all':
+            def all_parts(ctx, active):
+                result = np.ones(ctx.n, dtype=bool)
+                for part in parts:
+                    result &= part(ctx, active & result)
+                return result
+            return all_parts
+
+        def any_parts(ctx, active):
+            result = np.zeros(ctx.n, dtype=bool)
+            for part in parts:
+                result |= part(ctx, active & ~result)
+            return result
+        return any_parts
+    left, op, right = predicate
+    left, right, compare = _vectorize_expr(left), _vectorize_expr(right), _VECTOR_COMPARATORS[op]
+    return lambda ctx, active: compare(left(ctx, active), right(ctx, active))
+
+
+def _vectorize_rule(r):
+    """Fonction (ctx, active) -> points du critère (0 hors de `active`)"""
+    when = _vectorize_predicate(r.when) if r.when else None
+    value = _vectorize_expr(r.value) if r.value is not None else None
+    if value is None:
+        steps = [(_vectorize_predicate(p), points) for p, points in r.steps]
+    else:
+        steps = [((_VECTOR_COMPARATORS[op], operand), points) for op, operand, points in r.steps]
+
+    def points(ctx, active):
+        if when is not None:
+            active = active & when(ctx, active)
+        if not steps:
+            return np.where(active, value(ctx, active), 0)
+        v = value(ctx, active) if value is not None else None
+        out = np.zeros(ctx.n)
+        remaining = active.copy()
+        for test, pts in steps:
+            if value is None:
+                matched = test(ctx, remaining)
+            else:
+                compare, operand = test
+                matched = compare(v, operand)
+            hit = remaining & matched
+            out[hit] = pts
+            remaining &= ~hit
+        out[remaining] = r.otherwise
+        return out
+    return points
+
+
+VectorCreditType = namedtuple('VectorCreditType', 'base_score criteria adjustments eligibility')
+
+
+def _vectorize_credit_type(spec):
+    adjustments = []
+    if spec.get('max_duration') is not None:
+        adjustments.append(_vectorize_rule(rule(field('loan_duration', 12),
+                                                [('>', spec['max_duration'], DURATION_PENALTY)])))
+    max_amount = spec.get('limits', {}).get('max_amount')
+    if max_amount:
+        adjustments.append(_vectorize_rule(rule(field('loan_amount'), [('>', max_amount, AMOUNT_PENALTY)])))
+    return VectorCreditType(
+        base_score=spec.get('base_score', DEFAULT_BASE_SCORE),
+        criteria=[_vectorize_rule(r) for r in spec.get('criteria', [])],
+        adjustments=adjustments,
+        eligibility=[(_vectorize_predicate(p), message) for p, message in spec.get('eligibility', [])]
+    )
+
+
+def _vector_bands(score, bands_, default):
+    return np.select([score >= threshold for threshold, _ in bands_],
+                     [value for _, value in bands_], default)
+
+
 class AdvancedCreditScoringModel:
     def __init__(self):
-        # Score de base pour chaque type de crédit
-        self.base_scores = {
-            'consommation': 600,
-            'investissement': 550,
-            'avance_facture': 700,
-            'avance_commande': 650,
-            'tontine': 750,
-            'retraite': 800,
-            'spot': 500
-        }
-        
-        # Poids des critères par type de crédit
-        self.criteria_weights = {
-            'consommation': {
-                'age': 0.10,
-                'employment': 0.25,
-                'income': 0.30,
-                'debt_ratio': 0.20,
-                'loan_purpose': 0.15
-            },
-            'investissement': {
-                'business_age': 0.15,
-                'turnover': 0.25,
-                'profit_margin': 0.20,
-                'collateral': 0.20,
-                'business_type': 0.10,
-                'documents': 0.10
-            },
-            'avance_facture': {
-                'client_reputation': 0.30,
-                'invoice_amount': 0.20,
-                'payment_history': 0.25,
-                'invoice_validity': 0.15,
-                'business_relationship': 0.10
-            },
-            'avance_commande': {
-                'order_validity': 0.25,
-                'client_reputation': 0.25,
-                'production_capacity': 0.20,
-                'profit_margin': 0.15,
-                'raw_materials': 0.15
-            },
-            'tontine': {
-                'contribution_history': 0.35,
-                'member_duration': 0.25,
-                'contribution_amount': 0.20,
-                'group_solidarity': 0.20
-            },
-            'retraite': {
-                'pension_amount': 0.30,
-                'pension_duration': 0.25,
-                'age': 0.15,
-                'health_status': 0.15,
-                'other_income': 0.15
-            },
-            'spot': {
-                'urgency_validity': 0.25,
-                'repayment_capacity': 0.30,
-                'cash_flow': 0.25,
-                'business_stability': 0.20
-            }
-        }
-        
-        # Plafonds par type de crédit
-        self.credit_limits = {
-            'consommation': {'max_amount': None, 'salary_ratio': 0.35},
-            'investissement': {'max_amount': 100000000},
-            'avance_facture': {'max_amount': 100000000, 'invoice_ratio': 0.70},
-            'avance_commande': {'max_amount': 100000000},
-            'tontine': {'max_amount': 5000000},
-            'retraite': {'max_amount': None},  # Basé sur la quotité
-            'spot': {'max_amount': 100000000}
-        }
+        self.rules = CREDIT_RULES
+
+        # Score de base, poids des critères et plafonds par type de crédit
+        self.base_scores = {t: spec['base_score'] for t, spec in self.rules.items()}
+        self.criteria_weights = {t: spec.get('weights', {}) for t, spec in self.rules.items()}
+        self.credit_limits = {t: spec.get('limits', {}) for t, spec in self.rules.items()}
+
+        # Table compilée une fois pour score_batch : type de crédit -> fonctions numpy
+        self._vector_dispatch = {t: _vectorize_credit_type(spec) for t, spec in self.rules.items()}
+        self._vector_unknown_type = _vectorize_credit_type({})
+        self._vector_credit_history = _vectorize_rule(CREDIT_HISTORY_RULE)
+        self._vector_common_eligibility = [(_vectorize_predicate(p), message) for p, message in COMMON_ELIGIBILITY]
 
     def calculate_score(self, data):
         """Calcule le score de crédit en fonction du type de crédit et des données fournies"""
@@ -131,14 +680,18 @@ class AdvancedCreditScoringModel:
             
         except Exception as e:
             logger.error(f"Erreur dans le calcul du score: {e}")
-            return {
-                'score': 500,
-                'probability': 0.5,
-                'risk_level': 'moyen',
-                'factors': [],
-                'eligibility': {'eligible': False, 'reasons': [str(e)]},
-                'recommendations': []
-            }
+            return self._fallback_result(str(e))
+
+    @staticmethod
+    def _fallback_result(reason):
+        return {
+            'score': 500,
+            'probability': 0.5,
+            'risk_level': 'moyen',
+            'factors': [],
+            'eligibility': {'eligible': False, 'reasons': [reason]},
+            'recommendations': []
+        }
 
     def _score_consommation(self, data, base_score):
         """Scoring spécifique pour le crédit consommation"""
@@ -738,6 +1291,79 @@ class AdvancedCreditScoringModel:
         
         return recommendations
 
+    # ==========================================
+    # SCORING PAR LOT
+    # ==========================================
+
+    def score_batch(self, applications: pd.DataFrame) -> pd.DataFrame:
+        """
+        Score un DataFrame de demandes (une ligne par demande, colonnes = clés
+        de calculate_score) colonne par colonne avec numpy.
+
+        Renvoie, avec l'index d'entrée : score, probability, risk_level,
+        eligible, reasons, identiques à calculate_score ligne par ligne
+        (facteurs et recommandations restent propres à calculate_score).
+        """
+        ctx = _BatchContext(applications)
+        n = ctx.n
+        declared = applications['credit_type'] if 'credit_type' in applications.columns else None
+        type_codes, type_values = _factorize(declared, n, None)
+        missing = np.array([v is None for v in type_values], dtype=bool)[type_codes]
+        everyone = np.ones(n, dtype=bool)
+
+        types = [(self._vector_dispatch.get(t if t is not None else 'consommation', self._vector_unknown_type),
+                  type_codes == i)
+                 for i, t in enumerate(type_values)]
+
+        # Score : chaque critère ne compte que sur les lignes de son type
+        score = np.zeros(n)
+        for compiled, rows in types:
+            score[rows] = compiled.base_score
+        for compiled, rows in types:
+            for points in compiled.criteria:
+                score += points(ctx, rows)
+
+        score += self._vector_credit_history(ctx, everyone)
+        for compiled, rows in types:
+            for points in compiled.adjustments:
+                score += points(ctx, rows & ~missing)
+        score = np.clip(score, MIN_SCORE, MAX_SCORE)
+
+        # Éligibilité : un bit par contrôle échoué, motifs regroupés
+        messages, failures = [], np.zeros(n, dtype=np.int64)
+        checks = [(check, everyone) for check in self._vector_common_eligibility]
+        checks += [(check, rows) for compiled, rows in types for check in compiled.eligibility]
+        for (failed, message), rows in checks:
+            failures |= (rows & failed(ctx, rows)).astype(np.int64) << len(messages)
+            messages.append(message)
+        patterns, pattern_of_row = np.unique(failures, return_inverse=True)
+        pattern_reasons = [[m for bit, m in enumerate(messages) if pattern >> bit & 1] for pattern in patterns]
+        reasons = [list(pattern_reasons[i]) for i in pattern_of_row.ravel()]
+
+        probability = _vector_bands(score, PROBABILITY_BANDS, DEFAULT_PROBABILITY)
+        risk_level = _vector_bands(score, RISK_LEVELS, DEFAULT_RISK_LEVEL).astype(object)
+        score = np.trunc(score).astype(int)
+        eligible = failures == 0
+
+        # Lignes où calculate_score lèverait : résultat de repli
+        errors = ctx.errors
+        if errors.any():
+            fallback = self._fallback_result(None)
+            score[errors] = fallback['score']
+            probability[errors] = fallback['probability']
+            risk_level[errors] = fallback['risk_level']
+            eligible[errors] = False
+            for i in np.flatnonzero(errors):
+                reasons[i] = [ctx.error_messages[i]]
+
+        return pd.DataFrame({
+            'score': score,
+            'probability': probability,
+            'risk_level': risk_level,
+            'eligible': eligible,
+            'reasons': reasons
+        }, index=applications.index)
+
     def predict(self, features):
         """Interface principale pour la prédiction - compatible avec l'API existante"""
         # Adapter les features au nouveau format si nécessaire
@@ -753,10 +1379,10 @@ class AdvancedCreditScoringModel:
             'loan_duration': features.get('loan_duration', 12),
             **features  # Inclure toutes les autres données
         }
-        
+
         # Calculer le score avec toutes les données
         result = self.calculate_score(data)
-        
+
         # Adapter le format de retour pour l'API
         return {
             'score': result['score'],
@@ -765,4 +1391,4 @@ class AdvancedCreditScoringModel:
             'factors': result['factors'],
             'eligibility': result['eligibility'],
             'recommendations': result['recommendations']
-        }
\ No newline at end of file
+        }
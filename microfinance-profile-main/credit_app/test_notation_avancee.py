@@ -0,0 +1,292 @@
+"""
+Moteur de règles : résultats attendus fixés pour chaque type de crédit
+(critères, ajustements, éligibilité, facteurs, recommandations, replis sur
+erreur), et scoring par lot identique à calculate_score demande par
+demande; benchmark des deux chemins.
+
+    python -m pytest test_notation_avancee.py
+    python test_notation_avancee.py benchmark
+"""
+import logging
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from notation_avancé import AdvancedCreditScoringModel
+
+logging.getLogger('notation_avancé').setLevel(logging.CRITICAL)
+
+TRIALS = 3000
+
+
+# ==========================================
+# CAS FIXÉS
+# ==========================================
+
+PROFILE_QUALITY = {'name': 'profile_quality', 'label': 'Profil de qualité',
+                   'impact': 'positive', 'value': 'Excellent profil de crédit'}
+
+
+def expected(score, probability, risk_level, reasons=(), factors=(), recommendations=()):
+    return {
+        'score': score,
+        'probability': probability,
+        'risk_level': risk_level,
+        'factors': list(factors),
+        'eligibility': {'eligible': not reasons, 'reasons': list(reasons)},
+        'recommendations': list(recommendations)
+    }
+
+
+def debt_ratio(impact, value):
+    return {'name': 'debt_ratio', 'label': "Ratio d'endettement", 'impact': impact, 'value': value}
+
+
+def contribution_regularity(impact, missed):
+    return {'name': 'contribution_regularity', 'label': 'Régularité des cotisations',
+            'impact': impact, 'value': f'{missed} cotisation(s) manquée(s)'}
+
+
+CASES = [
+    # 600 + 50 (âge) + 100 (cdi) + 120 (mensualité 20%) + 40 (rénovation) + 30 (historique), plafonné
+    ({'credit_type': 'consommation', 'age': 35, 'employment_status': 'CDI', 'monthly_income': 500000,
+      'loan_amount': 2400000, 'loan_duration': 24, 'loan_purpose': 'Rénovation maison', 'credit_history': 'bon'},
+     expected(900, 0.95, 'bas', factors=[PROFILE_QUALITY, debt_ratio('positive', '20.0%')])),
+    # 600 + 20 + 50 + 20 (mensualité 50%) + 20 (voyage) - 100 (historique) - 50 (durée)
+    ({'credit_type': 'consommation', 'age': 22, 'employment_status': 'cdd', 'monthly_income': 200000,
+      'loan_amount': 6000000, 'loan_duration': 60, 'loan_purpose': 'voyage', 'credit_history': 'mauvais'},
+     expected(560, 0.5, 'moyen',
+              reasons=['La mensualité dépasse 35% du salaire', 'Durée maximale: 48 mois'],
+              factors=[debt_ratio('negative', '50.0%')],
+              recommendations=['Réduire le montant demandé ou augmenter la durée pour respecter le ratio de 35%'])),
+    # 550 + 70 (CA) + 30 (marge 8%) + 20 (patente) + 20 (garanties) + 20 (stock) - 50 (durée)
+    ({'credit_type': 'investissement', 'age': 40, 'entity_type': 'Entreprise', 'company_turnover': 25000000,
+      'net_profit': 2000000, 'has_statutes': True, 'has_patent': True, 'has_financial_statements': False,
+      'loan_amount': 10000000, 'collateral_value': 6000000, 'investment_type': 'Stock de marchandises',
+      'loan_duration': 40},
+     expected(660, 0.7, 'moyen', recommendations=["Fournir les états financiers de l'entreprise",
+                                                  'Augmenter la valeur des garanties'])),
+    # 550 + 20 (CA nul) - 100 (plafond); entity_type comparé sans casse pour l'éligibilité
+    ({'credit_type': 'investissement', 'entity_type': 'entreprise', 'company_turnover': 0, 'has_statutes': False,
+      'has_patent': False, 'loan_amount': 150000000, 'collateral_value': 10000000},
+     expected(470, 0.3, 'élevé',
+              reasons=['Âge minimum requis: 18 ans', 'Montant maximum: 100 000 000 FCFA',
+                       "Statuts de l'entreprise requis", 'Patente requise'],
+              recommendations=['Améliorer votre historique de crédit',
+                               "Fournir les états financiers de l'entreprise",
+                               'Augmenter la valeur des garanties'])),
+    # 700 - 100 (80% de la facture) - 50 (client) - 30 (délai) + 10 (relation)
+    ({'credit_type': 'avance_facture', 'age': 45, 'invoice_amount': 10000000, 'loan_amount': 8000000,
+      'client_payment_history': 'mauvais', 'payment_deadline_days': 120, 'invoice_verified': False,
+      'business_relationship_months': 6},
+     expected(530, 0.3, 'élevé', reasons=['Maximum 70% du montant de la facture'],
+              recommendations=['Améliorer votre historique de crédit'])),
+    # 650 - 50 (commande) + 60 (client) + 40 (capacité 5 x 8) + 20 (marge) - 20 (matières) - 100 (plafond)
+    ({'credit_type': 'avance_commande', 'age': 38, 'order_verified': False, 'order_client_reputation': 'Bon',
+      'production_capacity_score': 5, 'profit_margin_percentage': 12, 'raw_materials_cost_ratio': 0.7,
+      'loan_amount': 120000000, 'loan_duration': 6},
+     expected(600, 0.5, 'moyen')),
+    # 750 - 50 (historique) - 30 (adhésion) - 50 (solidarité); cotisation nulle : critère ignoré
+    ({'credit_type': 'tontine', 'contribution_history_months': 4, 'missed_contributions': 2,
+      'loan_amount': 6000000, 'contribution_amount': 0, 'group_default_rate': 0.2},
+     expected(520, 0.3, 'élevé',
+              reasons=['Âge minimum requis: 18 ans', 'Montant maximum: 5 000 000 FCFA',
+                       'Minimum 6 mois de cotisation requis'],
+              factors=[contribution_regularity('negative', 2)],
+              recommendations=['Améliorer votre historique de crédit',
+                               'Continuer à cotiser régulièrement pendant au moins 12 mois'])),
+    # 800 + 40 + 30 + 20 + 24 (autres revenus tronqués), plafonné
+    ({'credit_type': 'retraite', 'age': 72, 'pension_amount': 200000, 'loan_amount': 1200000, 'loan_duration': 12,
+      'pension_duration_months': 8, 'retirement_organization': 'autre', 'other_income': 123456},
+     expected(900, 0.95, 'bas', reasons=['Affiliation CNSS ou CPPF requise'], factors=[PROFILE_QUALITY])),
+    # 500 + 20 (urgence) + 60 (salaire) + 30 (trésorerie 1.2x) + 20 (ancienneté) + 10 (historique) - 50 (durée)
+    ({'credit_type': 'spot', 'age': 30, 'urgency': 'Mariage', 'repayment_source': 'salaire', 'cash_flow': 1000000,
+      'loan_amount': 2500000, 'business_age_years': 1, 'loan_duration': 4, 'credit_history': 'moyen'},
+     expected(590, 0.5, 'moyen', reasons=['Durée maximale: 3 mois'])),
+    # Type inconnu : score de base, contrôles communs seulement
+    ({'credit_type': 'crédit_inconnu', 'age': 16, 'loan_amount': 1000000},
+     expected(600, 0.5, 'moyen', reasons=['Âge minimum requis: 18 ans'])),
+    # Erreurs : résultat de repli avec le message de l'exception
+    ({'credit_type': 'consommation', 'monthly_income': 300000, 'loan_amount': 1000000, 'loan_duration': 0},
+     expected(500, 0.5, 'moyen', reasons=['division by zero'])),
+    ({'credit_type': 'spot', 'urgency': 5},
+     expected(500, 0.5, 'moyen', reasons=["'int' object has no attribute 'lower'"])),
+]
+
+
+# ==========================================
+# GENERATEUR
+# ==========================================
+
+CREDIT_TYPES = ['consommation', 'investissement', 'avance_facture', 'avance_commande',
+                'tontine', 'retraite', 'spot', 'inconnu']
+
+
+def random_application(rng: random.Random, valid: bool = False) -> dict:
+    """Demandes aux bornes des seuils, avec champs absents et (sauf valid) divisions par zero"""
+    def amount(*choices):
+        return rng.choice(list(choices) + [0, rng.randint(1, 200) * 500000])
+
+    candidates = {
+        'credit_type': rng.choice(CREDIT_TYPES),
+        'age': rng.choice([17, 18, 24, 25, 30, 55, 56, 65, 66, 70, 75, 80]),
+        'employment_status': rng.choice(['CDI', 'cdd', 'fonctionnaire', 'independant', 'chomeur', '']),
+        'monthly_income': amount(300000, 500000, 1000000),
+        'loan_amount': amount(5000000, 100000000, 100000001),
+        'loan_duration': rng.choice([0, 1, 3, 4, 12, 13, 24, 36, 48, 49]),
+        'loan_purpose': rng.choice(['Santé', 'rénovation maison', 'voyage', 'autre', '']),
+        'credit_history': rng.choice(['excellent', 'bon', 'moyen', 'mauvais', 'nouveau', 'Bon']),
+        'entity_type': rng.choice(['entreprise', 'Entreprise', 'particulier']),
+        'company_turnover': amount(10000000, 20000000, 50000000),
+        'net_profit': amount(1000000, 2000000),
+        'has_statutes': rng.choice([True, False, 1, 0]),
+        'has_patent': rng.choice([True, False]),
+        'has_financial_statements': rng.choice([True, False]),
+        'collateral_value': amount(2500000, 7500000),
+        'investment_type': rng.choice(['Équipement', 'machines agricoles', 'immobilier', 'stock', '']),
+        'invoice_amount': amount(7000000, 10000000),
+        'client_payment_history': rng.choice(['excellent', 'Bon', 'moyen', 'mauvais']),
+        'payment_deadline_days': rng.choice([15, 30, 31, 60, 90, 91]),
+        'invoice_verified': rng.choice([True, False]),
+        'business_relationship_months': rng.choice([0, 6, 12, 24]),
+        'order_verified': rng.choice([True, False]),
+        'order_client_reputation': rng.choice(['excellent', 'bon', 'moyen', 'faible']),
+        'production_capacity_score': rng.choice([0, 5, 7.5, 10]),
+        'profit_margin_percentage': rng.choice([5, 10, 20, 30]),
+        'raw_materials_cost_ratio': rng.choice([0.3, 0.4, 0.6, 0.7]),
+        'contribution_history_months': rng.choice([0, 5, 6, 12, 24]),
+        'missed_contributions': rng.choice([0, 1, 2, 3]),
+        'tontine_membership_months': rng.choice([0, 6, 12, 24]),
+        'contribution_amount': amount(100000, 200000),
+        'group_default_rate': rng.choice([0, 0.05, 0.1, 0.2]),
+        'pension_amount': amount(200000, 400000),
+        'pension_duration_months': rng.choice([0, 6, 12, 24]),
+        'retirement_organization': rng.choice(['cnss', 'CPPF', 'autre', '']),
+        'other_income': rng.choice([0, 25000, 50000, 123456, 1000000]),
+        'urgency': rng.choice(['Medical', 'décès', 'mariage', '']),
+        'repayment_source': rng.choice(['contrat', 'vente stock', 'salaire', 'autre']),
+        'cash_flow': amount(1000000, 5000000),
+        'business_age_years': rng.choice([0, 1, 2, 3])
+    }
+    if valid:
+        candidates['loan_duration'] = candidates['loan_duration'] or 12
+        candidates['loan_amount'] = candidates['loan_amount'] or 5000000
+    # Champs absents : valeur par defaut de chaque regle
+    return {key: value for key, value in candidates.items() if rng.random() < 0.85}
+
+
+def applications(seed: int, n: int, valid: bool = False):
+    rng = random.Random(seed)
+    return [random_application(rng, valid) for _ in range(n)]
+
+
+# ==========================================
+# TESTS
+# ==========================================
+
+@pytest.mark.parametrize('data, result', CASES)
+def test_calculate_score_cases(data, result):
+    assert AdvancedCreditScoringModel().calculate_score(data) == result
+
+
+def test_predict_fills_api_defaults():
+    model = AdvancedCreditScoringModel()
+    # Sans champs : cdi et 30 ans (defauts de l'API), contrairement a calculate_score
+    assert model.predict({}) == expected(760, 0.85, 'bas', factors=[PROFILE_QUALITY])
+    assert model.calculate_score({})['score'] == 610
+    assert model.predict({'credit_type': 'consommation', 'monthly_income': 400000, 'loan_amount': 1200000}) == \
+        expected(880, 0.95, 'bas', factors=[PROFILE_QUALITY, debt_ratio('positive', '25.0%')])
+
+
+def test_score_batch_cases():
+    data = [application for application, _ in CASES]
+    batch = AdvancedCreditScoringModel().score_batch(pd.DataFrame(data))
+    for (_, row), (_, result) in zip(batch.iterrows(), CASES):
+        assert row['score'] == result['score']
+        assert row['probability'] == result['probability']
+        assert row['risk_level'] == result['risk_level']
+        assert row['eligible'] == result['eligibility']['eligible']
+        assert row['reasons'] == result['eligibility']['reasons']
+
+
+def test_score_batch_matches_calculate_score():
+    model = AdvancedCreditScoringModel()
+    data = applications(3, TRIALS)
+    frame = pd.DataFrame(data, index=range(100, 100 + len(data)))
+    batch = model.score_batch(frame)
+
+    assert list(batch.index) == list(frame.index)
+    fallbacks = 0
+    for (_, row), application in zip(batch.iterrows(), data):
+        result = model.calculate_score(application)
+        assert row['score'] == result['score'], application
+        assert row['probability'] == result['probability'], application
+        assert row['risk_level'] == result['risk_level'], application
+        assert row['eligible'] == result['eligibility']['eligible'], application
+        if any('division by zero' in reason for reason in result['eligibility']['reasons']):
+            # Repli : 'float division by zero' ou non selon les types des colonnes
+            assert row['reasons'] == ['division by zero'], application
+            fallbacks += 1
+        else:
+            assert row['reasons'] == result['eligibility']['reasons'], application
+    assert fallbacks, "le generateur doit produire des divisions par zero"
+
+
+def test_score_batch_invalid_text():
+    model = AdvancedCreditScoringModel()
+    data = [
+        {'employment_status': 12, 'urgency': ''},
+        {'employment_status': 'cdi', 'urgency': ''},
+        {'credit_type': 'spot', 'employment_status': 'cdi', 'urgency': 5}
+    ]
+    batch = model.score_batch(pd.DataFrame(data))
+    for (_, row), application in zip(batch.iterrows(), data):
+        result = model.calculate_score(application)
+        assert row['score'] == result['score']
+        assert row['reasons'] == result['eligibility']['reasons'], (row['reasons'], result)
+
+
+def test_score_batch_empty_and_missing_columns():
+    model = AdvancedCreditScoringModel()
+    assert len(model.score_batch(pd.DataFrame())) == 0
+    batch = model.score_batch(pd.DataFrame({'age': [30, 16]}))
+    results = [model.calculate_score({'age': 30}), model.calculate_score({'age': 16})]
+    assert list(batch['score']) == [r['score'] for r in results]
+    assert list(batch['reasons']) == [r['eligibility']['reasons'] for r in results]
+
+
+# ==========================================
+# BENCHMARK
+# ==========================================
+
+def _best_of(fn, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def benchmark(n: int = 20000):
+    """Demandes valides (pas de repli sur exception), meilleur de 5 passes"""
+    data = applications(4, n, valid=True)
+    model = AdvancedCreditScoringModel()
+    frame = pd.DataFrame(data)
+
+    dict_time = _best_of(lambda: [model.calculate_score(application) for application in data])
+    batch_time = _best_of(lambda: model.score_batch(frame))
+
+    print(f"{n} demandes")
+    print(f"  dict, if/elif (calculate_score) : {dict_time * 1000:8.1f} ms  ({dict_time / n * 1e6:.1f} us/demande)")
+    print(f"  lot DataFrame (score_batch)     : {batch_time * 1000:8.1f} ms  ({batch_time / n * 1e6:.1f} us/demande)")
+    print(f"  gain du lot                     : x{dict_time / batch_time:.1f}")
+
+
+if __name__ == '__main__':
+    benchmark()
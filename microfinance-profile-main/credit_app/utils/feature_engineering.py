@@ -68,6 +68,90 @@ class FeatureEngineer:
         
         return features
     
+    def engineer_features_frame(self, df):
+        """
+        Ingénierie des caractéristiques pour un lot de demandes (une ligne par
+        demande, mêmes clés que engineer_features), calculée par colonne.
+        Les valeurs manquantes (colonne absente ou NaN) prennent les mêmes
+        valeurs par défaut que data.get dans engineer_features.
+        """
+        def column(name, default=0):
+            if name not in df.columns:
+                return pd.Series(default, index=df.index, dtype=float)
+            return pd.to_numeric(df[name], errors='coerce').fillna(default).astype(float)
+
+        def labels(name):
+            if name not in df.columns:
+                return pd.Series('', index=df.index, dtype=object)
+            return df[name]
+
+        features = pd.DataFrame(index=df.index)
+        
+        # Caractéristiques de base
+        features['age'] = self._calculate_age_column(labels('birthDate'))
+        features['monthlyIncome'] = column('monthlyIncome')
+        features['otherIncome'] = column('otherIncome')
+        features['totalIncome'] = features['monthlyIncome'] + features['otherIncome']
+        features['existingDebts'] = column('existingDebts')
+        features['requestedAmount'] = column('requestedAmount')
+        features['requestedDuration'] = column('requestedDuration')
+        
+        # Caractéristiques dérivées
+        features['debtToIncomeRatio'] = self._safe_divide_columns(
+            features['existingDebts'], features['monthlyIncome']
+        )
+        features['repaymentCapacity'] = features['monthlyIncome'] * 0.35
+        features['requestedAmountRatio'] = self._safe_divide_columns(
+            features['requestedAmount'], features['monthlyIncome']
+        )
+        
+        # Caractéristiques d'emploi
+        seniority = labels('jobSeniority').map(self.seniority_mapping).fillna(0).astype(float)
+        contract = labels('contractType').map(self.contract_mapping).fillna(0).astype(float)
+        features['jobSeniority'] = seniority
+        features['employmentStability'] = np.minimum(contract + np.minimum(seniority, 5), 10)
+        
+        # Caractéristiques bancaires
+        features['bankAccountAge'] = column('bankAccountAge')
+        features['averageBalance'] = column('averageBalance')
+        features['previousLoans'] = column('previousLoans')
+        
+        # Caractéristiques de risque
+        features['riskScore'] = self._calculate_risk_score_columns(features)
+        credit_limit = column('creditLimit')
+        utilization = self._safe_divide_columns(column('currentBalance'), credit_limit) * 100
+        features['creditUtilization'] = np.where(credit_limit > 0, np.minimum(utilization, 100), 0)
+        
+        return features
+    
+    def _calculate_age_column(self, birth_dates):
+        """Âge par colonne; date absente ou invalide -> 35, comme _calculate_age"""
+        births = pd.to_datetime(birth_dates.where(birth_dates.map(lambda v: isinstance(v, str))),
+                                format='%Y-%m-%d', errors='coerce')
+        today = datetime.now()
+        before_birthday = (births.dt.month > today.month) | (
+            (births.dt.month == today.month) & (births.dt.day > today.day)
+        )
+        age = today.year - births.dt.year - before_birthday.astype(int)
+        return age.fillna(35).astype(float)
+    
+    def _safe_divide_columns(self, numerator, denominator):
+        """Division sécurisée par colonne (0 si dénominateur nul)"""
+        numerator = np.asarray(numerator, dtype=float)
+        denominator = np.asarray(denominator, dtype=float)
+        return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator != 0)
+    
+    def _calculate_risk_score_columns(self, features):
+        """Calcul du score de risque par colonne"""
+        age = features['age'].to_numpy()
+        debt_ratio = features['debtToIncomeRatio'].to_numpy()
+        amount_ratio = features['requestedAmountRatio'].to_numpy()
+        return (
+            np.select([age < 25, age > 65], [2, 3], 0)
+            + np.select([debt_ratio > 0.5, debt_ratio > 0.3], [5, 2], 0)
+            + np.select([amount_ratio > 10, amount_ratio > 5], [4, 2], 0)
+        ).astype(float)
+    
     def _calculate_age(self, birth_date):
         """Calcul de l'âge"""
         try:
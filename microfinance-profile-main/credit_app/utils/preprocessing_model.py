@@ -0,0 +1,425 @@
+# utils/preprocessing_model.py
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score, classification_report, roc_auc_score
+import math
+import os
+import threading
+from collections import Counter
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+class FeatureValidationError(ValueError):
+    """Caractéristiques incompatibles avec le plan du modèle"""
+
+
+_NUMERIC_TYPES = (int, float, np.float64, np.float32, np.int64, np.int32)
+
+
+class FeaturePlan:
+    """
+    Plan de caractéristiques figé au chargement du modèle : ordre des
+    colonnes, type, valeurs par défaut et tampons réutilisés d'un appel à
+    l'autre (un jeu par thread, les requêtes Flask étant concurrentes).
+
+    Une caractéristique absente (ou None / NaN) prend sa valeur par défaut;
+    une valeur non numérique ou infinie est refusée.
+    
+    Un StandardScaler entraîné est appliqué directement dans le tampon
+    (mêmes opérations que StandardScaler.transform, sans sa validation
+    d'entrée à chaque appel); tout autre scaler passe par transform().
+    """
+    
+    def __init__(self, feature_names, scaler=None, defaults=None, dtype=np.float64):
+        if not feature_names:
+            raise FeatureValidationError("Aucune caractéristique dans le plan")
+        duplicates = sorted(name for name, count in Counter(feature_names).items() if count > 1)
+        if duplicates:
+            raise FeatureValidationError(f"Caractéristiques en double: {duplicates}")
+        n_features_expected = getattr(scaler, 'n_features_in_', None)
+        if n_features_expected is not None and n_features_expected != len(feature_names):
+            raise FeatureValidationError(
+                f"Le scaler attend {n_features_expected} caractéristiques, le plan en a {len(feature_names)}"
+            )
+        defaults = defaults or {}
+        self.feature_names = tuple(feature_names)
+        self.dtype = np.dtype(dtype)
+        self.defaults = np.array([defaults.get(name, 0) for name in self.feature_names], dtype=self.dtype)
+        self._columns = tuple(zip(range(len(self.feature_names)), self.feature_names, self.defaults.tolist()))
+        self._buffers = threading.local()
+        
+        self._transform = None
+        self._mean = self._std = None
+        if isinstance(scaler, StandardScaler) and n_features_expected is not None:
+            if scaler.with_mean:
+                self._mean = np.asarray(scaler.mean_, dtype=self.dtype)
+            if scaler.with_std:
+                self._std = np.asarray(scaler.scale_, dtype=self.dtype)
+        elif scaler is not None:
+            self._transform = scaler.transform
+    
+    def __len__(self):
+        return len(self.feature_names)
+    
+    def _buffer(self, n_rows):
+        """Tampon (n_rows x n_features) du thread courant, agrandi si besoin"""
+        buffer = getattr(self._buffers, 'array', None)
+        if buffer is None or buffer.shape[0] < n_rows:
+            buffer = np.empty((max(n_rows, 1), len(self)), dtype=self.dtype)
+            self._buffers.array = buffer
+        return buffer[:n_rows]
+    
+    def fill_row(self, features):
+        """Remplit le tampon avec une demande (dict) et renvoie une vue (1 x n_features)"""
+        array = self._buffer(1)
+        row = array[0]
+        get = features.get
+        for i, name, default in self._columns:
+            value = get(name)
+            if value is None:
+                value = default
+            elif type(value) not in _NUMERIC_TYPES and (
+                    isinstance(value, (bool, np.bool_)) or not isinstance(value, (int, float, np.number))):
+                raise FeatureValidationError(f"Caractéristique '{name}' non numérique: {value!r}")
+            elif not math.isfinite(value):
+                if value == value:
+                    raise FeatureValidationError(f"Valeur non finie pour '{name}': {value!r}")
+                value = default  # NaN
+            row[i] = value
+        return array
+    
+    def fill_frame(self, features_df):
+        """Remplit le tampon avec un lot (une ligne par demande) et renvoie une vue"""
+        array = self._buffer(len(features_df))
+        for i, name, default in self._columns:
+            if name not in features_df.columns:
+                array[:, i] = default
+                continue
+            column = features_df[name]
+            if not pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column):
+                raise FeatureValidationError(f"Caractéristique '{name}' non numérique (type {column.dtype})")
+            array[:, i] = column.to_numpy()
+            missing = np.isnan(array[:, i])
+            if missing.any():
+                array[missing, i] = default
+        self._check_finite(array)
+        return array
+    
+    def scale(self, array):
+        """Normalise le tampon rempli (en place pour un StandardScaler)"""
+        if self._transform is not None:
+            return self._transform(array)
+        if self._mean is not None:
+            np.subtract(array, self._mean, out=array)
+        if self._std is not None:
+            np.divide(array, self._std, out=array)
+        return array
+    
+    def _check_finite(self, array):
+        finite = np.isfinite(array)
+        if not finite.all():
+            bad = [self.feature_names[i] for i in np.flatnonzero(~finite.all(axis=0))]
+            raise FeatureValidationError(f"Valeurs non finies pour: {bad}")
+
+
+class ScoringModel:
+    def __init__(self, config):
+        self.config = config
+        self.model = None
+        self.scaler = None
+        self.feature_names = None
+        self.feature_plan = None
+        self.model_version = config.MODEL_VERSION
+        self.model_path = config.MODEL_PATH
+        
+        # Chargement du modèle au démarrage
+        self._load_model()
+    
+    def _load_model(self):
+        """Chargement du modèle pré-entraîné"""
+        try:
+            if os.path.exists(self.model_path):
+                self.model = joblib.load(os.path.join(self.model_path, 'random_forest_model.pkl'))
+                self.scaler = joblib.load(os.path.join(self.model_path, 'scaler.pkl'))
+                self.feature_names = joblib.load(os.path.join(self.model_path, 'feature_names.pkl'))
+                self._build_feature_plan()
+                logger.info("Modèle chargé avec succès")
+            else:
+                logger.warning("Modèle non trouvé, création d'un nouveau modèle")
+                self._create_default_model()
+        except Exception as e:
+            logger.error(f"Erreur lors du chargement du modèle: {str(e)}")
+            self._create_default_model()
+    
+    def _create_default_model(self):
+        """Création d'un modèle par défaut"""
+        self.model = RandomForestClassifier(n_estimators=100, random_state=42)
+        self.scaler = StandardScaler()
+        self.feature_names = [
+            'age', 'monthlyIncome', 'totalIncome', 'debtToIncomeRatio',
+            'repaymentCapacity', 'jobSeniority', 'employmentStability',
+            'requestedAmount', 'requestedDuration', 'requestedAmountRatio',
+            'bankAccountAge', 'averageBalance', 'previousLoans'
+        ]
+        self._build_feature_plan()
+    
+    def _build_feature_plan(self):
+        """Plan figé pour le modèle chargé, cohérent avec le scaler s'il est entraîné"""
+        self.feature_plan = FeaturePlan(self.feature_names, scaler=self.scaler)
+    
+    def predict(self, features):
+        """Prédiction du score de crédit"""
+        if not self.is_loaded():
+            raise ValueError("Modèle non chargé")
+        
+        # Préparation des données
+        feature_array = self._prepare_features(features)
+        
+        # Prédiction
+        if hasattr(self.model, 'predict_proba'):
+            probability = self.model.predict_proba(feature_array)[0][1]
+        else:
+            probability = 0.5
+        
+        # Calcul du score (0-1000)
+        score = self._calculate_score(probability, features)
+        
+        # Analyse des facteurs d'influence
+        factors = self._analyze_factors(features, feature_array)
+        
+        return {
+            'score': score,
+            'probability': probability,
+            'factors': factors
+        }
+    
+    def predict_batch(self, features_df):
+        """
+        Prédiction pour un lot : features_df contient une ligne par demande
+        (FeatureEngineer.engineer_features_frame). Une seule normalisation et
+        un seul predict_proba pour tout le lot.
+        """
+        if not self.is_loaded():
+            raise ValueError("Modèle non chargé")
+        
+        feature_array = self._prepare_feature_frame(features_df)
+        
+        if hasattr(self.model, 'predict_proba'):
+            probabilities = self.model.predict_proba(feature_array)[:, 1]
+        else:
+            probabilities = np.full(len(features_df), 0.5)
+        
+        scores = self._calculate_scores(probabilities, features_df)
+        
+        records = features_df.to_dict(orient='records')
+        return [
+            {
+                'score': score,
+                'probability': probability,
+                'factors': self._analyze_factors(features, None)
+            }
+            for score, probability, features in zip(scores, probabilities, records)
+        ]
+    
+    def _prepare_features(self, features):
+        """Préparation des caractéristiques pour le modèle (tampon du plan, 1 ligne)"""
+        return self.feature_plan.scale(self.feature_plan.fill_row(features))
+    
+    def _prepare_feature_frame(self, features_df):
+        """Matrice (demandes x caractéristiques) dans l'ordre du plan"""
+        return self.feature_plan.scale(self.feature_plan.fill_frame(features_df))
+    
+    def _calculate_score(self, probability, features):
+        """Calcul du score final (0-1000)"""
+        # Score de base basé sur la probabilité
+        base_score = (1 - probability) * 1000
+        
+        # Ajustements basés sur les règles métier
+        adjustments = 0
+        
+        # Ajustement pour le ratio dette/revenus
+        debt_ratio = features.get('debtToIncomeRatio', 0)
+        if debt_ratio > 0.5:
+            adjustments -= 100
+        elif debt_ratio < 0.2:
+            adjustments += 50
+        
+        # Ajustement pour la stabilité de l'emploi
+        employment_stability = features.get('employmentStability', 0)
+        if employment_stability >= 8:
+            adjustments += 50
+        elif employment_stability <= 3:
+            adjustments -= 50
+        
+        # Ajustement pour l'ancienneté
+        job_seniority = features.get('jobSeniority', 0)
+        if job_seniority >= 5:
+            adjustments += 30
+        
+        # Score final
+        final_score = max(0, min(1000, base_score + adjustments))
+        return final_score
+    
+    def _calculate_scores(self, probabilities, features_df):
+        """_calculate_score par colonne pour un lot"""
+        def column(name):
+            if name not in features_df.columns:
+                return np.zeros(len(features_df))
+            return features_df[name].to_numpy(dtype=float)
+        
+        base_scores = (1 - probabilities) * 1000
+        
+        debt_ratio = column('debtToIncomeRatio')
+        employment_stability = column('employmentStability')
+        job_seniority = column('jobSeniority')
+        adjustments = (
+            np.select([debt_ratio > 0.5, debt_ratio < 0.2], [-100, 50], 0)
+            + np.select([employment_stability >= 8, employment_stability <= 3], [50, -50], 0)
+            + np.where(job_seniority >= 5, 30, 0)
+        )
+        
+        return np.clip(base_scores + adjustments, 0, 1000)
+    
+    def _analyze_factors(self, features, feature_array):
+        """Analyse des facteurs d'influence"""
+        factors = []
+        
+        # Analyse du ratio dette/revenus
+        debt_ratio = features.get('debtToIncomeRatio', 0)
+        if debt_ratio > 0.4:
+            factors.append({
+                'name': 'Ratio dette/revenus élevé',
+                'value': debt_ratio,
+                'impact': 'negative'
+            })
+        elif debt_ratio < 0.2:
+            factors.append({
+                'name': 'Ratio dette/revenus faible',
+                'value': debt_ratio,
+                'impact': 'positive'
+            })
+        
+        # Analyse de la stabilité de l'emploi
+        employment_stability = features.get('employmentStability', 0)
+        if employment_stability >= 8:
+            factors.append({
+                'name': 'Stabilité de l\'emploi excellente',
+                'value': employment_stability,
+                'impact': 'positive'
+            })
+        elif employment_stability <= 3:
+            factors.append({
+                'name': 'Stabilité de l\'emploi faible',
+                'value': employment_stability,
+                'impact': 'negative'
+            })
+        
+        # Analyse des revenus
+        monthly_income = features.get('monthlyIncome', 0)
+        if monthly_income >= 5000:
+            factors.append({
+                'name': 'Revenus élevés',
+                'value': monthly_income,
+                'impact': 'positive'
+            })
+        elif monthly_income <= 1500:
+            factors.append({
+                'name': 'Revenus faibles',
+                'value': monthly_income,
+                'impact': 'negative'
+            })
+        
+        return factors
+    
+    def retrain(self, training_data):
+        """Réentraînement du modèle"""
+        try:
+            # Préparation des données d'entraînement
+            X, y = self._prepare_training_data(training_data)
+            
+            # Division des données
+            X_train, X_test, y_train, y_test = train_test_split(
+                X, y, test_size=0.2, random_state=42
+            )
+            
+            # Normalisation
+            self.scaler = StandardScaler()
+            X_train_scaled = self.scaler.fit_transform(X_train)
+            X_test_scaled = self.scaler.transform(X_test)
+            
+            # Entraînement du modèle
+            self.model = RandomForestClassifier(
+                n_estimators=100,
+                max_depth=10,
+                random_state=42
+            )
+            self.model.fit(X_train_scaled, y_train)
+            
+            # Évaluation
+            y_pred = self.model.predict(X_test_scaled)
+            y_pred_proba = self.model.predict_proba(X_test_scaled)[:, 1]
+            
+            metrics = {
+                'accuracy': accuracy_score(y_test, y_pred),
+                'auc': roc_auc_score(y_test, y_pred_proba),
+                'classification_report': classification_report(y_test, y_pred, output_dict=True)
+            }
+            
+            self._build_feature_plan()
+            
+            # Sauvegarde du modèle
+            self._save_model()
+            
+            # Mise à jour de la version
+            self.model_version = datetime.now().strftime('%Y%m%d_%H%M%S')
+            
+            return {
+                'metrics': metrics,
+                'version': self.model_version
+            }
+            
+        except Exception as e:
+            logger.error(f"Erreur lors du réentraînement: {str(e)}")
+            raise e
+    
+    def _prepare_training_data(self, training_data):
+        """Préparation des données d'entraînement"""
+        # Ici vous devez adapter selon votre format de données
+        # Ceci est un exemple basique
+        df = pd.DataFrame(training_data)
+        
+        # Extraction des caractéristiques
+        X = df[self.feature_names]
+        y = df['target']  # Supposons que 'target' est la colonne cible
+        
+        return X.values, y.values
+    
+    def _save_model(self):
+        """Sauvegarde du modèle"""
+        os.makedirs(self.model_path, exist_ok=True)
+        
+        joblib.dump(self.model, os.path.join(self.model_path, 'random_forest_model.pkl'))
+        joblib.dump(self.scaler, os.path.join(self.model_path, 'scaler.pkl'))
+        joblib.dump(self.feature_names, os.path.join(self.model_path, 'feature_names.pkl'))
+        
+        logger.info("Modèle sauvegardé avec succès")
+    
+    def get_model_info(self):
+        """Informations sur le modèle"""
+        return {
+            'version': self.model_version,
+            'loaded': self.is_loaded(),
+            'features': self.feature_names,
+            'model_type': 'RandomForest',
+            'last_updated': datetime.now().isoformat()
+        }
+    
+    def is_loaded(self):
+        """Vérification si le modèle est chargé"""
+        return self.model is not None
\ No newline at end of file
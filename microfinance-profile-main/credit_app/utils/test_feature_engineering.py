@@ -0,0 +1,95 @@
+"""
+engineer_features_frame donne, ligne par ligne, les memes caracteristiques
+que engineer_features sur chaque demande.
+
+    python -m pytest utils/test_feature_engineering.py
+    python utils/test_feature_engineering.py      # benchmark dicts vs DataFrame
+"""
+import logging
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from feature_engineering import FeatureEngineer
+
+logging.getLogger('feature_engineering').setLevel(logging.ERROR)  # dates invalides voulues
+
+TRIALS = 2000
+
+
+def random_application(rng: random.Random) -> dict:
+    today = datetime.now()
+    birth_dates = [
+        '',
+        'pas une date',
+        '1990-13-01',
+        (today - timedelta(days=rng.randint(6000, 30000))).strftime('%Y-%m-%d'),
+        today.replace(year=today.year - 30).strftime('%Y-%m-%d'),                      # anniversaire aujourd'hui
+        (today.replace(year=today.year - 40) + timedelta(days=1)).strftime('%Y-%m-%d'),  # demain
+    ]
+    candidates = {
+        'birthDate': rng.choice(birth_dates),
+        'monthlyIncome': rng.choice([0, 1500, 250000, rng.uniform(0, 2000000)]),
+        'otherIncome': rng.choice([0, 50000]),
+        'existingDebts': rng.choice([0, 100000, rng.uniform(0, 1000000)]),
+        'requestedAmount': rng.choice([0, 500000, rng.uniform(0, 20000000)]),
+        'requestedDuration': rng.choice([0, 12, 24]),
+        'jobSeniority': rng.choice(['moins_1_an', '1_3_ans', '3_5_ans', '5_10_ans', 'plus_10_ans', 'inconnu']),
+        'contractType': rng.choice(['CDI', 'Fonctionnaire', 'CDD', 'Freelance', 'Autres', 'stage']),
+        'bankAccountAge': rng.randint(0, 20),
+        'averageBalance': rng.uniform(0, 500000),
+        'previousLoans': rng.randint(0, 5),
+        'creditLimit': rng.choice([-1, 0, 100000, 500000]),
+        'currentBalance': rng.choice([0, 50000, 800000])
+    }
+    return {key: value for key, value in candidates.items() if rng.random() < 0.85}
+
+
+def test_frame_matches_dict_path():
+    rng = random.Random(0)
+    engineer = FeatureEngineer()
+    applications = [random_application(rng) for _ in range(TRIALS)]
+    frame = engineer.engineer_features_frame(pd.DataFrame(applications, index=range(7, 7 + TRIALS)))
+
+    assert list(frame.index) == list(range(7, 7 + TRIALS))
+    for (_, row), application in zip(frame.iterrows(), applications):
+        expected = engineer.engineer_features(application)
+        assert list(frame.columns) == list(expected), list(frame.columns)
+        for name, value in expected.items():
+            assert math.isclose(row[name], value, rel_tol=1e-12, abs_tol=1e-12), (name, row[name], value, application)
+
+
+def test_missing_columns():
+    engineer = FeatureEngineer()
+    frame = engineer.engineer_features_frame(pd.DataFrame({'monthlyIncome': [1000, None]}))
+    for (_, row), application in zip(frame.iterrows(), [{'monthlyIncome': 1000}, {}]):
+        expected = engineer.engineer_features(application)
+        assert all(math.isclose(row[name], value) for name, value in expected.items())
+
+
+def benchmark(n: int = 20000):
+    rng = random.Random(1)
+    engineer = FeatureEngineer()
+    applications = [random_application(rng) for _ in range(n)]
+    df = pd.DataFrame(applications)
+
+    start = time.perf_counter()
+    for application in applications:
+        engineer.engineer_features(application)
+    dict_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engineer.engineer_features_frame(df)
+    frame_time = time.perf_counter() - start
+
+    print(f"{n} demandes : dict {dict_time * 1000:.1f} ms, DataFrame {frame_time * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    benchmark()
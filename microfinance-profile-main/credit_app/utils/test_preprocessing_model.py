@@ -0,0 +1,54 @@
+"""
+ScoringModel du service de pretraitement : predict_batch donne, ligne par
+ligne, le meme resultat que predict, et les caracteristiques invalides
+levent FeatureValidationError (400 sur /predict et /predict/batch).
+
+    python -m pytest utils/test_preprocessing_model.py
+"""
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from preprocessing_model import FeatureValidationError, ScoringModel
+
+
+def _fitted_model(directory):
+    model = ScoringModel(SimpleNamespace(MODEL_PATH=os.path.join(directory, 'absent'), MODEL_VERSION='test'))
+    rng = np.random.default_rng(0)
+    rows = [dict({name: float(rng.uniform(0, 2)) for name in model.feature_names}, target=int(rng.integers(0, 2)))
+            for _ in range(200)]
+    model.model_path = directory
+    model.retrain(rows)
+    return model, rng
+
+
+def test_predict_batch_matches_predict():
+    with tempfile.TemporaryDirectory() as directory:
+        model, rng = _fitted_model(directory)
+        frame = pd.DataFrame(rng.uniform(0, 2, size=(25, len(model.feature_names))), columns=model.feature_names)
+        frame.iloc[3, 0] = np.nan  # valeur par defaut du plan
+
+        batch = model.predict_batch(frame)
+        assert len(batch) == len(frame)
+        for (_, row), result in zip(frame.iterrows(), batch):
+            single = model.predict(row.to_dict())
+            assert np.isclose(result['probability'], single['probability'])
+            assert result['score'] == single['score']
+
+
+def test_invalid_features_raise_validation_error():
+    with tempfile.TemporaryDirectory() as directory:
+        model, _ = _fitted_model(directory)
+        features = {name: 1.0 for name in model.feature_names}
+        for bad in ('abc', float('inf')):
+            features[model.feature_names[0]] = bad
+            try:
+                model.predict(features)
+            except FeatureValidationError:
+                continue
+            raise AssertionError(f"valeur {bad!r} acceptee")
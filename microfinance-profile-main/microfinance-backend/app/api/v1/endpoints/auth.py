@@ -0,0 +1,34 @@
+# app/api/v1/endpoints/auth.py
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db
+from app.models.user import User
+from app.services.auth_service import auth_service
+
+router = APIRouter()
+bearer_scheme = HTTPBearer()
+
+async def get_current_user_dependency(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """Utilisateur du token Bearer (sub = id), chargé dans la session de la requête"""
+    unauthorized = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Token invalide ou expiré",
+        headers={"WWW-Authenticate": "Bearer"}
+    )
+    payload = auth_service.decode_access_token(credentials.credentials)
+    if not payload or not str(payload.get("sub", "")).isdigit():
+        raise unauthorized
+    
+    result = await db.execute(
+        select(User).where(User.id == int(payload["sub"]), User.is_active.is_(True))
+    )
+    user = result.scalar_one_or_none()
+    if user is None:
+        raise unauthorized
+    return user
@@ -0,0 +1,18 @@
+# app/api/v1/endpoints/credit_cash.py
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db
+from app.models.user import User
+from app.services.portfolio_exposure import user_exposure
+from app.api.v1.endpoints.auth import get_current_user_dependency
+
+router = APIRouter()
+
+@router.get("/active-summary")
+async def get_active_summary(
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Encours des crédits actifs (cash et longs) en une requête agrégée"""
+    return {"success": True, "data": await user_exposure(db, current_user.id)}
@@ -0,0 +1,4 @@
+# app/api/v1/endpoints/credit_long.py
+from fastapi import APIRouter
+
+router = APIRouter()
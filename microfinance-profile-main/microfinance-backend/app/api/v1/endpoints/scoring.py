@@ -1,76 +1,64 @@
 # app/api/v1/endpoints/scoring.py
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
-from app.core.database import get_db
+from app.core.database import get_db, AsyncSessionLocal
 from app.models.user import User
 from app.models.scoring import CreditScoring
-from app.services.scoring_service import scoring_service
+from app.services.portfolio_exposure import user_exposure
+from app.services.scoring_service import scoring_service, realtime_score_flight
+from app.services.user_score import update_user_score
 from app.api.v1.endpoints.auth import get_current_user_dependency
 
 router = APIRouter()
 
-@router.get("/realtime-score")
-async def get_realtime_score(
-    current_user: User = Depends(get_current_user_dependency),
-    db: Session = Depends(get_db)
-):
-    """Obtient le score de crédit en temps réel"""
-    
-    # Compter les crédits actifs pour le calcul
-    from app.models.credit_cash import CreditCash
-    from app.models.credit_long import CreditLong
-    
-    active_cash_credits = db.query(CreditCash).filter(
-        CreditCash.user_id == current_user.id,
-        CreditCash.status.in_(["approved", "disbursed"])
-    ).all()
-    
-    active_long_credits = db.query(CreditLong).filter(
-        CreditLong.user_id == current_user.id,
-        CreditLong.status.in_(["approved", "disbursed"])
-    ).all()
-    
-    # Calculer les dettes existantes
-    total_debt = sum([credit.approved_amount or 0 for credit in active_cash_credits])
-    total_debt += sum([credit.approved_amount or 0 for credit in active_long_credits])
-    
-    user_data = {
-        "username": current_user.email,
-        "monthly_income": current_user.monthly_income,
-        "employment_status": current_user.employment_status,
-        "job_seniority": current_user.work_experience,
-        "profession": current_user.profession or "",
-        "company": current_user.employer_name or "",
-        "existing_debts": total_debt,
-        "current_score": current_user.credit_score,
-        "active_credits": [
-            {
-                "amount": credit.approved_amount or credit.requested_amount,
-                "type": "cash",
-                "status": credit.status
-            } for credit in active_cash_credits
-        ] + [
-            {
-                "amount": credit.approved_amount or credit.requested_amount, 
-                "type": "long",
-                "status": credit.status
-            } for credit in active_long_credits
-        ]
-    }
-    
-    try:
+async def _compute_realtime_score(current_user: User):
+    """
+    Crédits actifs + appel au service de scoring, partagé par les appels concurrents.
+    Session propre : le calcul peut survivre à la requête qui l'a lancé.
+    """
+    async with AsyncSessionLocal() as session:
+        # Dettes existantes : une requête agrégée servie par l'index couvrant
+        credits = await user_exposure(session, current_user.id)
+        
+        user_data = {
+            "username": current_user.email,
+            "monthly_income": current_user.monthly_income,
+            "employment_status": current_user.employment_status,
+            "job_seniority": current_user.work_experience,
+            "profession": current_user.profession or "",
+            "company": current_user.employer_name or "",
+            "existing_debts": credits["total_debt"],
+            "current_score": current_user.credit_score,
+            "active_credits": credits["active_credits"]
+        }
+        
         scoring_result = await scoring_service.calculate_realtime_score(user_data)
         
         # Mettre à jour le profil utilisateur si le score a changé
         new_score = scoring_result.get("score", current_user.credit_score)
         if abs(new_score - current_user.credit_score) >= 0.1:
-            current_user.credit_score = new_score
-            current_user.risk_level = scoring_result.get("risk_level", "medium")
-            current_user.eligible_amount_cash = scoring_result.get("eligible_amount_cash", 0)
-            current_user.eligible_amount_long = scoring_result.get("eligible_amount_long", 0)
-            db.commit()
+            await update_user_score(session, current_user.id, scoring_result, new_score)
+    
+    return scoring_result
+
+@router.get("/realtime-score")
+async def get_realtime_score(
+    current_user: User = Depends(get_current_user_dependency)
+):
+    """
+    Obtient le score de crédit en temps réel.
+    Les appels simultanés d'un même utilisateur (plusieurs widgets) partagent
+    un seul calcul, et son résultat pendant REALTIME_SCORE_MEMO_SECONDS.
+    """
+    
+    try:
+        scoring_result = await realtime_score_flight.do(
+            current_user.id,
+            lambda: _compute_realtime_score(current_user)
+        )
         
         return {
             "success": True,
@@ -91,10 +79,15 @@ async def get_realtime_score(
             }
         }
 
+@router.get("/realtime-score/stats")
+async def get_realtime_score_stats():
+    """Compteurs du regroupement des appels temps réel (appels partagés, calculs effectués)"""
+    return realtime_score_flight.stats()
+
 @router.post("/refresh-score")
 async def refresh_user_score(
     current_user: User = Depends(get_current_user_dependency),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Force le recalcul du score utilisateur"""
     
@@ -134,7 +127,9 @@ async def refresh_user_score(
         )
         
         db.add(scoring_record)
-        db.commit()
+        await db.commit()
+        # Le prochain /realtime-score repart du nouveau score
+        realtime_score_flight.forget(current_user.id)
         
         return {
             "success": True,
@@ -160,15 +155,17 @@ async def refresh_user_score(
 async def get_scoring_history(
     limit: int = 10,
     current_user: User = Depends(get_current_user_dependency),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Historique des scores de l'utilisateur"""
     
-    history = db.query(CreditScoring).filter(
-        CreditScoring.user_id == current_user.id
-    ).order_by(
-        CreditScoring.created_at.desc()
-    ).limit(limit).all()
+    result = await db.execute(
+        select(CreditScoring)
+        .where(CreditScoring.user_id == current_user.id)
+        .order_by(CreditScoring.created_at.desc())
+        .limit(limit)
+    )
+    history = result.scalars().all()
     
     return {
         "success": True,
@@ -0,0 +1,150 @@
+# benchmark_event_loop.py - Latence de la boucle d'événements sous charge
+"""
+Compare, sous N requêtes concurrentes, l'ancien accès base (Session
+synchrone, lignes ORM complètes des crédits actifs chargées dans la
+coroutine) et l'accès asynchrone (AsyncSession + requête agrégée).
+
+Une sonde se réveille toutes les 5 ms : son retard mesure le temps pendant
+lequel la boucle est restée bloquée, donc le délai ajouté à toutes les
+autres requêtes du worker.
+
+    python -m app.benchmark_event_loop --seed --users 2000 --credits 5
+    python -m app.benchmark_event_loop --concurrency 50 --requests 2000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.core.database import AsyncSessionLocal, Base, DATABASE_URL, engine
+from app.models.credit_cash import CreditCash
+from app.models.credit_long import CreditLong
+from app.models.scoring import CreditScoring  # noqa: F401 (relation User.scoring_results)
+from app.models.user import User
+from app.services.portfolio_exposure import ACTIVE_STATUSES, user_exposure
+
+PROBE_INTERVAL = 0.005
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+async def seed(n_users: int, credits_per_user: int):
+    """Utilisateurs de test bench-*@example.com avec leurs crédits cash et longs"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    rng = random.Random(42)
+    statuses = list(ACTIVE_STATUSES) + ["pending", "completed", "rejected"]
+    async with AsyncSessionLocal() as session:
+        for start in range(0, n_users, 500):
+            users = [
+                User(email=f"bench-{i}@example.com", password_hash="-", first_name="Bench",
+                     last_name=str(i), monthly_income=rng.randint(150, 2000) * 1000)
+                for i in range(start, min(n_users, start + 500))
+            ]
+            session.add_all(users)
+            await session.flush()
+            for user in users:
+                for j in range(credits_per_user):
+                    amount = rng.randint(50, 2000) * 1000
+                    session.add(CreditCash(
+                        reference=f"BC-{user.id}-{j}", user_id=user.id, credit_type="depannage",
+                        requested_amount=amount, approved_amount=amount * 0.9, status=rng.choice(statuses)
+                    ))
+                session.add(CreditLong(
+                    reference=f"BL-{user.id}", user_id=user.id, requested_amount=5e6, duration_months=24,
+                    purpose="Benchmark crédit long", status=rng.choice(statuses), approved_amount=4.5e6
+                ))
+            await session.commit()
+    print(f"{n_users} utilisateurs créés ({credits_per_user + 1} crédits chacun)")
+
+
+async def _user_ids():
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(User.id).where(User.email.like("bench-%")))
+        return result.scalars().all()
+
+
+def _sync_summary(sync_engine, user_id: int) -> float:
+    """Ancien chemin : deux requêtes synchrones, lignes ORM complètes, somme en Python"""
+    with Session(sync_engine) as db:
+        cash = db.query(CreditCash).filter(
+            CreditCash.user_id == user_id, CreditCash.status.in_(ACTIVE_STATUSES)).all()
+        long = db.query(CreditLong).filter(
+            CreditLong.user_id == user_id, CreditLong.status.in_(ACTIVE_STATUSES)).all()
+        return sum(c.approved_amount or 0 for c in cash) + sum(c.approved_amount or 0 for c in long)
+
+
+async def run(mode: str, user_ids, concurrency: int, n_requests: int, sync_engine=None):
+    lags, latencies = [], []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            expected = time.perf_counter() + PROBE_INTERVAL
+            await asyncio.sleep(PROBE_INTERVAL)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    async def one_request(user_id):
+        started = time.perf_counter()
+        if mode == "sync":
+            _sync_summary(sync_engine, user_id)  # bloque la boucle pendant la requête
+        else:
+            async with AsyncSessionLocal() as session:
+                await user_exposure(session, user_id)
+        latencies.append(time.perf_counter() - started)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(user_id):
+        async with semaphore:
+            await one_request(user_id)
+
+    probe_task = asyncio.create_task(probe())
+    started = time.perf_counter()
+    await asyncio.gather(*[limited(random.choice(user_ids)) for _ in range(n_requests)])
+    elapsed = time.perf_counter() - started
+    done.set()
+    await probe_task
+
+    print(f"{mode:6s} {n_requests / elapsed:8.0f} req/s  "
+          f"latence p50 {_percentile(latencies, 0.5) * 1000:6.1f} ms  p99 {_percentile(latencies, 0.99) * 1000:6.1f} ms  | "
+          f"retard boucle p50 {_percentile(lags, 0.5) * 1000:5.1f} ms  p99 {_percentile(lags, 0.99) * 1000:6.1f} ms  "
+          f"max {max(lags, default=0) * 1000:6.1f} ms  moyen {statistics.fmean(lags or [0]) * 1000:5.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", action="store_true", help="créer les utilisateurs de test")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--credits", type=int, default=5, help="crédits cash par utilisateur")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.seed:
+        await seed(args.users, args.credits)
+    user_ids = await _user_ids()
+    if not user_ids:
+        raise SystemExit("Aucun utilisateur bench-*: lancer d'abord avec --seed")
+
+    sync_engine = create_engine(DATABASE_URL.replace("+asyncpg", "+psycopg2"), pool_size=args.concurrency)
+    # Préchauffage des deux pools
+    await run("async", user_ids, args.concurrency, min(200, args.requests))
+    _sync_summary(sync_engine, user_ids[0])
+
+    print(f"{args.requests} requêtes, {args.concurrency} concurrentes, {len(user_ids)} utilisateurs")
+    await run("sync", user_ids, args.concurrency, args.requests, sync_engine)
+    await run("async", user_ids, args.concurrency, args.requests)
+    sync_engine.dispose()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
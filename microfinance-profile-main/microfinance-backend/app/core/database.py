@@ -8,8 +8,10 @@ DATABASE_URL = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncp
 
 engine = create_async_engine(
     DATABASE_URL,
-    echo=True,
-    pool_pre_ping=True
+    echo=settings.DATABASE_ECHO,
+    pool_pre_ping=True,
+    pool_size=settings.DATABASE_POOL_SIZE,
+    max_overflow=settings.DATABASE_MAX_OVERFLOW
 )
 
 AsyncSessionLocal = async_sessionmaker(
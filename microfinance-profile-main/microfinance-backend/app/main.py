@@ -8,14 +8,21 @@ import uvicorn
 from app.core.config import settings
 from app.core.database import engine, Base
 from app.api.v1 import api_router
+from app.services.scoring_service import scoring_service, realtime_score_flight
+from app.services.portfolio_exposure import create_exposure_indexes
 
 # Créer les tables au démarrage
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Créer les tables
-    Base.metadata.create_all(bind=engine)
+    # Créer les tables (moteur asyncpg : create_all exécuté via run_sync)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_exposure_indexes)
     print("✅ Tables créées")
+    # Client HTTP partagé vers le service de scoring Flask
+    await scoring_service.start()
     yield
+    await scoring_service.aclose()
     print("🔄 Arrêt de l'application")
 
 app = FastAPI(
@@ -43,4 +50,9 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "database": "connected"}
\ No newline at end of file
+    return {
+        "status": "healthy",
+        "database": "connected",
+        "scoring_service": scoring_service.status(),
+        "realtime_score_coalescing": realtime_score_flight.stats()
+    }
\ No newline at end of file
@@ -1,11 +1,16 @@
 # app/models/credit_cash.py
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, JSON, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
 class CreditCash(Base):
     __tablename__ = "credit_cash"
+    __table_args__ = (
+        # Index couvrant de l'exposition (services/portfolio_exposure) : parcours index seul
+        Index("ix_credit_cash_user_status", "user_id", "status",
+              postgresql_include=["approved_amount", "requested_amount"]),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     reference = Column(String(50), unique=True, nullable=False)
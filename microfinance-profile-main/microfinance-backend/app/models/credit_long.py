@@ -1,11 +1,16 @@
 # app/models/credit_long.py
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, JSON, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
 class CreditLong(Base):
     __tablename__ = "credit_long"
+    __table_args__ = (
+        # Même index couvrant que credit_cash (exposition par utilisateur et statut)
+        Index("ix_credit_long_user_status", "user_id", "status",
+              postgresql_include=["approved_amount", "requested_amount"]),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     reference = Column(String(50), unique=True, nullable=False)
@@ -50,7 +55,7 @@ class CreditLong(Base):
     review_notes = Column(Text)
     
     # Relations
-    user = relationship("User", back_populates="credit_long_requests")
+    user = relationship("User", back_populates="credit_long_requests", foreign_keys=[user_id])
     documents = relationship("CreditLongDocument", back_populates="credit_long")
     history = relationship("CreditLongHistory", back_populates="credit_long")
 
@@ -36,5 +36,5 @@ class User(Base):
     
     # Relations
     credit_cash_requests = relationship("CreditCash", back_populates="user")
-    credit_long_requests = relationship("CreditLong", back_populates="user")
+    credit_long_requests = relationship("CreditLong", back_populates="user", foreign_keys="CreditLong.user_id")
     scoring_results = relationship("CreditScoring", back_populates="user")
\ No newline at end of file
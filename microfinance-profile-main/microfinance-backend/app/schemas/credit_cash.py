@@ -4,7 +4,7 @@ from typing import Optional, List
 from datetime import datetime
 
 class CreditCashRequest(BaseModel):
-    credit_type: str = Field(..., regex="^(consommation_generale|avance_salaire|depannage)$")
+    credit_type: str = Field(..., pattern="^(consommation_generale|avance_salaire|depannage)$")
     requested_amount: float = Field(..., gt=0, le=2_000_000)
     auto_approve: bool = Field(True, description="Décaissement automatique si éligible")
 
@@ -5,7 +5,7 @@ from datetime import datetime
 
 class PersonalInfo(BaseModel):
     full_name: str = Field(..., min_length=2)
-    email: str = Field(..., regex=r'^[^@]+@[^@]+\.[^@]+$')
+    email: str = Field(..., pattern=r'^[^@]+@[^@]+\.[^@]+$')
     phone: str = Field(..., min_length=8)
     address: str = Field(..., min_length=10)
     profession: str
@@ -3,7 +3,9 @@ from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
 from app.models.user import User
 
@@ -26,12 +28,20 @@ class AuthService:
     def get_password_hash(self, password: str) -> str:
         return pwd_context.hash(password)
     
-    def authenticate_user(self, db: Session, email: str, password: str) -> Optional[User]:
-        user = db.query(User).filter(User.email == email).first()
+    async def authenticate_user(self, db: AsyncSession, email: str, password: str) -> Optional[User]:
+        result = await db.execute(select(User).where(User.email == email))
+        user = result.scalar_one_or_none()
         if not user:
             return None
-        if not self.verify_password(password, user.password_hash):
+        # bcrypt est volontairement lent : hors de la boucle d'événements
+        if not await run_in_threadpool(self.verify_password, password, user.password_hash):
             return None
         return user
+    
+    def decode_access_token(self, token: str) -> Optional[dict]:
+        try:
+            return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            return None
 
 auth_service = AuthService()
\ No newline at end of file
@@ -0,0 +1,73 @@
+# app/services/circuit_breaker.py
+import time
+from typing import Any, Dict, Optional
+
+
+class CircuitOpenError(Exception):
+    """Appel refusé : le service distant est considéré indisponible"""
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur pour un service distant.
+
+    closed    : appels autorisés, les échecs consécutifs sont comptés
+    open      : après failure_threshold échecs, appels refusés pendant reset_timeout secondes
+    half_open : ensuite, un seul appel d'essai; succès -> closed, échec -> open
+
+    Pas de verrou : utilisé depuis une seule boucle asyncio.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, name: str = "service"):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self.stats = {"rejected": 0, "opened": 0}
+
+    def allow(self) -> bool:
+        """True si l'appel peut partir (en half_open, un seul à la fois)"""
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.stats["rejected"] += 1
+                return False
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                self.stats["rejected"] += 1
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self._probe_in_flight = False
+        if self.state == "open":
+            return  # appel parti avant l'ouverture : ne prolonge pas la coupure
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.stats["opened"] += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Appel abandonné (annulation) : ni succès ni échec"""
+        self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        retry_in = None
+        if self.state == "open":
+            retry_in = max(0.0, round(self.reset_timeout - (time.monotonic() - self.opened_at), 1))
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_in_seconds": retry_in,
+            **self.stats
+        }
@@ -0,0 +1,96 @@
+# app/services/portfolio_exposure.py
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.credit_cash import CreditCash
+from app.models.credit_long import CreditLong
+
+# Crédits qui comptent dans l'endettement du client
+ACTIVE_STATUSES = ("approved", "disbursed")
+
+# Index couvrants (user_id, status) INCLUDE montants, déclarés sur les modèles
+EXPOSURE_INDEXES = tuple(
+    index for model in (CreditCash, CreditLong)
+    for index in model.__table__.indexes if index.name.endswith("_user_status")
+)
+
+
+def create_exposure_indexes(connection):
+    """
+    Crée les index couvrants manquants. create_all ne les ajoute pas aux
+    tables déjà existantes ; à lancer via run_sync au démarrage.
+    """
+    for index in EXPOSURE_INDEXES:
+        index.create(connection, checkfirst=True)
+
+
+def _exposure_by_status(model, credit_type: str, user_ids: List[int]):
+    """
+    Agrégats par (utilisateur, statut) d'une table de crédits. Seuls user_id,
+    status et les montants sont lus : ils sont tous dans l'index couvrant
+    ix_<table>_user_status, les colonnes JSON ne sont jamais chargées.
+    """
+    return (
+        select(
+            model.user_id.label("user_id"),
+            literal(credit_type).label("type"),
+            model.status.label("status"),
+            func.count().label("count"),
+            func.coalesce(func.sum(model.approved_amount), 0).label("approved_total"),
+            func.coalesce(func.sum(func.coalesce(model.approved_amount, model.requested_amount)), 0).label("amount"),
+        )
+        .where(model.user_id.in_(user_ids), model.status.in_(ACTIVE_STATUSES))
+        .group_by(model.user_id, model.status)
+    )
+
+
+def exposure_query(user_ids: Iterable[int]):
+    """Crédits cash et longs actifs des utilisateurs : un seul UNION ALL de GROUP BY"""
+    user_ids = list(user_ids)
+    return union_all(
+        _exposure_by_status(CreditCash, "cash", user_ids),
+        _exposure_by_status(CreditLong, "long", user_ids),
+    )
+
+
+def _empty_exposure() -> Dict[str, Any]:
+    return {"total_debt": 0.0, "active_count": 0, "active_credits": []}
+
+
+def summarize(rows, user_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Regroupe les lignes agrégées par utilisateur. Chaque utilisateur demandé
+    a une entrée, vide s'il n'a aucun crédit actif.
+    """
+    exposures = {user_id: _empty_exposure() for user_id in user_ids}
+    for row in sorted(rows, key=lambda r: (r.type, r.status)):
+        exposure = exposures.setdefault(row.user_id, _empty_exposure())
+        exposure["total_debt"] += float(row.approved_total)
+        exposure["active_count"] += row.count
+        exposure["active_credits"].append({
+            "type": row.type,
+            "status": row.status,
+            "count": row.count,
+            "amount": float(row.amount),
+        })
+    return exposures
+
+
+async def portfolio_exposure(session: AsyncSession, user_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Exposition de plusieurs utilisateurs en un aller-retour : par utilisateur,
+    total des montants approuvés (dettes existantes), nombre de crédits actifs
+    et une ligne par type et statut.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+    rows = (await session.execute(exposure_query(user_ids))).all()
+    return summarize(rows, user_ids)
+
+
+async def user_exposure(session: AsyncSession, user_id: int) -> Dict[str, Any]:
+    """Exposition d'un seul utilisateur (dettes existantes du scoring temps réel)"""
+    return (await portfolio_exposure(session, [user_id]))[user_id]
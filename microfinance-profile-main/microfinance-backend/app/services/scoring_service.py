@@ -0,0 +1,178 @@
+# app/services/scoring_service.py
+import httpx
+import asyncio
+from typing import Dict, Any, Optional
+from app.core.config import settings
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.services.single_flight import SingleFlight
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Délais par endpoint du service Flask (le scoring complet lit la base, le temps réel doit rester court)
+ENDPOINT_TIMEOUTS = {
+    "/client-scoring": httpx.Timeout(settings.SCORING_TIMEOUT_SCORE, connect=settings.SCORING_CONNECT_TIMEOUT),
+    "/realtime-scoring": httpx.Timeout(settings.SCORING_TIMEOUT_REALTIME, connect=settings.SCORING_CONNECT_TIMEOUT),
+}
+
+class ScoringService:
+    """
+    Client du service de scoring Flask.
+
+    Un seul httpx.AsyncClient (pool de connexions keep-alive) ouvert par le
+    lifespan de l'application; un disjoncteur bascule directement sur le
+    scoring de fallback après des échecs répétés au lieu d'attendre le délai
+    à chaque requête.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url or settings.SCORING_SERVICE_URL
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.SCORING_BREAKER_FAILURES,
+            reset_timeout=settings.SCORING_BREAKER_RESET_SECONDS,
+            name="flask-scoring"
+        )
+        self.stats = {"requests": 0, "failures": 0, "fallbacks": 0}
+    
+    async def start(self):
+        """Ouvre le client partagé (appelé au démarrage de l'application)"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                transport=self.transport,
+                timeout=httpx.Timeout(settings.SCORING_TIMEOUT_SCORE, connect=settings.SCORING_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=settings.SCORING_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.SCORING_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.SCORING_KEEPALIVE_EXPIRY
+                )
+            )
+            logger.info(f"Client scoring ouvert vers {self.base_url}")
+    
+    async def aclose(self):
+        """Ferme les connexions du pool (arrêt de l'application)"""
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise RuntimeError("ScoringService non démarré: appeler start() dans le lifespan")
+        return self._client
+    
+    async def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST via le client partagé, sous contrôle du disjoncteur"""
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Service de scoring indisponible ({self.breaker.state})")
+        
+        self.stats["requests"] += 1
+        try:
+            response = await self.client.post(path, json=payload, timeout=ENDPOINT_TIMEOUTS[path])
+            response.raise_for_status()
+            result = response.json()
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except httpx.HTTPStatusError as e:
+            # Une erreur 4xx vient de la requête, pas d'une panne du service
+            if e.response.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.release()
+            self.stats["failures"] += 1
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            self.stats["failures"] += 1
+            raise
+        
+        self.breaker.record_success()
+        return result
+    
+    async def calculate_score(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Calcule le score via le service Flask"""
+        try:
+            return await self._post("/client-scoring", user_data)
+                
+        except Exception as e:
+            logger.error(f"Erreur scoring Flask: {str(e)}")
+            self.stats["fallbacks"] += 1
+            return self._fallback_scoring(user_data)
+    
+    async def calculate_realtime_score(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Score temps réel"""
+        try:
+            return await self._post("/realtime-scoring", user_data)
+                
+        except Exception as e:
+            logger.error(f"Erreur scoring temps réel: {str(e)}")
+            self.stats["fallbacks"] += 1
+            return self._fallback_realtime_scoring(user_data)
+    
+    def status(self) -> Dict[str, Any]:
+        """État du client et du disjoncteur (pour /health)"""
+        return {
+            "url": self.base_url,
+            "client_open": self._client is not None,
+            "circuit": self.breaker.snapshot(),
+            **self.stats
+        }
+    
+    def _fallback_scoring(self, user_data: Dict) -> Dict[str, Any]:
+        """Scoring de fallback"""
+        monthly_income = user_data.get("monthly_income", 0)
+        employment_status = user_data.get("employment_status", "autre")
+        
+        # Score de base
+        if monthly_income >= 500000:
+            score = 8.0
+        elif monthly_income >= 300000:
+            score = 6.5
+        elif monthly_income >= 150000:
+            score = 5.0
+        else:
+            score = 3.0
+        
+        # Ajustements
+        if employment_status == "cdi":
+            score += 1.0
+        elif employment_status == "cdd":
+            score += 0.5
+        
+        score = max(0, min(10, score))
+        
+        # Montants éligibles
+        eligible_cash = min(monthly_income * 0.5, settings.MAX_CREDIT_CASH)
+        eligible_long = min(monthly_income * 3, settings.MAX_CREDIT_LONG) if score >= 6 else 0
+        
+        return {
+            "score": score,
+            "risk_level": "low" if score >= 7 else ("medium" if score >= 5 else "high"),
+            "probability": score / 10,
+            "decision": "approuvé" if score >= 7 else ("à étudier" if score >= 5 else "refusé"),
+            "eligible_amount": int(eligible_cash),
+            "eligible_amount_cash": int(eligible_cash),
+            "eligible_amount_long": int(eligible_long),
+            "factors": [],
+            "recommendations": ["Scoring de fallback utilisé"],
+            "model_version": "fallback_1.0"
+        }
+    
+    def _fallback_realtime_scoring(self, user_data: Dict) -> Dict[str, Any]:
+        """Scoring temps réel de fallback"""
+        result = self._fallback_scoring(user_data)
+        result.update({
+            "is_realtime": True,
+            "previous_score": user_data.get("current_score", 6.0),
+            "score_change": result["score"] - user_data.get("current_score", 6.0),
+            "last_updated": "now"
+        })
+        return result
+
+scoring_service = ScoringService()
+
+# Appels concurrents à /realtime-score pour un même utilisateur regroupés
+realtime_score_flight = SingleFlight(memo_seconds=settings.REALTIME_SCORE_MEMO_SECONDS, name="realtime-score")
\ No newline at end of file
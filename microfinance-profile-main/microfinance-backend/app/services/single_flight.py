@@ -0,0 +1,89 @@
+# app/services/single_flight.py
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    Regroupement des appels concurrents par clé.
+
+    Un seul calcul en cours par clé : les appels qui arrivent pendant ce
+    calcul attendent le même résultat (coalesced). Un résultat réussi reste
+    servi pendant memo_seconds (memo_hits) pour absorber les rafales. Les
+    erreurs sont propagées à tous les appelants en attente mais jamais
+    mémorisées.
+
+    Le calcul tourne dans sa propre tâche : l'annulation d'un appelant
+    (client déconnecté) n'interrompt pas les autres.
+    """
+
+    def __init__(self, memo_seconds: float = 2.0, max_entries: int = 10000, name: str = "single-flight"):
+        self.memo_seconds = memo_seconds
+        self.max_entries = max_entries
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._memo: Dict[Hashable, Tuple[float, Any]] = {}
+        self.counters = {"calls": 0, "executions": 0, "coalesced": 0, "memo_hits": 0, "errors": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.counters["calls"] += 1
+
+        memo = self._memo.get(key)
+        if memo is not None:
+            if time.monotonic() < memo[0]:
+                self.counters["memo_hits"] += 1
+                return memo[1]
+            del self._memo[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.counters["coalesced"] += 1
+        else:
+            self.counters["executions"] += 1
+            task = asyncio.ensure_future(self._run(key, fn))
+            # Erreur lue même si tous les appelants ont été annulés
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = asyncio.current_task()
+        try:
+            result = await fn()
+        except BaseException:
+            self.counters["errors"] += 1
+            raise
+        finally:
+            current = self._inflight.get(key) is task
+            if current:
+                del self._inflight[key]
+        # Clé invalidée par forget() pendant le calcul : résultat non mémorisé
+        if current and self.memo_seconds > 0:
+            self._remember(key, result)
+        return result
+
+    def _remember(self, key: Hashable, result: Any):
+        now = time.monotonic()
+        if len(self._memo) >= self.max_entries:
+            self._memo = {k: v for k, v in self._memo.items() if v[0] > now}
+            if len(self._memo) >= self.max_entries:
+                self._memo.pop(next(iter(self._memo)))
+        self._memo[key] = (now + self.memo_seconds, result)
+
+    def forget(self, key: Hashable):
+        """Invalide le résultat mémorisé et détache le calcul en cours (données modifiées)"""
+        self._memo.pop(key, None)
+        self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.counters["calls"]
+        shared = self.counters["coalesced"] + self.counters["memo_hits"]
+        return {
+            "name": self.name,
+            "memo_seconds": self.memo_seconds,
+            "in_flight": len(self._inflight),
+            "memoized": len(self._memo),
+            **self.counters,
+            "shared_ratio": round(shared / calls, 4) if calls else 0.0
+        }
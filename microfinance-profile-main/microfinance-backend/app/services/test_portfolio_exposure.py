@@ -0,0 +1,54 @@
+"""
+Exposition des portefeuilles : forme de la requête agrégée (un seul
+UNION ALL, colonnes couvertes par l'index) et regroupement par utilisateur.
+
+    python -m pytest app/services/test_portfolio_exposure.py      (depuis microfinance-backend)
+"""
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from app.models.scoring import CreditScoring  # noqa: F401 (relation User.scoring_results)
+from app.models.user import User  # noqa: F401
+from app.services.portfolio_exposure import EXPOSURE_INDEXES, exposure_query, summarize
+
+
+def _sql(statement):
+    return str(statement.compile(dialect=postgresql.dialect())).lower()
+
+
+def _row(user_id, type_, status, count, approved_total, amount):
+    return SimpleNamespace(user_id=user_id, type=type_, status=status, count=count,
+                           approved_total=approved_total, amount=amount)
+
+
+def test_single_round_trip_reads_only_indexed_columns():
+    sql = _sql(exposure_query([1, 2, 3]))
+    assert sql.count("union all") == 1 and sql.count("group by") == 2
+    assert "from credit_cash" in sql and "from credit_long" in sql
+    for column in ("financial_details", "simulation_results", "personal_info", "scoring_factors", "notes"):
+        assert column not in sql
+
+
+def test_covering_indexes():
+    assert sorted(index.name for index in EXPOSURE_INDEXES) == ["ix_credit_cash_user_status", "ix_credit_long_user_status"]
+    for index in EXPOSURE_INDEXES:
+        ddl = str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+        assert "(user_id, status) INCLUDE (approved_amount, requested_amount)" in ddl
+
+
+def test_summarize_groups_by_user():
+    rows = [
+        _row(1, "long", "approved", 1, 4.5e6, 4.5e6),
+        _row(1, "cash", "disbursed", 2, 300000, 300000),
+        _row(1, "cash", "approved", 1, 0, 150000),  # approved_amount encore NULL
+        _row(2, "cash", "approved", 3, 90000, 90000),
+    ]
+    exposures = summarize(rows, [1, 2, 3])
+    assert exposures[1]["total_debt"] == 4.8e6 and exposures[1]["active_count"] == 4
+    assert [(c["type"], c["status"]) for c in exposures[1]["active_credits"]] == [
+        ("cash", "approved"), ("cash", "disbursed"), ("long", "approved")]
+    assert exposures[2]["active_credits"] == [{"type": "cash", "status": "approved", "count": 3, "amount": 90000.0}]
+    assert exposures[3] == {"total_debt": 0.0, "active_count": 0, "active_credits": []}
+
@@ -0,0 +1,104 @@
+"""
+Client de scoring partagé : réutilisation du client, délais par endpoint,
+disjoncteur et bascule sur le fallback.
+
+    python -m pytest app/services/test_scoring_service.py      (depuis microfinance-backend)
+"""
+import asyncio
+
+import httpx
+
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.scoring_service import ENDPOINT_TIMEOUTS, ScoringService
+
+USER = {"username": "client@test", "monthly_income": 600000, "employment_status": "cdi"}
+
+
+def _service(handler, failures=3, reset=60.0):
+    service = ScoringService(base_url="http://scoring.test", transport=httpx.MockTransport(handler))
+    service.breaker = CircuitBreaker(failure_threshold=failures, reset_timeout=reset)
+    return service
+
+
+def test_shared_client_and_timeouts():
+    seen = []
+
+    def handler(request):
+        seen.append((request.url.path, request.extensions["timeout"]["read"]))
+        return httpx.Response(200, json={"score": 7.5, "model_version": "v1"})
+
+    async def scenario():
+        service = _service(handler)
+        await service.start()
+        client = service.client
+        assert (await service.calculate_score(USER))["score"] == 7.5
+        assert (await service.calculate_realtime_score(USER))["score"] == 7.5
+        assert service.client is client
+        await service.aclose()
+
+    asyncio.run(scenario())
+    assert seen == [
+        ("/client-scoring", ENDPOINT_TIMEOUTS["/client-scoring"].read),
+        ("/realtime-scoring", ENDPOINT_TIMEOUTS["/realtime-scoring"].read),
+    ]
+
+
+def test_breaker_opens_and_uses_fallback():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        raise httpx.ConnectError("refused", request=request)
+
+    async def scenario():
+        service = _service(handler, failures=3)
+        await service.start()
+        results = [await service.calculate_score(USER) for _ in range(10)]
+        await service.aclose()
+        return service, results
+
+    service, results = asyncio.run(scenario())
+    assert len(calls) == 3  # les 7 suivants ne partent pas
+    assert all(r["model_version"] == "fallback_1.0" for r in results)
+    assert service.breaker.state == "open"
+    assert service.status()["circuit"]["rejected"] == 7
+
+
+def test_half_open_probe_recovers():
+    healthy = {"up": False}
+
+    def handler(request):
+        if not healthy["up"]:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"score": 6.0})
+
+    async def scenario():
+        service = _service(handler, failures=2, reset=0.05)
+        await service.start()
+        for _ in range(2):
+            await service.calculate_realtime_score(USER)
+        assert service.breaker.state == "open"
+        healthy["up"] = True
+        await asyncio.sleep(0.06)
+        result = await service.calculate_realtime_score(USER)
+        await service.aclose()
+        return service, result
+
+    service, result = asyncio.run(scenario())
+    assert result["score"] == 6.0 and service.breaker.state == "closed"
+
+
+def test_client_errors_do_not_trip():
+    def handler(request):
+        return httpx.Response(422, json={"detail": "invalide"})
+
+    async def scenario():
+        service = _service(handler, failures=2)
+        await service.start()
+        for _ in range(5):
+            await service.calculate_score(USER)
+        await service.aclose()
+        return service
+
+    assert asyncio.run(scenario()).breaker.state == "closed"
+
@@ -0,0 +1,100 @@
+"""
+Regroupement des appels concurrents : un calcul par clé, fenêtre de
+mémorisation, erreurs non mémorisées, annulation d'un appelant.
+
+    python -m pytest app/services/test_single_flight.py      (depuis microfinance-backend)
+"""
+import asyncio
+
+from app.services.single_flight import SingleFlight
+
+
+def _counting(delay=0.02, fail=False):
+    calls = []
+
+    async def compute(key):
+        calls.append(key)
+        await asyncio.sleep(delay)
+        if fail:
+            raise RuntimeError("service indisponible")
+        return {"user": key, "n": len(calls)}
+
+    return calls, compute
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight(memo_seconds=0)
+    calls, compute = _counting()
+
+    async def scenario():
+        return await asyncio.gather(
+            *[flight.do(1, lambda: compute(1)) for _ in range(8)],
+            *[flight.do(2, lambda: compute(2)) for _ in range(3)]
+        )
+
+    results = asyncio.run(scenario())
+    assert sorted(calls) == [1, 2]
+    assert all(r is results[0] for r in results[:8])
+    stats = flight.stats()
+    assert stats["executions"] == 2 and stats["coalesced"] == 9 and stats["in_flight"] == 0
+
+
+def test_memo_window_absorbs_bursts():
+    flight = SingleFlight(memo_seconds=0.05)
+    calls, compute = _counting(delay=0)
+
+    async def scenario():
+        first = await flight.do(1, lambda: compute(1))
+        second = await flight.do(1, lambda: compute(1))
+        await asyncio.sleep(0.06)
+        third = await flight.do(1, lambda: compute(1))
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    assert second is first and third["n"] == 2
+    assert flight.stats()["memo_hits"] == 1
+
+
+def test_errors_propagate_and_are_not_memoized():
+    flight = SingleFlight(memo_seconds=10)
+    calls, compute = _counting(fail=True)
+
+    async def scenario():
+        results = await asyncio.gather(*[flight.do(1, lambda: compute(1)) for _ in range(4)],
+                                       return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        await asyncio.gather(flight.do(1, lambda: compute(1)), return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2 and flight.stats()["errors"] == 2
+
+
+def test_cancelled_caller_does_not_cancel_others():
+    flight = SingleFlight(memo_seconds=0)
+    calls, compute = _counting(delay=0.05)
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do(1, lambda: compute(1)))
+        second = asyncio.ensure_future(flight.do(1, lambda: compute(1)))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario())["user"] == 1 and len(calls) == 1
+
+
+def test_forget_during_execution():
+    flight = SingleFlight(memo_seconds=10)
+    calls, compute = _counting(delay=0.03)
+
+    async def scenario():
+        stale = asyncio.ensure_future(flight.do(1, lambda: compute(1)))
+        await asyncio.sleep(0.01)
+        flight.forget(1)  # score modifié pendant le calcul
+        fresh = await flight.do(1, lambda: compute(1))
+        await stale
+        return await flight.do(1, lambda: compute(1)), fresh
+
+    memoized, fresh = asyncio.run(scenario())
+    assert len(calls) == 2 and memoized is fresh
+
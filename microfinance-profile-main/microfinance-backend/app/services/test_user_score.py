@@ -0,0 +1,26 @@
+"""
+Mise à jour du score du profil : un seul UPDATE ciblé, valeurs par défaut
+quand le service de scoring ne renvoie pas tous les champs.
+
+    python -m pytest app/services/test_user_score.py      (depuis microfinance-backend)
+"""
+from sqlalchemy.dialects import postgresql
+
+from app.services.user_score import user_score_update
+
+
+def test_update_targets_one_user():
+    compiled = user_score_update(7, {"risk_level": "low", "eligible_amount_cash": 250000}, 7.4).compile(
+        dialect=postgresql.dialect())
+    sql = str(compiled).lower()
+    assert sql.startswith("update users set") and "where users.id =" in sql
+    assert "select" not in sql
+    assert compiled.params["id_1"] == 7
+    assert compiled.params["credit_score"] == 7.4 and compiled.params["risk_level"] == "low"
+    assert compiled.params["eligible_amount_cash"] == 250000 and compiled.params["eligible_amount_long"] == 0
+
+
+def test_update_defaults():
+    params = user_score_update(1, {}, 5.0).compile(dialect=postgresql.dialect()).params
+    assert params["risk_level"] == "medium"
+    assert params["eligible_amount_cash"] == params["eligible_amount_long"] == 0
@@ -0,0 +1,25 @@
+# app/services/user_score.py
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.user import User
+
+
+def user_score_update(user_id: int, scoring_result: dict, score: float):
+    """UPDATE direct du score du profil, sans recharger l'utilisateur"""
+    return (
+        update(User)
+        .where(User.id == user_id)
+        .values(
+            credit_score=score,
+            risk_level=scoring_result.get("risk_level", "medium"),
+            eligible_amount_cash=scoring_result.get("eligible_amount_cash", 0),
+            eligible_amount_long=scoring_result.get("eligible_amount_long", 0),
+        )
+    )
+
+
+async def update_user_score(session: AsyncSession, user_id: int, scoring_result: dict, score: float):
+    """Met à jour le score du profil et valide la transaction"""
+    await session.execute(user_score_update(user_id, scoring_result, score))
+    await session.commit()